@@ -0,0 +1,187 @@
+"""Alert delivery worker.
+
+Drains `alert_deliveries` as a queue: claims due rows with SKIP LOCKED, sends
+them over pooled `httpx.AsyncClient` connections with per-channel concurrency,
+honours 429 Retry-After by pausing the channel, retries with exponential
+backoff, and writes all outcomes of a batch back in one statement.
+
+With a digest interval, non-urgent alerts are coalesced per channel into one
+message once the oldest has waited the interval or enough are buffered;
+high-severity alerts above the urgent confidence bypass the buffer.
+
+Run with `python -m alerts.delivery_worker`.
+"""
+
+import asyncio
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+from alerts.digest import format_digest
+from alerts.notifiers import send_async
+from api.services.delivery_service import claim_deliveries, claim_digest, record_delivery_results
+
+# Errors that retrying cannot fix.
+PERMANENT_ERRORS = {"missing_discord_webhook", "missing_telegram_token_or_chat"}
+
+
+class ChannelLimiter:
+    """Concurrency cap plus a shared pause window set by 429 responses."""
+
+    def __init__(self, concurrency: int):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.paused_until = 0.0
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def remaining_pause(self) -> float:
+        return max(0.0, self.paused_until - time.monotonic())
+
+
+def backoff_seconds(attempts: int, base: float = 5.0, cap: float = 900.0) -> float:
+    return min(cap, base * 2 ** max(0, attempts - 1)) * random.uniform(0.8, 1.2)
+
+
+def classify(item: Dict[str, Any], result: Dict[str, Any], max_attempts: int) -> Dict[str, Any]:
+    """Map a send result to a queue update."""
+    update = {"id": item["id"], "destination": result.get("destination"), "error": result.get("error"), "retry_in": 0.0}
+    if result.get("ok"):
+        update["status"] = "sent"
+        return update
+    if result.get("skipped"):
+        # Never sent (channel paused): reschedule and give back the claimed attempt.
+        update.update(status="retry", retry_in=result.get("retry_after") or 1.0, refund=1)
+        return update
+    status_code = result.get("status_code")
+    retryable = result.get("error") not in PERMANENT_ERRORS and (status_code is None or status_code == 429 or status_code >= 500)
+    if not retryable or item["attempts"] >= max_attempts:
+        update["status"] = "failed"
+        return update
+    update["status"] = "retry"
+    update["retry_in"] = result.get("retry_after") or backoff_seconds(item["attempts"])
+    return update
+
+
+async def deliver_one(
+    client: httpx.AsyncClient,
+    limiter: ChannelLimiter,
+    item: Dict[str, Any],
+    max_inline_wait: float = 5.0,
+    text: Optional[str] = None,
+) -> Dict[str, Any]:
+    async with limiter.semaphore:
+        wait = limiter.remaining_pause()
+        if wait > max_inline_wait:
+            return {"ok": False, "channel": item["channel"], "skipped": True, "error": "channel_paused", "retry_after": wait}
+        if wait:
+            await asyncio.sleep(wait)
+        result = await send_async(client, item["channel"], item["payload"], text=text)
+        if result.get("status_code") == 429:
+            limiter.pause(result.get("retry_after") or 1.0)
+        return result
+
+
+async def deliver_batch(client: httpx.AsyncClient, items: List[Dict[str, Any]], limiters: Dict[str, ChannelLimiter], max_attempts: int = 5) -> List[Dict[str, Any]]:
+    results = await asyncio.gather(*(deliver_one(client, limiters[i["channel"]], i) for i in items))
+    return [classify(i, r, max_attempts) for i, r in zip(items, results)]
+
+
+async def deliver_digest(client: httpx.AsyncClient, limiter: ChannelLimiter, items: List[Dict[str, Any]], max_attempts: int = 5) -> List[Dict[str, Any]]:
+    """Send one channel's claimed rows as a single message.
+
+    The rows listed in the message share its outcome; rows cut off by the
+    channel's length limit go back to `pending` (attempt refunded) for the
+    next digest.
+    """
+    if len(items) == 1:
+        return await deliver_batch(client, items, {items[0]["channel"]: limiter}, max_attempts)
+    text, included = format_digest([i["payload"] for i in items], items[0]["channel"])
+    result = await deliver_one(client, limiter, items[0], text=text)
+    listed = set(included)
+    updates = [classify(items[n], result, max_attempts) for n in included]
+    updates += [{"id": i["id"], "status": "pending", "error": None, "retry_in": 0.0, "refund": 1} for n, i in enumerate(items) if n not in listed]
+    return updates
+
+
+async def run_worker(
+    batch_size: int = 200,
+    poll_seconds: float = 2.0,
+    concurrency: Optional[Dict[str, int]] = None,
+    max_attempts: int = 5,
+    client: Optional[httpx.AsyncClient] = None,
+    once: bool = False,
+    digest_interval: float = 0.0,
+    digest_max_items: int = 25,
+    urgent_min_confidence: float = 0.9,
+) -> Dict[str, Any]:
+    concurrency = concurrency or {"discord": 4, "telegram": 8}
+    limiters = {ch: ChannelLimiter(n) for ch, n in concurrency.items()}
+    own_client = client is None
+    client = client or httpx.AsyncClient(timeout=8.0, limits=httpx.Limits(max_connections=sum(concurrency.values())))
+    stats = {"claimed": 0, "messages": 0, "sent": 0, "retry": 0, "failed": 0, "pending": 0, "seconds": 0.0}
+    try:
+        while True:
+            digesting = digest_interval > 0
+            items = await asyncio.to_thread(claim_deliveries, batch_size, 300, urgent_min_confidence if digesting else None)
+            digests = []
+            if digesting:
+                for ch in list(limiters):
+                    claimed = await asyncio.to_thread(claim_digest, ch, digest_interval, digest_max_items)
+                    if claimed:
+                        digests.append(claimed)
+            for i in items:
+                limiters.setdefault(i["channel"], ChannelLimiter(2))
+            if items or digests:
+                t0 = time.perf_counter()
+                results = await asyncio.gather(
+                    deliver_batch(client, items, limiters, max_attempts),
+                    *(deliver_digest(client, limiters[d[0]["channel"]], d, max_attempts) for d in digests),
+                )
+                updates = [u for r in results for u in r]
+                await asyncio.to_thread(record_delivery_results, updates)
+                elapsed = time.perf_counter() - t0
+                stats["claimed"] += len(updates)
+                stats["messages"] += len(items) + len(digests)
+                stats["seconds"] += elapsed
+                for u in updates:
+                    stats[u["status"]] += 1
+                print(
+                    f"[delivery] alerts={len(updates)} messages={len(items) + len(digests)} "
+                    f"sent={sum(u['status'] == 'sent' for u in updates)} rate={len(updates) / elapsed:.1f}/s"
+                )
+                continue
+            if once:
+                break
+            await asyncio.sleep(poll_seconds)
+    finally:
+        if own_client:
+            await client.aclose()
+    stats["deliveries_per_sec"] = round(stats["claimed"] / stats["seconds"], 1) if stats["seconds"] else None
+    return stats
+
+
+def main() -> None:
+    load_dotenv()
+    asyncio.run(
+        run_worker(
+            batch_size=int(os.getenv("DELIVERY_BATCH_SIZE", "200")),
+            poll_seconds=float(os.getenv("DELIVERY_POLL_SECONDS", "2")),
+            concurrency={
+                "discord": int(os.getenv("DELIVERY_DISCORD_CONCURRENCY", "4")),
+                "telegram": int(os.getenv("DELIVERY_TELEGRAM_CONCURRENCY", "8")),
+            },
+            max_attempts=int(os.getenv("DELIVERY_MAX_ATTEMPTS", "5")),
+            digest_interval=float(os.getenv("DIGEST_INTERVAL_SECONDS", "60")),
+            digest_max_items=int(os.getenv("DIGEST_MAX_ITEMS", "25")),
+            urgent_min_confidence=float(os.getenv("DIGEST_URGENT_MIN_CONFIDENCE", "0.9")),
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Per-channel alert digests.
+
+During bursts the delivery worker sends a channel's buffered alerts as one
+message instead of one message each. Buffering lives in the `alert_deliveries`
+queue (see `claim_digest`), so a restart loses nothing; this module only ranks
+and formats.
+"""
+
+from typing import Any, Dict, List, Tuple
+
+SEVERITY_RANK = {"high": 3, "medium": 2, "low": 1}
+MAX_CHARS = {"discord": 2000, "telegram": 4096}
+
+
+def rank_key(alert: Dict[str, Any]) -> Tuple[int, float]:
+    return SEVERITY_RANK.get(alert.get("severity"), 0), float(alert.get("confidence") or 0)
+
+
+def rank_alerts(alerts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return sorted(alerts, key=rank_key, reverse=True)
+
+
+def format_digest(alerts: List[Dict[str, Any]], channel: str) -> Tuple[str, List[int]]:
+    """One message for a channel, highest severity then confidence first, cut to the channel's length limit.
+
+    Returns the text and the indexes (into `alerts`) of the alerts it lists;
+    the ones cut off are summarised as "+N more" and must be sent later.
+    """
+    order = sorted(range(len(alerts)), key=lambda i: rank_key(alerts[i]), reverse=True)
+    counts: Dict[str, int] = {}
+    for i in order:
+        counts[alerts[i].get("severity", "medium")] = counts.get(alerts[i].get("severity", "medium"), 0) + 1
+    summary = ", ".join(f"{sev}={n}" for sev, n in counts.items())
+    head = f"BaseTrace digest: {len(alerts)} alerts ({summary})"
+    limit = MAX_CHARS.get(channel, 2000)
+    lines = [head]
+    size = len(head)
+    included: List[int] = []
+    for n, i in enumerate(order):
+        a = alerts[i]
+        line = f"- [{a.get('severity', 'medium')}] {a.get('type', 'unknown')} {a.get('address', '-')} conf={float(a.get('confidence') or 0):.2f}"
+        more = f"... +{len(order) - n} more in the next digest"
+        if size + len(line) + len(more) + 2 > limit:
+            lines.append(more)
+            break
+        lines.append(line)
+        included.append(i)
+        size += len(line) + 1
+    return "\n".join(lines), included
@@ -1,11 +1,316 @@
-"""Alert engine scaffold."""
+"""Alert engine.
 
+Rule evaluation shared by the SQL path in `api.services.alert_service` and the
+streaming path below. `StreamingAlertEngine` consumes committed blocks and keeps
+per-address sliding-window counters in memory (bucketed ring buffers covering
+the current and previous 24h), so candidates are emitted per block instead of
+by request-time scans over `transactions`.
+"""
 
-def evaluate_alerts(window_stats: dict) -> list[dict]:
+import json
+import os
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from labels.known_entities import BASE_KNOWN_LABELS
+
+BRIDGES = {a for a, label in BASE_KNOWN_LABELS.items() if label == "bridge"}
+
+WINDOW_SECONDS = 24 * 3600
+CHECKPOINT_VERSION = 1
+
+# rule_type -> (now evidence key, prev evidence key, base confidence, applies min_count)
+_SPIKE_RULES = {
+    "fan_out_spike": ("now_outbound", "prev_outbound", 0.5, True),
+    "fan_in_spike": ("now_inbound", "prev_inbound", 0.5, True),
+    "anomalous_bridge_path": ("bridge_counterparty_now", "bridge_counterparty_prev", 0.55, False),
+}
+
+
+def spike_alert(rule_type: str, address: str, now_c: int, prev_c: int, cfg: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    now_key, prev_key, base_conf, uses_min_count = _SPIKE_RULES[rule_type]
+    now_c = int(now_c or 0)
+    prev_c = int(prev_c or 0)
+    if uses_min_count and now_c < cfg["min_count"]:
+        return None
+    ratio = float(now_c) / max(1, prev_c)
+    delta = now_c - prev_c
+    if ratio < cfg["min_ratio"] or delta < cfg["min_delta"]:
+        return None
+    return {
+        "type": rule_type,
+        "address": address,
+        "severity": "high" if ratio >= 8 else "medium",
+        "confidence": min(0.99, base_conf + min(ratio, 10) / 12),
+        "evidence": {"window": "24h_vs_prev24h", now_key: now_c, prev_key: prev_c, "ratio": round(ratio, 2), "delta": delta},
+    }
+
+
+def centrality_alert(address: str, out_c: int, in_c: int, cfg: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    out_c = int(out_c or 0)
+    in_c = int(in_c or 0)
+    if out_c + in_c < cfg["min_count"]:
+        return None
+    return {
+        "type": "new_high_centrality_node",
+        "address": address,
+        "severity": "medium",
+        "confidence": 0.7,
+        "evidence": {"window": "last_24h", "outbound": out_c, "inbound": in_c, "degree_proxy": out_c + in_c},
+    }
+
+
+def apply_centrality(alert: Dict[str, Any], scores: Optional[Dict[str, Any]], min_pct: float = 0.95) -> Optional[Dict[str, Any]]:
+    """Re-score a `new_high_centrality_node` candidate with precomputed PageRank.
+
+    Degree alone is dominated by spam fan-outs; an address whose PageRank
+    percentile is below `min_pct` is dropped, the rest get confidence from
+    their percentile. Addresses the centrality job has not scored yet keep the
+    degree-based candidate.
+    """
+    if scores is None:
+        return alert
+    pct = float(scores["pagerank_pct"])
+    if pct < min_pct:
+        return None
+    evidence = {**alert["evidence"], "pagerank": scores["pagerank"], "pagerank_rank": scores["pagerank_rank"], "pagerank_pct": round(pct, 4)}
+    conf = 0.6 + 0.35 * (pct - min_pct) / max(1e-9, 1.0 - min_pct)
+    return {**alert, "severity": "high" if scores["pagerank_rank"] <= 100 else alert["severity"], "confidence": round(min(0.95, conf), 4), "evidence": evidence}
+
+
+def evaluate_alerts(window_stats: dict, thresholds: Dict[str, Dict[str, Any]]) -> list[dict]:
+    """Turn per-rule window rows into alert candidates.
+
+    `window_stats` maps rule type to rows of `(address, now_count, prev_count)`,
+    or `(address, outbound, inbound)` for `new_high_centrality_node`.
+    """
     alerts = []
-    # TODO:
-    # - fan_out_spike
-    # - fan_in_spike
-    # - new_high_centrality_node
-    # - anomalous_bridge_path
+    for rule_type in ("fan_out_spike", "fan_in_spike", "new_high_centrality_node", "anomalous_bridge_path"):
+        cfg = thresholds.get(rule_type)
+        if not cfg or not cfg.get("enabled"):
+            continue
+        for addr, a, b in window_stats.get(rule_type, []):
+            if rule_type == "new_high_centrality_node":
+                alert = centrality_alert(addr, a, b, cfg)
+            else:
+                alert = spike_alert(rule_type, addr, a, b, cfg)
+            if alert:
+                alerts.append(alert)
     return alerts
+
+
+class SlidingWindowCounter:
+    """Per-key event counts for the current and the previous window.
+
+    Events land in fixed-width time buckets kept in a ring covering two windows.
+    `current` and `previous` hold running totals, so reads are O(1) and moving
+    the clock only touches the keys of the buckets that cross a window edge.
+    Window edges are aligned to `bucket_seconds`.
+    """
+
+    def __init__(self, bucket_seconds: int = 300, window_seconds: int = WINDOW_SECONDS):
+        if window_seconds % bucket_seconds:
+            raise ValueError("window_seconds must be a multiple of bucket_seconds")
+        self.bucket_seconds = bucket_seconds
+        self.window_buckets = window_seconds // bucket_seconds
+        self.head: Optional[int] = None
+        self.buckets: deque = deque()  # [bucket_index, Counter], oldest first
+        self.current: Counter = Counter()
+        self.previous: Counter = Counter()
+
+    def _bucket(self, ts: float) -> int:
+        return int(ts // self.bucket_seconds)
+
+    def advance(self, ts: float) -> Set[str]:
+        """Move the clock forward; returns keys whose previous-window count dropped."""
+        new_head = self._bucket(ts)
+        if self.head is not None and new_head <= self.head:
+            return set()
+        old_head = self.head
+        self.head = new_head
+        dropped: Set[str] = set()
+        for idx, counts in self.buckets:
+            if old_head is not None and idx <= old_head - self.window_buckets:
+                continue
+            if idx > new_head - self.window_buckets:
+                break
+            self.current.subtract(counts)
+            self.previous.update(counts)
+        while self.buckets and self.buckets[0][0] <= new_head - 2 * self.window_buckets:
+            _, counts = self.buckets.popleft()
+            self.previous.subtract(counts)
+            dropped.update(counts)
+        self._prune(self.current)
+        self._prune(self.previous)
+        return dropped
+
+    def add(self, key: str, ts: float, n: int = 1) -> bool:
+        """Count an event; returns False if it is older than both windows."""
+        idx = self._bucket(ts)
+        if self.head is None or idx > self.head:
+            self.advance(ts)
+        if idx <= self.head - 2 * self.window_buckets:
+            return False
+        if self.buckets and self.buckets[-1][0] == idx:
+            counts = self.buckets[-1][1]
+        else:
+            counts = None
+            for b_idx, b_counts in reversed(self.buckets):
+                if b_idx == idx:
+                    counts = b_counts
+                    break
+                if b_idx < idx:
+                    break
+            if counts is None:
+                counts = Counter()
+                self.buckets.append([idx, counts])
+                if len(self.buckets) > 1 and self.buckets[-2][0] > idx:
+                    self.buckets = deque(sorted(self.buckets, key=lambda b: b[0]))
+        counts[key] += n
+        if idx > self.head - self.window_buckets:
+            self.current[key] += n
+        else:
+            self.previous[key] += n
+        return True
+
+    @staticmethod
+    def _prune(counter: Counter) -> None:
+        for k in [k for k, v in counter.items() if v <= 0]:
+            del counter[k]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "bucket_seconds": self.bucket_seconds,
+            "window_buckets": self.window_buckets,
+            "head": self.head,
+            "buckets": [[idx, dict(counts)] for idx, counts in self.buckets],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SlidingWindowCounter":
+        bucket_seconds = int(data["bucket_seconds"])
+        w = cls(bucket_seconds=bucket_seconds, window_seconds=bucket_seconds * int(data["window_buckets"]))
+        w.head = data.get("head")
+        for idx, counts in data.get("buckets", []):
+            c = Counter({k: int(v) for k, v in counts.items()})
+            w.buckets.append([int(idx), c])
+            if w.head is not None and idx > w.head - w.window_buckets:
+                w.current.update(c)
+            else:
+                w.previous.update(c)
+        return w
+
+
+class StreamingAlertEngine:
+    """Incremental evaluator for the v1 alert rules.
+
+    Feed committed blocks in order with `consume_block`. The engine clock is the
+    latest block timestamp, which tracks `now()` of the SQL rules while ingest is
+    at the chain head. Only addresses touched by the block, or whose previous
+    window shrank, are re-evaluated. A (type, address) pair is emitted at most
+    once per rule cooldown.
+    """
+
+    def __init__(self, thresholds: Dict[str, Dict[str, Any]], bucket_seconds: int = 300, bridges: Optional[Iterable[str]] = None):
+        self.thresholds = thresholds
+        self.bridges = {b.lower() for b in (bridges or BRIDGES)}
+        self.outbound = SlidingWindowCounter(bucket_seconds)
+        self.inbound = SlidingWindowCounter(bucket_seconds)
+        self.bridge_counterparties = SlidingWindowCounter(bucket_seconds)
+        self.last_block = -1
+        self.clock: Optional[float] = None
+        self._emitted: Dict[str, float] = {}
+
+    def consume_block(self, block_number: int, timestamp: datetime | float | None, txs: Iterable[Tuple[Optional[str], Optional[str]]]) -> List[Dict[str, Any]]:
+        """Apply one block's `(from_address, to_address)` pairs; returns new candidates."""
+        if block_number <= self.last_block:
+            return []
+        self.last_block = block_number
+        if timestamp is None:
+            return []
+        ts = timestamp.timestamp() if isinstance(timestamp, datetime) else float(timestamp)
+        self.clock = max(self.clock or ts, ts)
+
+        out_dirty = self.outbound.advance(ts)
+        in_dirty = self.inbound.advance(ts)
+        bridge_dirty = self.bridge_counterparties.advance(ts)
+        touched: Set[str] = set()
+
+        for from_a, to_a in txs:
+            from_a = (from_a or "").lower() or None
+            to_a = (to_a or "").lower() or None
+            if from_a and self.outbound.add(from_a, ts):
+                out_dirty.add(from_a)
+                touched.add(from_a)
+            if to_a and self.inbound.add(to_a, ts):
+                in_dirty.add(to_a)
+                touched.add(to_a)
+            if from_a in self.bridges or to_a in self.bridges:
+                cp = to_a if from_a in self.bridges else from_a
+                if cp and self.bridge_counterparties.add(cp, ts):
+                    bridge_dirty.add(cp)
+
+        stats = {
+            "fan_out_spike": [(a, self.outbound.current[a], self.outbound.previous[a]) for a in out_dirty],
+            "fan_in_spike": [(a, self.inbound.current[a], self.inbound.previous[a]) for a in in_dirty],
+            "new_high_centrality_node": [(a, self.outbound.current[a], self.inbound.current[a]) for a in touched],
+            "anomalous_bridge_path": [(a, self.bridge_counterparties.current[a], self.bridge_counterparties.previous[a]) for a in bridge_dirty],
+        }
+        return self._cooldown_filter(evaluate_alerts(stats, self.thresholds), ts)
+
+    def _cooldown_filter(self, candidates: List[Dict[str, Any]], ts: float) -> List[Dict[str, Any]]:
+        out = []
+        for a in candidates:
+            key = f"{a['type']}|{a['address']}"
+            cooldown = int(self.thresholds.get(a["type"], {}).get("cooldown_hours", 6)) * 3600
+            last = self._emitted.get(key)
+            if last is not None and ts - last < cooldown:
+                continue
+            self._emitted[key] = ts
+            out.append(a)
+        if len(self._emitted) > 4096:
+            horizon = max(int(c.get("cooldown_hours", 6)) for c in self.thresholds.values()) * 3600
+            self._emitted = {k: v for k, v in self._emitted.items() if ts - v < horizon}
+        return out
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": CHECKPOINT_VERSION,
+            "last_block": self.last_block,
+            "clock": self.clock,
+            "outbound": self.outbound.to_dict(),
+            "inbound": self.inbound.to_dict(),
+            "bridge_counterparties": self.bridge_counterparties.to_dict(),
+            "emitted": self._emitted,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], thresholds: Dict[str, Dict[str, Any]]) -> "StreamingAlertEngine":
+        if data.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"unsupported checkpoint version: {data.get('version')}")
+        eng = cls(thresholds, bucket_seconds=int(data["outbound"]["bucket_seconds"]))
+        eng.last_block = int(data["last_block"])
+        eng.clock = data.get("clock")
+        eng.outbound = SlidingWindowCounter.from_dict(data["outbound"])
+        eng.inbound = SlidingWindowCounter.from_dict(data["inbound"])
+        eng.bridge_counterparties = SlidingWindowCounter.from_dict(data["bridge_counterparties"])
+        eng._emitted = {k: float(v) for k, v in (data.get("emitted") or {}).items()}
+        return eng
+
+    def checkpoint(self, path: str) -> None:
+        """Write state atomically (temp file + rename)."""
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    @classmethod
+    def restore(cls, path: str, thresholds: Dict[str, Dict[str, Any]]) -> Optional["StreamingAlertEngine"]:
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f), thresholds)
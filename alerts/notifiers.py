@@ -1,8 +1,19 @@
 import os
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Tuple
 
 import httpx
 
+# Shared pooled client for synchronous sends (runbook test alerts); the delivery
+# worker uses its own httpx.AsyncClient.
+_client: Optional[httpx.Client] = None
+
+
+def _sync_client() -> httpx.Client:
+    global _client
+    if _client is None:
+        _client = httpx.Client(timeout=8.0)
+    return _client
+
 
 def _format_message(alert: Dict[str, Any]) -> str:
     a_type = alert.get("type", "unknown")
@@ -18,51 +29,82 @@ def _format_message(alert: Dict[str, Any]) -> str:
     )
 
 
-def send_discord(alert: dict):
-    webhook = os.getenv("DISCORD_WEBHOOK_URL", "").strip()
-    if not webhook:
-        return {"ok": False, "channel": "discord", "error": "missing_discord_webhook"}
+def build_request(channel: str, alert: dict, text: Optional[str] = None) -> Tuple[Optional[str], Optional[dict], Optional[str], Optional[str]]:
+    """Return `(url, json_body, destination, error)` for a channel send."""
+    text = text if text is not None else _format_message(alert)
+    if channel == "discord":
+        webhook = os.getenv("DISCORD_WEBHOOK_URL", "").strip()
+        if not webhook:
+            return None, None, None, "missing_discord_webhook"
+        return webhook, {"content": text}, webhook, None
+    if channel == "telegram":
+        token = os.getenv("TELEGRAM_BOT_TOKEN", "").strip()
+        chat_id = os.getenv("TELEGRAM_CHAT_ID", "").strip()
+        if not token or not chat_id:
+            return None, None, None, "missing_telegram_token_or_chat"
+        base = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org").rstrip("/")
+        body = {"chat_id": chat_id, "text": text, "disable_web_page_preview": True}
+        return f"{base}/bot{token}/sendMessage", body, chat_id, None
+    raise ValueError("unsupported channel")
 
-    body = {"content": _format_message(alert)}
-    try:
-        r = httpx.post(webhook, json=body, timeout=8.0)
-        if r.status_code >= 400:
-            return {
-                "ok": False,
-                "channel": "discord",
-                "status_code": r.status_code,
-                "error": r.text[:250],
-                "destination": webhook,
-            }
-        return {"ok": True, "channel": "discord", "status_code": r.status_code, "destination": webhook}
-    except Exception as e:
-        return {"ok": False, "channel": "discord", "error": str(e), "destination": webhook}
 
+def _retry_after(r: httpx.Response) -> Optional[float]:
+    """Seconds to wait from a 429: Retry-After header, Discord `retry_after`, or Telegram `parameters.retry_after`."""
+    header = r.headers.get("retry-after")
+    if header:
+        try:
+            return float(header)
+        except ValueError:
+            pass
+    try:
+        data = r.json()
+    except Exception:
+        return None
+    v = data.get("retry_after") or (data.get("parameters") or {}).get("retry_after")
+    return float(v) if v is not None else None
 
-def send_telegram(alert: dict):
-    token = os.getenv("TELEGRAM_BOT_TOKEN", "").strip()
-    chat_id = os.getenv("TELEGRAM_CHAT_ID", "").strip()
-    if not token or not chat_id:
-        return {"ok": False, "channel": "telegram", "error": "missing_telegram_token_or_chat"}
 
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    body = {"chat_id": chat_id, "text": _format_message(alert), "disable_web_page_preview": True}
-    try:
-        r = httpx.post(url, json=body, timeout=8.0)
-        if r.status_code >= 400:
-            return {
-                "ok": False,
-                "channel": "telegram",
-                "status_code": r.status_code,
-                "error": r.text[:250],
-                "destination": chat_id,
-            }
-        data = r.json() if r.content else {}
-        return {
-            "ok": bool(data.get("ok", True)),
-            "channel": "telegram",
+def parse_response(channel: str, r: httpx.Response, destination: str) -> dict:
+    if r.status_code >= 400:
+        out = {
+            "ok": False,
+            "channel": channel,
             "status_code": r.status_code,
-            "destination": chat_id,
+            "error": r.text[:250],
+            "destination": destination,
         }
+        if r.status_code == 429:
+            out["retry_after"] = _retry_after(r)
+        return out
+    if channel == "telegram":
+        data = r.json() if r.content else {}
+        return {"ok": bool(data.get("ok", True)), "channel": channel, "status_code": r.status_code, "destination": destination}
+    return {"ok": True, "channel": channel, "status_code": r.status_code, "destination": destination}
+
+
+def _send(channel: str, alert: dict) -> dict:
+    url, body, destination, error = build_request(channel, alert)
+    if error:
+        return {"ok": False, "channel": channel, "error": error}
+    try:
+        return parse_response(channel, _sync_client().post(url, json=body), destination)
+    except Exception as e:
+        return {"ok": False, "channel": channel, "error": str(e), "destination": destination}
+
+
+async def send_async(client: httpx.AsyncClient, channel: str, alert: dict, text: Optional[str] = None) -> dict:
+    url, body, destination, error = build_request(channel, alert, text)
+    if error:
+        return {"ok": False, "channel": channel, "error": error}
+    try:
+        return parse_response(channel, await client.post(url, json=body), destination)
     except Exception as e:
-        return {"ok": False, "channel": "telegram", "error": str(e), "destination": chat_id}
+        return {"ok": False, "channel": channel, "error": str(e), "destination": destination}
+
+
+def send_discord(alert: dict):
+    return _send("discord", alert)
+
+
+def send_telegram(alert: dict):
+    return _send("telegram", alert)
@@ -13,9 +13,10 @@ from api.routes.cluster import router as cluster_router
 from api.routes.metrics import router as metrics_router
 from api.routes.alerts_actions import router as alerts_actions_router
 from api.routes.runbook import router as runbook_router
-from api.routes.risk import router as risk_router
+from api.routes.risk import leaderboard_router as risk_leaderboard_router, router as risk_router
 from api.routes.dashboard import router as dashboard_router
 from api.routes.alpha import router as alpha_router
+from api.routes.stream import router as stream_router
 
 app = FastAPI(title="BaseTrace API", version="0.1.0")
 
@@ -44,5 +45,7 @@ app.include_router(cluster_router, prefix="/cluster", tags=["cluster"])
 app.include_router(metrics_router, prefix="/metrics", tags=["metrics"])
 app.include_router(runbook_router, prefix="/runbook", tags=["runbook"])
 app.include_router(risk_router, prefix="/entity", tags=["risk"])
+app.include_router(risk_leaderboard_router, prefix="/risk", tags=["risk"])
 app.include_router(dashboard_router, prefix="/dashboard", tags=["dashboard"])
 app.include_router(alpha_router, prefix="/alpha", tags=["alpha"])
+app.include_router(stream_router, prefix="/stream", tags=["stream"])
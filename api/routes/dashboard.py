@@ -1,10 +1,11 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
 
+from api.services.cache_service import cached_response, metrics_ttl
 from api.services.dashboard_service import dashboard_summary
 
 router = APIRouter()
 
 
 @router.get("/summary")
-def get_dashboard_summary(hot_limit: int = 5):
-    return dashboard_summary(hot_limit=hot_limit)
+def get_dashboard_summary(request: Request, hot_limit: int = 5):
+    return cached_response(request, ("block", "alerts", "failures"), lambda: dashboard_summary(hot_limit=hot_limit), ttl=metrics_ttl())
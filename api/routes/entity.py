@@ -1,10 +1,35 @@
-from fastapi import APIRouter
+from typing import List
 
-from api.services.entity_service import get_entity_profile
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from api.services.entity_service import batch_max_addresses, get_entity_profile, stream_entity_profiles
+from api.services.stream_service import format_ndjson
 
 router = APIRouter()
 
 
+class AddressesIn(BaseModel):
+    addresses: List[str]
+
+
+def check_batch(body: AddressesIn) -> List[str]:
+    if len(body.addresses) > batch_max_addresses():
+        raise HTTPException(status_code=400, detail=f"at most {batch_max_addresses()} addresses per request")
+    return body.addresses
+
+
+@router.post("/batch")
+def entity_batch(body: AddressesIn):
+    """Profiles of many addresses as newline-delimited JSON, one per distinct address, in request order."""
+    return StreamingResponse((format_ndjson(p) for p in stream_entity_profiles(check_batch(body))), media_type="application/x-ndjson")
+
+
 @router.get("/{address}")
-def entity_profile(address: str):
-    return get_entity_profile(address)
+def entity_profile(address: str, window: str | None = None):
+    """`window` (e.g. 24h, 7d) limits top counterparties to transfers in that range."""
+    try:
+        return get_entity_profile(address, window=window)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,18 +1,200 @@
-from fastapi import APIRouter
+from datetime import datetime
+from typing import Literal
 
-from api.services.graph_service import get_global_graph, get_neighbors
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from api.services.cache_service import cached_response
+from api.services.centrality_service import centrality_history, top_centrality
+from api.services.graph_service import find_paths, get_global_graph, get_neighborhood, get_neighbors
+from api.services.sketch_service import top_degree
+from api.services.snapshot_service import snapshot_status
+from api.services.trace_service import block_at, collect, trace_flow
+from api.services.stream_service import format_sse
+from api.services.temporal_service import global_graph_in_window, graph_diff, neighbors_in_window, resolve_window
 
 router = APIRouter()
 
 
+def _window(window: str | None, start: datetime | None, end: datetime | None):
+    """Resolved [start, end) when the request is time-bounded, else None."""
+    if not (window or start or end):
+        return None
+    try:
+        return resolve_window(window, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.get("/global")
-def global_graph(limit: int = 80):
-    return get_global_graph(limit=min(limit, 200))
+def global_graph(request: Request, limit: int = 80, hours: int | None = None, window: str | None = None, start: datetime | None = None, end: datetime | None = None):
+    bounds = _window(window, start, end)
+    if bounds:
+        return cached_response(request, ("block",), lambda: global_graph_in_window(*bounds, limit=min(limit, 200)))
+    return cached_response(request, ("block", "graph"), lambda: get_global_graph(limit=min(limit, 200), hours=hours))
+
+
+@router.get("/diff")
+def diff(
+    window: str = "24h",
+    start: datetime | None = None,
+    end: datetime | None = None,
+    base_start: datetime | None = None,
+    base_end: datetime | None = None,
+    address: str | None = None,
+    min_ratio: float = 3.0,
+    min_delta: int = 10,
+    limit: int = 200,
+):
+    """Pairs that appeared or grew sharply in a window vs a base window (default: the preceding one)."""
+    s, e = _window(None if start else window, start, end)
+    bs, be = _window(None, base_start or s - (e - s), base_end or s)
+    return graph_diff(s, e, bs, be, address=address, min_ratio=min_ratio, min_delta=min_delta, limit=min(max(limit, 1), 1000))
+
+
+@router.get("/top")
+def top_nodes(limit: int = 20, hours: int = 24):
+    limit = min(max(limit, 1), 500)
+    return {"limit": limit, **top_degree(limit=limit, hours=min(max(hours, 1), 48))}
+
+
+@router.get("/centrality")
+def centrality(limit: int = 50):
+    return top_centrality(limit=min(max(limit, 1), 500))
+
+
+@router.get("/centrality/{address}/history")
+def centrality_history_route(address: str, limit: int = 48):
+    return {"address": address.lower(), "history": centrality_history(address, limit=min(max(limit, 1), 500))}
+
+
+@router.get("/snapshot")
+def snapshot():
+    return snapshot_status()
+
+
+@router.get("/path")
+def path(
+    src: str,
+    dst: str,
+    k: int = 1,
+    max_hops: int = 6,
+    weighted: bool = False,
+    direction: Literal["any", "out", "in"] = "any",
+    start: datetime | None = None,
+    end: datetime | None = None,
+    max_degree: int = 5000,
+    skip_infra: bool = True,
+    time_budget_ms: float = 250.0,
+):
+    """How `src` reaches `dst`: up to `k` node-disjoint paths with per-edge tx counts and values."""
+    data = find_paths(
+        src,
+        dst,
+        k=min(max(k, 1), 5),
+        max_hops=min(max(max_hops, 1), 8),
+        weighted=weighted,
+        direction=direction,
+        start=start,
+        end=end,
+        max_degree=max_degree,
+        skip_infra=skip_infra,
+        time_budget_ms=min(time_budget_ms, 2000.0),
+    )
+    if data is None:
+        raise HTTPException(status_code=503, detail="graph snapshot not loaded (set GRAPH_ENGINE=1)")
+    return data
+
+
+@router.get("/trace")
+def trace(
+    address: str,
+    direction: Literal["forward", "backward"] = "forward",
+    attribution: Literal["proportional", "fifo"] = "proportional",
+    asset: list[str] | None = Query(default=None),
+    from_block: int | None = None,
+    to_block: int | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    max_hops: int = 4,
+    max_nodes: int = 200,
+    max_edges: int = 1000,
+    max_fanout: int = 25,
+    min_share: float = 0.001,
+    time_budget_ms: float = 2000.0,
+    skip_infra: bool = True,
+    stream: bool = False,
+):
+    """Follow value out of (forward) or into (backward) `address` hop by hop in time order.
+
+    `asset` ('native' or a token contract, repeatable) limits the assets traced;
+    `start`/`end` are mapped to the first/last ingested block in that range.
+    With `stream=true` the events are sent as server-sent events while the
+    trace expands.
+    """
+    if start and from_block is None:
+        from_block = block_at(start) or 2**62
+    if end and to_block is None:
+        to_block = block_at(end, after=False) or 0
+    events = trace_flow(
+        address,
+        direction=direction,
+        attribution=attribution,
+        assets=asset,
+        from_block=from_block,
+        to_block=to_block,
+        skip_infra=skip_infra,
+        max_hops=min(max(max_hops, 1), 8),
+        max_nodes=min(max(max_nodes, 1), 5000),
+        max_edges=min(max(max_edges, 1), 10000),
+        max_fanout=min(max(max_fanout, 1), 200),
+        min_share=min(max(min_share, 0.0), 1.0),
+        time_budget_ms=min(time_budget_ms, 10000.0),
+    )
+    if not stream:
+        return collect(events)
+    return StreamingResponse(
+        (format_sse(ev.pop("type"), ev) for ev in events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/neighbors/{address}")
-def neighbors(address: str, depth: int = 1, limit: int = 25):
-    data = get_neighbors(address, limit=limit)
+def neighbors(
+    address: str,
+    depth: int = 1,
+    limit: int = 25,
+    max_nodes: int = 500,
+    time_budget_ms: float = 150.0,
+    skip_infra: bool = True,
+    max_edges: int = 2000,
+    window: str | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+):
+    """1 hop: the heaviest `limit` pairs. Deeper: bounded BFS with `limit` new nodes per hop.
+
+    `window` (1h, 24h, 7d) or `start`/`end` restrict 1-hop results to transfers in that range.
+    """
+    depth = min(max(depth, 1), 4)
+    bounds = _window(window, start, end)
+    if bounds and depth > 1:
+        raise HTTPException(status_code=400, detail="time windows are supported for depth=1 only")
+    if bounds:
+        data = neighbors_in_window(address, *bounds, limit=min(limit, 500))
+    elif depth == 1:
+        data = get_neighbors(address, limit=limit)
+    else:
+        data = get_neighborhood(
+            address,
+            depth=depth,
+            limit=min(limit, 200),
+            max_nodes=min(max_nodes, 5000),
+            time_budget_ms=min(time_budget_ms, 2000.0),
+            skip_infra=skip_infra,
+            max_edges=min(max_edges, 10000),
+        )
     return {
         "address": address.lower(),
         "depth": depth,
@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 
 from api.services.label_service import get_labels
+from labels.known_entities import registry_status
 from labels.taxonomy import LABEL_TAXONOMY
 
 router = APIRouter()
@@ -11,6 +12,11 @@ def taxonomy():
     return {"labels": LABEL_TAXONOMY}
 
 
+@router.get("/known")
+def known_entities():
+    return registry_status()
+
+
 @router.get("/{address}")
 def labels(address: str):
     return get_labels(address)
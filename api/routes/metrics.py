@@ -1,10 +1,16 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
 
+from api.services.cache_service import cache_stats, cached_response, metrics_ttl
 from api.services.metrics_service import get_metrics
 
 router = APIRouter()
 
 
 @router.get("")
-def metrics():
-    return get_metrics()
+def metrics(request: Request):
+    return cached_response(request, ("block", "alerts"), get_metrics, ttl=metrics_ttl())
+
+
+@router.get("/cache")
+def metrics_cache():
+    return cache_stats()
@@ -1,10 +1,30 @@
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 
-from api.services.risk_service import entity_risk
+from api.routes.entity import AddressesIn, check_batch
+from api.services.risk_service import entity_risk, risk_history, stream_entity_risks, top_risk
+from api.services.stream_service import format_ndjson
 
 router = APIRouter()
+leaderboard_router = APIRouter()
 
 
 @router.get("/{address}/risk")
 def risk(address: str):
     return entity_risk(address)
+
+
+@leaderboard_router.post("/batch")
+def risk_batch(body: AddressesIn):
+    """`/entity/{address}/risk` of many addresses as newline-delimited JSON, in request order."""
+    return StreamingResponse((format_ndjson(r) for r in stream_entity_risks(check_batch(body))), media_type="application/x-ndjson")
+
+
+@leaderboard_router.get("/top")
+def top(limit: int = 50, offset: int = 0, band: str = "low"):
+    return top_risk(limit=min(max(limit, 1), 500), min_band=band, offset=max(offset, 0))
+
+
+@leaderboard_router.get("/{address}/history")
+def history(address: str, limit: int = 48):
+    return {"address": address.lower(), "history": risk_history(address, limit=min(max(limit, 1), 500))}
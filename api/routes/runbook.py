@@ -1,6 +1,7 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 
 from api.services.alert_service import get_thresholds, update_threshold
+from api.services.cache_service import cached_response
 from api.services.delivery_service import recent_deliveries, send_test_alert
 from api.services.runbook_service import (
     alerts_runbook,
@@ -19,8 +20,8 @@ def runbook_ingest():
 
 
 @router.get("/alerts")
-def runbook_alerts():
-    return alerts_runbook()
+def runbook_alerts(request: Request):
+    return cached_response(request, ("alerts",), alerts_runbook)
 
 
 @router.get("/failures")
@@ -1,10 +1,15 @@
 from fastapi import APIRouter
 
-from api.services.search_service import search_entities
+from api.services.search_service import search_entities, search_index_status
 
 router = APIRouter()
 
 
 @router.get("")
-def search(q: str, limit: int = 20):
-    return {"query": q, "limit": limit, "results": search_entities(q, limit=limit)}
+def search(q: str, limit: int = 20, typeahead: bool = False):
+    return {"query": q, "limit": limit, "typeahead": typeahead, "results": search_entities(q, limit=limit, typeahead=typeahead)}
+
+
+@router.get("/status")
+def status():
+    return search_index_status()
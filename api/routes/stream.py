@@ -0,0 +1,42 @@
+import asyncio
+
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+
+from api.services.stream_service import format_sse, hub
+
+router = APIRouter()
+
+HEARTBEAT_SECONDS = 15.0
+
+
+@router.get("")
+async def stream(request: Request):
+    """Server-sent events: `alert` for inserts and status changes, `counters` for dashboard deltas."""
+    sub = hub.subscribe()
+
+    async def events():
+        try:
+            yield "retry: 3000\n\n" + format_sse("counters", hub.snapshot())
+            while not sub.dropped:
+                try:
+                    chunk = await asyncio.wait_for(sub.queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                yield chunk
+        finally:
+            hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/stats")
+def stream_stats():
+    return {"clients": len(hub.subscribers), "counters": hub.snapshot(), **hub.stats}
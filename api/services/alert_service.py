@@ -1,13 +1,20 @@
 import hashlib
 import json
+import os
+import select
+import threading
+import time
+from datetime import datetime
 from typing import Any, Dict, List, Optional
 
-from api.services.db import get_conn
+import psycopg2
+import psycopg2.extensions
 
-BRIDGES = {
-    "0x4200000000000000000000000000000000000010",  # L2StandardBridge
-    "0x4200000000000000000000000000000000000007",  # L2CrossDomainMessenger
-}
+from alerts.engine import BRIDGES, apply_centrality, evaluate_alerts
+from api.services.centrality_service import centrality_for
+from api.services.db import get_conn, get_dsn
+from api.services.delivery_service import delivery_channels
+from api.services.feature_service import activity_rows, feature_store, recent_activity, spike_rows
 
 DEFAULT_THRESHOLDS = {
     "fan_out_spike": {"min_ratio": 3.0, "min_delta": 20, "min_count": 25, "cooldown_hours": 6, "enabled": True},
@@ -17,38 +24,57 @@ DEFAULT_THRESHOLDS = {
 }
 
 
-def _ensure_schema() -> None:
-    with get_conn() as conn:
-        cur = conn.cursor()
-        cur.execute("ALTER TABLE alerts ADD COLUMN IF NOT EXISTS assignee TEXT")
-        cur.execute("ALTER TABLE alerts ADD COLUMN IF NOT EXISTS ack_at TIMESTAMPTZ")
-        cur.execute("ALTER TABLE alerts ADD COLUMN IF NOT EXISTS resolved_at TIMESTAMPTZ")
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS alert_thresholds (
-              rule_type TEXT PRIMARY KEY,
-              min_ratio NUMERIC,
-              min_delta INT,
-              min_count INT,
-              cooldown_hours INT DEFAULT 6,
-              enabled BOOLEAN DEFAULT TRUE,
-              updated_at TIMESTAMPTZ DEFAULT now()
-            )
-            """
-        )
-        for rt, cfg in DEFAULT_THRESHOLDS.items():
-            cur.execute(
-                """
-                INSERT INTO alert_thresholds(rule_type, min_ratio, min_delta, min_count, cooldown_hours, enabled, updated_at)
-                VALUES(%s,%s,%s,%s,%s,%s,now())
-                ON CONFLICT (rule_type) DO NOTHING
-                """,
-                (rt, cfg["min_ratio"], cfg["min_delta"], cfg["min_count"], cfg["cooldown_hours"], cfg["enabled"]),
-            )
+# Thresholds are served from memory. The alert_thresholds trigger (migration 0007)
+# NOTIFYs on every write; a listener thread drops the cache, and the TTL bounds
+# staleness if the listener is down.
+_thresholds_cache: Dict[str, Any] = {"value": None, "loaded_at": 0.0, "generation": 0}
+_thresholds_lock = threading.Lock()
+_listener: Dict[str, Any] = {"thread": None}
+
+
+def _thresholds_ttl() -> float:
+    return float(os.getenv("THRESHOLDS_CACHE_TTL", "60"))
+
+
+def invalidate_thresholds() -> None:
+    with _thresholds_lock:
+        _thresholds_cache["generation"] += 1
+        _thresholds_cache["value"] = None
+
+
+def _listen_for_threshold_changes() -> None:
+    while True:
+        conn = None
+        try:
+            conn = psycopg2.connect(get_dsn())
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            conn.cursor().execute("LISTEN alert_thresholds")
+            invalidate_thresholds()
+            while True:
+                if select.select([conn], [], [], 30) == ([], [], []):
+                    continue
+                conn.poll()
+                if conn.notifies:
+                    conn.notifies.clear()
+                    invalidate_thresholds()
+        except Exception:
+            time.sleep(5)
+        finally:
+            if conn is not None:
+                conn.close()
+
+
+def _ensure_listener() -> None:
+    if _listener["thread"] is not None or os.getenv("THRESHOLDS_LISTEN", "1") != "1":
+        return
+    with _thresholds_lock:
+        if _listener["thread"] is None:
+            t = threading.Thread(target=_listen_for_threshold_changes, name="thresholds-listener", daemon=True)
+            t.start()
+            _listener["thread"] = t
 
 
-def _load_thresholds() -> Dict[str, Dict[str, Any]]:
-    _ensure_schema()
+def _fetch_thresholds() -> Dict[str, Dict[str, Any]]:
     out = {k: dict(v) for k, v in DEFAULT_THRESHOLDS.items()}
     with get_conn() as conn:
         cur = conn.cursor()
@@ -64,6 +90,19 @@ def _load_thresholds() -> Dict[str, Dict[str, Any]]:
     return out
 
 
+def _load_thresholds() -> Dict[str, Dict[str, Any]]:
+    _ensure_listener()
+    cached = _thresholds_cache["value"]
+    if cached is None or time.monotonic() - _thresholds_cache["loaded_at"] > _thresholds_ttl():
+        generation = _thresholds_cache["generation"]
+        cached = _fetch_thresholds()
+        with _thresholds_lock:
+            # Don't publish a read that raced with an invalidation.
+            if generation == _thresholds_cache["generation"]:
+                _thresholds_cache["value"], _thresholds_cache["loaded_at"] = cached, time.monotonic()
+    return {k: dict(v) for k, v in cached.items()}
+
+
 def _fingerprint(alert: Dict[str, Any]) -> str:
     base = {
         "type": alert.get("type"),
@@ -73,191 +112,226 @@ def _fingerprint(alert: Dict[str, Any]) -> str:
     return hashlib.sha256(json.dumps(base, sort_keys=True).encode()).hexdigest()[:16]
 
 
-def _persist_alerts(candidates: List[Dict[str, Any]], thresholds: Dict[str, Dict[str, Any]]) -> None:
+def _with_centrality(candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Apply the centrality job's PageRank to `new_high_centrality_node` candidates (one lookup)."""
+    addrs = [a["address"] for a in candidates if a.get("type") == "new_high_centrality_node"]
+    if not addrs:
+        return candidates
+    scores = centrality_for(addrs)
+    out = []
+    for a in candidates:
+        if a.get("type") == "new_high_centrality_node":
+            a = apply_centrality(a, scores.get((a.get("address") or "").lower()))
+        if a:
+            out.append(a)
+    return out
+
+
+def _persist_alerts(candidates: List[Dict[str, Any]], thresholds: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Insert candidates whose fingerprint is outside its cooldown; returns the inserted alerts.
+
+    Two statements per batch regardless of size: transaction-scoped advisory
+    locks on the sorted fingerprints, then one set-based INSERT .. SELECT that
+    filters against recent alerts via idx_alerts_fingerprint_created. The
+    INSERT snapshot is taken after the locks are held, so concurrent evaluators
+    see each other's committed rows and cannot both insert a fingerprint.
+    Inserted alerts are queued in alert_deliveries for each configured channel.
+    """
+    candidates = _with_centrality(candidates)
     if not candidates:
-        return
+        return []
+    batch: Dict[str, tuple] = {}
+    for a in candidates:
+        fp = _fingerprint(a)
+        if fp in batch:
+            continue
+        rt = a.get("type")
+        batch[fp] = (
+            rt,
+            (a.get("address") or "").lower(),
+            a.get("severity", "medium"),
+            float(a.get("confidence", 0.5)),
+            json.dumps(a.get("evidence", {})),
+            fp,
+            int(thresholds.get(rt, {}).get("cooldown_hours", 6)),
+        )
+    fps = sorted(batch)
+    cols = list(zip(*(batch[fp] for fp in fps)))
+
     with get_conn() as conn:
         cur = conn.cursor()
-        for a in candidates:
-            rt = a.get("type")
-            cooldown = int(thresholds.get(rt, {}).get("cooldown_hours", 6))
-            fp = _fingerprint(a)
-            cur.execute(
-                """
-                SELECT 1 FROM alerts
-                WHERE fingerprint = %s
-                  AND created_at >= now() - (%s || ' hours')::interval
-                LIMIT 1
-                """,
-                (fp, cooldown),
-            )
-            if cur.fetchone():
-                continue
-            cur.execute(
-                """
-                INSERT INTO alerts(type, address, severity, confidence, evidence, fingerprint)
-                VALUES(%s, %s, %s, %s, %s::jsonb, %s)
-                """,
-                (
-                    rt,
-                    (a.get("address") or "").lower(),
-                    a.get("severity", "medium"),
-                    float(a.get("confidence", 0.5)),
-                    json.dumps(a.get("evidence", {})),
-                    fp,
-                ),
+        cur.execute("SELECT pg_advisory_xact_lock(hashtextextended(fp, 0)) FROM unnest(%s::text[]) AS fp", (fps,))
+        cur.execute(
+            """
+            WITH inserted AS (
+              INSERT INTO alerts(type, address, severity, confidence, evidence, fingerprint)
+              SELECT c.type, c.address, c.severity, c.confidence, c.evidence::jsonb, c.fingerprint
+              FROM unnest(%s::text[], %s::text[], %s::text[], %s::numeric[], %s::text[], %s::text[], %s::int[])
+                AS c(type, address, severity, confidence, evidence, fingerprint, cooldown_hours)
+              WHERE NOT EXISTS (
+                SELECT 1 FROM alerts a
+                WHERE a.fingerprint = c.fingerprint
+                  AND a.created_at >= now() - make_interval(hours => c.cooldown_hours)
+              )
+              RETURNING id, type, address, severity, confidence, evidence, fingerprint, created_at
+            ), queued AS (
+              INSERT INTO alert_deliveries(alert_id, channel, status, attempts, payload)
+              SELECT i.id, ch, 'pending', 0,
+                     jsonb_build_object('id', i.id, 'type', i.type, 'address', i.address, 'severity', i.severity,
+                                        'confidence', i.confidence, 'evidence', i.evidence)
+              FROM inserted i CROSS JOIN unnest(%s::text[]) AS ch
             )
+            SELECT * FROM inserted
+            """,
+            tuple(list(c) for c in cols) + (delivery_channels(),),
+        )
+        rows = cur.fetchall()
+
+    return [
+        {
+            "id": int(i),
+            "type": t,
+            "address": a,
+            "severity": sev,
+            "confidence": float(c or 0),
+            "evidence": e or {},
+            "fingerprint": fp,
+            "created_at": created.isoformat() if created else None,
+        }
+        for i, t, a, sev, c, e, fp, created in rows
+    ]
 
 
-def _generate_alert_candidates(limit: int = 20, thresholds: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+# Rule clock: `now()` for live evaluation, or the `as_of` parameter for historical replay.
+_AS_OF = "COALESCE(%(as_of)s::timestamptz, now())"
+
+
+def _generate_alert_candidates(
+    limit: int = 20,
+    thresholds: Optional[Dict[str, Dict[str, Any]]] = None,
+    as_of: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
     cfg = thresholds or _load_thresholds()
-    alerts: List[Dict[str, Any]] = []
+    stats: Dict[str, List[tuple]] = {}
+    # Live evaluation reads the 24h activity rules from the feature store when it is mapped,
+    # plus the transfers of blocks ingested since it was built.
+    store = feature_store() if as_of is None else None
     with get_conn() as conn:
         cur = conn.cursor()
 
+        if store is not None:
+            recent = recent_activity(cur, store)
+            for rule, direction in (("fan_out_spike", "out"), ("fan_in_spike", "in")):
+                if cfg[rule]["enabled"]:
+                    stats[rule] = spike_rows(store, direction, cfg[rule]["min_count"], max(limit, 50), recent)
+            if cfg["new_high_centrality_node"]["enabled"]:
+                stats["new_high_centrality_node"] = activity_rows(store, cfg["new_high_centrality_node"]["min_count"], max(limit, 30), recent)
+
         # fan_out_spike
-        if cfg["fan_out_spike"]["enabled"]:
+        if cfg["fan_out_spike"]["enabled"] and store is None:
             cur.execute(
-                """
+                f"""
                 WITH now_w AS (
                   SELECT from_address AS a, COUNT(*) AS c
                   FROM transactions
-                  WHERE timestamp >= now() - interval '24 hours' AND from_address IS NOT NULL
+                  WHERE timestamp >= {_AS_OF} - interval '24 hours' AND timestamp < {_AS_OF} AND from_address IS NOT NULL
                   GROUP BY from_address
                 ), prev_w AS (
                   SELECT from_address AS a, COUNT(*) AS c
                   FROM transactions
-                  WHERE timestamp >= now() - interval '48 hours' AND timestamp < now() - interval '24 hours' AND from_address IS NOT NULL
+                  WHERE timestamp >= {_AS_OF} - interval '48 hours' AND timestamp < {_AS_OF} - interval '24 hours' AND from_address IS NOT NULL
                   GROUP BY from_address
                 )
                 SELECT n.a, n.c, COALESCE(p.c,0)
                 FROM now_w n LEFT JOIN prev_w p ON p.a=n.a
-                WHERE n.c >= %s
+                WHERE n.c >= %(min_count)s
                 ORDER BY (n.c-COALESCE(p.c,0)) DESC
-                LIMIT %s
+                LIMIT %(limit)s
                 """,
-                (cfg["fan_out_spike"]["min_count"], max(limit, 50)),
+                {"as_of": as_of, "min_count": cfg["fan_out_spike"]["min_count"], "limit": max(limit, 50)},
             )
-            for addr, now_c, prev_c in cur.fetchall():
-                baseline = max(1, int(prev_c or 0))
-                ratio = float(now_c) / baseline
-                delta = int(now_c) - int(prev_c or 0)
-                if ratio >= cfg["fan_out_spike"]["min_ratio"] and delta >= cfg["fan_out_spike"]["min_delta"]:
-                    alerts.append({
-                        "type": "fan_out_spike",
-                        "address": addr,
-                        "severity": "high" if ratio >= 8 else "medium",
-                        "confidence": min(0.99, 0.5 + min(ratio, 10) / 12),
-                        "evidence": {"window": "24h_vs_prev24h", "now_outbound": int(now_c), "prev_outbound": int(prev_c or 0), "ratio": round(ratio, 2), "delta": delta},
-                    })
+            stats["fan_out_spike"] = cur.fetchall()
 
         # fan_in_spike
-        if cfg["fan_in_spike"]["enabled"]:
+        if cfg["fan_in_spike"]["enabled"] and store is None:
             cur.execute(
-                """
+                f"""
                 WITH now_w AS (
                   SELECT to_address AS a, COUNT(*) AS c
                   FROM transactions
-                  WHERE timestamp >= now() - interval '24 hours' AND to_address IS NOT NULL
+                  WHERE timestamp >= {_AS_OF} - interval '24 hours' AND timestamp < {_AS_OF} AND to_address IS NOT NULL
                   GROUP BY to_address
                 ), prev_w AS (
                   SELECT to_address AS a, COUNT(*) AS c
                   FROM transactions
-                  WHERE timestamp >= now() - interval '48 hours' AND timestamp < now() - interval '24 hours' AND to_address IS NOT NULL
+                  WHERE timestamp >= {_AS_OF} - interval '48 hours' AND timestamp < {_AS_OF} - interval '24 hours' AND to_address IS NOT NULL
                   GROUP BY to_address
                 )
                 SELECT n.a, n.c, COALESCE(p.c,0)
                 FROM now_w n LEFT JOIN prev_w p ON p.a=n.a
-                WHERE n.c >= %s
+                WHERE n.c >= %(min_count)s
                 ORDER BY (n.c-COALESCE(p.c,0)) DESC
-                LIMIT %s
+                LIMIT %(limit)s
                 """,
-                (cfg["fan_in_spike"]["min_count"], max(limit, 50)),
+                {"as_of": as_of, "min_count": cfg["fan_in_spike"]["min_count"], "limit": max(limit, 50)},
             )
-            for addr, now_c, prev_c in cur.fetchall():
-                baseline = max(1, int(prev_c or 0))
-                ratio = float(now_c) / baseline
-                delta = int(now_c) - int(prev_c or 0)
-                if ratio >= cfg["fan_in_spike"]["min_ratio"] and delta >= cfg["fan_in_spike"]["min_delta"]:
-                    alerts.append({
-                        "type": "fan_in_spike",
-                        "address": addr,
-                        "severity": "high" if ratio >= 8 else "medium",
-                        "confidence": min(0.99, 0.5 + min(ratio, 10) / 12),
-                        "evidence": {"window": "24h_vs_prev24h", "now_inbound": int(now_c), "prev_inbound": int(prev_c or 0), "ratio": round(ratio, 2), "delta": delta},
-                    })
+            stats["fan_in_spike"] = cur.fetchall()
 
         # new_high_centrality_node
-        if cfg["new_high_centrality_node"]["enabled"]:
+        if cfg["new_high_centrality_node"]["enabled"] and store is None:
             cur.execute(
-                """
+                f"""
                 WITH recent AS (
                   SELECT from_address AS a, COUNT(*) AS out_c, 0::bigint AS in_c
                   FROM transactions
-                  WHERE timestamp >= now() - interval '24 hours' AND from_address IS NOT NULL
+                  WHERE timestamp >= {_AS_OF} - interval '24 hours' AND timestamp < {_AS_OF} AND from_address IS NOT NULL
                   GROUP BY from_address
                   UNION ALL
                   SELECT to_address AS a, 0::bigint AS out_c, COUNT(*) AS in_c
                   FROM transactions
-                  WHERE timestamp >= now() - interval '24 hours' AND to_address IS NOT NULL
+                  WHERE timestamp >= {_AS_OF} - interval '24 hours' AND timestamp < {_AS_OF} AND to_address IS NOT NULL
                   GROUP BY to_address
                 ), agg AS (
                   SELECT a, SUM(out_c) AS out_c, SUM(in_c) AS in_c FROM recent GROUP BY a
                 )
                 SELECT a, out_c, in_c
                 FROM agg
-                WHERE (out_c + in_c) >= %s
+                WHERE (out_c + in_c) >= %(min_count)s
                 ORDER BY (out_c + in_c) DESC
-                LIMIT %s
+                LIMIT %(limit)s
                 """,
-                (cfg["new_high_centrality_node"]["min_count"], max(limit, 30)),
+                {"as_of": as_of, "min_count": cfg["new_high_centrality_node"]["min_count"], "limit": max(limit, 30)},
             )
-            for addr, out_c, in_c in cur.fetchall():
-                alerts.append({
-                    "type": "new_high_centrality_node",
-                    "address": addr,
-                    "severity": "medium",
-                    "confidence": 0.7,
-                    "evidence": {"window": "last_24h", "outbound": int(out_c or 0), "inbound": int(in_c or 0), "degree_proxy": int((out_c or 0) + (in_c or 0))},
-                })
+            stats["new_high_centrality_node"] = cur.fetchall()
 
         # anomalous_bridge_path
         if cfg["anomalous_bridge_path"]["enabled"]:
             cur.execute(
-                """
+                f"""
                 WITH now_w AS (
-                  SELECT CASE WHEN from_address = ANY(%s) THEN to_address ELSE from_address END AS cp, COUNT(*) AS c
+                  SELECT CASE WHEN from_address = ANY(%(bridges)s) THEN to_address ELSE from_address END AS cp, COUNT(*) AS c
                   FROM transactions
-                  WHERE timestamp >= now() - interval '24 hours' AND (from_address = ANY(%s) OR to_address = ANY(%s))
+                  WHERE timestamp >= {_AS_OF} - interval '24 hours' AND timestamp < {_AS_OF}
+                    AND (from_address = ANY(%(bridges)s) OR to_address = ANY(%(bridges)s))
                   GROUP BY cp
                 ), prev_w AS (
-                  SELECT CASE WHEN from_address = ANY(%s) THEN to_address ELSE from_address END AS cp, COUNT(*) AS c
+                  SELECT CASE WHEN from_address = ANY(%(bridges)s) THEN to_address ELSE from_address END AS cp, COUNT(*) AS c
                   FROM transactions
-                  WHERE timestamp >= now() - interval '48 hours' AND timestamp < now() - interval '24 hours' AND (from_address = ANY(%s) OR to_address = ANY(%s))
+                  WHERE timestamp >= {_AS_OF} - interval '48 hours' AND timestamp < {_AS_OF} - interval '24 hours'
+                    AND (from_address = ANY(%(bridges)s) OR to_address = ANY(%(bridges)s))
                   GROUP BY cp
                 )
                 SELECT n.cp, n.c, COALESCE(p.c,0)
                 FROM now_w n LEFT JOIN prev_w p ON p.cp=n.cp
                 WHERE n.cp IS NOT NULL
                 ORDER BY (n.c-COALESCE(p.c,0)) DESC
-                LIMIT %s
+                LIMIT %(limit)s
                 """,
-                (list(BRIDGES), list(BRIDGES), list(BRIDGES), list(BRIDGES), list(BRIDGES), list(BRIDGES), max(limit, 30)),
+                {"as_of": as_of, "bridges": sorted(BRIDGES), "limit": max(limit, 30)},
             )
-            for cp, now_c, prev_c in cur.fetchall():
-                baseline = max(1, int(prev_c or 0))
-                ratio = float(now_c) / baseline
-                delta = int(now_c) - int(prev_c or 0)
-                if ratio >= cfg["anomalous_bridge_path"]["min_ratio"] and delta >= cfg["anomalous_bridge_path"]["min_delta"]:
-                    alerts.append({
-                        "type": "anomalous_bridge_path",
-                        "address": cp,
-                        "severity": "high" if ratio >= 8 else "medium",
-                        "confidence": min(0.99, 0.55 + min(ratio, 10) / 12),
-                        "evidence": {"window": "24h_vs_prev24h", "bridge_counterparty_now": int(now_c), "bridge_counterparty_prev": int(prev_c or 0), "ratio": round(ratio, 2), "delta": delta},
-                    })
-
-    return alerts
+            stats["anomalous_bridge_path"] = cur.fetchall()
+
+    return evaluate_alerts(stats, cfg)
 
 
 def _format_rows(rows):
@@ -294,7 +368,6 @@ def recent_alerts(limit: int = 20, status: Optional[str] = None):
 
 
 def alert_queue(limit: int = 20, status: str = "new"):
-    _ensure_schema()
     with get_conn() as conn:
         cur = conn.cursor()
         cur.execute(
@@ -327,7 +400,6 @@ def alerts_for_address(address: str, limit: int = 20, status: Optional[str] = No
 def update_alert_status(alert_id: int, status: str, assignee: Optional[str] = None):
     if status not in {"new", "ack", "resolved"}:
         raise ValueError("invalid status")
-    _ensure_schema()
     with get_conn() as conn:
         cur = conn.cursor()
         cur.execute(
@@ -350,8 +422,12 @@ def get_thresholds() -> Dict[str, Dict[str, Any]]:
     return _load_thresholds()
 
 
+def persist_candidates(candidates: List[Dict[str, Any]], thresholds: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """Persist externally generated candidates (e.g. from the streaming engine) with cooldown dedupe."""
+    return _persist_alerts(candidates, thresholds or _load_thresholds())
+
+
 def update_threshold(rule_type: str, min_ratio: Optional[float], min_delta: Optional[int], min_count: Optional[int], cooldown_hours: Optional[int], enabled: Optional[bool]):
-    _ensure_schema()
     with get_conn() as conn:
         cur = conn.cursor()
         cur.execute(
@@ -368,4 +444,5 @@ def update_threshold(rule_type: str, min_ratio: Optional[float], min_delta: Opti
             """,
             (rule_type, min_ratio, min_delta, min_count, cooldown_hours, enabled),
         )
+    invalidate_thresholds()
     return get_thresholds().get(rule_type)
@@ -0,0 +1,266 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from api.services.db import get_conn
+from api.services.snapshot_service import graph_snapshot
+
+# Read-through cache for polled aggregate endpoints (dashboard summary,
+# global graph, metrics, alert runbook). Their responses only change when
+# ingest commits a block or an alert / dead-letter row is written, so the
+# key of a response is its path, its query and the watermarks it depends
+# on:
+#
+# - block: `ingest_state.last_block`,
+# - alerts: max `alerts.id` and the `cache_epochs` counter of alert updates
+#   and deletes that changed rows (status changes keep the max id),
+# - failures: the `cache_epochs` counter of `ingest_failures` statements
+#   that changed rows,
+# - graph: the in-memory graph snapshot's edge watermark when it serves.
+#
+# Watermarks are read in one query, at most every RESPONSE_CACHE_WATERMARK_MS
+# per process, before the response is computed, so an entry never holds older
+# data than its key. Entries also expire after RESPONSE_CACHE_TTL_SECONDS for
+# the parts that move with the clock (24h windows, the RPC chain head).
+# Bodies with parts no watermark covers (the relabel queue, the feature
+# store's age, waitlist signups: /metrics and /dashboard/summary) pass a
+# shorter `ttl` (RESPONSE_CACHE_METRICS_TTL_SECONDS).
+#
+# Concurrent misses on one key are coalesced: the first request computes,
+# the others wait for its result. Bodies are rendered once; their ETag lets
+# pollers revalidate with If-None-Match and get a 304. With
+# RESPONSE_CACHE_BACKEND=postgres, misses first look in the shared
+# `response_cache` table, under a per-key advisory lock, so one process
+# computes for all of them.
+
+WATERMARKS = ("block", "alerts", "failures", "graph")
+
+_WATERMARK_SQL = """
+    SELECT (SELECT value FROM ingest_state WHERE key = 'last_block'),
+           (SELECT COALESCE(MAX(id), 0) FROM alerts),
+           (SELECT epoch FROM cache_epochs WHERE name = 'alerts'),
+           (SELECT epoch FROM cache_epochs WHERE name = 'ingest_failures')
+"""
+
+_STATS = ("hits", "misses", "coalesced", "shared_hits", "not_modified", "uncached", "evictions")
+
+_lock = threading.Lock()
+_state: Dict[str, Any] = {
+    "entries": OrderedDict(),
+    "flights": {},
+    "watermarks": None,
+    "watermarks_at": 0.0,
+    "watermark_flight": None,
+    "stats": dict.fromkeys(_STATS, 0),
+}
+
+
+def cache_enabled() -> bool:
+    return os.getenv("RESPONSE_CACHE", "1") == "1"
+
+
+def _max_entries() -> int:
+    return int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+
+
+def _ttl() -> float:
+    return float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30"))
+
+
+def metrics_ttl() -> float:
+    return float(os.getenv("RESPONSE_CACHE_METRICS_TTL_SECONDS", "2"))
+
+
+def _watermark_seconds() -> float:
+    return float(os.getenv("RESPONSE_CACHE_WATERMARK_MS", "500")) / 1000.0
+
+
+def _shared() -> bool:
+    return os.getenv("RESPONSE_CACHE_BACKEND", "memory") == "postgres"
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+def _single_flight(flights: Dict[Any, _Flight], key: Any, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+    """(fn(), False) for the first caller of `key`, (its result, True) for callers that arrive meanwhile."""
+    with _lock:
+        flight = flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = flights[key] = _Flight()
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value, True
+    try:
+        flight.value = fn()
+        return flight.value, False
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _lock:
+            flights.pop(key, None)
+        flight.done.set()
+
+
+def _read_watermarks() -> Dict[str, Any]:
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(_WATERMARK_SQL)
+        block, alert_id, alert_epoch, failure_epoch = cur.fetchone()
+    return {"block": block, "alerts": (int(alert_id), int(alert_epoch or 0)), "failures": int(failure_epoch or 0)}
+
+
+def watermarks() -> Dict[str, Any]:
+    """Current watermarks, re-read at most every RESPONSE_CACHE_WATERMARK_MS (one reader at a time)."""
+    if time.monotonic() - _state["watermarks_at"] >= _watermark_seconds():
+
+        def read():
+            wm = _read_watermarks()
+            _state["watermarks"], _state["watermarks_at"] = wm, time.monotonic()
+            return wm
+
+        _single_flight(_state["flights"], "watermarks", read)
+    wm = dict(_state["watermarks"])
+    snapshot = graph_snapshot()
+    wm["graph"] = snapshot.watermark if snapshot is not None else None
+    return wm
+
+
+def _render(value: Any) -> Tuple[bytes, str]:
+    body = JSONResponse(content=jsonable_encoder(value)).body
+    return body, '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _compute_shared(key: str, compute: Callable[[], Any], ttl: float) -> Tuple[bytes, str, bool]:
+    """(body, etag, found) through `response_cache`: one process computes a key, the others read it."""
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_advisory_xact_lock(hashtextextended(%s, 0))", (key,))
+        cur.execute(
+            "SELECT body, etag FROM response_cache WHERE key = %s AND stored_at >= now() - make_interval(secs => %s)",
+            (key, ttl),
+        )
+        row = cur.fetchone()
+        if row:
+            return bytes(row[0]), row[1], True
+        body, etag = _render(compute())
+        cur.execute(
+            """
+            INSERT INTO response_cache(key, etag, body) VALUES (%s, %s, %s)
+            ON CONFLICT (key) DO UPDATE SET etag = EXCLUDED.etag, body = EXCLUDED.body, stored_at = now()
+            """,
+            (key, etag, body),
+        )
+        cur.execute("DELETE FROM response_cache WHERE stored_at < now() - make_interval(secs => %s)", (max(ttl, _ttl()),))
+    return body, etag, False
+
+
+def _count(stat: str) -> None:
+    with _lock:
+        _state["stats"][stat] += 1
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {t.strip().removeprefix("W/") for t in header.split(",")}
+    return "*" in tags or etag in tags
+
+
+def cached_response(request: Request, depends_on: Sequence[str], compute: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+    """`compute()` for this request, served from the cache while `depends_on` watermarks are unchanged.
+
+    Entries expire after `ttl` seconds (RESPONSE_CACHE_TTL_SECONDS by default).
+    """
+    if not cache_enabled():
+        return compute()
+    try:
+        wm = watermarks()
+    except Exception as e:
+        print(f"[cache] watermarks unavailable, not caching: {e}")
+        _count("uncached")
+        return compute()
+    key = json.dumps(
+        [request.url.path, sorted(request.query_params.multi_items()), [wm[k] for k in depends_on]],
+        default=str,
+        separators=(",", ":"),
+    )
+    ttl = _ttl() if ttl is None else ttl
+    now = time.monotonic()
+    with _lock:
+        entries = _state["entries"]
+        entry = entries.get(key)
+        if entry is not None and now - entry[2] < ttl:
+            entries.move_to_end(key)
+            status = "hit"
+        else:
+            entry, status = None, None
+
+    if entry is None:
+        def load():
+            if _shared():
+                digest = hashlib.sha256(key.encode()).hexdigest()
+                body, etag, found = _compute_shared(digest, compute, ttl)
+            else:
+                (body, etag), found = _render(compute()), False
+            fresh = (body, etag, time.monotonic())
+            with _lock:
+                entries = _state["entries"]
+                entries[key] = fresh
+                entries.move_to_end(key)
+                while len(entries) > _max_entries():
+                    entries.popitem(last=False)
+                    _state["stats"]["evictions"] += 1
+            return fresh, found
+
+        (entry, found), coalesced = _single_flight(_state["flights"], key, load)
+        status = "coalesced" if coalesced else "shared_hit" if found else "miss"
+    _count({"hit": "hits", "miss": "misses", "coalesced": "coalesced", "shared_hit": "shared_hits"}[status])
+
+    body, etag, _ = entry
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "X-Cache": status}
+    if _not_modified(request, etag):
+        _count("not_modified")
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def cache_stats() -> Dict[str, Any]:
+    with _lock:
+        stats = dict(_state["stats"])
+        size = len(_state["entries"])
+    served = stats["hits"] + stats["misses"] + stats["coalesced"] + stats["shared_hits"]
+    return {
+        "enabled": cache_enabled(),
+        "backend": "postgres" if _shared() else "memory",
+        "entries": size,
+        "max_entries": _max_entries(),
+        "ttl_seconds": _ttl(),
+        "metrics_ttl_seconds": metrics_ttl(),
+        **stats,
+        "hit_rate": round((served - stats["misses"]) / served, 4) if served else None,
+    }
+
+
+def clear_cache() -> None:
+    with _lock:
+        _state["entries"].clear()
+        _state["watermarks"], _state["watermarks_at"] = None, 0.0
+        _state["stats"] = dict.fromkeys(_STATS, 0)
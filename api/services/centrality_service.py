@@ -0,0 +1,162 @@
+import io
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from api.services.db import get_conn
+
+_COLUMNS = ("pagerank", "pagerank_rank", "pagerank_pct", "in_degree", "out_degree", "in_tx", "out_tx")
+
+
+def _history_top() -> int:
+    return int(os.getenv("CENTRALITY_HISTORY_TOP", "10000"))
+
+
+def _history_runs() -> int:
+    return int(os.getenv("CENTRALITY_HISTORY_RUNS", "168"))
+
+
+def _copy_rows(addresses: List[str], cols: Dict[str, np.ndarray], run_id: int) -> io.StringIO:
+    lines = zip(
+        addresses,
+        np.char.mod("%.6e", cols["pagerank"]).tolist(),
+        cols["pagerank_rank"].tolist(),
+        np.char.mod("%.6f", cols["pagerank_pct"]).tolist(),
+        cols["in_degree"].tolist(),
+        cols["out_degree"].tolist(),
+        cols["in_tx"].tolist(),
+        cols["out_tx"].tolist(),
+    )
+    buf = io.StringIO()
+    buf.writelines(f"{a}\t{run_id}\t{pr}\t{rk}\t{pct}\t{ind}\t{outd}\t{intx}\t{outtx}\n" for a, pr, rk, pct, ind, outd, intx, outtx in lines)
+    buf.seek(0)
+    return buf
+
+
+def store_centrality(run: Dict[str, Any], addresses: List[str], cols: Dict[str, np.ndarray]) -> int:
+    """Record a run, replace the latest scores and append top-N history; returns the run id.
+
+    Scores are COPYed into a temp table and upserted, so readers keep seeing the
+    previous run until commit. Addresses that dropped out of the graph keep no row.
+    """
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO centrality_runs(started_at, edge_watermark, nodes, edges, iterations, residual, converged, seconds)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING id
+            """,
+            (run["started_at"], run["edge_watermark"], run["nodes"], run["edges"], run["iterations"], run["residual"], run["converged"], run["seconds"]),
+        )
+        run_id = int(cur.fetchone()[0])
+        cur.execute("CREATE TEMP TABLE centrality_stage (LIKE address_centrality INCLUDING DEFAULTS) ON COMMIT DROP")
+        cur.copy_expert(
+            f"COPY centrality_stage(address, run_id, {', '.join(_COLUMNS)}) FROM STDIN",
+            _copy_rows(addresses, cols, run_id),
+        )
+        cur.execute(
+            f"""
+            INSERT INTO address_centrality(address, run_id, {', '.join(_COLUMNS)}, updated_at)
+            SELECT address, run_id, {', '.join(_COLUMNS)}, now() FROM centrality_stage
+            ON CONFLICT (address) DO UPDATE SET
+              run_id = EXCLUDED.run_id,
+              {', '.join(f'{c} = EXCLUDED.{c}' for c in _COLUMNS)},
+              updated_at = EXCLUDED.updated_at
+            """
+        )
+        cur.execute("DELETE FROM address_centrality WHERE run_id <> %s", (run_id,))
+        cur.execute(
+            """
+            INSERT INTO address_centrality_history(run_id, address, pagerank, pagerank_rank, in_degree, out_degree)
+            SELECT run_id, address, pagerank, pagerank_rank, in_degree, out_degree
+            FROM centrality_stage WHERE pagerank_rank <= %s
+            """,
+            (_history_top(),),
+        )
+        cur.execute(
+            "DELETE FROM centrality_runs WHERE id <= %s - %s",
+            (run_id, _history_runs()),
+        )
+    return run_id
+
+
+def centrality_for(addresses: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """Latest scores for `addresses` (missing ones are omitted)."""
+    addrs = sorted({a.lower() for a in addresses if a})
+    if not addrs:
+        return {}
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            f"SELECT address, {', '.join(_COLUMNS)}, updated_at FROM address_centrality WHERE address = ANY(%s)",
+            (addrs,),
+        )
+        rows = cur.fetchall()
+    return {r[0]: _format(r) for r in rows}
+
+
+def _format(row) -> Dict[str, Any]:
+    address, pr, rank, pct, in_d, out_d, in_tx, out_tx, updated = row
+    return {
+        "address": address,
+        "pagerank": float(pr),
+        "pagerank_rank": int(rank),
+        "pagerank_pct": round(float(pct), 6),
+        "in_degree": int(in_d),
+        "out_degree": int(out_d),
+        "in_tx": int(in_tx),
+        "out_tx": int(out_tx),
+        "updated_at": updated.isoformat() if isinstance(updated, datetime) else updated,
+    }
+
+
+def latest_run() -> Optional[Dict[str, Any]]:
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT id, started_at, finished_at, edge_watermark, nodes, edges, iterations, residual, converged, seconds
+            FROM centrality_runs ORDER BY id DESC LIMIT 1
+            """
+        )
+        row = cur.fetchone()
+    if not row:
+        return None
+    keys = ("id", "started_at", "finished_at", "edge_watermark", "nodes", "edges", "iterations", "residual", "converged", "seconds")
+    out = dict(zip(keys, row))
+    out["started_at"] = out["started_at"].isoformat()
+    out["finished_at"] = out["finished_at"].isoformat() if out["finished_at"] else None
+    return out
+
+
+def top_centrality(limit: int = 50) -> Dict[str, Any]:
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            f"SELECT address, {', '.join(_COLUMNS)}, updated_at FROM address_centrality ORDER BY pagerank_rank LIMIT %s",
+            (limit,),
+        )
+        rows = cur.fetchall()
+    return {"run": latest_run(), "nodes": [_format(r) for r in rows]}
+
+
+def centrality_history(address: str, limit: int = 48) -> List[Dict[str, Any]]:
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT r.id, r.finished_at, h.pagerank, h.pagerank_rank, h.in_degree, h.out_degree
+            FROM address_centrality_history h JOIN centrality_runs r ON r.id = h.run_id
+            WHERE h.address = %s
+            ORDER BY r.id DESC LIMIT %s
+            """,
+            (address.lower(), limit),
+        )
+        rows = cur.fetchall()
+    return [
+        {"run_id": int(i), "at": at.isoformat() if at else None, "pagerank": float(pr), "pagerank_rank": int(rk), "in_degree": int(ind), "out_degree": int(outd)}
+        for i, at, pr, rk, ind, outd in rows
+    ]
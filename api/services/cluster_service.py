@@ -1,8 +1,144 @@
+import io
+from typing import Any, Dict, List
+
 from api.services.db import get_conn
+from api.services.snapshot_service import graph_snapshot
+
+
+def store_clusters(run: Dict[str, Any], addresses: List[str], cluster_ids: List[str], component_ids: List[str], hubs: List[bool]) -> int:
+    """Upsert the changed assignments and recount the sizes of every cluster they touch.
+
+    `addresses` are the nodes whose assignment may have changed (all of them
+    on a full run); rows that already match are left alone.
+    """
+    buf = io.StringIO()
+    buf.writelines(f"{a}\t{c}\t{k}\t{'t' if h else 'f'}\n" for a, c, k, h in zip(addresses, cluster_ids, component_ids, hubs))
+    buf.seek(0)
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("CREATE TEMP TABLE cluster_stage (address TEXT, cluster_id TEXT, component_id TEXT, hub BOOLEAN) ON COMMIT DROP")
+        cur.copy_expert("COPY cluster_stage FROM STDIN", buf)
+        cur.execute("ANALYZE cluster_stage")  # temp tables have no stats; small incremental batches should use the indexes
+        cur.execute(
+            """
+            CREATE TEMP TABLE cluster_moves ON COMMIT DROP AS
+            SELECT s.address, s.cluster_id, s.component_id, s.hub, c.cluster_id AS old_cluster_id
+            FROM cluster_stage s LEFT JOIN address_clusters c ON c.address = s.address
+            WHERE c.address IS NULL OR (c.cluster_id, c.component_id, c.hub) IS DISTINCT FROM (s.cluster_id, s.component_id, s.hub)
+            """
+        )
+        cur.execute(
+            """
+            INSERT INTO address_clusters(address, cluster_id, component_id, hub, updated_at)
+            SELECT address, cluster_id, component_id, hub, now() FROM cluster_moves
+            ON CONFLICT (address) DO UPDATE SET
+              cluster_id = EXCLUDED.cluster_id,
+              component_id = EXCLUDED.component_id,
+              hub = EXCLUDED.hub,
+              updated_at = EXCLUDED.updated_at
+            """
+        )
+        changed = cur.rowcount
+        cur.execute(
+            """
+            CREATE TEMP TABLE cluster_touched ON COMMIT DROP AS
+            SELECT cluster_id FROM cluster_moves
+            UNION SELECT old_cluster_id FROM cluster_moves WHERE old_cluster_id IS NOT NULL
+            """
+        )
+        cur.execute("ANALYZE cluster_touched")
+        cur.execute("DELETE FROM clusters k USING cluster_touched t WHERE k.cluster_id = t.cluster_id")
+        cur.execute(
+            """
+            INSERT INTO clusters(cluster_id, component_id, size, updated_at)
+            SELECT a.cluster_id, MIN(a.component_id), COUNT(*), now()
+            FROM address_clusters a JOIN cluster_touched t ON t.cluster_id = a.cluster_id
+            GROUP BY a.cluster_id
+            """
+        )
+        if run["mode"] == "full":
+            # Keep planner stats current so later incremental batches probe the indexes.
+            cur.execute("ANALYZE address_clusters")
+            cur.execute("ANALYZE clusters")
+        cur.execute(
+            """
+            INSERT INTO clustering_runs(started_at, mode, edge_watermark, nodes, changed, iterations, seconds)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            RETURNING id
+            """,
+            (run["started_at"], run["mode"], run["edge_watermark"], run["nodes"], changed, run["iterations"], run["seconds"]),
+        )
+        return int(cur.fetchone()[0])
+
+
+def _cluster_response(center: str, source: str, nodes, **fields) -> Dict[str, Any]:
+    """The /cluster shape every path returns; keys a path cannot fill are None."""
+    out = {
+        "center": center,
+        "source": source,
+        "cluster_id": None,
+        "component_id": None,
+        "hub": None,
+        "size": None,
+        "truncated": False,
+        "updated_at": None,
+        "hop1_count": None,
+        "hop2_count": None,
+    }
+    out.update(fields)
+    out["nodes"] = nodes
+    return out
+
+
+def _precomputed_cluster(addr: str, limit: int):
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            WITH me AS (SELECT cluster_id, component_id, hub, updated_at FROM address_clusters WHERE address = %s)
+            SELECT me.cluster_id, me.component_id, me.hub, me.updated_at, k.size, m.address
+            FROM me
+            JOIN clusters k ON k.cluster_id = me.cluster_id
+            LEFT JOIN LATERAL (
+              SELECT a.address FROM address_clusters a WHERE a.cluster_id = me.cluster_id ORDER BY a.address LIMIT %s
+            ) m ON TRUE
+            """,
+            (addr, limit),
+        )
+        rows = cur.fetchall()
+    if not rows:
+        return None
+    cluster_id, component_id, hub, updated_at, size, _ = rows[0]
+    return _cluster_response(
+        addr,
+        "precomputed",
+        [{"id": r[5]} for r in rows if r[5]],
+        cluster_id=cluster_id,
+        component_id=component_id,
+        hub=bool(hub),
+        size=int(size),
+        truncated=int(size) > limit,
+        updated_at=updated_at.isoformat() if updated_at else None,
+    )
 
 
 def get_cluster(address: str, limit: int = 200):
     addr = address.lower()
+    precomputed = _precomputed_cluster(addr, limit)
+    if precomputed is not None:
+        return precomputed
+    snapshot = graph_snapshot()
+    if snapshot is not None:
+        res = snapshot.cluster(addr, limit)
+        return _cluster_response(
+            addr,
+            "snapshot",
+            res["nodes"],
+            size=len(res["nodes"]),
+            truncated=max(res["hop1_count"], res["hop2_count"]) >= limit,
+            hop1_count=res["hop1_count"],
+            hop2_count=res["hop2_count"],
+        )
 
     with get_conn() as conn:
         cur = conn.cursor()
@@ -34,9 +170,12 @@ def get_cluster(address: str, limit: int = 200):
             hop2 = {r[0] for r in cur.fetchall() if r[0]}
 
     nodes = {addr, *hop1, *hop2}
-    return {
-        "center": addr,
-        "hop1_count": len(set(hop1)),
-        "hop2_count": len(hop2),
-        "nodes": [{"id": n} for n in sorted(nodes)],
-    }
+    return _cluster_response(
+        addr,
+        "neighborhood",
+        [{"id": n} for n in sorted(nodes)],
+        size=len(nodes),
+        truncated=max(len(hop1), len(hop2)) >= limit,
+        hop1_count=len(set(hop1)),
+        hop2_count=len(hop2),
+    )
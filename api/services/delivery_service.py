@@ -1,9 +1,122 @@
 import json
-from typing import Any, Dict, List
+import os
+from typing import Any, Dict, List, Optional
 
 from alerts.notifiers import send_discord, send_telegram
 from api.services.db import get_conn
 
+SUPPORTED_CHANNELS = ("discord", "telegram")
+
+
+def delivery_channels() -> List[str]:
+    """Channels new alerts are queued for (ALERT_DELIVERY_CHANNELS, comma separated)."""
+    raw = os.getenv("ALERT_DELIVERY_CHANNELS", "")
+    return [c for c in (x.strip().lower() for x in raw.split(",")) if c in SUPPORTED_CHANNELS]
+
+
+def _claimed(rows) -> List[Dict[str, Any]]:
+    return [
+        {"id": int(i), "alert_id": int(a) if a is not None else None, "channel": ch, "attempts": int(n), "payload": payload or {}}
+        for i, a, ch, n, payload in rows
+    ]
+
+
+def claim_deliveries(limit: int = 100, stale_seconds: int = 300, urgent_min_confidence: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Claim due queue rows (SKIP LOCKED), counting the attempt; stale claims are reclaimed.
+
+    With `urgent_min_confidence`, only high-severity alerts at or above that
+    confidence are claimed (the digest bypass).
+    """
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            UPDATE alert_deliveries d
+            SET status = 'sending', locked_at = now(), attempts = d.attempts + 1, updated_at = now()
+            WHERE d.id IN (
+              SELECT id FROM alert_deliveries
+              WHERE ((status IN ('pending', 'retry') AND next_attempt_at <= now())
+                 OR (status = 'sending' AND locked_at < now() - make_interval(secs => %(stale)s)))
+                AND (%(urgent)s::float8 IS NULL
+                     OR (payload->>'severity' = 'high' AND (payload->>'confidence')::float8 >= %(urgent)s::float8))
+              ORDER BY next_attempt_at
+              LIMIT %(limit)s
+              FOR UPDATE SKIP LOCKED
+            )
+            RETURNING d.id, d.alert_id, d.channel, d.attempts, d.payload
+            """,
+            {"stale": stale_seconds, "limit": limit, "urgent": urgent_min_confidence},
+        )
+        return _claimed(cur.fetchall())
+
+
+def claim_digest(channel: str, interval_seconds: float, max_items: int, stale_seconds: int = 300) -> List[Dict[str, Any]]:
+    """Claim a channel's buffered rows once the digest is due.
+
+    A digest is due when its oldest row has waited `interval_seconds` or
+    `max_items` rows are buffered; otherwise nothing is claimed.
+    """
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            WITH buffered AS (
+              SELECT id, created_at FROM alert_deliveries
+              WHERE channel = %(channel)s
+                AND ((status IN ('pending', 'retry') AND next_attempt_at <= now())
+                  OR (status = 'sending' AND locked_at < now() - make_interval(secs => %(stale)s)))
+              ORDER BY created_at
+              LIMIT %(max_items)s
+              FOR UPDATE SKIP LOCKED
+            ), gate AS (
+              SELECT COUNT(*) >= %(max_items)s OR MIN(created_at) <= now() - make_interval(secs => %(interval)s) AS due
+              FROM buffered
+            )
+            UPDATE alert_deliveries d
+            SET status = 'sending', locked_at = now(), attempts = d.attempts + 1, updated_at = now()
+            FROM buffered b, gate g
+            WHERE d.id = b.id AND g.due
+            RETURNING d.id, d.alert_id, d.channel, d.attempts, d.payload
+            """,
+            {"channel": channel, "stale": stale_seconds, "max_items": max_items, "interval": interval_seconds},
+        )
+        return _claimed(cur.fetchall())
+
+
+def record_delivery_results(updates: List[Dict[str, Any]]) -> None:
+    """Apply worker outcomes in one statement.
+
+    Each update: `id`, `status` (sent|retry|failed|pending), `error`, `destination`, `retry_in` seconds,
+    and optionally `refund`: claimed attempts to give back for rows that were not sent.
+    """
+    if not updates:
+        return
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            UPDATE alert_deliveries d
+            SET status = u.status,
+                error = u.error,
+                destination = COALESCE(u.destination, d.destination),
+                next_attempt_at = now() + make_interval(secs => u.retry_in),
+                attempts = GREATEST(0, d.attempts - u.refund),
+                locked_at = NULL,
+                updated_at = now()
+            FROM unnest(%s::bigint[], %s::text[], %s::text[], %s::text[], %s::float8[], %s::int[])
+              AS u(id, status, error, destination, retry_in, refund)
+            WHERE d.id = u.id
+            """,
+            (
+                [u["id"] for u in updates],
+                [u["status"] for u in updates],
+                [u.get("error") for u in updates],
+                [u.get("destination") for u in updates],
+                [float(u.get("retry_in") or 0) for u in updates],
+                [int(u.get("refund") or 0) for u in updates],
+            ),
+        )
+
 
 def _persist(alert_id: int | None, result: Dict[str, Any], payload: Dict[str, Any]) -> None:
     with get_conn() as conn:
@@ -81,7 +194,7 @@ def recent_deliveries(limit: int = 50, status: str | None = None) -> List[Dict[s
                 "channel": channel_name,
                 "destination": dest,
                 "status": st,
-                "attempts": int(attempts or 1),
+                "attempts": int(attempts or 0),
                 "error": err,
                 "payload": payload or {},
                 "created_at": created_at.isoformat() if created_at else None,
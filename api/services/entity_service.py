@@ -1,78 +1,129 @@
+import os
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
 from api.services.db import get_conn
-from api.services.label_service import get_labels
+from api.services.feature_service import features_many
+from api.services.label_service import labels_for
+from api.services.temporal_service import counterparties_in_window, resolve_window
+
+# Profiles of a set of addresses in a constant number of queries. Flows and
+# counterparties are LATERAL aggregates per address, which keeps each one on
+# its (address, ...) index range: a plain join lets a few hub addresses
+# skew the estimate into scanning the whole table. Labels go through
+# `labels_for`. When the feature store is mapped the flows are read from it
+# instead (its wei sums are exact), except for addresses ingest added or
+# updated since the store was built.
+
+TOP_COUNTERPARTIES = 10
+_FLOW_FEATURES = (
+    "out_wei_7d", "in_wei_7d", "out_txs_7d", "in_txs_7d",
+    "out_wei_30d", "in_wei_30d", "out_txs_30d", "in_txs_30d",
+)
+
+_FLOWS_SQL = """
+    SELECT b.address, o.wei7, i.wei7, o.n7, i.n7, o.wei30, i.wei30, o.n30, i.n30
+    FROM unnest(%(a)s::text[]) AS b(address)
+    CROSS JOIN LATERAL (
+      SELECT COALESCE(SUM(value_wei) FILTER (WHERE timestamp >= now() - interval '7 days'), 0) AS wei7,
+             COUNT(*) FILTER (WHERE timestamp >= now() - interval '7 days') AS n7,
+             COALESCE(SUM(value_wei), 0) AS wei30, COUNT(*) AS n30
+      FROM transactions
+      WHERE from_address = b.address AND timestamp >= now() - interval '30 days'
+    ) o
+    CROSS JOIN LATERAL (
+      SELECT COALESCE(SUM(value_wei) FILTER (WHERE timestamp >= now() - interval '7 days'), 0) AS wei7,
+             COUNT(*) FILTER (WHERE timestamp >= now() - interval '7 days') AS n7,
+             COALESCE(SUM(value_wei), 0) AS wei30, COUNT(*) AS n30
+      FROM transactions
+      WHERE to_address = b.address AND timestamp >= now() - interval '30 days'
+    ) i
+"""
+
+_COUNTERPARTIES_SQL = """
+    SELECT b.address, c.cp, c.txs, c.value_wei
+    FROM unnest(%(a)s::text[]) WITH ORDINALITY AS b(address, n)
+    CROSS JOIN LATERAL (
+      SELECT cp, SUM(tx_count) AS txs, SUM(total_value_wei) AS value_wei
+      FROM (
+        SELECT dst_address AS cp, tx_count, total_value_wei FROM edges WHERE src_address = b.address
+        UNION ALL
+        SELECT src_address, tx_count, total_value_wei FROM edges WHERE dst_address = b.address AND src_address <> b.address
+      ) e
+      GROUP BY cp
+      ORDER BY SUM(tx_count) DESC, cp
+      LIMIT %(limit)s
+    ) c
+    ORDER BY b.n, c.txs DESC, c.cp
+"""
+
+
+def batch_max_addresses() -> int:
+    return int(os.getenv("BATCH_MAX_ADDRESSES", "5000"))
+
+
+def batch_chunk() -> int:
+    return int(os.getenv("BATCH_CHUNK_ADDRESSES", "500"))
 
 
-def get_entity_profile(address: str):
+def normalize_addresses(addresses: Sequence[str]) -> List[str]:
+    """Lowercased, de-duplicated `addresses` in request order."""
+    return list(dict.fromkeys(a.strip().lower() for a in addresses if a and a.strip()))
+
+
+def _flow(out_wei, in_wei, out_txs, in_txs) -> Dict[str, Any]:
+    return {"outbound_wei": str(out_wei or 0), "inbound_wei": str(in_wei or 0), "outbound_txs": int(out_txs or 0), "inbound_txs": int(in_txs or 0)}
+
+
+def entity_profiles(cur, addresses: Sequence[str]) -> List[Dict[str, Any]]:
+    """Profiles of `addresses` (lowercase, distinct), in order, in a fixed number of queries whatever their number."""
+    addrs = list(addresses)
+    labels = labels_for(cur, addrs)
+    stored = features_many(cur, addrs, _FLOW_FEATURES)
+    query = addrs
+    flows: Dict[str, tuple] = {}
+    if stored is not None:
+        cols, missing = stored
+        flows = {a: tuple(int(v) for v in row) for a, row in zip(addrs, zip(*(cols[k].tolist() for k in _FLOW_FEATURES)))}
+        query = [addrs[n] for n in missing]
+    if query:
+        cur.execute(_FLOWS_SQL, {"a": query})
+        flows.update({r[0]: r[1:] for r in cur.fetchall()})
+    cur.execute(_COUNTERPARTIES_SQL, {"a": addrs, "limit": TOP_COUNTERPARTIES})
+    top: Dict[str, List[Dict[str, Any]]] = {}
+    for a, cp, txs, v in cur.fetchall():
+        top.setdefault(a, []).append({"address": cp, "tx_count": int(txs or 0), "total_value_wei": str(v or 0)})
+    out = []
+    for a in addrs:
+        f = flows[a]
+        out.append({
+            "address": a,
+            "labels": labels[a]["labels"],
+            "features": labels[a]["features"],
+            "flow_7d": _flow(*f[:4]),
+            "flow_30d": _flow(*f[4:]),
+            "top_counterparties": top.get(a, []),
+            "counterparties_window": None,
+        })
+    return out
+
+
+def get_entity_profile(address: str, window: Optional[str] = None):
     addr = address.lower()
-    label_bundle = get_labels(addr)
+    bounds = resolve_window(window) if window else None
+    with get_conn() as conn:
+        profile = entity_profiles(conn.cursor(), [addr])[0]
+    if bounds is not None:
+        profile["top_counterparties"] = counterparties_in_window(addr, *bounds, limit=TOP_COUNTERPARTIES)
+        profile["counterparties_window"] = {"start": bounds[0].isoformat(), "end": bounds[1].isoformat()}
+    return profile
 
+
+def stream_entity_profiles(addresses: Sequence[str]) -> Iterator[Dict[str, Any]]:
+    """Profiles of `addresses` chunk by chunk (BATCH_CHUNK_ADDRESSES), on one connection."""
+    addrs = normalize_addresses(addresses)
+    size = batch_chunk()
     with get_conn() as conn:
         cur = conn.cursor()
-
-        cur.execute(
-            """
-            SELECT
-              COALESCE(SUM(CASE WHEN from_address = %s THEN value_wei ELSE 0 END),0) AS out_wei,
-              COALESCE(SUM(CASE WHEN to_address = %s THEN value_wei ELSE 0 END),0) AS in_wei,
-              COALESCE(COUNT(*) FILTER (WHERE from_address = %s),0) AS out_txs,
-              COALESCE(COUNT(*) FILTER (WHERE to_address = %s),0) AS in_txs
-            FROM transactions
-            WHERE timestamp >= now() - interval '7 days'
-              AND (from_address = %s OR to_address = %s)
-            """,
-            (addr, addr, addr, addr, addr, addr),
-        )
-        out_wei7, in_wei7, out_txs7, in_txs7 = cur.fetchone()
-
-        cur.execute(
-            """
-            SELECT
-              COALESCE(SUM(CASE WHEN from_address = %s THEN value_wei ELSE 0 END),0) AS out_wei,
-              COALESCE(SUM(CASE WHEN to_address = %s THEN value_wei ELSE 0 END),0) AS in_wei,
-              COALESCE(COUNT(*) FILTER (WHERE from_address = %s),0) AS out_txs,
-              COALESCE(COUNT(*) FILTER (WHERE to_address = %s),0) AS in_txs
-            FROM transactions
-            WHERE timestamp >= now() - interval '30 days'
-              AND (from_address = %s OR to_address = %s)
-            """,
-            (addr, addr, addr, addr, addr, addr),
-        )
-        out_wei30, in_wei30, out_txs30, in_txs30 = cur.fetchone()
-
-        cur.execute(
-            """
-            SELECT
-              CASE WHEN src_address = %s THEN dst_address ELSE src_address END AS cp,
-              SUM(tx_count) AS txs,
-              SUM(total_value_wei) AS value_wei
-            FROM edges
-            WHERE src_address = %s OR dst_address = %s
-            GROUP BY cp
-            ORDER BY txs DESC
-            LIMIT 10
-            """,
-            (addr, addr, addr),
-        )
-        top = [
-            {"address": cp, "tx_count": int(txs or 0), "total_value_wei": str(v or 0)}
-            for cp, txs, v in cur.fetchall()
-        ]
-
-    return {
-        "address": addr,
-        "labels": label_bundle["labels"],
-        "features": label_bundle["features"],
-        "flow_7d": {
-            "outbound_wei": str(out_wei7 or 0),
-            "inbound_wei": str(in_wei7 or 0),
-            "outbound_txs": int(out_txs7 or 0),
-            "inbound_txs": int(in_txs7 or 0),
-        },
-        "flow_30d": {
-            "outbound_wei": str(out_wei30 or 0),
-            "inbound_wei": str(in_wei30 or 0),
-            "outbound_txs": int(out_txs30 or 0),
-            "inbound_txs": int(in_txs30 or 0),
-        },
-        "top_counterparties": top,
-    }
+        for lo in range(0, len(addrs), size):
+            yield from entity_profiles(cur, addrs[lo:lo + size])
+            conn.commit()
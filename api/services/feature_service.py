@@ -0,0 +1,330 @@
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from features.store import ALERT_COLUMNS, FLOW_COLUMNS, TX_WINDOWS, WEI_COLUMNS, FeatureStore, open_store
+from graph.csr import add_wei, split_wei, sub_wei
+
+# Per-address features materialized by `python -m features.builder`
+# (features/store.py). `refresh_store` folds in what ingest committed past
+# the store's watermarks, in one REPEATABLE READ transaction so every step
+# sees the same data:
+#
+# - addresses updated since the last run (minus FEATURE_STORE_OVERLAP_SECONDS)
+#   overwrite their counters,
+# - edge rows past the `edges.id` watermark add to the degrees; a pair is a
+#   new counterparty when no row at or below the watermark has it,
+# - transfers of blocks past the block watermark (`ingest_state.last_block`)
+#   are added to the windows they fall in, and transfers already counted
+#   that slid out of a window since the previous `as_of` are subtracted,
+# - 7-day alert counts are recomputed (alert status changes are updates).
+#
+# Replayed blocks and deleted rows are only picked up by a full rebuild
+# (FEATURE_STORE_FULL_EVERY runs).
+#
+# With FEATURE_STORE_PATH set, API workers map the builder's file and reopen
+# it when a new one is renamed into place; `feature_store()` returns None
+# (callers answer from SQL) when it is unset, missing, or older than
+# FEATURE_STORE_MAX_AGE_SECONDS. Addresses first seen or updated by ingest
+# since the store's `as_of` are read from SQL as well (`features_many`).
+
+CHUNK_ROWS = 200_000
+
+_state: Dict[str, Any] = {"store": None, "file": None, "checked_at": 0.0}
+
+_BLOCK_WATERMARK_SQL = """
+    SELECT COALESCE(
+      (SELECT value::bigint FROM ingest_state WHERE key = 'last_block' AND value ~ '^[0-9]+$'),
+      (SELECT MAX(block_number) FROM transactions),
+      -1
+    )
+"""
+
+_EDGES_SQL = """
+    WITH e AS (SELECT src_address, dst_address FROM edges WHERE id > %(lo)s AND id <= %(hi)s)
+    SELECT address, SUM(out_n), SUM(in_n), SUM(new_cp)
+    FROM (
+      SELECT src_address AS address, COUNT(*) AS out_n, 0::bigint AS in_n, 0::bigint AS new_cp FROM e GROUP BY 1
+      UNION ALL
+      SELECT dst_address, 0, COUNT(*), 0 FROM e GROUP BY 1
+      UNION ALL
+      SELECT src_address, 0, 0, COUNT(DISTINCT dst_address) FROM e
+      WHERE %(lo)s = 0 OR NOT EXISTS (
+        SELECT 1 FROM edges p WHERE p.src_address = e.src_address AND p.dst_address = e.dst_address AND p.id <= %(lo)s
+      )
+      GROUP BY 1
+    ) t
+    GROUP BY address
+"""
+
+_CHANGED_SQL = "SELECT address FROM addresses WHERE address = ANY(%s) AND updated_at > to_timestamp(%s)"
+
+# Transfers of the blocks a store has not folded in yet, in the windows the
+# 24h activity alert rules read (last 24h, the 24h before).
+_RECENT_ACTIVITY_SQL = """
+    SELECT address, SUM(out_1d), SUM(in_1d), SUM(out_prev), SUM(in_prev)
+    FROM (
+      SELECT from_address AS address, COUNT(*) FILTER (WHERE timestamp >= now() - interval '1 day') AS out_1d,
+             0::bigint AS in_1d, COUNT(*) FILTER (WHERE timestamp < now() - interval '1 day') AS out_prev, 0::bigint AS in_prev
+      FROM transactions
+      WHERE block_number > %(block)s AND timestamp >= now() - interval '2 days' AND from_address IS NOT NULL
+      GROUP BY 1
+      UNION ALL
+      SELECT to_address, 0, COUNT(*) FILTER (WHERE timestamp >= now() - interval '1 day'),
+             0, COUNT(*) FILTER (WHERE timestamp < now() - interval '1 day')
+      FROM transactions
+      WHERE block_number > %(block)s AND timestamp >= now() - interval '2 days' AND to_address IS NOT NULL
+      GROUP BY 1
+    ) t
+    GROUP BY address
+"""
+
+_ALERTS_SQL = """
+    SELECT address, COUNT(*), COUNT(*) FILTER (WHERE status = 'new'), COUNT(*) FILTER (WHERE severity = 'high'),
+           COALESCE(SUM(confidence), 0)::float8
+    FROM alerts
+    WHERE created_at >= now() - interval '7 days'
+    GROUP BY address
+"""
+
+
+def _window(w: str, expire: bool) -> str:
+    days = TX_WINDOWS[w]
+    if expire:
+        return f"timestamp >= to_timestamp(%(prev)s) - interval '{days} days' AND timestamp < now() - interval '{days} days'"
+    return f"timestamp >= now() - interval '{days} days'"
+
+
+def _flows_sql(expire: bool) -> str:
+    """Per-address window sums of FLOW_COLUMNS over new blocks, or (`expire`) over counted rows that left a window."""
+    if expire:
+        rows = "block_number <= %(blo)s AND (" + " OR ".join(f"({_window(w, True)})" for w in TX_WINDOWS) + ")"
+    else:
+        rows = f"block_number > %(blo)s AND block_number <= %(bhi)s AND {_window('30d', False)}"
+    parts = []
+    for direction, key in (("out", "from_address"), ("in", "to_address")):
+        exprs = []
+        for col in FLOW_COLUMNS:
+            d, kind, w = col.split("_")
+            if d != direction:
+                exprs.append("0")
+            elif kind == "txs":
+                exprs.append(f"COUNT(*) FILTER (WHERE {_window(w, expire)})")
+            else:
+                exprs.append(f"COALESCE(SUM(value_wei) FILTER (WHERE {_window(w, expire)}), 0)")
+        parts.append(f"SELECT {key} AS address, {', '.join(exprs)} FROM transactions WHERE {rows} AND {key} IS NOT NULL GROUP BY 1")
+    sums = ", ".join(f"SUM(c{i})" for i in range(len(FLOW_COLUMNS)))
+    return f"SELECT address, {sums} FROM ({' UNION ALL '.join(parts)}) t(address, {', '.join(f'c{i}' for i in range(len(FLOW_COLUMNS)))}) GROUP BY address"
+
+
+def _stream(conn, name: str, sql: str, params: Dict[str, Any]):
+    named = conn.cursor(name=name)
+    named.itersize = CHUNK_ROWS
+    named.execute(sql, params)
+    while True:
+        rows = named.fetchmany(CHUNK_ROWS)
+        if not rows:
+            break
+        yield rows
+    named.close()
+
+
+def _apply(store: FeatureStore, rows: List[tuple], columns: Sequence[str], mode: str) -> FeatureStore:
+    """Fold (address, *values) rows into `columns`: `set`, `add` or `sub`."""
+    store, ids = store.extended([r[0] for r in rows])
+    for j, name in enumerate(columns):
+        if name in WEI_COLUMNS:
+            hi, lo = store.columns[f"{name}_hi"], store.columns[f"{name}_lo"]
+            v_hi, v_lo = split_wei(r[j + 1] for r in rows)
+            if mode == "set":
+                hi[ids], lo[ids] = v_hi, v_lo
+            elif mode == "add":
+                hi[ids], lo[ids] = add_wei(hi[ids], lo[ids], v_hi, v_lo)
+            else:
+                hi[ids], lo[ids] = sub_wei(hi[ids], lo[ids], v_hi, v_lo)
+            continue
+        col = store.columns[name]
+        vals = np.array([r[j + 1] for r in rows], dtype=col.dtype)
+        if mode == "set":
+            col[ids] = vals
+        elif mode == "add":
+            col[ids] += vals
+        else:
+            col[ids] = np.maximum(col[ids] - vals, 0)
+    return store
+
+
+def refresh_store(store: FeatureStore, conn, full: bool = False) -> Tuple[FeatureStore, Dict[str, Any]]:
+    """Return `store` brought up to date, and a summary; folds into its writable columns in place."""
+    t0 = time.perf_counter()
+    overlap = float(os.getenv("FEATURE_STORE_OVERLAP_SECONDS", "300"))
+    cur = conn.cursor()
+    cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+    cur.execute("SELECT EXTRACT(EPOCH FROM now())::float8, (SELECT COALESCE(MAX(id), 0) FROM edges)")
+    as_of, edges_hi = cur.fetchone()
+    cur.execute(_BLOCK_WATERMARK_SQL)
+    block_hi = int(cur.fetchone()[0])
+    wm = store.watermarks
+    full = full or wm["as_of"] is None or edges_hi < wm["edges"] or block_hi < wm["block"]
+    if full:
+        store, wm = FeatureStore.empty(), FeatureStore.empty().watermarks
+    counts = {"addresses": 0, "edges": 0, "flows": 0, "expired": 0, "alerts": 0}
+
+    if full:
+        sql, params = "SELECT address, tx_count, contracts_deployed FROM addresses", {}
+    else:
+        sql, params = "SELECT address, tx_count, contracts_deployed FROM addresses WHERE updated_at >= to_timestamp(%(since)s)", {"since": wm["addresses_at"] - overlap}
+    for rows in _stream(conn, "feature_addresses", sql, params):
+        store = _apply(store, rows, ("tx_count", "contracts_deployed"), "set")
+        counts["addresses"] += len(rows)
+
+    if edges_hi > wm["edges"]:
+        for rows in _stream(conn, "feature_edges", _EDGES_SQL, {"lo": wm["edges"], "hi": edges_hi}):
+            store = _apply(store, rows, ("outbound_edges", "inbound_edges", "unique_counterparties"), "add")
+            counts["edges"] += len(rows)
+
+    if block_hi > wm["block"]:
+        for rows in _stream(conn, "feature_flows", _flows_sql(False), {"blo": wm["block"], "bhi": block_hi}):
+            store = _apply(store, rows, FLOW_COLUMNS, "add")
+            counts["flows"] += len(rows)
+    if not full:
+        for rows in _stream(conn, "feature_expired", _flows_sql(True), {"blo": wm["block"], "prev": wm["as_of"]}):
+            store = _apply(store, rows, FLOW_COLUMNS, "sub")
+            counts["expired"] += len(rows)
+
+    cur.execute(_ALERTS_SQL)
+    rows = cur.fetchall()
+    store, _ = store.extended([r[0] for r in rows])
+    for name in ALERT_COLUMNS:
+        store.columns[name][:] = 0
+    if rows:
+        store = _apply(store, rows, ALERT_COLUMNS, "set")
+    counts["alerts"] = len(rows)
+
+    store.watermarks = {"edges": int(edges_hi), "block": block_hi, "as_of": float(as_of), "addresses_at": float(as_of)}
+    return store, dict(counts, full=full, size=len(store), watermarks=store.watermarks, seconds=round(time.perf_counter() - t0, 3))
+
+
+def store_path() -> Optional[str]:
+    return os.getenv("FEATURE_STORE_PATH") or None
+
+
+def _max_age() -> float:
+    return float(os.getenv("FEATURE_STORE_MAX_AGE_SECONDS", "600"))
+
+
+def _load_file(path: str) -> None:
+    """Map the store at `path` if the file changed since the last load."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        _state["store"] = _state["file"] = None
+        return
+    key = (st.st_ino, st.st_mtime_ns, st.st_size)
+    if _state["file"] and _state["file"]["key"] == key:
+        return
+    store, header = open_store(path)
+    _state["store"] = store
+    _state["file"] = {"path": path, "key": key, "created_at": header["created_at"]}
+
+
+def feature_store() -> Optional[FeatureStore]:
+    """The mapped store, or None when not configured, not built yet or stale."""
+    path = store_path()
+    if not path:
+        return None
+    now = time.time()
+    if now - _state["checked_at"] >= 1.0:
+        _state["checked_at"] = now
+        try:
+            _load_file(path)
+        except ValueError as e:
+            print(f"[features] cannot map {path}: {e}")
+    store = _state["store"]
+    if store is None or now - store.watermarks["as_of"] > _max_age():
+        return None
+    return store
+
+
+def features_many(cur, addresses: Sequence[str], names: Optional[Sequence[str]] = None) -> Optional[Tuple[Dict[str, np.ndarray], List[int]]]:
+    """(columns `names` of `addresses` aligned with them, positions the store cannot answer), or None when it is unavailable.
+
+    The store cannot answer for addresses it has never seen or that ingest
+    updated after its `as_of` (one lookup on `addresses`); callers read those
+    from SQL.
+    """
+    store = feature_store()
+    if store is None:
+        return None
+    ids = store.ids(addresses).tolist()
+    cols = store.gather(np.asarray(ids, dtype=np.int64), names)
+    known = [a for a, i in zip(addresses, ids) if i >= 0]
+    changed = set()
+    if known:
+        cur.execute(_CHANGED_SQL, (known, store.watermarks["as_of"]))
+        changed = {r[0] for r in cur.fetchall()}
+    return cols, [n for n, (a, i) in enumerate(zip(addresses, ids)) if i < 0 or a in changed]
+
+
+def recent_activity(cur, store: FeatureStore) -> Dict[str, Tuple[int, int, int, int]]:
+    """address -> (out, in transfers in the last 24h, out, in in the 24h before) of blocks past the store's block watermark."""
+    cur.execute(_RECENT_ACTIVITY_SQL, {"block": store.watermarks["block"]})
+    return {r[0]: tuple(int(v) for v in r[1:]) for r in cur.fetchall()}
+
+
+def _top_rows(store: FeatureStore, a: np.ndarray, b: np.ndarray, keep, key, limit: int, recent: Dict[str, Tuple[int, int]]) -> List[tuple]:
+    """(address, a, b) rows with keep(a, b), smallest key(a, b) first, where `recent` adds to a and b.
+
+    Addresses `recent` does not touch keep their store values, so the
+    first `limit` of them plus every touched address hold the answer.
+    """
+    touched = list(recent)
+    touched_ids = store.ids(touched) if touched else np.zeros(0, dtype=np.int64)
+    ids = np.flatnonzero(keep(a, b))
+    ids = ids[np.argsort(key(a[ids], b[ids]), kind="stable")]
+    ids = ids[~np.isin(ids, touched_ids)][:limit]
+    rows = list(zip(store.index.decode(ids), a[ids].tolist(), b[ids].tolist()))
+    for address, i in zip(touched, touched_ids.tolist()):
+        da, db = recent[address]
+        va, vb = (int(a[i]) + da, int(b[i]) + db) if i >= 0 else (da, db)
+        if keep(va, vb):
+            rows.append((address, va, vb))
+    rows.sort(key=lambda r: key(r[1], r[2]))
+    return rows[:limit]
+
+
+def spike_rows(store: FeatureStore, direction: str, min_count: int, limit: int, recent: Optional[Dict[str, tuple]] = None) -> List[tuple]:
+    """(address, transfers in the last 24h, in the 24h before) of `direction` ("out" or "in"), as the
+    fan-out / fan-in rules read them: at least `min_count` now, largest increase first.
+
+    `recent` (see `recent_activity`) adds the blocks ingested since the store was built.
+    """
+    now = store.columns[f"{direction}_txs_1d"]
+    prev = store.columns[f"{direction}_txs_2d"] - now
+    k = 0 if direction == "out" else 1
+    delta = {addr: (r[k], r[k + 2]) for addr, r in (recent or {}).items() if r[k] or r[k + 2]}
+    return _top_rows(store, now, prev, lambda n, p: n >= min_count, lambda n, p: p - n, limit, delta)
+
+
+def activity_rows(store: FeatureStore, min_count: int, limit: int, recent: Optional[Dict[str, tuple]] = None) -> List[tuple]:
+    """(address, outbound, inbound transfers in the last 24h) with at least `min_count` in total, busiest first."""
+    delta = {addr: (r[0], r[1]) for addr, r in (recent or {}).items() if r[0] or r[1]}
+    return _top_rows(
+        store, store.columns["out_txs_1d"], store.columns["in_txs_1d"], lambda o, i: o + i >= min_count, lambda o, i: -(o + i), limit, delta
+    )
+
+
+def feature_status() -> Dict[str, Any]:
+    store = feature_store()
+    mapped = _state["store"]
+    return {
+        "enabled": store_path() is not None,
+        "ready": store is not None,
+        "addresses": len(mapped) if mapped is not None else 0,
+        "bytes": mapped.nbytes() if mapped is not None else 0,
+        "watermarks": mapped.watermarks if mapped is not None else None,
+        "age_seconds": round(time.time() - mapped.watermarks["as_of"], 1) if mapped is not None else None,
+        "file_created_at": _state["file"]["created_at"] if _state["file"] else None,
+    }
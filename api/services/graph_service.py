@@ -1,26 +1,47 @@
+import time
+from datetime import datetime
+
+import psycopg2.errors
+
 from api.services.db import get_conn
+from api.services.sketch_service import load_sketches
+from api.services.snapshot_service import graph_snapshot
+from graph.paths import shortest_paths
+from graph.traversal import INFRA_ADDRESSES, bounded_bfs
+
 
+def get_global_graph(limit: int = 80, hours: int | None = None):
+    """Return the top N most-active addresses and all edges between them.
 
-def get_global_graph(limit: int = 80):
-    """Return the top N most-active addresses and all edges between them."""
+    With `hours`, nodes are the top addresses by degree over that recent window
+    from the ingest degree sketches instead of an all-time GROUP BY over edges.
+    Otherwise the in-memory graph snapshot answers when it is ready.
+    """
+    snapshot = graph_snapshot() if not hours else None
+    if snapshot is not None:
+        return snapshot.global_graph(limit)
+    sketches = load_sketches() if hours else None
     with get_conn() as conn:
         cur = conn.cursor()
-        # Find the most active addresses by total weighted degree
-        cur.execute(
-            """
-            SELECT address
-            FROM (
-                SELECT src_address AS address, SUM(tx_count) AS w FROM edges GROUP BY src_address
-                UNION ALL
-                SELECT dst_address, SUM(tx_count) FROM edges GROUP BY dst_address
-            ) t
-            GROUP BY address
-            ORDER BY SUM(w) DESC
-            LIMIT %s
-            """,
-            (limit,),
-        )
-        top_addrs = [r[0] for r in cur.fetchall()]
+        if sketches is not None:
+            top_addrs = [r["address"] for r in sketches.top_degree(limit, hours=hours)]
+        else:
+            # Find the most active addresses by total weighted degree
+            cur.execute(
+                """
+                SELECT address
+                FROM (
+                    SELECT src_address AS address, SUM(tx_count) AS w FROM edges GROUP BY src_address
+                    UNION ALL
+                    SELECT dst_address, SUM(tx_count) FROM edges GROUP BY dst_address
+                ) t
+                GROUP BY address
+                ORDER BY SUM(w) DESC
+                LIMIT %s
+                """,
+                (limit,),
+            )
+            top_addrs = [r[0] for r in cur.fetchall()]
         if not top_addrs:
             return {"nodes": [], "edges": []}
 
@@ -52,6 +73,9 @@ def get_global_graph(limit: int = 80):
 
 def get_neighbors(address: str, limit: int = 25):
     addr = address.lower()
+    snapshot = graph_snapshot()
+    if snapshot is not None:
+        return snapshot.neighbors(addr, limit)
     with get_conn() as conn:
         cur = conn.cursor()
         cur.execute(
@@ -77,3 +101,128 @@ def get_neighbors(address: str, limit: int = 25):
         edges.append({"src": s, "dst": d, "tx_count": int(c or 0), "total_value_wei": str(v or 0)})
 
     return {"nodes": [{"id": n} for n in sorted(nodes)], "edges": edges}
+
+
+def get_neighborhood(
+    address: str,
+    depth: int = 2,
+    limit: int = 25,
+    max_nodes: int = 500,
+    time_budget_ms: float = 150.0,
+    skip_infra: bool = True,
+    max_edges: int = 2000,
+):
+    """Bounded multi-hop neighborhood; see graph/traversal.py for the caps and budgets.
+
+    Without a graph snapshot the same walk runs in SQL, one query per hop
+    with each frontier node's heaviest `limit` pairs, under a statement
+    timeout set to the remaining budget.
+    """
+    skip = INFRA_ADDRESSES if skip_infra else frozenset()
+    snapshot = graph_snapshot()
+    if snapshot is not None:
+        return bounded_bfs(snapshot, address, depth, limit, max_nodes, time_budget_ms, skip, max_edges)
+
+    t0 = time.perf_counter()
+    addr = address.lower()
+    hop_of = {addr: 0}
+    frontier = [addr]
+    edges = {}
+    truncated, reason, hops_done = False, None, 0
+    with get_conn() as conn:
+        cur = conn.cursor()
+        for hop in range(1, depth + 1):
+            remaining = time_budget_ms - (time.perf_counter() - t0) * 1000
+            if not frontier:
+                break
+            if remaining <= 0:
+                truncated, reason = True, "time_budget"
+                break
+            try:
+                cur.execute("SET LOCAL statement_timeout = %s", (max(1, int(remaining)),))
+                cur.execute(
+                    """
+                    SELECT x.src, x.dst, x.c, x.v
+                    FROM unnest(%s::text[]) f(a)
+                    CROSS JOIN LATERAL (
+                      SELECT src_address AS src, dst_address AS dst, SUM(tx_count) AS c, SUM(total_value_wei) AS v
+                      FROM edges
+                      WHERE src_address = f.a OR dst_address = f.a
+                      GROUP BY src_address, dst_address
+                      ORDER BY SUM(tx_count) DESC
+                      LIMIT %s
+                    ) x
+                    ORDER BY x.c DESC
+                    """,
+                    (frontier, limit),
+                )
+                rows = cur.fetchall()
+            except psycopg2.errors.QueryCanceled:
+                conn.rollback()
+                truncated, reason = True, "time_budget"
+                break
+            next_frontier = []
+            for s, d, c, v in rows:
+                other = d if s in hop_of and hop_of[s] < hop else s
+                if other not in hop_of:
+                    if len(hop_of) >= max_nodes:
+                        truncated, reason = True, "node_budget"
+                        break
+                    if len(next_frontier) >= limit:
+                        continue
+                    hop_of[other] = hop
+                    if other not in skip:
+                        next_frontier.append(other)
+                if s in hop_of and d in hop_of:
+                    edges[(s, d)] = {"src": s, "dst": d, "tx_count": int(c or 0), "total_value_wei": str(v or 0)}
+            frontier = next_frontier
+            hops_done = hop
+            if truncated:
+                break
+
+    nodes = [{"id": n, "hop": h, **({"skipped": True} if n in skip and n != addr else {})} for n, h in hop_of.items()]
+    nodes.sort(key=lambda x: (x["hop"], x["id"]))
+    return {
+        "nodes": nodes,
+        "edges": sorted(edges.values(), key=lambda e: -e["tx_count"])[:max_edges],
+        "hops": hops_done,
+        "truncated": truncated,
+        "truncated_reason": reason,
+        "edges_truncated": len(edges) > max_edges,
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 2),
+    }
+
+
+def find_paths(
+    src: str,
+    dst: str,
+    k: int = 1,
+    max_hops: int = 6,
+    weighted: bool = False,
+    direction: str = "any",
+    start: datetime | None = None,
+    end: datetime | None = None,
+    max_degree: int = 5000,
+    skip_infra: bool = True,
+    time_budget_ms: float = 250.0,
+):
+    """Paths from `src` to `dst` over the graph snapshot; None until a snapshot is loaded."""
+    snapshot = graph_snapshot()
+    if snapshot is None:
+        return None
+    window = None
+    if start or end:
+        window = (int(start.timestamp()) if start else 0, int(end.timestamp()) if end else 2**32 - 1)
+    return shortest_paths(
+        snapshot,
+        src,
+        dst,
+        k=k,
+        max_hops=max_hops,
+        weighted=weighted,
+        direction=direction,
+        window=window,
+        max_degree=max_degree,
+        skip=INFRA_ADDRESSES if skip_infra else (),
+        time_budget_ms=time_budget_ms,
+    )
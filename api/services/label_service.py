@@ -1,61 +1,364 @@
+import io
+import json
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
 from api.services.db import get_conn
-from labels.rules import label_address
+from api.services.feature_service import features_many
+from labels.known_entities import KnownEntities, registry
+from labels.rules import FEATURES, known_label, label_columns, label_sql
 
+BATCH_ROWS = 50_000
 
-def persist_labels(address: str, labels: list[dict]):
-    with get_conn() as conn:
-        cur = conn.cursor()
-        cur.execute("DELETE FROM labels WHERE address = %s", (address.lower(),))
-        for lb in labels:
-            cur.execute(
-                """
-                INSERT INTO labels(address, label, confidence, evidence)
-                VALUES(%s, %s, %s, %s::jsonb)
-                """,
-                (address.lower(), lb.get("label"), float(lb.get("confidence", 0)), json_dumps(lb.get("evidence", {}))),
-            )
+# Features of a set of addresses in one statement: outbound and inbound edge
+# aggregates are grouped once each (over the whole table, or over the index
+# ranges of the requested addresses) and joined to the address counters.
+_FEATURES_SQL = """
+    WITH a AS ({addresses}),
+    o AS (
+      SELECT src_address AS address, COUNT(*) AS n, COUNT(DISTINCT dst_address) AS ucp
+      FROM edges {src_filter} GROUP BY src_address
+    ),
+    i AS (
+      SELECT dst_address AS address, COUNT(*) AS n
+      FROM edges {dst_filter} GROUP BY dst_address
+    )
+    SELECT a.address, COALESCE(ad.tx_count, 0), COALESCE(ad.contracts_deployed, 0),
+           COALESCE(o.ucp, 0), COALESCE(i.n, 0), COALESCE(o.n, 0)
+    FROM a
+    LEFT JOIN addresses ad ON ad.address = a.address
+    LEFT JOIN o ON o.address = a.address
+    LEFT JOIN i ON i.address = a.address
+"""
 
 
-def json_dumps(obj: dict) -> str:
-    import json
+def _features_sql(subset: bool) -> str:
+    if subset:
+        return _FEATURES_SQL.format(
+            addresses="SELECT DISTINCT unnest(%(a)s::text[]) AS address",
+            src_filter="WHERE src_address = ANY(%(a)s)",
+            dst_filter="WHERE dst_address = ANY(%(a)s)",
+        )
+    return _FEATURES_SQL.format(addresses="SELECT address FROM addresses", src_filter="", dst_filter="")
+
 
+def json_dumps(obj: dict) -> str:
     return json.dumps(obj or {})
 
 
-def get_features(address: str) -> dict:
+def features_for(cur, addresses: Sequence[str]) -> Dict[str, Dict[str, int]]:
+    """Label features of `addresses` (lowercase): from the feature store when it is mapped, else in one set-based query.
+
+    Addresses the store cannot answer (new or updated since it was built) go through the query.
+    """
+    stored = features_many(cur, addresses, FEATURES)
+    if stored is None:
+        return _query_features(cur, addresses)
+    cols, missing = stored
+    values = np.column_stack([cols[k] for k in FEATURES]).tolist()
+    out = {a: dict(zip(FEATURES, v)) for a, v in zip(addresses, values)}
+    if missing:
+        out.update(_query_features(cur, [addresses[n] for n in missing]))
+    return out
+
+
+def _query_features(cur, addresses: Sequence[str]) -> Dict[str, Dict[str, int]]:
+    cur.execute(_features_sql(True), {"a": list(addresses)})
+    return {r[0]: dict(zip(FEATURES, (int(v) for v in r[1:]))) for r in cur.fetchall()}
+
+
+def labels_for(cur, addresses: Sequence[str]) -> Dict[str, dict]:
+    """`get_labels` bundles of `addresses` (lowercase) in three set-based queries."""
+    addrs = list(dict.fromkeys(addresses))
+    cur.execute(
+        f"""
+        SELECT a.address, {', '.join('s.' + k for k in FEATURES)}, s.labeled_at, d.marked_at
+        FROM unnest(%s::text[]) AS a(address)
+        LEFT JOIN address_label_state s ON s.address = a.address
+        LEFT JOIN label_dirty d ON d.address = a.address
+        """,
+        (addrs,),
+    )
+    out: Dict[str, dict] = {}
+    for address, *row in cur.fetchall():
+        labeled_at, marked_at = row[-2], row[-1]
+        out[address] = {
+            "address": address,
+            "features": dict(zip(FEATURES, (int(v) for v in row[:-2]))) if labeled_at else None,
+            "labels": [],
+            "labeled_at": labeled_at.isoformat() if labeled_at else None,
+            "stale": labeled_at is not None and marked_at is not None,
+        }
+    stored = [a for a in addrs if out[a]["labeled_at"]]
+    if stored:
+        cur.execute("SELECT address, label, confidence, evidence FROM labels WHERE address = ANY(%s) ORDER BY id", (stored,))
+        for a, lb, c, ev in cur.fetchall():
+            out[a]["labels"].append({"label": lb, "confidence": float(c), "evidence": ev or {}})
+    # Addresses the relabeler has not reached yet are labeled in memory from their current features.
+    fresh = [a for a in addrs if not out[a]["labeled_at"]]
+    if fresh:
+        features = features_for(cur, fresh)
+        cols = {k: np.array([features[a][k] for a in fresh], dtype=np.int64) for k in FEATURES}
+        for a in fresh:
+            out[a]["features"] = features[a]
+        for i, lb in label_columns(fresh, cols):
+            out[fresh[i]]["labels"].append(lb)
+    return out
+
+
+def get_labels(address: str):
+    """Stored labels and the features they were computed from; never writes.
+
+    `stale` says ingest changed the address since (it waits in the relabel
+    queue). An address the relabeler has not reached yet is labeled in
+    memory from its current features.
+    """
     addr = address.lower()
     with get_conn() as conn:
-        cur = conn.cursor()
+        return labels_for(conn.cursor(), [addr])[addr]
+
+
+def mark_dirty(cur, addresses: Iterable[str]) -> None:
+    """Queue `addresses` for relabeling (in the caller's transaction).
+
+    An address already queued keeps its oldest mark, but the no-op update
+    still locks its row: a relabeler batch that claimed it waits for this
+    transaction instead of relabeling from data that is about to change.
+    """
+    addrs = sorted({a.lower() for a in addresses if a})
+    if addrs:
         cur.execute(
-            "SELECT tx_count, contracts_deployed FROM addresses WHERE address = %s",
-            (addr,),
+            """
+            INSERT INTO label_dirty(address) SELECT unnest(%s::text[])
+            ON CONFLICT (address) DO UPDATE SET marked_at = label_dirty.marked_at
+            """,
+            (addrs,),
         )
-        row = cur.fetchone() or (0, 0)
 
-        cur.execute(
-            "SELECT COUNT(DISTINCT dst_address) FROM edges WHERE src_address = %s",
-            (addr,),
+
+def queue_known_changes(previous: KnownEntities, current: KnownEntities) -> int:
+    """Queue the addresses whose known-entity labels differ after a registry reload."""
+    changed = current.changed(previous)
+    with get_conn() as conn:
+        cur = conn.cursor()
+        for lo in range(0, len(changed), BATCH_ROWS):
+            mark_dirty(cur, changed[lo:lo + BATCH_ROWS])
+    return len(changed)
+
+
+def _columns(rows: List[tuple]) -> tuple:
+    addresses = [r[0] for r in rows]
+    values = np.array([r[1:] for r in rows], dtype=np.int64).reshape(len(rows), len(FEATURES))
+    return addresses, {k: values[:, j] for j, k in enumerate(FEATURES)}
+
+
+def store_labels(cur, addresses: Sequence[str], labeled: Iterable[tuple]) -> Dict[str, int]:
+    """Make `labels` for `addresses` exactly `labeled` ((address, label dict) pairs) in bulk.
+
+    Rows that are already stored unchanged are left alone, so relabeling a
+    stable address writes nothing.
+    """
+    cur.execute("CREATE TEMP TABLE label_batch (address TEXT) ON COMMIT DROP")
+    cur.execute("CREATE TEMP TABLE label_stage (address TEXT, label TEXT, confidence NUMERIC, evidence JSONB) ON COMMIT DROP")
+    cur.copy_expert("COPY label_batch FROM STDIN", io.StringIO("".join(f"{a}\n" for a in addresses)))
+    buf = io.StringIO()
+    for a, lb in labeled:
+        evidence = json_dumps(lb.get("evidence", {})).replace("\\", "\\\\")
+        buf.write(f"{a}\t{lb['label']}\t{float(lb.get('confidence', 0))!r}\t{evidence}\n")
+    buf.seek(0)
+    cur.copy_expert("COPY label_stage FROM STDIN", buf)
+    return _merge_stage(cur)
+
+
+def _merge_stage(cur) -> Dict[str, int]:
+    """Make `labels` of the addresses in label_batch exactly the rows in label_stage."""
+    cur.execute("ANALYZE label_batch")
+    cur.execute("ANALYZE label_stage")
+    cur.execute(
+        """
+        DELETE FROM labels l USING label_batch b
+        WHERE l.address = b.address
+          AND NOT EXISTS (
+            SELECT 1 FROM label_stage s
+            WHERE s.address = l.address AND s.label = l.label AND s.confidence = l.confidence AND s.evidence = l.evidence
+          )
+        """
+    )
+    deleted = cur.rowcount
+    cur.execute(
+        """
+        INSERT INTO labels(address, label, confidence, evidence)
+        SELECT s.address, s.label, s.confidence, s.evidence FROM label_stage s
+        WHERE NOT EXISTS (
+          SELECT 1 FROM labels l
+          WHERE l.address = s.address AND l.label = s.label AND l.confidence = s.confidence AND l.evidence = s.evidence
         )
-        unique_counterparties = cur.fetchone()[0] or 0
+        """
+    )
+    return {"deleted": deleted, "inserted": cur.rowcount}
 
-        cur.execute("SELECT COUNT(*) FROM edges WHERE dst_address = %s", (addr,))
-        inbound_edges = cur.fetchone()[0] or 0
 
-        cur.execute("SELECT COUNT(*) FROM edges WHERE src_address = %s", (addr,))
-        outbound_edges = cur.fetchone()[0] or 0
+def _store_state(cur, addresses: Sequence[str], cols: Dict[str, np.ndarray]) -> None:
+    cur.execute("CREATE TEMP TABLE label_state_stage (LIKE address_label_state INCLUDING DEFAULTS) ON COMMIT DROP")
+    buf = io.StringIO()
+    buf.writelines("\t".join(map(str, r)) + "\n" for r in zip(addresses, *(cols[k].tolist() for k in FEATURES)))
+    buf.seek(0)
+    cur.copy_expert(f"COPY label_state_stage(address, {', '.join(FEATURES)}) FROM STDIN", buf)
+    _upsert_state(cur, "label_state_stage")
 
-    return {
-        "tx_count": row[0] or 0,
-        "contracts_deployed": row[1] or 0,
-        "unique_counterparties": unique_counterparties,
-        "inbound_edges": inbound_edges,
-        "outbound_edges": outbound_edges,
-    }
 
+def _upsert_state(cur, table: str) -> None:
+    cur.execute(
+        f"""
+        INSERT INTO address_label_state(address, {', '.join(FEATURES)}, labeled_at)
+        SELECT address, {', '.join(FEATURES)}, now() FROM {table}
+        ON CONFLICT (address) DO UPDATE SET
+          {', '.join(f'{k} = EXCLUDED.{k}' for k in FEATURES)},
+          labeled_at = EXCLUDED.labeled_at
+        """
+    )
 
-def get_labels(address: str):
-    addr = address.lower()
-    features = get_features(addr)
-    labels = label_address(addr, features)
-    persist_labels(addr, labels)
-    return {"address": addr, "features": features, "labels": labels}
+
+def _label_rows(cur, rows: List[tuple], totals: Dict[str, int]) -> None:
+    addresses, cols = _columns(rows)
+    labeled = [(addresses[i], lb) for i, lb in label_columns(addresses, cols)]
+    written = store_labels(cur, addresses, labeled)
+    _store_state(cur, addresses, cols)
+    totals["addresses"] += len(addresses)
+    totals["labels"] += len(labeled)
+    totals["inserted"] += written["inserted"]
+    totals["deleted"] += written["deleted"]
+
+
+def stage_known(cur, addresses: Optional[Sequence[str]] = None) -> None:
+    """Temp table label_known: registry labels of `addresses` (all entries when None)."""
+    known = registry()
+    if addresses is None:
+        entries = known.entries()
+    else:
+        entries = ((addresses[i], known.entry(e)) for i, e in zip(*(a.tolist() for a in known.lookup_many(addresses))))
+    cur.execute("CREATE TEMP TABLE label_known (address TEXT, label TEXT, evidence JSONB) ON COMMIT DROP")
+    buf = io.StringIO()
+    for a, entry in entries:
+        lb = known_label(entry)
+        evidence = json_dumps(lb["evidence"]).replace("\\", "\\\\")
+        buf.write(f"{a}\t{lb['label']}\t{evidence}\n")
+    buf.seek(0)
+    cur.copy_expert("COPY label_known FROM STDIN", buf)
+    cur.execute("ANALYZE label_known")
+
+
+def _relabel_in_database(cur, addresses: Optional[List[str]], totals: Dict[str, int]) -> None:
+    """Features, labels (the rules compiled to SQL) and the merge, without leaving Postgres."""
+    params = {"a": addresses} if addresses is not None else {}
+    cur.execute(
+        f"""
+        CREATE TEMP TABLE label_features ON COMMIT DROP AS
+        SELECT address, {', '.join(f'{k}::bigint AS {k}' for k in FEATURES)}
+        FROM ({_features_sql(addresses is not None)}) f(address, {', '.join(FEATURES)})
+        """,
+        params,
+    )
+    cur.execute("ANALYZE label_features")
+    cur.execute("CREATE TEMP TABLE label_batch ON COMMIT DROP AS SELECT address FROM label_features")
+    stage_known(cur, addresses)
+    cur.execute(f"CREATE TEMP TABLE label_stage ON COMMIT DROP AS {label_sql('label_features', 'label_known')}")
+    written = _merge_stage(cur)
+    _upsert_state(cur, "label_features")
+    cur.execute("SELECT (SELECT COUNT(*) FROM label_batch), (SELECT COUNT(*) FROM label_stage)")
+    n, labels = cur.fetchone()
+    totals["addresses"] += n
+    totals["labels"] += labels
+    totals["inserted"] += written["inserted"]
+    totals["deleted"] += written["deleted"]
+
+
+def relabel(
+    addresses: Optional[Iterable[str]] = None,
+    since: Optional[datetime] = None,
+    batch_size: int = BATCH_ROWS,
+    in_database: bool = False,
+) -> Dict[str, Any]:
+    """Recompute and store labels for `addresses`, those updated since `since`, or (neither) all.
+
+    Each batch of `batch_size` addresses commits on its own. The full run
+    streams one aggregate query through a held cursor; subsets fetch their
+    features batch by batch through the (src_address, ...) and dst_address
+    indexes. With `in_database` the rules run as SQL and nothing but the
+    totals leaves Postgres: the full run is a single transaction.
+    """
+    t0 = time.perf_counter()
+    totals = {"addresses": 0, "labels": 0, "inserted": 0, "deleted": 0}
+    with get_conn() as conn:
+        cur = conn.cursor()
+        if in_database and addresses is None and since is None:
+            _relabel_in_database(cur, None, totals)
+        elif addresses is None and since is None:
+            named = conn.cursor(name="label_features", withhold=True)
+            named.itersize = batch_size
+            named.execute(_features_sql(False))
+            try:
+                while True:
+                    rows = named.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    _label_rows(cur, rows, totals)
+                    conn.commit()
+            finally:
+                named.close()
+        else:
+            if addresses is None:
+                cur.execute("SELECT address FROM addresses WHERE updated_at >= %s", (since,))
+                addresses = [r[0] for r in cur.fetchall()]
+            todo = sorted({a.lower() for a in addresses if a})
+            for lo in range(0, len(todo), batch_size):
+                if in_database:
+                    _relabel_in_database(cur, todo[lo:lo + batch_size], totals)
+                else:
+                    cur.execute(_features_sql(True), {"a": todo[lo:lo + batch_size]})
+                    _label_rows(cur, cur.fetchall(), totals)
+                conn.commit()
+    totals["seconds"] = round(time.perf_counter() - t0, 3)
+    totals["addresses_per_sec"] = round(totals["addresses"] / totals["seconds"]) if totals["seconds"] else None
+    return totals
+
+
+def drain_dirty(batch_size: int = BATCH_ROWS) -> Dict[str, Any]:
+    """Relabel up to `batch_size` queued addresses, oldest first, in one transaction.
+
+    Claimed rows are deleted in the same transaction that stores the new
+    labels, so a failed batch stays queued; rows locked by an ingesting
+    transaction are skipped until it commits.
+    """
+    t0 = time.perf_counter()
+    totals = {"addresses": 0, "labels": 0, "inserted": 0, "deleted": 0}
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            DELETE FROM label_dirty WHERE address IN (
+              SELECT address FROM label_dirty ORDER BY marked_at LIMIT %s FOR UPDATE SKIP LOCKED
+            )
+            RETURNING address, marked_at
+            """,
+            (batch_size,),
+        )
+        claimed = cur.fetchall()
+        if claimed:
+            cur.execute(_features_sql(True), {"a": [a for a, _ in claimed]})
+            _label_rows(cur, cur.fetchall(), totals)
+    totals["oldest_marked_at"] = min(m for _, m in claimed).isoformat() if claimed else None
+    totals["seconds"] = round(time.perf_counter() - t0, 3)
+    return totals
+
+
+def queue_status() -> Dict[str, Any]:
+    """Relabel backlog and the age of its oldest entry (how stale the stalest label is)."""
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*), EXTRACT(EPOCH FROM now() - MIN(marked_at)) FROM label_dirty")
+        n, age = cur.fetchone()
+    return {"label_dirty": int(n), "label_stale_age_seconds": round(float(age), 1) if age is not None else 0.0}
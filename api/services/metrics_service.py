@@ -3,6 +3,8 @@ import os
 import httpx
 
 from api.services.db import get_conn
+from api.services.feature_service import feature_status
+from api.services.label_service import queue_status
 
 
 def _rpc_head_block() -> int | None:
@@ -65,4 +67,6 @@ def get_metrics():
         "tx_24h": tx_24h,
         "transfers_24h": transfers_24h,
         "alerts_24h": alerts_24h,
+        **queue_status(),
+        "feature_store": feature_status(),
     }
@@ -1,101 +1,366 @@
+import io
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
 from api.services.db import get_conn
-from api.services.label_service import get_labels
+from api.services.entity_service import batch_chunk, normalize_addresses
+from api.services.feature_service import feature_store
+from features.store import FeatureStore
+from risk.scoring import BAND_HIGH, BAND_MEDIUM, CENTRALITY_PCT_FLOOR, FACTORS, LABEL_WEIGHTS, band, risk_factors
 
+# Scores are computed for every address with a non-zero input by
+# `python -m risk.risk_job` (see risk/scoring.py) and stored in
+# `address_risk`; reads are point lookups. An address without a row scored 0
+# in the latest run.
+
+CHUNK_ROWS = 200_000
+
+_STATS = (
+    "new_alerts_7d", "high_alerts_7d", "avg_alert_conf_7d",
+    "outbound_txs_24h", "inbound_txs_24h", "outbound_wei_7d", "inbound_wei_7d",
+)
+
+_FLOWS_SQL = """
+      SELECT address, SUM(out_c) AS out_c, SUM(in_c) AS in_c, SUM(out_wei) AS out_wei, SUM(in_wei) AS in_wei
+      FROM (
+        SELECT from_address AS address, COUNT(*) FILTER (WHERE timestamp >= now() - interval '24 hours') AS out_c,
+               0::bigint AS in_c, COALESCE(SUM(value_wei), 0) AS out_wei, 0::numeric AS in_wei
+        FROM transactions
+        WHERE timestamp >= now() - interval '7 days' AND from_address IS NOT NULL
+        GROUP BY from_address
+        UNION ALL
+        SELECT to_address, 0, COUNT(*) FILTER (WHERE timestamp >= now() - interval '24 hours'),
+               0, COALESCE(SUM(value_wei), 0)
+        FROM transactions
+        WHERE timestamp >= now() - interval '7 days' AND to_address IS NOT NULL
+        GROUP BY to_address
+      ) t
+      GROUP BY address
+"""
+
+_ALERTS_SQL = """
+      SELECT address,
+             COUNT(*) FILTER (WHERE status = 'new') AS new_alerts,
+             COUNT(*) FILTER (WHERE severity = 'high') AS high_alerts,
+             AVG(confidence)::float8 AS avg_conf
+      FROM alerts
+      WHERE created_at >= now() - interval '7 days'
+      GROUP BY address
+"""
+
+# The same inputs read from the feature store (api/services/feature_service.py),
+# COPYed into risk_features by `_stage_features`.
+_STORE_FLOWS_SQL = """
+      SELECT address, out_c, in_c, out_wei_hi * 18446744073709551616 + out_wei_lo AS out_wei,
+             in_wei_hi * 18446744073709551616 + in_wei_lo AS in_wei
+      FROM risk_features WHERE has_flow
+"""
+_STORE_ALERTS_SQL = "SELECT address, new_alerts, high_alerts, avg_conf FROM risk_features WHERE has_alerts"
+
+_INPUT_SQL = """
+    CREATE TEMP TABLE risk_input ON COMMIT DROP AS
+    WITH flows AS (
+{flows}
+    ), recent_alerts AS (
+{alerts}
+    ), weighted AS (
+      SELECT l.address, SUM(l.confidence::float8 * w.weight) AS label_weight
+      FROM labels l JOIN unnest(%(labels)s::text[], %(weights)s::float8[]) AS w(label, weight) ON w.label = l.label
+      GROUP BY l.address
+    ), scored AS (
+      SELECT address FROM flows
+      UNION SELECT address FROM recent_alerts
+      UNION SELECT address FROM weighted
+      UNION SELECT address FROM address_centrality WHERE pagerank_pct > %(pct_floor)s
+    )
+    SELECT s.address,
+           COALESCE(w.label_weight, 0) AS label_weight,
+           COALESCE(a.new_alerts, 0) AS new_alerts_7d,
+           COALESCE(a.high_alerts, 0) AS high_alerts_7d,
+           COALESCE(a.avg_conf, 0) AS avg_alert_conf_7d,
+           COALESCE(f.out_c, 0) AS outbound_txs_24h,
+           COALESCE(f.in_c, 0) AS inbound_txs_24h,
+           COALESCE(f.out_wei, 0) AS outbound_wei_7d,
+           COALESCE(f.in_wei, 0) AS inbound_wei_7d,
+           c.pagerank_pct::float8 AS pagerank_pct
+    FROM scored s
+    LEFT JOIN flows f ON f.address = s.address
+    LEFT JOIN recent_alerts a ON a.address = s.address
+    LEFT JOIN weighted w ON w.address = s.address
+    LEFT JOIN address_centrality c ON c.address = s.address
+"""
+
+_COLUMNS_SQL = """
+    SELECT address, label_weight, new_alerts_7d, high_alerts_7d, avg_alert_conf_7d,
+           COALESCE(pagerank_pct, 'NaN'), outbound_txs_24h + inbound_txs_24h, (outbound_wei_7d + inbound_wei_7d)::float8
+    FROM risk_input
+"""
+
+_INPUTS = ("label_weight", "new_alerts", "high_alerts", "avg_alert_conf", "pagerank_pct", "txs_24h", "wei_7d")
+
+
+def _history_top() -> int:
+    return int(os.getenv("RISK_HISTORY_TOP", "1000"))
+
+
+def _history_runs() -> int:
+    return int(os.getenv("RISK_HISTORY_RUNS", "2016"))
 
-def entity_risk(address: str):
-    addr = address.lower()
-    labels_bundle = get_labels(addr)
 
+def _load_inputs(conn) -> tuple:
+    """(addresses, input columns) of every address in risk_input."""
+    named = conn.cursor(name="risk_inputs")
+    named.itersize = CHUNK_ROWS
+    named.execute(_COLUMNS_SQL)
+    addresses, parts = [], []
+    while True:
+        rows = named.fetchmany(CHUNK_ROWS)
+        if not rows:
+            break
+        addresses.extend(r[0] for r in rows)
+        parts.append(np.array([r[1:] for r in rows], dtype=np.float64))
+    named.close()
+    values = np.concatenate(parts) if parts else np.zeros((0, len(_INPUTS)))
+    return addresses, {k: values[:, j] for j, k in enumerate(_INPUTS)}
+
+
+def _stage_features(cur, store: FeatureStore) -> None:
+    """Temp table risk_features: the flow and alert inputs of every store address that has any."""
+    c = store.columns
+    has_flow = (c["out_txs_7d"] + c["in_txs_7d"]) > 0
+    has_alerts = c["alerts_7d"] > 0
+    ids = np.flatnonzero(has_flow | has_alerts)
+    avg_conf = c["alert_conf_sum_7d"][ids] / np.maximum(c["alerts_7d"][ids], 1)
+    cols = [store.index.decode(ids)] + [a.astype(str).tolist() for a in (
+        c["out_txs_1d"][ids], c["in_txs_1d"][ids],
+        c["out_wei_7d_hi"][ids], c["out_wei_7d_lo"][ids], c["in_wei_7d_hi"][ids], c["in_wei_7d_lo"][ids],
+        c["new_alerts_7d"][ids], c["high_alerts_7d"][ids],
+    )] + [np.char.mod("%.17g", avg_conf).tolist()] + [np.where(m[ids], "t", "f").tolist() for m in (has_flow, has_alerts)]
+    cur.execute(
+        """
+        CREATE TEMP TABLE risk_features (
+          address TEXT, out_c BIGINT, in_c BIGINT, out_wei_hi NUMERIC, out_wei_lo NUMERIC, in_wei_hi NUMERIC, in_wei_lo NUMERIC,
+          new_alerts BIGINT, high_alerts BIGINT, avg_conf FLOAT8, has_flow BOOLEAN, has_alerts BOOLEAN
+        ) ON COMMIT DROP
+        """
+    )
+    buf = io.StringIO()
+    buf.writelines("\t".join(r) + "\n" for r in zip(*cols))
+    buf.seek(0)
+    cur.copy_expert("COPY risk_features FROM STDIN", buf)
+    cur.execute("ANALYZE risk_features")
+
+
+def _copy_scores(addresses: List[str], scores: Dict[str, np.ndarray]) -> io.StringIO:
+    cols = [np.char.mod("%.4f", scores[k]).tolist() for k in ("risk_score",) + FACTORS]
+    buf = io.StringIO()
+    buf.writelines("\t".join(r) + "\n" for r in zip(addresses, *cols))
+    buf.seek(0)
+    return buf
+
+
+def score_all() -> Dict[str, Any]:
+    """Score every address with a non-zero input and replace `address_risk`; returns the run.
+
+    Inputs come from one aggregate per source table (7 days of transactions,
+    7 days of alerts, weighted labels, top PageRank percentiles; flows and
+    alerts from the feature store instead when it is mapped), the
+    arithmetic runs over NumPy columns, and the scores are COPYed back and
+    upserted in the same transaction, so readers keep the previous run until
+    commit. The top RISK_HISTORY_TOP of each run are kept as history for
+    RISK_HISTORY_RUNS runs.
+    """
+    started = datetime.now(timezone.utc)
+    t0 = time.perf_counter()
     with get_conn() as conn:
         cur = conn.cursor()
-
+        store = feature_store()
+        if store is not None:
+            _stage_features(cur, store)
+            sql = _INPUT_SQL.format(flows=_STORE_FLOWS_SQL, alerts=_STORE_ALERTS_SQL)
+        else:
+            sql = _INPUT_SQL.format(flows=_FLOWS_SQL, alerts=_ALERTS_SQL)
         cur.execute(
-            """
-            SELECT
-              COUNT(*) FILTER (WHERE status='new') AS new_alerts,
-              COUNT(*) FILTER (WHERE severity='high') AS high_alerts,
-              COALESCE(AVG(confidence),0)
-            FROM alerts
-            WHERE address = %s
-              AND created_at >= now() - interval '7 days'
-            """,
-            (addr,),
+            sql,
+            {"labels": list(LABEL_WEIGHTS), "weights": list(LABEL_WEIGHTS.values()), "pct_floor": CENTRALITY_PCT_FLOOR},
+        )
+        cur.execute("ALTER TABLE risk_input ADD PRIMARY KEY (address)")
+        addresses, cols = _load_inputs(conn)
+        scores = risk_factors(cols)
+        run = {
+            "started_at": started.isoformat(),
+            "addresses": len(addresses),
+            "high": int((scores["risk_score"] >= BAND_HIGH).sum()),
+            "medium": int(((scores["risk_score"] >= BAND_MEDIUM) & (scores["risk_score"] < BAND_HIGH)).sum()),
+        }
+        cur.execute(
+            "INSERT INTO risk_runs(started_at, addresses, high, medium, seconds) VALUES (%s, %s, %s, %s, 0) RETURNING id",
+            (started, run["addresses"], run["high"], run["medium"]),
         )
-        new_alerts, high_alerts, avg_conf = cur.fetchone()
+        run["id"] = run_id = int(cur.fetchone()[0])
 
+        cur.execute(f"CREATE TEMP TABLE risk_stage (address TEXT PRIMARY KEY, risk_score REAL, {', '.join(f'{k} REAL' for k in FACTORS)}) ON COMMIT DROP")
+        cur.copy_expert(f"COPY risk_stage(address, risk_score, {', '.join(FACTORS)}) FROM STDIN", _copy_scores(addresses, scores))
         cur.execute(
-            """
-            WITH recent AS (
-              SELECT from_address AS a, COUNT(*) AS out_c, 0::bigint AS in_c
-              FROM transactions
-              WHERE timestamp >= now() - interval '24 hours' AND from_address IS NOT NULL
-              GROUP BY from_address
-              UNION ALL
-              SELECT to_address AS a, 0::bigint AS out_c, COUNT(*) AS in_c
-              FROM transactions
-              WHERE timestamp >= now() - interval '24 hours' AND to_address IS NOT NULL
-              GROUP BY to_address
-            ), agg AS (
-              SELECT a, SUM(out_c) AS out_c, SUM(in_c) AS in_c
-              FROM recent GROUP BY a
-            )
-            SELECT COALESCE(out_c,0), COALESCE(in_c,0)
-            FROM agg
-            WHERE a = %s
+            f"""
+            INSERT INTO address_risk(address, run_id, risk_score, {', '.join(FACTORS)}, {', '.join(_STATS)}, centrality_source, updated_at)
+            SELECT s.address, %s, s.risk_score, {', '.join('s.' + k for k in FACTORS)}, {', '.join('i.' + k for k in _STATS)},
+                   CASE WHEN i.pagerank_pct IS NULL THEN 'degree_24h' ELSE 'pagerank' END, now()
+            FROM risk_stage s JOIN risk_input i ON i.address = s.address
+            ON CONFLICT (address) DO UPDATE SET
+              run_id = EXCLUDED.run_id,
+              risk_score = EXCLUDED.risk_score,
+              {', '.join(f'{k} = EXCLUDED.{k}' for k in FACTORS + _STATS)},
+              centrality_source = EXCLUDED.centrality_source,
+              updated_at = EXCLUDED.updated_at
             """,
-            (addr,),
+            (run_id,),
         )
-        row = cur.fetchone() or (0, 0)
-        out_24h, in_24h = int(row[0] or 0), int(row[1] or 0)
-
+        cur.execute("DELETE FROM address_risk WHERE run_id <> %s", (run_id,))
         cur.execute(
-            """
-            SELECT
-              COALESCE(SUM(CASE WHEN from_address = %s THEN value_wei ELSE 0 END),0),
-              COALESCE(SUM(CASE WHEN to_address = %s THEN value_wei ELSE 0 END),0)
-            FROM transactions
-            WHERE timestamp >= now() - interval '7 days'
-              AND (from_address = %s OR to_address = %s)
+            f"""
+            INSERT INTO address_risk_history(run_id, address, risk_score, {', '.join(FACTORS)})
+            SELECT %s, address, risk_score, {', '.join(FACTORS)}
+            FROM risk_stage ORDER BY risk_score DESC, address LIMIT %s
             """,
-            (addr, addr, addr, addr),
+            (run_id, _history_top()),
         )
-        out_wei_7d, in_wei_7d = cur.fetchone()
-
-    label_risk = 0.0
-    for lb in labels_bundle.get("labels", []):
-        l = lb.get("label")
-        c = float(lb.get("confidence", 0))
-        if l in {"bridge", "exchange-facing", "high-activity", "router"}:
-            label_risk += c * 20
-        elif l in {"deployer", "treasury"}:
-            label_risk += c * 10
+        cur.execute("DELETE FROM risk_runs WHERE id <= %s - %s", (run_id, _history_runs()))
+        run["seconds"] = round(time.perf_counter() - t0, 3)
+        cur.execute("UPDATE risk_runs SET seconds = %s, finished_at = now() WHERE id = %s", (run["seconds"], run_id))
+    return run
 
-    alert_risk = min(45.0, (int(new_alerts or 0) * 4.0) + (int(high_alerts or 0) * 8.0) + float(avg_conf or 0) * 10)
-    centrality_risk = min(25.0, ((out_24h + in_24h) / 50.0))
 
-    flow_mag = float(out_wei_7d or 0) + float(in_wei_7d or 0)
-    flow_risk = min(20.0, flow_mag / 1e21)
+def _select(address: str) -> str:
+    return f"""
+        SELECT {address}, r.risk_score, {', '.join('r.' + k for k in FACTORS + _STATS)}, r.centrality_source,
+               c.pagerank, c.pagerank_rank, r.updated_at
+    """
 
-    score = max(0.0, min(100.0, label_risk + alert_risk + centrality_risk + flow_risk))
 
+def _format(row) -> Dict[str, Any]:
+    address, score, *rest = row
+    factors, stats = rest[:len(FACTORS)], rest[len(FACTORS):len(FACTORS) + len(_STATS)]
+    source, pagerank, pagerank_rank, scored_at = rest[len(FACTORS) + len(_STATS):]
+    score = float(score or 0)
+    new_a, high_a, avg_c, out_c, in_c, out_w, in_w = stats
     return {
-        "address": addr,
+        "address": address,
         "risk_score": round(score, 2),
-        "band": "high" if score >= 70 else "medium" if score >= 40 else "low",
-        "factors": {
-            "label_risk": round(label_risk, 2),
-            "alert_risk": round(alert_risk, 2),
-            "centrality_risk": round(centrality_risk, 2),
-            "flow_risk": round(flow_risk, 2),
-        },
+        "band": band(score),
+        "factors": {k: round(float(v or 0), 2) for k, v in zip(FACTORS, factors)},
         "stats": {
-            "new_alerts_7d": int(new_alerts or 0),
-            "high_alerts_7d": int(high_alerts or 0),
-            "avg_alert_conf_7d": float(avg_conf or 0),
-            "outbound_txs_24h": out_24h,
-            "inbound_txs_24h": in_24h,
-            "outbound_wei_7d": str(out_wei_7d or 0),
-            "inbound_wei_7d": str(in_wei_7d or 0),
+            "new_alerts_7d": int(new_a or 0),
+            "high_alerts_7d": int(high_a or 0),
+            "avg_alert_conf_7d": float(avg_c or 0),
+            "outbound_txs_24h": int(out_c or 0),
+            "inbound_txs_24h": int(in_c or 0),
+            "outbound_wei_7d": str(out_w or 0),
+            "inbound_wei_7d": str(in_w or 0),
+            "pagerank": float(pagerank) if pagerank is not None else None,
+            "pagerank_rank": int(pagerank_rank) if pagerank_rank is not None else None,
+            "centrality_source": source or ("pagerank" if pagerank is not None else "degree_24h"),
         },
-        "labels": labels_bundle.get("labels", []),
+        "scored_at": scored_at.isoformat() if scored_at else None,
     }
+
+
+def entity_risks(cur, addresses: Sequence[str]) -> List[Dict[str, Any]]:
+    """Stored scores of `addresses` (lowercase), in order, with their labels; one query."""
+    cur.execute(
+        f"""
+        {_select("q.address")},
+               run.id, run.finished_at,
+               (SELECT COALESCE(json_agg(json_build_object('label', label, 'confidence', confidence::float8, 'evidence', COALESCE(evidence, '{{}}'::jsonb)) ORDER BY id), '[]'::json)
+                FROM labels WHERE address = q.address)
+        FROM unnest(%s::text[]) WITH ORDINALITY AS q(address, n)
+        LEFT JOIN address_risk r ON r.address = q.address
+        LEFT JOIN address_centrality c ON c.address = q.address
+        LEFT JOIN LATERAL (SELECT id, finished_at FROM risk_runs ORDER BY id DESC LIMIT 1) run ON true
+        ORDER BY q.n
+        """,
+        (list(addresses),),
+    )
+    out = []
+    for row in cur.fetchall():
+        risk = _format(row[:-3])
+        run_id, finished_at, labels = row[-3:]
+        risk["run_id"] = int(run_id) if run_id is not None else None
+        risk["scored_at"] = risk["scored_at"] or (finished_at.isoformat() if finished_at else None)
+        risk["labels"] = labels
+        out.append(risk)
+    return out
+
+
+def entity_risk(address: str):
+    """Stored score of `address` from the latest run (zeros when it had no non-zero input) and its labels."""
+    with get_conn() as conn:
+        return entity_risks(conn.cursor(), [address.lower()])[0]
+
+
+def stream_entity_risks(addresses: Sequence[str]) -> Iterator[Dict[str, Any]]:
+    """`entity_risk` of `addresses` chunk by chunk (BATCH_CHUNK_ADDRESSES), on one connection."""
+    addrs = normalize_addresses(addresses)
+    size = batch_chunk()
+    with get_conn() as conn:
+        cur = conn.cursor()
+        for lo in range(0, len(addrs), size):
+            yield from entity_risks(cur, addrs[lo:lo + size])
+            conn.commit()
+
+
+def latest_risk_run() -> Optional[Dict[str, Any]]:
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT id, started_at, finished_at, addresses, high, medium, seconds FROM risk_runs ORDER BY id DESC LIMIT 1")
+        row = cur.fetchone()
+    if not row:
+        return None
+    out = dict(zip(("id", "started_at", "finished_at", "addresses", "high", "medium", "seconds"), row))
+    out["started_at"] = out["started_at"].isoformat()
+    out["finished_at"] = out["finished_at"].isoformat() if out["finished_at"] else None
+    return out
+
+
+def top_risk(limit: int = 50, min_band: str = "low", offset: int = 0) -> Dict[str, Any]:
+    """Riskiest addresses of the latest run, highest first (idx_address_risk_score)."""
+    floor = {"high": BAND_HIGH, "medium": BAND_MEDIUM}.get(min_band, 0.0)
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            f"""
+            {_select("r.address")}
+            FROM address_risk r
+            LEFT JOIN address_centrality c ON c.address = r.address
+            WHERE r.risk_score >= %s
+            ORDER BY r.risk_score DESC, r.address
+            LIMIT %s OFFSET %s
+            """,
+            (floor, limit, offset),
+        )
+        rows = cur.fetchall()
+    return {"run": latest_risk_run(), "addresses": [_format(r) for r in rows]}
+
+
+def risk_history(address: str, limit: int = 48) -> List[Dict[str, Any]]:
+    """Scores of `address` in the runs where it made the top RISK_HISTORY_TOP, newest first."""
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            f"""
+            SELECT r.id, r.finished_at, h.risk_score, {', '.join('h.' + k for k in FACTORS)}
+            FROM address_risk_history h JOIN risk_runs r ON r.id = h.run_id
+            WHERE h.address = %s
+            ORDER BY r.id DESC LIMIT %s
+            """,
+            (address.lower(), limit),
+        )
+        rows = cur.fetchall()
+    return [
+        {"run_id": int(i), "at": at.isoformat() if at else None, "risk_score": round(float(s), 2), "factors": {k: round(float(v), 2) for k, v in zip(FACTORS, f)}}
+        for i, at, s, *f in rows
+    ]
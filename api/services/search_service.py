@@ -1,39 +1,149 @@
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from psycopg2 import errors
+
 from api.services.db import get_conn
+from labels.known_entities import KnownEntities, registry
+from labels.taxonomy import LABEL_TAXONOMY
+from search.trigram import TrigramIndex
+
+# `search_top` (migration 0016) holds the TOP_K most active addresses under
+# every '0x' + up-to-TOP_PREFIX_DIGITS hex prefix and under every label. A
+# longer prefix range-scans idx_addresses_address_prefix: with 5+ digits
+# even 50M addresses leave ~50 rows to rank. Free text matches label names
+# and known-entity names (an in-process trigram index per registry).
+TOP_K = 20
+TOP_PREFIX_DIGITS = 4
+TYPEAHEAD_LIMIT = 10
+NAME_CANDIDATES = 1000
+
+_HEX = re.compile(r"^0x[0-9a-f]{0,40}$")
+
+_RESULT_SQL = """
+    SELECT c.address, COALESCE(a.tx_count, 0), COALESCE(a.contracts_deployed, 0),
+           COALESCE(l.label, ''), COALESCE(l.confidence, 0), c.match, c.name
+    FROM ({candidates}) c
+    LEFT JOIN addresses a ON a.address = c.address
+    LEFT JOIN LATERAL (
+      SELECT label, confidence
+      FROM labels
+      WHERE address = c.address
+      ORDER BY confidence DESC
+      LIMIT 1
+    ) l ON true
+    ORDER BY {order}
+    LIMIT %(limit)s
+"""
+
+_names: Dict[str, Any] = {"registry": None}
+_names_lock = threading.Lock()
+
+
+def _name_index(known: KnownEntities) -> Tuple[TrigramIndex, np.ndarray, np.ndarray]:
+    """(index over distinct names, entries ordered by name id, start offset per name id) for `known`."""
+    if _names["registry"] is not known:
+        with _names_lock:
+            if _names["registry"] is not known:
+                offsets = known.name_offsets.tolist()
+                names = [known.names[a:b].decode().lower() for a, b in zip(offsets[:-1], offsets[1:])]
+                index = TrigramIndex(names)
+                name_ids = np.searchsorted(index.names, np.array(names, dtype=object))
+                has_name = np.array([bool(n) for n in names], dtype=bool)
+                entries = np.flatnonzero(has_name)
+                entries = entries[np.argsort(name_ids[entries], kind="stable")]
+                starts = np.searchsorted(name_ids[entries], np.arange(len(index) + 1))
+                _names.update(registry=known, index=index, entries=entries, starts=starts)
+    return _names["index"], _names["entries"], _names["starts"]
+
+
+def _name_matches(q: str, limit: int) -> Tuple[List[str], List[str]]:
+    """(addresses, names) of known entities whose name contains `q`, at most `limit`."""
+    known = registry()
+    if not len(known):
+        return [], []
+    index, entries, starts = _name_index(known)
+    addresses, names, seen = [], [], set()
+    for i in index.search(q).tolist():
+        for e in entries[starts[i]:starts[i + 1]].tolist():
+            a = known.address(e)
+            if a not in seen:
+                seen.add(a)
+                addresses.append(a)
+                names.append(known.entry(e).get("name"))
+            if len(addresses) >= limit:
+                return addresses, names
+    return addresses, names
+
 
+def _prefix_candidates(cur, q: str) -> Tuple[str, Dict[str, Any]]:
+    """Candidate rows for a hex prefix; a short prefix reads its precomputed list (at most TOP_K rows).
 
-def search_entities(query: str, limit: int = 20):
+    Until the indexer has run, a short prefix takes the first rows of its
+    range unranked (LIMIT without a sort) instead of ranking the whole range.
+    """
+    pattern = "SELECT address, tx_count AS rank, 'prefix' AS match, NULL::text AS name FROM addresses WHERE address LIKE %(pattern)s"
+    if len(q) - 2 > TOP_PREFIX_DIGITS:
+        return pattern, {"pattern": q + "%"}
+    cur.execute("SELECT refreshed_at IS NOT NULL FROM search_index_state")
+    row = cur.fetchone()
+    if row and row[0]:
+        return (
+            "SELECT address, tx_count AS rank, 'prefix' AS match, NULL::text AS name FROM search_top WHERE kind = 'prefix' AND key = %(q)s",
+            {"q": q},
+        )
+    return pattern + " LIMIT %(limit)s", {"pattern": q + "%"}
+
+
+def search_entities(query: str, limit: int = 20, typeahead: bool = False):
+    """Addresses matching `query`: a '0x' hex prefix, or text found in a label or known-entity name.
+
+    Ranked by tx_count without sorting whole ranges (see search_top), so a
+    prefix of up to TOP_PREFIX_DIGITS hex digits returns at most TOP_K rows. With
+    `typeahead` at most TYPEAHEAD_LIMIT rows come back and the query is cut
+    off after SEARCH_TYPEAHEAD_TIMEOUT_MS (returning no rows).
+    """
     q = (query or "").strip().lower()
     if not q:
         return []
+    if typeahead:
+        limit = min(limit, TYPEAHEAD_LIMIT)
+    limit = max(1, limit)
 
     with get_conn() as conn:
         cur = conn.cursor()
-        cur.execute(
+        if typeahead:
+            cur.execute("SET LOCAL statement_timeout = %s", (int(os.getenv("SEARCH_TYPEAHEAD_TIMEOUT_MS", "200")),))
+        if q.startswith("0x"):
+            if not _HEX.match(q):
+                return []
+            if len(q) - 2 <= TOP_PREFIX_DIGITS:
+                limit = min(limit, TOP_K)
+            candidates, params = _prefix_candidates(cur, q)
+            order = "c.rank DESC, c.address"
+        else:
+            labels = [lb for lb in LABEL_TAXONOMY if q in lb]
+            addresses, names = _name_matches(q, NAME_CANDIDATES)
+            candidates = """
+                SELECT DISTINCT ON (address) address, match, name FROM (
+                  SELECT address, 'name' AS match, name FROM unnest(%(addresses)s::text[], %(names)s::text[]) AS n(address, name)
+                  UNION ALL
+                  SELECT address, 'label', key FROM search_top WHERE kind = 'label' AND key = ANY(%(labels)s)
+                ) m ORDER BY address, match DESC
             """
-            SELECT DISTINCT a.address,
-                   a.tx_count,
-                   a.contracts_deployed,
-                   COALESCE(l.label, '') as top_label,
-                   COALESCE(l.confidence, 0) as top_confidence
-            FROM addresses a
-            LEFT JOIN LATERAL (
-              SELECT label, confidence
-              FROM labels
-              WHERE address = a.address
-              ORDER BY confidence DESC
-              LIMIT 1
-            ) l ON true
-            WHERE a.address LIKE %s
-               OR EXISTS (
-                 SELECT 1 FROM labels x
-                 WHERE x.address = a.address AND x.label LIKE %s
-               )
-            ORDER BY a.tx_count DESC
-            LIMIT %s
-            """,
-            (f"%{q}%", f"%{q}%", limit),
-        )
-        rows = cur.fetchall()
+            params = {"addresses": addresses, "names": names, "labels": labels}
+            order = "COALESCE(a.tx_count, 0) DESC, c.address"
+        params["limit"] = limit
+        try:
+            cur.execute(_RESULT_SQL.format(candidates=candidates, order=order), params)
+            rows = cur.fetchall()
+        except errors.QueryCanceled:
+            conn.rollback()
+            return []
 
     return [
         {
@@ -42,6 +152,134 @@ def search_entities(query: str, limit: int = 20):
             "contracts_deployed": int(cd or 0),
             "top_label": lbl,
             "top_confidence": float(conf or 0),
+            "match": match,
+            "name": name,
         }
-        for addr, tx, cd, lbl, conf in rows
+        for addr, tx, cd, lbl, conf, match, name in rows
     ]
+
+
+def _replace_lists(cur, source: str, key_expr: str, top_k: int) -> int:
+    """Make the prefix lists of the keys in search_keys the top_k rows per key of `source` (kept in search_new).
+
+    Returns the number of rows written.
+    """
+    cur.execute("DROP TABLE IF EXISTS search_new")
+    cur.execute(
+        f"""
+        CREATE TEMP TABLE search_new ON COMMIT DROP AS
+        SELECT key, address, tx_count FROM (
+          SELECT key, address, tx_count, row_number() OVER (PARTITION BY key ORDER BY tx_count DESC, address) AS rn
+          FROM (
+            SELECT {key_expr} AS key, address, MAX(tx_count) AS tx_count FROM {source} GROUP BY 1, 2
+          ) c
+        ) r WHERE rn <= %s
+        """,
+        (top_k,),
+    )
+    cur.execute("ANALYZE search_new")
+    # Rows already stored unchanged stay; most short-prefix lists do not move.
+    cur.execute(
+        """
+        DELETE FROM search_top s USING search_keys k
+        WHERE s.kind = 'prefix' AND s.key = k.key
+          AND NOT EXISTS (SELECT 1 FROM search_new n WHERE n.key = s.key AND n.address = s.address AND n.tx_count = s.tx_count)
+        """
+    )
+    cur.execute(
+        """
+        INSERT INTO search_top(kind, key, address, tx_count)
+        SELECT 'prefix', key, address, tx_count FROM search_new
+        ON CONFLICT (kind, key, address) DO NOTHING
+        """
+    )
+    return cur.rowcount
+
+
+def refresh_search_index(full: bool = False, top_k: int = TOP_K) -> Dict[str, Any]:
+    """Bring search_top up to date; one transaction, readers keep the old rows until commit.
+
+    Incremental runs only revisit the prefixes of addresses updated since
+    the last run (minus SEARCH_INDEX_OVERLAP_SECONDS for late commits).
+    Because tx_count never decreases, a list's new members are among its
+    current members and the updated addresses, and a shorter prefix's new
+    list among its current one and its changed children's new lists, so
+    each level re-ranks only those rows. Label lists are rebuilt from
+    `labels` every run.
+    """
+    t0 = time.perf_counter()
+    overlap = float(os.getenv("SEARCH_INDEX_OVERLAP_SECONDS", "300"))
+    width = 2 + TOP_PREFIX_DIGITS
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("INSERT INTO search_index_state(id) VALUES (TRUE) ON CONFLICT (id) DO NOTHING")
+        cur.execute("SELECT updated_through, now() FROM search_index_state FOR UPDATE")
+        since, upto = cur.fetchone()
+        full = full or since is None
+        valid = f"address ~ '^0x[0-9a-f]{{{TOP_PREFIX_DIGITS}}}'"
+        if full:
+            cur.execute("DELETE FROM search_top WHERE kind = 'prefix'")
+            cur.execute(f"CREATE TEMP TABLE search_cand ON COMMIT DROP AS SELECT address, tx_count FROM addresses WHERE {valid}")
+        else:
+            cur.execute(
+                f"""
+                CREATE TEMP TABLE search_cand ON COMMIT DROP AS
+                SELECT address, tx_count FROM addresses WHERE updated_at >= %s - make_interval(secs => %s) AND {valid}
+                """,
+                (since, overlap),
+            )
+        cur.execute(f"CREATE TEMP TABLE search_keys ON COMMIT DROP AS SELECT DISTINCT left(address, {width}) AS key FROM search_cand")
+        cur.execute("ANALYZE search_keys")
+        cur.execute("SELECT COUNT(*) FROM search_keys")
+        prefixes = int(cur.fetchone()[0])
+        cur.execute(
+            """
+            INSERT INTO search_cand
+            SELECT s.address, s.tx_count FROM search_top s JOIN search_keys k ON s.kind = 'prefix' AND s.key = k.key
+            """
+        )
+        rows = _replace_lists(cur, "search_cand", f"left(address, {width})", top_k)
+
+        for n in range(width - 1, 1, -1):
+            # search_new holds the changed lists one digit longer than n.
+            cur.execute("DROP TABLE search_keys")
+            cur.execute(f"CREATE TEMP TABLE search_keys ON COMMIT DROP AS SELECT DISTINCT left(key, {n}) AS key FROM search_new")
+            cur.execute("ANALYZE search_keys")
+            cur.execute(
+                """
+                CREATE TEMP TABLE search_level ON COMMIT DROP AS
+                SELECT key, address, tx_count FROM search_new
+                UNION ALL
+                SELECT s.key, s.address, s.tx_count FROM search_top s JOIN search_keys k ON s.kind = 'prefix' AND s.key = k.key
+                """
+            )
+            rows += _replace_lists(cur, "search_level", f"left(key, {n})", top_k)
+            cur.execute("DROP TABLE search_level")
+
+        cur.execute("DELETE FROM search_top WHERE kind = 'label'")
+        cur.execute(
+            """
+            INSERT INTO search_top(kind, key, address, tx_count)
+            SELECT 'label', label, address, tx_count FROM (
+              SELECT l.label, l.address, a.tx_count,
+                     row_number() OVER (PARTITION BY l.label ORDER BY a.tx_count DESC, l.address) AS rn
+              FROM (SELECT DISTINCT label, address FROM labels) l JOIN addresses a ON a.address = l.address
+            ) r WHERE rn <= %s
+            """,
+            (top_k,),
+        )
+        cur.execute(
+            "UPDATE search_index_state SET updated_through = %s, refreshed_at = now(), runs = runs + 1",
+            (upto,),
+        )
+    return {"full": full, "prefixes": prefixes, "rows_written": rows, "seconds": round(time.perf_counter() - t0, 3)}
+
+
+def search_index_status() -> Dict[str, Optional[Any]]:
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT updated_through, refreshed_at, runs FROM search_index_state")
+        row = cur.fetchone()
+    if not row:
+        return {"updated_through": None, "refreshed_at": None, "runs": 0}
+    return {"updated_through": row[0].isoformat() if row[0] else None, "refreshed_at": row[1].isoformat() if row[1] else None, "runs": row[2]}
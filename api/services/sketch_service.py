@@ -0,0 +1,41 @@
+from typing import Optional
+
+from api.services.db import get_conn
+from graph.sketches import DegreeSketches
+
+# Merged view of all replica snapshots, rebuilt only when a replica writes a new one.
+_cache: dict = {"key": None, "sketches": None}
+
+
+def load_sketches() -> Optional[DegreeSketches]:
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT replica, updated_at FROM degree_sketches ORDER BY replica")
+        key = tuple(cur.fetchall())
+        if not key:
+            return None
+        if key == _cache["key"]:
+            return _cache["sketches"]
+        cur.execute("SELECT payload FROM degree_sketches ORDER BY replica")
+        merged = None
+        for (payload,) in cur.fetchall():
+            s = DegreeSketches.from_bytes(payload)
+            if merged is None:
+                merged = s
+            else:
+                merged.merge(s)
+    _cache["key"], _cache["sketches"] = key, merged
+    return merged
+
+
+def top_degree(limit: int = 20, hours: int = 24):
+    sketches = load_sketches()
+    if sketches is None:
+        return {"source": "sketch", "hours": hours, "nodes": [], "error_bounds": None}
+    return {
+        "source": "sketch",
+        "hours": hours,
+        "last_block": sketches.last_block,
+        "nodes": sketches.top_degree(limit, hours=hours),
+        "error_bounds": sketches.error_bounds(hours=hours),
+    }
@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from api.services.db import get_conn
+from graph.csr import CSRGraph, split_wei
+from graph.snapshot_file import open_snapshot
+
+# Process-wide CSR snapshot of `edges` (see graph/csr.py). A daemon thread
+# builds it once, then folds in rows past the `edges.id` watermark every
+# GRAPH_REFRESH_SECONDS and swaps the reference. Until the first build
+# finishes `graph_snapshot()` returns None and services answer from SQL.
+# Ingest inserts a block's edges in one transaction from a single writer, so
+# ids commit in order and the watermark never skips a row.
+#
+# With GRAPH_SNAPSHOT_PATH set, workers instead map the file written by
+# `python -m graph.snapshot_builder` (graph/snapshot_file.py) and reopen it
+# when the builder renames a new one into place: startup needs no Postgres
+# scan and the arrays are shared by every worker through the page cache.
+# Freshness then follows the builder's interval.
+
+CHUNK_ROWS = 200_000
+
+_state: Dict[str, Any] = {"graph": None, "thread": None, "built_at": None, "refreshed_at": None, "last_refresh_seconds": None, "file": None}
+_lock = threading.Lock()
+
+
+def graph_engine_enabled() -> bool:
+    return os.getenv("GRAPH_ENGINE", "0") == "1"
+
+
+def _refresh_seconds() -> float:
+    return float(os.getenv("GRAPH_REFRESH_SECONDS", "30"))
+
+
+def snapshot_path() -> Optional[str]:
+    return os.getenv("GRAPH_SNAPSHOT_PATH") or None
+
+
+def load_edges(graph: CSRGraph, conn) -> CSRGraph:
+    """Return `graph` with every edge row committed past its watermark."""
+    cur = conn.cursor()
+    cur.execute("SELECT COALESCE(MAX(id), 0) FROM edges")
+    upto = int(cur.fetchone()[0])
+    if upto <= graph.watermark:
+        return graph
+    named = conn.cursor(name="graph_snapshot_edges")
+    named.itersize = CHUNK_ROWS
+    named.execute(
+        """
+        SELECT src_address, dst_address, SUM(tx_count), SUM(total_value_wei),
+               COALESCE(EXTRACT(EPOCH FROM MIN(window_start)), 0)::bigint,
+               COALESCE(EXTRACT(EPOCH FROM MAX(window_end)), 0)::bigint
+        FROM edges
+        WHERE id > %s AND id <= %s
+        GROUP BY src_address, dst_address
+        """,
+        (graph.watermark, upto),
+    )
+    index, parts = graph.index, []
+    while True:
+        rows = named.fetchmany(CHUNK_ROWS)
+        if not rows:
+            break
+        src_a, dst_a, cnt, val, first, last = zip(*rows)
+        index, ids = index.extend(list(src_a) + list(dst_a))
+        parts.append((ids[: len(rows)], ids[len(rows):], np.array(cnt, np.int64), *split_wei(val), np.array(first, np.uint32), np.array(last, np.uint32)))
+    named.close()
+    if not parts:
+        return graph.merge([], watermark=upto)
+    cols = [np.concatenate(c) for c in zip(*parts)]
+    return graph.merge_ids(index, *cols, watermark=upto)
+
+
+def _load_file(path: str) -> Optional[CSRGraph]:
+    """The mapped snapshot at `path` if it changed since the last load, else None."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = (st.st_ino, st.st_mtime_ns, st.st_size)
+    if _state["file"] and _state["file"]["key"] == key:
+        return None
+    graph, header = open_snapshot(path)
+    _state["file"] = {"path": path, "key": key, "created_at": header["created_at"]}
+    return graph
+
+
+def refresh_snapshot() -> Optional[CSRGraph]:
+    t0 = time.perf_counter()
+    path = snapshot_path()
+    if path:
+        graph = _load_file(path)
+        if graph is None:
+            return _state["graph"]
+    else:
+        with get_conn() as conn:
+            graph = load_edges(_state["graph"] or CSRGraph.empty(), conn)
+    with _lock:
+        if _state["graph"] is None:
+            _state["built_at"] = time.time()
+        _state["graph"] = graph
+        _state["refreshed_at"] = time.time()
+        _state["last_refresh_seconds"] = round(time.perf_counter() - t0, 3)
+    return graph
+
+
+def _refresh_loop() -> None:
+    while True:
+        try:
+            refresh_snapshot()
+        except Exception as e:
+            print(f"[graph] snapshot refresh failed: {e}")
+        time.sleep(_refresh_seconds())
+
+
+def graph_snapshot() -> Optional[CSRGraph]:
+    """Current snapshot, or None when the engine is disabled or still building."""
+    if not graph_engine_enabled():
+        return None
+    if _state["thread"] is None:
+        with _lock:
+            if _state["thread"] is None:
+                t = threading.Thread(target=_refresh_loop, name="graph-snapshot", daemon=True)
+                t.start()
+                _state["thread"] = t
+    return _state["graph"]
+
+
+def snapshot_status() -> Dict[str, Any]:
+    g = _state["graph"]
+    return {
+        "enabled": graph_engine_enabled(),
+        "ready": g is not None,
+        "nodes": g.n_nodes if g is not None else 0,
+        "edges": g.n_edges if g is not None else 0,
+        "watermark": g.watermark if g is not None else None,
+        "bytes": g.nbytes() if g is not None else 0,
+        "built_at": _state["built_at"],
+        "refreshed_at": _state["refreshed_at"],
+        "last_refresh_seconds": _state["last_refresh_seconds"],
+        "source": "file" if snapshot_path() else "postgres",
+        "file_created_at": _state["file"]["created_at"] if _state["file"] else None,
+    }
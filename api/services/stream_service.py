@@ -0,0 +1,177 @@
+import asyncio
+import json
+import os
+import select
+import threading
+import time
+from typing import Any, Dict, Optional, Set
+
+import psycopg2
+import psycopg2.extensions
+
+from api.services.db import get_conn, get_dsn
+
+# One LISTEN connection per API process feeds every /stream client. The
+# alerts trigger (migration 0009) NOTIFYs on insert and status change; the
+# listener applies each event to in-memory counters and fans it out, so DB
+# load does not grow with the number of connected clients. Counters are
+# re-read on a timer to age out the 24h window and correct any drift.
+
+COUNTER_KEYS = ("alerts_24h", "queue_new", "queue_ack", "queue_resolved", "high_open")
+
+
+def _resync_seconds() -> float:
+    return float(os.getenv("STREAM_RESYNC_SECONDS", "30"))
+
+
+def _fetch_counters() -> Dict[str, int]:
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT
+              COUNT(*) FILTER (WHERE created_at >= now() - interval '24 hours'),
+              COUNT(*) FILTER (WHERE status = 'new'),
+              COUNT(*) FILTER (WHERE status = 'ack'),
+              COUNT(*) FILTER (WHERE status = 'resolved'),
+              COUNT(*) FILTER (WHERE status IN ('new', 'ack') AND severity = 'high')
+            FROM alerts
+            """
+        )
+        row = cur.fetchone()
+    return {k: int(v or 0) for k, v in zip(COUNTER_KEYS, row)}
+
+
+def apply_event(counters: Dict[str, int], event: Dict[str, Any]) -> None:
+    """Update counters in place from one alert event."""
+    status, old = event.get("status"), event.get("old_status")
+    high = event.get("severity") == "high"
+    if event.get("op") == "insert":
+        counters["alerts_24h"] += 1
+    elif old in ("new", "ack", "resolved"):
+        counters[f"queue_{old}"] -= 1
+        if high and old in ("new", "ack"):
+            counters["high_open"] -= 1
+    if status in ("new", "ack", "resolved"):
+        counters[f"queue_{status}"] += 1
+        if high and status in ("new", "ack"):
+            counters["high_open"] += 1
+
+
+class Subscriber:
+    def __init__(self, maxsize: int):
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=maxsize)
+        self.dropped = False
+
+
+class StreamHub:
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self.subscribers: Set[Subscriber] = set()
+        self.counters: Dict[str, int] = {k: 0 for k in COUNTER_KEYS}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+        self.stats = {"notifications": 0, "resyncs": 0, "dropped_clients": 0}
+
+    def subscribe(self) -> Subscriber:
+        self.loop = asyncio.get_running_loop()
+        self._ensure_listener()
+        sub = Subscriber(self.queue_size)
+        self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        self.subscribers.discard(sub)
+
+    def snapshot(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.counters)
+
+    def _ensure_listener(self) -> None:
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._listen, name="alert-stream-listener", daemon=True)
+                self.thread.start()
+
+    def _publish(self, chunk: str) -> None:
+        # Runs on the event loop. A client that cannot keep up is dropped
+        # rather than buffered without bound; EventSource reconnects and
+        # starts again from a fresh counters snapshot.
+        for sub in list(self.subscribers):
+            try:
+                sub.queue.put_nowait(chunk)
+            except asyncio.QueueFull:
+                sub.dropped = True
+                self.subscribers.discard(sub)
+                self.stats["dropped_clients"] += 1
+
+    def _emit(self, messages) -> None:
+        # Each batch is serialised once and shared by every client as one write.
+        if self.loop is not None and messages:
+            chunk = "".join(format_sse(event, data, data.get("id") if event == "alert" else None) for event, data in messages)
+            self.loop.call_soon_threadsafe(self._publish, chunk)
+
+    def _resync(self) -> None:
+        counters = _fetch_counters()
+        with self.lock:
+            changed = counters != self.counters
+            self.counters = counters
+        self.stats["resyncs"] += 1
+        if changed:
+            self._emit([("counters", counters)])
+
+    def _listen(self) -> None:
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(get_dsn())
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                conn.cursor().execute("LISTEN alert_events")
+                self._resync()
+                next_resync = time.monotonic() + _resync_seconds()
+                while True:
+                    timeout = max(0.0, next_resync - time.monotonic())
+                    if select.select([conn], [], [], timeout) != ([], [], []):
+                        conn.poll()
+                        self._drain(conn)
+                    if time.monotonic() >= next_resync:
+                        self._resync()
+                        next_resync = time.monotonic() + _resync_seconds()
+            except Exception:
+                time.sleep(5)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def _drain(self, conn) -> None:
+        messages = []
+        with self.lock:
+            for n in conn.notifies:
+                try:
+                    event = json.loads(n.payload)
+                except ValueError:
+                    continue
+                apply_event(self.counters, event)
+                messages.append(("alert", event))
+            conn.notifies.clear()
+            counters = dict(self.counters)
+        if messages:
+            self.stats["notifications"] += len(messages)
+            messages.append(("counters", counters))
+            self._emit(messages)
+
+
+hub = StreamHub(queue_size=int(os.getenv("STREAM_CLIENT_QUEUE", "256")))
+
+
+def format_sse(event: str, data: Any, event_id: Optional[int] = None) -> str:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, separators=(',', ':'), default=str)}\n\n"
+
+
+def format_ndjson(data: Any) -> str:
+    """One newline-delimited JSON record (the batch endpoints' stream format)."""
+    return json.dumps(data, separators=(",", ":"), default=str) + "\n"
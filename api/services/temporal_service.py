@@ -0,0 +1,211 @@
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from api.services.db import get_conn
+
+# Time-bounded graph queries over `edge_buckets` (hourly rollup of `edges`,
+# migration 0012). A query touches only the buckets inside its window, so cost
+# follows the window size instead of total history. Windows are aligned to
+# whole hours: start is floored, end is rounded up.
+
+BUCKET = timedelta(hours=1)
+MAX_SPAN = timedelta(days=90)
+_WINDOW_RE = re.compile(r"^(\d+)([hd])$")
+
+
+def _rows(address: bool, s: str = "s", e: str = "e") -> str:
+    """Bucket rows in [%(s)s, %(e)s); for one address, one range scan per direction index."""
+    if not address:
+        return f"SELECT * FROM edge_buckets WHERE bucket_start >= %({s})s AND bucket_start < %({e})s"
+    return f"""
+      SELECT * FROM edge_buckets WHERE src_address = %(a)s AND bucket_start >= %({s})s AND bucket_start < %({e})s
+      UNION ALL
+      SELECT * FROM edge_buckets WHERE dst_address = %(a)s AND src_address <> %(a)s AND bucket_start >= %({s})s AND bucket_start < %({e})s
+    """
+
+
+def parse_window(window: str) -> timedelta:
+    """'1h', '24h', '7d' -> timedelta."""
+    m = _WINDOW_RE.match((window or "").strip().lower())
+    if not m:
+        raise ValueError(f"invalid window {window!r} (expected e.g. 1h, 24h, 7d)")
+    n, unit = int(m.group(1)), m.group(2)
+    span = timedelta(hours=n) if unit == "h" else timedelta(days=n)
+    if span <= timedelta(0) or span > MAX_SPAN:
+        raise ValueError(f"window must be between 1h and {MAX_SPAN.days}d")
+    return span
+
+
+def _floor(t: datetime) -> datetime:
+    t = t if t.tzinfo else t.replace(tzinfo=timezone.utc)
+    return t.replace(minute=0, second=0, microsecond=0)
+
+
+def _ceil(t: datetime) -> datetime:
+    f = _floor(t)
+    return f if f == (t if t.tzinfo else t.replace(tzinfo=timezone.utc)) else f + BUCKET
+
+
+def resolve_window(window: Optional[str] = None, start: Optional[datetime] = None, end: Optional[datetime] = None, now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    """[start, end) from a relative `window` ending at `end` (default now) or an explicit range."""
+    end = _ceil(end or now or datetime.now(timezone.utc))
+    if window:
+        start = end - parse_window(window)
+    if start is None:
+        raise ValueError("a window or a start time is required")
+    start = _floor(start)
+    if start >= end:
+        raise ValueError("start must be before end")
+    if end - start > MAX_SPAN:
+        raise ValueError(f"range longer than {MAX_SPAN.days}d")
+    return start, end
+
+
+def _window_json(start: datetime, end: datetime) -> Dict[str, Any]:
+    return {"start": start.isoformat(), "end": end.isoformat(), "buckets": int((end - start) / BUCKET)}
+
+
+def _edge(s, d, c, v, first, last) -> Dict[str, Any]:
+    return {
+        "src": s,
+        "dst": d,
+        "tx_count": int(c or 0),
+        "total_value_wei": str(v or 0),
+        "first_seen": first.isoformat() if first else None,
+        "last_seen": last.isoformat() if last else None,
+    }
+
+
+def _graph(edges: List[Dict[str, Any]], extra_nodes=()) -> Dict[str, Any]:
+    nodes = set(extra_nodes)
+    for e in edges:
+        nodes.add(e["src"])
+        nodes.add(e["dst"])
+    return {"nodes": [{"id": n} for n in sorted(nodes)], "edges": edges}
+
+
+def neighbors_in_window(address: str, start: datetime, end: datetime, limit: int = 25) -> Dict[str, Any]:
+    addr = address.lower()
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            f"""
+            SELECT src_address, dst_address, SUM(tx_count), SUM(total_value_wei), MIN(first_seen), MAX(last_seen)
+            FROM ({_rows(True)}) b
+            GROUP BY src_address, dst_address
+            ORDER BY SUM(tx_count) DESC
+            LIMIT %(limit)s
+            """,
+            {"a": addr, "s": start, "e": end, "limit": limit},
+        )
+        edges = [_edge(*r) for r in cur.fetchall()]
+    return {"window": _window_json(start, end), **_graph(edges, [addr])}
+
+
+def global_graph_in_window(start: datetime, end: datetime, limit: int = 80) -> Dict[str, Any]:
+    """Top `limit` addresses by transfers inside the window and the pairs among them."""
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            WITH w AS (
+              SELECT src_address, dst_address, SUM(tx_count) AS c, SUM(total_value_wei) AS v,
+                     MIN(first_seen) AS first_seen, MAX(last_seen) AS last_seen
+              FROM edge_buckets
+              WHERE bucket_start >= %(s)s AND bucket_start < %(e)s
+              GROUP BY src_address, dst_address
+            ), top AS (
+              SELECT a FROM (
+                SELECT src_address AS a, c FROM w UNION ALL SELECT dst_address, c FROM w
+              ) t
+              GROUP BY a ORDER BY SUM(c) DESC LIMIT %(limit)s
+            )
+            SELECT src_address, dst_address, c, v, first_seen, last_seen
+            FROM w
+            WHERE src_address IN (SELECT a FROM top) AND dst_address IN (SELECT a FROM top)
+            ORDER BY c DESC
+            LIMIT 400
+            """,
+            {"s": start, "e": end, "limit": limit},
+        )
+        edges = [_edge(*r) for r in cur.fetchall()]
+    return {"window": _window_json(start, end), **_graph(edges)}
+
+
+def counterparties_in_window(address: str, start: datetime, end: datetime, limit: int = 10) -> List[Dict[str, Any]]:
+    addr = address.lower()
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            f"""
+            SELECT CASE WHEN src_address = %(a)s THEN dst_address ELSE src_address END AS cp,
+                   SUM(tx_count), SUM(total_value_wei)
+            FROM ({_rows(True)}) b
+            GROUP BY cp
+            ORDER BY SUM(tx_count) DESC
+            LIMIT %(limit)s
+            """,
+            {"a": addr, "s": start, "e": end, "limit": limit},
+        )
+        rows = cur.fetchall()
+    return [{"address": cp, "tx_count": int(c or 0), "total_value_wei": str(v or 0)} for cp, c, v in rows]
+
+
+def graph_diff(
+    start: datetime,
+    end: datetime,
+    base_start: datetime,
+    base_end: datetime,
+    address: Optional[str] = None,
+    min_ratio: float = 3.0,
+    min_delta: int = 10,
+    limit: int = 200,
+) -> Dict[str, Any]:
+    """Pairs that appeared in [start, end) or grew by `min_ratio` and `min_delta` over the base window.
+
+    Both windows are compared per hour, so windows of different lengths are
+    compared by rate. With `address`, only that address's pairs are scanned.
+    """
+    addr = address.lower() if address else None
+    scale = (end - start) / (base_end - base_start)
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            f"""
+            WITH cur AS (
+              SELECT src_address, dst_address, SUM(tx_count) AS c, SUM(total_value_wei) AS v,
+                     MIN(first_seen) AS first_seen, MAX(last_seen) AS last_seen
+              FROM ({_rows(bool(addr))}) w
+              GROUP BY src_address, dst_address
+            ), base AS (
+              SELECT b.src_address, b.dst_address, SUM(b.tx_count) AS c, SUM(b.total_value_wei) AS v
+              FROM ({_rows(bool(addr), "bs", "be")}) b
+              WHERE (b.src_address, b.dst_address) IN (SELECT src_address, dst_address FROM cur)
+              GROUP BY b.src_address, b.dst_address
+            )
+            SELECT cur.src_address, cur.dst_address, cur.c, cur.v, cur.first_seen, cur.last_seen,
+                   COALESCE(base.c, 0), COALESCE(base.v, 0)
+            FROM cur LEFT JOIN base ON base.src_address = cur.src_address AND base.dst_address = cur.dst_address
+            WHERE base.c IS NULL
+               OR (cur.c >= %(ratio)s * base.c * %(scale)s AND cur.c - base.c * %(scale)s >= %(delta)s)
+            ORDER BY cur.c - COALESCE(base.c, 0) * %(scale)s DESC
+            LIMIT %(limit)s
+            """,
+            {"s": start, "e": end, "bs": base_start, "be": base_end, "a": addr, "ratio": min_ratio, "delta": min_delta, "scale": scale, "limit": limit},
+        )
+        rows = cur.fetchall()
+    edges = []
+    for s, d, c, v, first, last, base_c, base_v in rows:
+        e = _edge(s, d, c, v, first, last)
+        e["base_tx_count"] = int(base_c)
+        e["base_value_wei"] = str(base_v)
+        e["change"] = "new" if not base_c else "grew"
+        e["ratio"] = round(float(c) / (float(base_c) * scale), 2) if base_c else None
+        edges.append(e)
+    return {
+        "window": _window_json(start, end),
+        "base": _window_json(base_start, base_end),
+        "address": addr,
+        **_graph(edges, [addr] if addr else []),
+    }
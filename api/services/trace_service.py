@@ -0,0 +1,141 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import psycopg2
+
+from api.services.db import get_conn
+from graph.flow import NATIVE, trace
+from graph.traversal import INFRA_ADDRESSES
+from labels.known_entities import BASE_KNOWN_LABELS
+
+# Value-flow traces over raw transfers (graph/flow.py). Each hop fetches the
+# frontier's transfers in one statement: per address, the earliest (forward)
+# or latest (backward) `limit` transfers of both tables inside its block range,
+# served by the (address, block_number) indexes of migration 0013.
+
+# Every branch is cut at `limit` on its own index before the merge, so a busy
+# address costs at most 4 * limit index rows whatever its history.
+_BRANCHES = {
+    "native": """
+      (SELECT block_number, 'native' AS asset, from_address, to_address, value_wei AS amount, tx_hash, timestamp
+       FROM transactions WHERE {side} = f.a AND block_number BETWEEN f.lo AND f.hi AND value_wei > 0
+       ORDER BY block_number {order} LIMIT %(limit)s)
+    """,
+    "token": """
+      (SELECT block_number, token_address, from_address, to_address, amount, tx_hash, timestamp
+       FROM token_transfers WHERE {side} = f.a AND block_number BETWEEN f.lo AND f.hi AND amount > 0{tokens}
+       ORDER BY block_number {order} LIMIT %(limit)s)
+    """,
+}
+
+
+def _transfers_sql(assets: Optional[List[str]], backward: bool) -> str:
+    branches = []
+    tokens = [a for a in assets or [] if a != NATIVE]
+    order = "DESC" if backward else "ASC"
+    for side in ("from_address", "to_address"):
+        if assets is None or NATIVE in assets:
+            branches.append(_BRANCHES["native"].format(side=side, order=order))
+        if assets is None or tokens:
+            branches.append(_BRANCHES["token"].format(side=side, order=order, tokens=" AND token_address = ANY(%(tokens)s)" if tokens else ""))
+    return f"""
+        SELECT f.a, x.*
+        FROM unnest(%(a)s::text[], %(lo)s::bigint[], %(hi)s::bigint[]) f(a, lo, hi)
+        CROSS JOIN LATERAL (
+          SELECT * FROM ({' UNION ALL '.join(branches)}) u
+          ORDER BY block_number {order}
+          LIMIT %(limit)s
+        ) x
+    """
+
+
+def _fetcher(conn, assets: Optional[List[str]], backward: bool):
+    sql = _transfers_sql(assets, backward)
+    tokens = [a for a in assets or [] if a != NATIVE]
+
+    def fetch(bounds: Dict[str, Tuple[Optional[int], Optional[int]]], limit: int, remaining_ms: float):
+        addrs = list(bounds)
+        cur = conn.cursor()
+        try:
+            cur.execute("SET LOCAL statement_timeout = %s", (max(1, int(remaining_ms)),))
+            cur.execute(
+                sql,
+                {
+                    "a": addrs,
+                    "lo": [bounds[a][0] if bounds[a][0] is not None else 0 for a in addrs],
+                    "hi": [bounds[a][1] if bounds[a][1] is not None else 2**62 for a in addrs],
+                    "tokens": tokens,
+                    "limit": limit + 1,
+                },
+            )
+            rows = cur.fetchall()
+        except psycopg2.errors.QueryCanceled:
+            conn.rollback()
+            return None
+        out: Dict[str, Tuple[List[tuple], bool]] = {a: ([], False) for a in addrs}
+        for a, block, asset, src, dst, amount, tx_hash, ts in rows:
+            out[a][0].append((int(block), asset, src, dst, int(amount), tx_hash, ts.isoformat() if isinstance(ts, datetime) else ts))
+        for a, (transfers, _) in out.items():
+            if len(transfers) > limit:
+                out[a] = (transfers[:limit], True)
+        return out
+
+    return fetch
+
+
+def block_at(ts: datetime, after: bool = True) -> Optional[int]:
+    """First block at or after `ts` (or last block at or before it) among ingested transactions."""
+    with get_conn() as conn:
+        cur = conn.cursor()
+        if after:
+            cur.execute("SELECT block_number FROM transactions WHERE timestamp >= %s ORDER BY timestamp LIMIT 1", (ts,))
+        else:
+            cur.execute("SELECT block_number FROM transactions WHERE timestamp <= %s ORDER BY timestamp DESC LIMIT 1", (ts,))
+        row = cur.fetchone()
+    return int(row[0]) if row else None
+
+
+def trace_flow(
+    address: str,
+    direction: str = "forward",
+    attribution: str = "proportional",
+    assets: Optional[Iterable[str]] = None,
+    from_block: Optional[int] = None,
+    to_block: Optional[int] = None,
+    skip_infra: bool = True,
+    **budgets: Any,
+) -> Iterator[Dict[str, Any]]:
+    """Stream trace events (see graph.flow.trace) over `transactions` and `token_transfers`.
+
+    `assets` limits the trace to 'native' and/or token contract addresses.
+    Infrastructure contracts end a branch unless `skip_infra` is off.
+    """
+    wanted = sorted({a.lower() for a in assets}) if assets else None
+    stop_at = {a: BASE_KNOWN_LABELS[a] for a in INFRA_ADDRESSES} if skip_infra else {}
+    with get_conn() as conn:
+        yield from trace(
+            _fetcher(conn, wanted, direction == "backward"),
+            address,
+            direction=direction,
+            mode=attribution,
+            from_block=from_block,
+            to_block=to_block,
+            stop_at=stop_at,
+            **budgets,
+        )
+
+
+def collect(events: Iterator[Dict[str, Any]]) -> Dict[str, Any]:
+    """One JSON document from a trace event stream."""
+    nodes: List[Dict[str, Any]] = []
+    edges: List[Dict[str, Any]] = []
+    done: Dict[str, Any] = {}
+    for ev in events:
+        kind = ev.pop("type")
+        if kind == "node":
+            nodes.append(ev)
+        elif kind == "edge":
+            edges.append(ev)
+        elif kind == "done":
+            done = ev
+    return {**done, "nodes": nodes, "edges": edges}
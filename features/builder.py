@@ -0,0 +1,67 @@
+"""Feature store builder.
+
+Keeps the per-address feature columns (features/store.py) in memory, folds
+in what ingest committed past their watermarks every
+`FEATURE_STORE_INTERVAL_SECONDS` and writes them atomically to
+`FEATURE_STORE_PATH` for API workers to map. Every
+`FEATURE_STORE_FULL_EVERY` runs it rebuilds from scratch, which also drops
+the drift of replayed blocks. On start it resumes from the existing file.
+
+Run with `python -m features.builder` (`--once` for a single run, `--full`
+to force a rebuild).
+"""
+
+import argparse
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from api.services.db import get_conn
+from api.services.feature_service import refresh_store
+from features.store import FeatureStore, default_path, resume, write_store
+
+
+def run_once(path: str, store: Optional[FeatureStore] = None, full: bool = False) -> Tuple[FeatureStore, Dict[str, Any]]:
+    """Refresh from Postgres and write `path`; returns (store, summary)."""
+    store = store if store is not None else resume(path)
+    with get_conn() as conn:
+        store, run = refresh_store(store, conn, full=full)
+    t = time.perf_counter()
+    write_store(store, path)
+    run["bytes"] = os.path.getsize(path)
+    run["write_seconds"] = round(time.perf_counter() - t, 3)
+    return store, run
+
+
+def main() -> None:
+    load_dotenv()
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--once", action="store_true")
+    p.add_argument("--full", action="store_true")
+    args = p.parse_args()
+    path = default_path()
+    interval = float(os.getenv("FEATURE_STORE_INTERVAL_SECONDS", "60"))
+    full_every = max(1, int(os.getenv("FEATURE_STORE_FULL_EVERY", "1440")))
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    store, runs = None, 0
+    while True:
+        try:
+            store, run = run_once(path, store, full=args.full or (runs > 0 and runs % full_every == 0))
+            runs += 1
+            print(
+                f"[features] {'full' if run['full'] else 'incremental'} refresh: {run['size']} addresses, "
+                f"{run['addresses']} counters, {run['edges']} edge, {run['flows']} flow, {run['expired']} expired rows, "
+                f"{run['bytes']} bytes in {run['seconds']}s + write {run['write_seconds']}s"
+            )
+        except Exception as e:
+            print(f"[features] refresh failed: {e}")
+        if args.once:
+            break
+        args.full = False
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    main()
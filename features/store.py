@@ -0,0 +1,133 @@
+"""Columnar per-address features keyed by `AddressIndex` ids.
+
+Every column is one NumPy array aligned with the index: row `i` holds the
+features of `index.address(i)`. The builder (`python -m features.builder`)
+refreshes the columns from ingest watermarks (api/services/feature_service.py)
+and writes them with the mmap layout of graph/snapshot_file.py, so API
+workers share one copy through the page cache and read any number of
+addresses with a single fancy index per column.
+
+Columns:
+
+- tx_count, contracts_deployed: the `addresses` counters,
+- unique_counterparties, inbound_edges, outbound_edges: the label features
+  over `edges` (see labels/rules.py FEATURES),
+- {out,in}_txs_{1d,2d,7d,30d}, {out,in}_wei_{7d,30d}: transfers in the
+  trailing windows at `as_of`. Wei sums are exact: each is stored as the
+  uint64 limbs `<name>_hi`, `<name>_lo` (like `CSRGraph.value_hi`/`value_lo`)
+  and read back as Python ints,
+- alerts_7d, new_alerts_7d, high_alerts_7d, alert_conf_sum_7d: alerts
+  created in the last 7 days.
+"""
+
+import os
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from graph.csr import ADDRESS_DTYPE, AddressIndex, join_wei
+from graph.snapshot_file import open_arrays, write_arrays
+
+MAGIC = b"BTFEATS\x00"
+FORMAT_VERSION = 2
+
+LABEL_COLUMNS = ("tx_count", "contracts_deployed", "unique_counterparties", "inbound_edges", "outbound_edges")
+TX_WINDOWS = {"1d": 1, "2d": 2, "7d": 7, "30d": 30}
+WEI_WINDOWS = ("7d", "30d")
+WEI_COLUMNS = tuple(f"{d}_wei_{w}" for w in WEI_WINDOWS for d in ("out", "in"))
+FLOW_COLUMNS = tuple(f"{d}_txs_{w}" for w in TX_WINDOWS for d in ("out", "in")) + WEI_COLUMNS
+ALERT_COLUMNS = ("alerts_7d", "new_alerts_7d", "high_alerts_7d", "alert_conf_sum_7d")
+COLUMNS = LABEL_COLUMNS + FLOW_COLUMNS + ALERT_COLUMNS
+# Stored arrays: COLUMNS with every wei column split into its two limbs.
+ARRAYS = tuple(a for c in COLUMNS for a in ((f"{c}_hi", f"{c}_lo") if c in WEI_COLUMNS else (c,)))
+
+
+def dtype(array: str) -> np.dtype:
+    if array.endswith(("_hi", "_lo")):
+        return np.dtype(np.uint64)
+    return np.dtype(np.float64 if array == "alert_conf_sum_7d" else np.int64)
+
+
+class FeatureStore:
+    def __init__(self, index: AddressIndex, columns: Dict[str, np.ndarray], watermarks: Optional[Dict[str, Any]] = None):
+        self.index = index
+        self.columns = columns
+        # edges: last `edges.id` folded in; block: last block of `transactions`;
+        # as_of: epoch the windows end at; addresses_at: `addresses.updated_at` read up to.
+        self.watermarks = dict(watermarks or {"edges": 0, "block": -1, "as_of": None, "addresses_at": None})
+
+    @classmethod
+    def empty(cls) -> "FeatureStore":
+        return cls(AddressIndex(np.zeros(0, dtype=ADDRESS_DTYPE)), {a: np.zeros(0, dtype=dtype(a)) for a in ARRAYS})
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def nbytes(self) -> int:
+        return int(self.index.addresses.nbytes + self.index.order.nbytes + sum(a.nbytes for a in self.columns.values()))
+
+    def ids(self, addresses: Sequence[str]) -> np.ndarray:
+        """Ids of `addresses`, -1 where the store has never seen them."""
+        return self.index.lookup_many(addresses)
+
+    def gather(self, ids: np.ndarray, names: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+        """Columns `names` (all by default) at `ids`; 0 where the id is -1. Wei columns are object arrays of ints."""
+        ids = np.asarray(ids, dtype=np.int64)
+        known = ids >= 0
+        safe = np.where(known, ids, 0)
+
+        def take(array: str) -> np.ndarray:
+            col = self.columns[array]
+            return np.where(known, col[safe], 0).astype(col.dtype) if len(col) else np.zeros(len(ids), dtype=col.dtype)
+
+        return {name: join_wei(take(f"{name}_hi"), take(f"{name}_lo")) if name in WEI_COLUMNS else take(name) for name in names or COLUMNS}
+
+    def features_many(self, addresses: Sequence[str], names: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+        """Columns `names` of `addresses`, aligned with them; unknown addresses read 0."""
+        return self.gather(self.ids(addresses), names)
+
+    def extended(self, addresses: Sequence[str]) -> Tuple["FeatureStore", np.ndarray]:
+        """(store including `addresses` with writable columns, their ids); existing ids are unchanged.
+
+        Columns of a mapped store are read-only, so they are copied here
+        (once per refresh); new rows start at 0.
+        """
+        index, ids = self.index.extend(addresses)
+        grow = len(index) - len(self.index)
+        columns = {
+            k: np.concatenate([a, np.zeros(grow, dtype=a.dtype)]) if grow or not a.flags.writeable else a
+            for k, a in self.columns.items()
+        }
+        return FeatureStore(index, columns, self.watermarks), ids
+
+
+def write_store(store: FeatureStore, path: str) -> Dict[str, Any]:
+    """Atomically write `store` to `path`; returns the header."""
+    arrays = {"addresses": store.index.addresses, "order": store.index.order}
+    arrays.update(store.columns)
+    return write_arrays(path, arrays, {"watermarks": store.watermarks, "addresses": len(store)}, MAGIC, FORMAT_VERSION)
+
+
+def open_store(path: str, verify: bool = False) -> Tuple[FeatureStore, Dict[str, Any]]:
+    """Map `path` read-only as a `FeatureStore`; ValueError when it is not a valid one."""
+    cols, header = open_arrays(path, MAGIC, FORMAT_VERSION, "feature store", verify)
+    missing = ({"addresses", "order"} | set(ARRAYS)) - set(cols)
+    if missing:
+        raise ValueError(f"feature store lacks arrays: {sorted(missing)}")
+    index = AddressIndex(cols.pop("addresses"), cols.pop("order"))
+    return FeatureStore(index, {a: cols[a] for a in ARRAYS}, header["watermarks"]), header
+
+
+def resume(path: str) -> FeatureStore:
+    """The store at `path`, or an empty one when it is missing or unreadable."""
+    try:
+        return open_store(path, verify=True)[0]
+    except FileNotFoundError:
+        return FeatureStore.empty()
+    except ValueError as e:
+        print(f"[features] ignoring {path}: {e}")
+        return FeatureStore.empty()
+
+
+def default_path() -> str:
+    return os.getenv("FEATURE_STORE_PATH", "state/features.store")
@@ -0,0 +1,65 @@
+"""Centrality scores over a `CSRGraph` snapshot.
+
+`pagerank` runs weighted power iteration straight over the CSR arrays: each
+iteration is one gather of the source ranks and one `np.bincount` scatter into
+the destinations, so a 10M-pair graph costs a few hundred MB of transient
+arrays and no per-node Python work. Pair weights are `log1p(tx_count)`, so a
+spam address that sprays thousands of one-off transfers passes little rank,
+while repeated relationships count more without letting one pair dominate.
+Dangling mass (addresses that never send) is spread uniformly. Iteration
+stops at `tol` (L1 change) or after `max_iter`, whichever comes first.
+"""
+
+from typing import Dict
+
+import numpy as np
+
+from graph.csr import CSRGraph
+
+
+def pagerank(graph: CSRGraph, damping: float = 0.85, tol: float = 1e-6, max_iter: int = 100) -> Dict:
+    """Weighted PageRank; returns scores (summing to 1) and convergence info."""
+    n = graph.n_nodes
+    if n == 0:
+        return {"scores": np.zeros(0), "iterations": 0, "residual": 0.0, "converged": True}
+    src = graph.sources()
+    dst = graph.out_dst
+    weight = np.log1p(graph.tx_count.astype(np.float64))
+    out_weight = np.bincount(src, weights=weight, minlength=n)
+    coef = weight / out_weight[src]
+    dangling = out_weight == 0
+    del weight, out_weight
+
+    rank = np.full(n, 1.0 / n)
+    residual, it = np.inf, 0
+    while it < max_iter:
+        it += 1
+        nxt = np.bincount(dst, weights=rank[src] * coef, minlength=n)
+        nxt *= damping
+        nxt += (1.0 - damping + damping * rank[dangling].sum()) / n
+        residual = float(np.abs(nxt - rank).sum())
+        rank = nxt
+        if residual < tol:
+            break
+    return {"scores": rank, "iterations": it, "residual": residual, "converged": residual < tol}
+
+
+def degree_centrality(graph: CSRGraph) -> Dict[str, np.ndarray]:
+    """Distinct counterparties and transfer counts in each direction per node."""
+    n = graph.n_nodes
+    return {
+        "out_degree": np.diff(graph.out_offsets),
+        "in_degree": np.diff(graph.in_offsets),
+        "out_tx": np.bincount(graph.sources(), weights=graph.tx_count, minlength=n).astype(np.int64),
+        "in_tx": np.bincount(graph.out_dst, weights=graph.tx_count, minlength=n).astype(np.int64),
+    }
+
+
+def rank_percentiles(scores: np.ndarray) -> tuple:
+    """(rank, percentile) per node: rank 1 is the highest score, percentile 1.0 the top."""
+    n = len(scores)
+    order = np.argsort(-scores, kind="stable")
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(1, n + 1)
+    pct = 1.0 - (rank - 1) / max(n, 1)
+    return rank, pct
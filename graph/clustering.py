@@ -0,0 +1,205 @@
+"""Entity clusters over a `CSRGraph` snapshot.
+
+Pairs are first filtered: both ends must be ordinary addresses (not in `skip`,
+at most `max_degree` counterparties) and the pair must carry at least
+`min_tx` transfers. Hubs such as WETH or routers would otherwise glue every
+address on the chain into one cluster; they are kept as singletons.
+
+- components: union-find by vectorized hooking of roots plus full path
+  compression, so a round is a few NumPy passes over the surviving pairs
+  and pairs inside one component drop out for good.
+- communities: label propagation inside components over the undirected
+  filtered pairs weighted by `log1p(tx_count)`. Each round updates the
+  nodes in two halves drawn by a deterministic hash of (node, round), which
+  breaks the label swaps of fully synchronous updates while keeping runs
+  reproducible; ties keep the current label, then the smaller one.
+
+`Clustering.update` refreshes in place after new edges: pairs touching
+changed nodes are unioned into the existing forest and propagation reruns
+from the changed nodes outwards only. A node crossing `max_degree` removes
+pairs and can split components, so components are then rebuilt (a few
+vectorized passes) and the new hub is reset to a singleton; propagation
+still starts from the changed nodes.
+
+Cluster and component ids are the smallest member address, so they stay
+stable across runs and restarts as long as that member stays.
+"""
+
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+from graph.csr import CSRGraph, _gather
+from graph.traversal import INFRA_ADDRESSES, skip_ids
+
+
+def connected_components(n: int, src: np.ndarray, dst: np.ndarray, parent: Optional[np.ndarray] = None) -> np.ndarray:
+    """Root (smallest id) of every node's component; `parent` continues an earlier forest."""
+    parent = np.arange(n, dtype=np.int64) if parent is None else _compress(parent)
+    src, dst = src.astype(np.int64), dst.astype(np.int64)
+    while len(src):
+        ps, pd = parent[src], parent[dst]
+        live = ps != pd
+        src, dst, ps, pd = src[live], dst[live], ps[live], pd[live]
+        if not len(src):
+            break
+        np.minimum.at(parent, np.maximum(ps, pd), np.minimum(ps, pd))
+        parent = _compress(parent)
+    return parent
+
+
+def _compress(parent: np.ndarray) -> np.ndarray:
+    while True:
+        grand = parent[parent]
+        if np.array_equal(grand, parent):
+            return parent
+        parent = grand
+
+
+class Undirected:
+    """Filtered pairs as a symmetric CSR: `nbr[offsets[i]:offsets[i + 1]]` with weights `w`."""
+
+    def __init__(self, n: int, src: np.ndarray, dst: np.ndarray, weight: np.ndarray):
+        u = np.concatenate([src, dst]).astype(np.int64)
+        v = np.concatenate([dst, src]).astype(np.int64)
+        order = np.argsort(u, kind="stable")
+        self.n = n
+        self.offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(u, minlength=n), out=self.offsets[1:])
+        self.nbr = v[order]
+        self.w = np.concatenate([weight, weight])[order]
+
+    def around(self, nodes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(node, neighbor, weight) for every pair of `nodes`."""
+        pos, owner = _gather(self.offsets, nodes)
+        return nodes[owner], self.nbr[pos], self.w[pos]
+
+    def neighbors(self, nodes: np.ndarray) -> np.ndarray:
+        return np.unique(self.nbr[_gather(self.offsets, nodes)[0]])
+
+
+def label_propagation(und: Undirected, labels: np.ndarray, active: Optional[np.ndarray] = None, max_iter: int = 20) -> Tuple[np.ndarray, int]:
+    """Propagate `labels` (modified copy returned) from `active` nodes (default: all) outwards."""
+    labels = labels.copy()
+    n = und.n
+    active = np.arange(n, dtype=np.int64) if active is None else np.asarray(active, dtype=np.int64)
+    it = 0
+    while len(active) and it < max_iter:
+        it += 1
+        changed_all = []
+        coin = ((active * 2654435761 + it * 40503) >> 11) & 1
+        for half in (0, 1):
+            nodes = active[coin == half]
+            if not len(nodes):
+                continue
+            node, nbr, w = und.around(nodes)
+            if not len(node):
+                continue
+            lab = labels[nbr]
+            key, inv = np.unique(node * n + lab, return_inverse=True)
+            score = np.bincount(inv, weights=w)
+            k_node, k_lab = key // n, key % n
+            keep_current = (k_lab == labels[k_node]).astype(np.int8)
+            order = np.lexsort((k_lab, -keep_current, -score, k_node))
+            first = np.unique(k_node[order], return_index=True)[1]
+            best_node, best_lab = k_node[order][first], k_lab[order][first]
+            moved = best_lab != labels[best_node]
+            labels[best_node[moved]] = best_lab[moved]
+            changed_all.append(best_node[moved])
+        changed = np.concatenate(changed_all) if changed_all else np.zeros(0, np.int64)
+        active = und.neighbors(changed) if len(changed) else changed
+    return labels, it
+
+
+def smallest_member(graph: CSRGraph, labels: np.ndarray) -> np.ndarray:
+    """Node id of the smallest address sharing each node's label."""
+    rank = np.empty(len(labels), dtype=np.int64)
+    rank[graph.index.order] = np.arange(len(labels))
+    best = np.full(len(labels), len(labels), dtype=np.int64)
+    np.minimum.at(best, labels, rank)
+    return graph.index.order[best[labels]].astype(np.int64)
+
+
+class Clustering:
+    """Component and community assignment for every node, refreshable in place."""
+
+    def __init__(self, max_degree: int = 1000, min_tx: int = 2, skip: Optional[Iterable[str]] = INFRA_ADDRESSES, max_iter: int = 20):
+        self.max_degree = max_degree
+        self.min_tx = min_tx
+        self.skip = skip or ()
+        self.max_iter = max_iter
+        self.graph: Optional[CSRGraph] = None
+        self.hub: np.ndarray = np.zeros(0, dtype=bool)
+        self.degree: np.ndarray = np.zeros(0, dtype=np.int64)
+        self.parent: np.ndarray = np.zeros(0, dtype=np.int64)
+        self.labels: np.ndarray = np.zeros(0, dtype=np.int64)
+        self.component_key: np.ndarray = np.zeros(0, dtype=np.int64)
+        self.cluster_key: np.ndarray = np.zeros(0, dtype=np.int64)
+        self.iterations = 0
+        self.mode = "full"
+
+    def _filtered(self, graph: CSRGraph):
+        hub = graph.incident_counts() > self.max_degree
+        hub[skip_ids(graph, self.skip)] = True
+        src, dst = graph.sources(), graph.out_dst
+        keep = (graph.tx_count >= self.min_tx) & ~hub[src] & ~hub[dst] & (src != dst)
+        return hub, src[keep], dst[keep], np.log1p(graph.tx_count[keep].astype(np.float64))
+
+    def full(self, graph: CSRGraph) -> np.ndarray:
+        """Cluster from scratch; returns the ids of nodes whose cluster or component key changed."""
+        n = graph.n_nodes
+        self.mode = "full"
+        self.hub, src, dst, w = self._filtered(graph)
+        self.degree = np.bincount(src, minlength=n) + np.bincount(dst, minlength=n)
+        self.parent = connected_components(n, src, dst)
+        self.labels, self.iterations = label_propagation(Undirected(n, src, dst, w), np.arange(n, dtype=np.int64), max_iter=self.max_iter)
+        return self._finish(graph)
+
+    def update(self, graph: CSRGraph) -> np.ndarray:
+        """Fold the snapshot's new pairs in; returns changed node ids (all on a full rebuild)."""
+        old = self.graph
+        if old is None:
+            return self.full(graph)
+        n_old, n = old.n_nodes, graph.n_nodes
+        self.mode = "incremental"
+        hub, src, dst, w = self._filtered(graph)
+        # Pairs are only ever added or made heavier, so a node gained filtered
+        # pairs exactly when its filtered degree grew; it lost them when a
+        # counterparty turned into a hub.
+        degree = np.bincount(src, minlength=n) + np.bincount(dst, minlength=n)
+        touched = np.flatnonzero(np.concatenate([degree[:n_old] != self.degree, np.ones(n - n_old, dtype=bool)]))
+        new_hubs = np.flatnonzero(hub[:n_old] & ~self.hub)
+        self.degree, self.hub = degree, hub
+        und = Undirected(n, src, dst, w)
+        if len(new_hubs):
+            self.parent = connected_components(n, src, dst)  # pairs were removed: components may split
+        else:
+            node, nbr, _ = und.around(touched)
+            self.parent = connected_components(n, node, nbr, np.concatenate([self.parent, np.arange(n_old, n)]))
+        labels = np.concatenate([self.labels, np.arange(n_old, n)])
+        active = np.union1d(touched, und.neighbors(touched))
+        if len(new_hubs):
+            # A new hub has no filtered pairs, so propagation would never move
+            # it: make it a singleton again and restart the nodes still
+            # carrying its id. Its former neighbours lost a pair, so they are
+            # already in `touched`.
+            orphans = np.flatnonzero(np.isin(labels, new_hubs) & ~hub)
+            labels[new_hubs] = new_hubs
+            labels[orphans] = orphans
+            active = np.union1d(active, orphans)
+        self.labels, self.iterations = label_propagation(und, labels, active, max_iter=self.max_iter)
+        return self._finish(graph)
+
+    def _finish(self, graph: CSRGraph) -> np.ndarray:
+        n_old = len(self.cluster_key)
+        component_key = smallest_member(graph, self.parent)
+        cluster_key = smallest_member(graph, self.labels)
+        changed = np.zeros(graph.n_nodes, dtype=bool)
+        changed[n_old:] = True
+        changed[:n_old] = (component_key[:n_old] != self.component_key) | (cluster_key[:n_old] != self.cluster_key)
+        self.graph, self.component_key, self.cluster_key = graph, component_key, cluster_key
+        return np.flatnonzero(changed)
+
+    def sizes(self) -> np.ndarray:
+        """Member count of each node's cluster."""
+        return np.bincount(self.cluster_key, minlength=len(self.cluster_key))[self.cluster_key]
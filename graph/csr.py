@@ -0,0 +1,482 @@
+"""In-memory compressed sparse row (CSR) snapshot of the edge graph.
+
+`edges` holds one row per transfer. A snapshot aggregates them per
+(src, dst) pair and stores the result as flat NumPy arrays over dense
+address ids:
+
+- `AddressIndex`: the address for every id plus a permutation that sorts
+  them, so lookups are a binary search and new addresses are appended
+  without renumbering existing ids.
+- Outgoing adjacency: `out_offsets[i]:out_offsets[i + 1]` slices `out_dst`,
+  `tx_count`, `value_hi`, `value_lo`, `first_ts` and `last_ts` for source
+  `i`, sorted by destination.
+- Incoming adjacency: `in_offsets` slices `in_src` plus `in_edge`, the
+  position of the same pair in the outgoing arrays, so attributes are
+  stored once.
+
+Snapshots are immutable. `merge` folds newly ingested rows in with sorted
+O(E) inserts and returns a new snapshot, so readers keep using the old one
+until the caller swaps the reference. Wei sums are exact: each is stored as
+two uint64 limbs (`value_hi * 2**64 + value_lo`) and added with carry, so
+they match the NUMERIC sums of the SQL path digit for digit.
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+ADDRESS_DTYPE = "S42"
+EDGE_ARRAYS = ("out_dst", "tx_count", "value_hi", "value_lo", "first_ts", "last_ts")
+# Nodes with more incident pairs than this keep their heaviest HUB_TOP_K
+# pairs cached per snapshot, so repeated traversals through hubs are O(k).
+HUB_DEGREE = 4096
+HUB_TOP_K = 256
+_LIMB = (1 << 64) - 1
+_HALF = np.uint64(0xFFFFFFFF)
+
+
+def _pair_keys(src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    return (src.astype(np.int64) << 32) | dst.astype(np.int64)
+
+
+def _offsets(ids: np.ndarray, n: int) -> np.ndarray:
+    out = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(ids, minlength=n), out=out[1:])
+    return out
+
+
+def split_wei(values: Iterable) -> Tuple[np.ndarray, np.ndarray]:
+    """(value_hi, value_lo) uint64 limbs of non-negative integer wei amounts (int, Decimal or str)."""
+    ints = [int(v) for v in values]
+    return (
+        np.fromiter((v >> 64 for v in ints), np.uint64, len(ints)),
+        np.fromiter((v & _LIMB for v in ints), np.uint64, len(ints)),
+    )
+
+
+def join_wei(value_hi: np.ndarray, value_lo: np.ndarray) -> np.ndarray:
+    """Exact amounts of limb pairs, as an object array of ints."""
+    return np.array([(h << 64) | lo for h, lo in zip(value_hi.tolist(), value_lo.tolist())], dtype=object)
+
+
+def wei_strings(value_hi: np.ndarray, value_lo: np.ndarray) -> List[str]:
+    return [str(v) for v in join_wei(value_hi, value_lo).tolist()]
+
+
+def add_wei(hi_a, lo_a, hi_b, lo_b) -> Tuple[np.ndarray, np.ndarray]:
+    """Element-wise 128-bit sum of two limb pairs."""
+    lo = lo_a + lo_b
+    return hi_a + hi_b + (lo < lo_a), lo
+
+
+def sub_wei(hi_a, lo_a, hi_b, lo_b) -> Tuple[np.ndarray, np.ndarray]:
+    """Element-wise 128-bit difference of two limb pairs, 0 where it would be negative."""
+    negative = (hi_a < hi_b) | ((hi_a == hi_b) & (lo_a < lo_b))
+    lo = lo_a - lo_b
+    hi = hi_a - hi_b - (lo_a < lo_b)
+    zero = np.zeros_like(lo)
+    return np.where(negative, zero, hi), np.where(negative, zero, lo)
+
+
+def _sum_wei(value_hi, value_lo, order, starts) -> Tuple[np.ndarray, np.ndarray]:
+    """Exact per-group sums of limb pairs: the low limb is summed as 32-bit halves, then carried."""
+    lo = np.asarray(value_lo, np.uint64)[order]
+    low = np.add.reduceat(lo & _HALF, starts)
+    mid = np.add.reduceat(lo >> np.uint64(32), starts) + (low >> np.uint64(32))
+    hi = np.add.reduceat(np.asarray(value_hi, np.uint64)[order], starts) + (mid >> np.uint64(32))
+    return hi, ((mid & _HALF) << np.uint64(32)) | (low & _HALF)
+
+
+def _aggregate(src, dst, tx_count, value_hi, value_lo, first_ts, last_ts):
+    """Sum duplicate (src, dst) rows; returns arrays sorted by (src, dst)."""
+    keys = _pair_keys(src, dst)
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.zeros(0, dtype=np.int64)
+    if not len(starts):
+        return keys, np.zeros(0, np.int64), np.zeros(0, np.uint64), np.zeros(0, np.uint64), np.zeros(0, np.uint32), np.zeros(0, np.uint32)
+    return (
+        keys[starts],
+        np.add.reduceat(np.asarray(tx_count, np.int64)[order], starts),
+        *_sum_wei(value_hi, value_lo, order, starts),
+        np.minimum.reduceat(np.asarray(first_ts, np.uint32)[order], starts),
+        np.maximum.reduceat(np.asarray(last_ts, np.uint32)[order], starts),
+    )
+
+
+class AddressIndex:
+    def __init__(self, addresses: np.ndarray, order: Optional[np.ndarray] = None):
+        self.addresses = addresses
+        self.order = order if order is not None else np.argsort(addresses, kind="stable").astype(np.int64)
+
+    def __len__(self) -> int:
+        return len(self.addresses)
+
+    @classmethod
+    def from_addresses(cls, addresses: Iterable[str]) -> "AddressIndex":
+        return cls(np.array([a.lower().encode() for a in addresses], dtype=ADDRESS_DTYPE))
+
+    def lookup_many(self, addresses: Sequence[str]) -> np.ndarray:
+        """Ids for `addresses`, -1 where unknown."""
+        keys = np.array([a.lower().encode() for a in addresses], dtype=ADDRESS_DTYPE)
+        if not len(self.addresses):
+            return np.full(len(keys), -1, dtype=np.int64)
+        pos = np.searchsorted(self.addresses, keys, sorter=self.order)
+        ids = self.order[np.minimum(pos, len(self.order) - 1)]
+        return np.where(self.addresses[ids] == keys, ids, -1)
+
+    def lookup(self, address: str) -> int:
+        return int(self.lookup_many([address])[0])
+
+    def address(self, i: int) -> str:
+        return self.addresses[i].decode()
+
+    def decode(self, ids: np.ndarray) -> List[str]:
+        return self.addresses[ids].astype("U42").tolist()
+
+    def extend(self, addresses: Sequence[str]) -> Tuple["AddressIndex", np.ndarray]:
+        """Return (index including `addresses`, their ids); existing ids are unchanged."""
+        ids = self.lookup_many(addresses)
+        missing = np.unique(np.array([a.lower().encode() for a in addresses], dtype=ADDRESS_DTYPE)[ids < 0])
+        if not len(missing):
+            return self, ids
+        new_ids = np.arange(len(self.addresses), len(self.addresses) + len(missing), dtype=np.int64)
+        pos = np.searchsorted(self.addresses, missing, sorter=self.order) if len(self.addresses) else np.zeros(len(missing), np.int64)
+        index = AddressIndex(np.concatenate([self.addresses, missing]), np.insert(self.order, pos, new_ids))
+        return index, index.lookup_many(addresses)
+
+
+class CSRGraph:
+    def __init__(
+        self,
+        index: AddressIndex,
+        out_offsets: np.ndarray,
+        out_dst: np.ndarray,
+        tx_count: np.ndarray,
+        value_hi: np.ndarray,
+        value_lo: np.ndarray,
+        first_ts: np.ndarray,
+        last_ts: np.ndarray,
+        in_offsets: np.ndarray,
+        in_src: np.ndarray,
+        in_edge: np.ndarray,
+        watermark: int = 0,
+    ):
+        self.index = index
+        self.out_offsets = out_offsets
+        self.out_dst = out_dst
+        self.tx_count = tx_count
+        self.value_hi = value_hi
+        self.value_lo = value_lo
+        self.first_ts = first_ts
+        self.last_ts = last_ts
+        self.in_offsets = in_offsets
+        self.in_src = in_src
+        self.in_edge = in_edge
+        self.watermark = watermark
+        self._degree: Optional[np.ndarray] = None
+        self._hub_top: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        self._incident_counts: Optional[np.ndarray] = None
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.out_offsets) - 1
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.out_dst)
+
+    def nbytes(self) -> int:
+        arrays = [getattr(self, k) for k in ("out_offsets", *EDGE_ARRAYS, "in_offsets", "in_src", "in_edge")]
+        return sum(a.nbytes for a in arrays) + self.index.addresses.nbytes + self.index.order.nbytes
+
+    @classmethod
+    def empty(cls) -> "CSRGraph":
+        return cls.from_pairs(AddressIndex(np.zeros(0, dtype=ADDRESS_DTYPE)), *(np.zeros(0, np.int64),) * 7)
+
+    @classmethod
+    def from_pairs(cls, index, src, dst, tx_count, value_hi, value_lo, first_ts, last_ts, watermark: int = 0) -> "CSRGraph":
+        """Build from (possibly repeated) id pairs; repeated pairs are summed."""
+        keys, tx_count, value_hi, value_lo, first_ts, last_ts = _aggregate(src, dst, tx_count, value_hi, value_lo, first_ts, last_ts)
+        return cls._from_sorted(index, keys, tx_count, value_hi, value_lo, first_ts, last_ts, watermark)
+
+    @classmethod
+    def _from_sorted(cls, index, keys, tx_count, value_hi, value_lo, first_ts, last_ts, watermark) -> "CSRGraph":
+        n = len(index)
+        src = (keys >> 32).astype(np.int32)
+        dst = (keys & 0xFFFFFFFF).astype(np.int32)
+        in_edge = np.argsort(dst, kind="stable").astype(np.int32)
+        return cls(
+            index,
+            _offsets(src, n),
+            dst,
+            tx_count,
+            value_hi,
+            value_lo,
+            first_ts,
+            last_ts,
+            _offsets(dst, n),
+            src[in_edge],
+            in_edge,
+            watermark,
+        )
+
+    @classmethod
+    def from_edges(cls, rows: Iterable[Tuple[str, str, int, int, int, int]], watermark: int = 0) -> "CSRGraph":
+        """Build from (src, dst, tx_count, value_wei, first_ts, last_ts) address rows; `value_wei` is an integer."""
+        return cls.empty().merge(rows, watermark)
+
+    def sources(self) -> np.ndarray:
+        """Source id of every outgoing edge (expanded from the offsets)."""
+        return np.repeat(np.arange(self.n_nodes, dtype=np.int32), np.diff(self.out_offsets))
+
+    def merge(self, rows: Iterable[Tuple[str, str, int, int, int, int]], watermark: Optional[int] = None) -> "CSRGraph":
+        """Return a new snapshot with `rows` added; existing pairs are summed in place."""
+        rows = list(rows)
+        if not rows:
+            return self._with_watermark(watermark)
+        src_a, dst_a, cnt, val, first, last = zip(*rows)
+        index, ids = self.index.extend(list(src_a) + list(dst_a))
+        return self.merge_ids(index, ids[: len(rows)], ids[len(rows):], cnt, *split_wei(val), first, last, watermark)
+
+    def merge_ids(self, index: AddressIndex, src, dst, tx_count, value_hi, value_lo, first_ts, last_ts, watermark: Optional[int] = None) -> "CSRGraph":
+        """Like `merge`, for id columns over `index` (an extension of this snapshot's index)."""
+        n_new = len(index)
+        d_keys, d_cnt, d_hi, d_lo, d_first, d_last = _aggregate(src, dst, tx_count, value_hi, value_lo, first_ts, last_ts)
+        if not self.n_edges:
+            return CSRGraph._from_sorted(index, d_keys, d_cnt, d_hi, d_lo, d_first, d_last, watermark or 0)
+
+        base_keys = _pair_keys(self.sources(), self.out_dst)
+        pos = np.searchsorted(base_keys, d_keys)
+        hit = pos < len(base_keys)
+        hit[hit] = base_keys[pos[hit]] == d_keys[hit]
+
+        tx_count, value_hi, value_lo = self.tx_count.copy(), self.value_hi.copy(), self.value_lo.copy()
+        first_ts, last_ts = self.first_ts.copy(), self.last_ts.copy()
+        p = pos[hit]
+        tx_count[p] += d_cnt[hit]
+        value_hi[p], value_lo[p] = add_wei(value_hi[p], value_lo[p], d_hi[hit], d_lo[hit])
+        first_ts[p] = np.minimum(first_ts[p], d_first[hit])
+        last_ts[p] = np.maximum(last_ts[p], d_last[hit])
+
+        new = ~hit
+        if not new.any():
+            return CSRGraph(
+                index, _pad(self.out_offsets, n_new), self.out_dst, tx_count, value_hi, value_lo, first_ts, last_ts,
+                _pad(self.in_offsets, n_new), self.in_src, self.in_edge,
+                self.watermark if watermark is None else watermark,
+            )
+
+        ins = pos[new]
+        keys = np.insert(base_keys, ins, d_keys[new])
+        tx_count = np.insert(tx_count, ins, d_cnt[new])
+        value_hi = np.insert(value_hi, ins, d_hi[new])
+        value_lo = np.insert(value_lo, ins, d_lo[new])
+        first_ts = np.insert(first_ts, ins, d_first[new])
+        last_ts = np.insert(last_ts, ins, d_last[new])
+        src = (keys >> 32).astype(np.int32)
+        out_dst = (keys & 0xFFFFFFFF).astype(np.int32)
+
+        # Incoming side: shift old edge positions past the inserts, then insert
+        # the new pairs at their (dst, src) rank instead of re-sorting everything.
+        new_out_pos = (ins + np.arange(len(ins))).astype(np.int32)
+        old_in_edge = self.in_edge + np.searchsorted(ins, self.in_edge, side="right").astype(np.int32)
+        in_dst_old = np.repeat(np.arange(self.n_nodes, dtype=np.int64), np.diff(self.in_offsets))
+        in_keys_old = (in_dst_old << 32) | self.in_src.astype(np.int64)
+        new_in_keys = (out_dst[new_out_pos].astype(np.int64) << 32) | src[new_out_pos].astype(np.int64)
+        order = np.argsort(new_in_keys, kind="stable")
+        in_pos = np.searchsorted(in_keys_old, new_in_keys[order])
+        in_edge = np.insert(old_in_edge, in_pos, new_out_pos[order])
+        return CSRGraph(
+            index,
+            _offsets(src, n_new),
+            out_dst,
+            tx_count,
+            value_hi,
+            value_lo,
+            first_ts,
+            last_ts,
+            _offsets(out_dst, n_new),
+            src[in_edge],
+            in_edge,
+            self.watermark if watermark is None else watermark,
+        )
+
+    def _with_watermark(self, watermark: Optional[int]) -> "CSRGraph":
+        if watermark is None or watermark == self.watermark:
+            return self
+        g = CSRGraph(**{k: v for k, v in self.__dict__.items() if not k.startswith("_")})
+        g.watermark = watermark
+        return g
+
+    # Queries --------------------------------------------------------------
+
+    def degree(self) -> np.ndarray:
+        """Weighted (tx_count) in + out degree per node, cached per snapshot."""
+        if self._degree is None:
+            out_w = np.bincount(self.sources(), weights=self.tx_count, minlength=self.n_nodes)
+            in_w = np.bincount(self.out_dst, weights=self.tx_count, minlength=self.n_nodes)
+            self._degree = out_w + in_w
+        return self._degree
+
+    def out_edges(self, i: int) -> np.ndarray:
+        """Positions in the edge arrays of `i`'s outgoing pairs."""
+        if i < 0 or i >= self.n_nodes:
+            return np.zeros(0, dtype=np.int64)
+        return np.arange(self.out_offsets[i], self.out_offsets[i + 1])
+
+    def in_edges(self, i: int) -> np.ndarray:
+        """Positions in the edge arrays of `i`'s incoming pairs."""
+        if i < 0 or i >= self.n_nodes:
+            return np.zeros(0, dtype=np.int64)
+        return self.in_edge[self.in_offsets[i]:self.in_offsets[i + 1]].astype(np.int64)
+
+    def edge_src(self, e: np.ndarray) -> np.ndarray:
+        return (np.searchsorted(self.out_offsets, e, side="right") - 1).astype(np.int32)
+
+    def incident(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(edge positions, other endpoint) for every pair touching `i`."""
+        if i < 0 or i >= self.n_nodes:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        lo, hi = self.in_offsets[i], self.in_offsets[i + 1]
+        e = np.concatenate([self.out_edges(i), self.in_edge[lo:hi]])
+        other = np.concatenate([self.out_dst[self.out_offsets[i]:self.out_offsets[i + 1]], self.in_src[lo:hi]])
+        return e, other
+
+    def incident_counts(self) -> np.ndarray:
+        """Number of distinct counterparty pairs (in + out) per node, cached per snapshot."""
+        if self._incident_counts is None:
+            self._incident_counts = np.diff(self.out_offsets) + np.diff(self.in_offsets)
+        return self._incident_counts
+
+    def expand(self, nodes: np.ndarray, direction: str = "any") -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """All pairs leaving `nodes` as (edge positions, from node, to node).
+
+        `direction` is "out" (follow src -> dst), "in" (dst -> src) or "any".
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        parts = []
+        if direction in ("out", "any"):
+            pos, owner = _gather(self.out_offsets, nodes)
+            parts.append((pos, nodes[owner], self.out_dst[pos].astype(np.int64)))
+        if direction in ("in", "any"):
+            pos, owner = _gather(self.in_offsets, nodes)
+            parts.append((self.in_edge[pos].astype(np.int64), nodes[owner], self.in_src[pos].astype(np.int64)))
+        if len(parts) == 1:
+            return parts[0]
+        return tuple(np.concatenate(x) for x in zip(*parts))
+
+    def heaviest_incident(self, i: int, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(edge positions, other endpoint) of `i`'s `k` heaviest pairs, heaviest first."""
+        cached = self._hub_top.get(i)
+        if cached is not None and k <= HUB_TOP_K:
+            return cached[0][:k], cached[1][:k]
+        e, other = self.incident(i)
+        hub = len(e) > HUB_DEGREE and k <= HUB_TOP_K
+        w = self.tx_count[e]
+        take = HUB_TOP_K if hub else k
+        if len(e) > take:
+            top = np.argpartition(-w, take - 1)[:take]
+            e, other, w = e[top], other[top], w[top]
+        order = np.argsort(-w, kind="stable")
+        e, other = e[order], other[order]
+        if hub:
+            self._hub_top[i] = (e, other)
+        return e[:k], other[:k]
+
+    def edge_rows(self, e: np.ndarray) -> List[Dict]:
+        src = self.index.decode(self.edge_src(e))
+        dst = self.index.decode(self.out_dst[e])
+        wei = wei_strings(self.value_hi[e], self.value_lo[e])
+        return [{"src": s, "dst": d, "tx_count": int(c), "total_value_wei": v} for s, d, c, v in zip(src, dst, self.tx_count[e], wei)]
+
+    def heaviest(self, e: np.ndarray, limit: int) -> np.ndarray:
+        """The `limit` heaviest edge positions of `e` by tx_count, heaviest first."""
+        if limit <= 0:
+            return e[:0]
+        w = self.tx_count[e]
+        if len(e) > limit:
+            top = np.argpartition(-w, limit - 1)[:limit]
+            e, w = e[top], w[top]
+        return e[np.argsort(-w, kind="stable")]
+
+    def top_nodes(self, limit: int) -> np.ndarray:
+        deg = self.degree()
+        if not len(deg):
+            return np.zeros(0, dtype=np.int64)
+        k = min(limit, len(deg))
+        top = np.argpartition(-deg, k - 1)[:k]
+        return top[np.argsort(-deg[top], kind="stable")]
+
+    def neighbors(self, address: str, limit: int = 25) -> Dict:
+        i = self.index.lookup(address)
+        e, _ = self.incident(i)
+        e = self.heaviest(e, limit)
+        edges = self.edge_rows(e)
+        nodes = {address.lower(), *(x["src"] for x in edges), *(x["dst"] for x in edges)}
+        return {"nodes": [{"id": n} for n in sorted(nodes)], "edges": edges}
+
+    def global_graph(self, limit: int = 80, max_edges: int = 400) -> Dict:
+        top = self.top_nodes(limit)
+        if not len(top):
+            return {"nodes": [], "edges": []}
+        members = np.zeros(self.n_nodes, dtype=bool)
+        members[top] = True
+        e = np.concatenate([self.out_edges(int(i)) for i in top])
+        e = self.heaviest(e[members[self.out_dst[e]]], max_edges)
+        edges = self.edge_rows(e)
+        nodes = {*(x["src"] for x in edges), *(x["dst"] for x in edges)}
+        return {"nodes": [{"id": n} for n in sorted(nodes)], "edges": edges}
+
+    def neighbor_ids(self, ids: np.ndarray, limit: int) -> np.ndarray:
+        """Distinct neighbors of `ids`, heaviest pairs first, at most `limit`."""
+        parts = [self.incident(int(i)) for i in ids]
+        if not parts:
+            return np.zeros(0, dtype=np.int64)
+        e = np.concatenate([p[0] for p in parts])
+        other = np.concatenate([p[1] for p in parts]).astype(np.int64)
+        weight = self.tx_count[e]
+        # Hub neighborhoods run to 1e5+ pairs; rank only the heaviest few
+        # unless duplicates leave fewer than `limit` distinct neighbors.
+        for k in (4 * limit, 32 * limit, 256 * limit, len(e)):
+            if k < len(e):
+                top = np.argpartition(-weight, k)[:k]
+                cand, w = other[top], weight[top]
+            else:
+                cand, w = other, weight
+            cand = cand[np.argsort(-w, kind="stable")]
+            uniq, first = np.unique(cand, return_index=True)
+            if len(uniq) >= limit or k >= len(e):
+                return uniq[np.argsort(first)][:limit]
+        return np.zeros(0, dtype=np.int64)
+
+    def cluster(self, address: str, limit: int = 200) -> Dict:
+        addr = address.lower()
+        i = self.index.lookup(addr)
+        hop1 = self.neighbor_ids(np.array([i]) if i >= 0 else np.zeros(0, np.int64), limit)
+        hop1 = hop1[hop1 != i]
+        hop2 = self.neighbor_ids(hop1, limit)
+        hop1_a, hop2_a = self.index.decode(hop1), self.index.decode(hop2)
+        nodes = {addr, *hop1_a, *hop2_a}
+        return {
+            "center": addr,
+            "hop1_count": len(hop1_a),
+            "hop2_count": len(hop2_a),
+            "nodes": [{"id": n} for n in sorted(nodes)],
+        }
+
+
+def _gather(offsets: np.ndarray, nodes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Concatenated CSR slices of `nodes`: (positions, index into `nodes` of each)."""
+    starts = offsets[nodes]
+    counts = offsets[nodes + 1] - starts
+    owner = np.repeat(np.arange(len(nodes)), counts)
+    pos = np.arange(int(counts.sum()), dtype=np.int64) - np.repeat(np.cumsum(counts) - counts - starts, counts)
+    return pos, owner
+
+
+def _pad(offsets: np.ndarray, n: int) -> np.ndarray:
+    if len(offsets) - 1 >= n:
+        return offsets
+    return np.concatenate([offsets, np.full(n + 1 - len(offsets), offsets[-1], dtype=offsets.dtype)])
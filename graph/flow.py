@@ -0,0 +1,273 @@
+"""Time-ordered value-flow tracing over individual transfers.
+
+Unlike the snapshot traversals, a trace works on single transfers (native
+`transactions` and ERC20 `token_transfers`) because order matters: funds that
+reached an address at block b can only leave it at block b or later. Forward
+traces follow what a source sent on; backward traces follow what funded a
+sink and run the same bookkeeping on the time-reversed flow.
+
+Attribution per node and asset, starting at the first traced arrival
+(earlier balance is unknown and treated as already spent):
+
+- proportional: every outgoing transfer carries the traced share of the
+  balance at that moment (haircut).
+- fifo: arrivals queue up as lots and outgoing transfers drain the oldest
+  lots first.
+
+Outgoing value beyond the known balance came from earlier funds and counts
+as untraced. Assets are never converted into each other. Amounts are exact
+integers (wei or raw token units); a traced share is rounded down to a whole
+unit and the remainder stays with the node that holds it.
+
+The walk is level-synchronous: a hop's frontier is fetched in one call, so a
+node reached again later is processed again with only its new arrivals. Hubs
+are bounded by `max_events` transfers per node and `max_fanout` traced
+transfers onwards; addresses in `stop_at` (infrastructure) receive value but
+are not expanded; transfers carrying less than `min_share` of the traced
+total are dropped. Node, edge and wall-clock budgets stop the walk early with
+`truncated` set and the reason.
+"""
+
+import heapq
+import time
+from collections import defaultdict, deque
+from typing import Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+NATIVE = "native"
+
+# (block_number, asset, from_address, to_address, amount, tx_hash, timestamp)
+Transfer = Tuple[int, str, str, str, int, str, Optional[str]]
+# address -> (lowest block, highest block); returns address -> (transfers, more_available),
+# or None when the remaining time budget ran out.
+Fetch = Callable[[Dict[str, Tuple[Optional[int], Optional[int]]], int, float], Optional[Dict[str, Tuple[List[Transfer], bool]]]]
+
+
+def attribute(
+    node: str,
+    transfers: Sequence[Transfer],
+    arrivals: Optional[Mapping[Tuple[str, str, str], Tuple[int, int]]],
+    mode: str = "proportional",
+    backward: bool = False,
+) -> Tuple[List[Tuple[Transfer, int]], Dict[str, int]]:
+    """Traced part of each onward transfer of `node`, plus the traced balance left per asset.
+
+    `arrivals` maps (tx_hash, asset, counterparty) of traced incoming
+    transfers to (block, traced amount); None marks the trace root, whose onward
+    transfers are traced in full.
+    """
+    if mode not in ("proportional", "fifo"):
+        raise ValueError(f"unknown attribution mode {mode!r}")
+    pending = dict(arrivals or {})
+    sign = -1 if backward else 1
+    events = []  # (time, 0 = in / 1 = out, asset, amount, traced, transfer)
+    for t in transfers:
+        block, asset, src, dst, amount = t[0], t[1], t[2], t[3], int(t[4])
+        if src == dst or amount <= 0:
+            continue
+        onward = (src == node) != backward
+        if onward:
+            events.append((sign * block, 1, asset, amount, 0, t))
+        else:
+            cp = src if not backward else dst
+            traced = int(pending.pop((t[5], asset, cp), (block, 0))[1])
+            events.append((sign * block, 0, asset, amount, min(traced, amount), t))
+    for (_, asset, _), (block, traced) in pending.items():
+        # Arrival outside the fetched window (a busy node): keep it as a bare lot.
+        events.append((sign * block, 0, asset, int(traced), int(traced), None))
+    events.sort(key=lambda e: (e[0], e[1]))
+
+    out: List[Tuple[Transfer, int]] = []
+    held: Dict[str, int] = {}
+    if arrivals is None:
+        return [(e[5], e[3]) for e in events if e[1] == 1], held
+
+    started: Dict[str, bool] = {}
+    total: Dict[str, int] = defaultdict(int)
+    lots: Dict[str, deque] = defaultdict(deque)
+    for _, kind, asset, amount, traced, t in events:
+        if kind == 0:
+            if traced > 0:
+                started[asset] = True
+            if not started.get(asset):
+                continue
+            if mode == "proportional":
+                total[asset] += amount
+                held[asset] = held.get(asset, 0) + traced
+            else:
+                lots[asset].append([amount, traced])
+            continue
+        if not started.get(asset):
+            continue
+        if mode == "proportional":
+            bal = max(total[asset], amount)  # overdraft came from earlier, untraced funds
+            share = held.get(asset, 0) * amount // bal if bal > 0 else 0
+            held[asset] = held.get(asset, 0) - share
+            total[asset] = bal - amount
+        else:
+            share, need, q = 0, amount, lots[asset]
+            while need > 0 and q:
+                lot = q[0]
+                take = min(need, lot[0])
+                part = lot[1] * take // lot[0]
+                share += part
+                lot[0] -= take
+                lot[1] -= part
+                need -= take
+                if lot[0] <= 0:
+                    q.popleft()
+        if share > 0:
+            out.append((t, share))
+    if mode == "fifo":
+        for asset, q in lots.items():
+            held[asset] = sum(lot[1] for lot in q)
+    return out, {a: v for a, v in held.items() if v > 0}
+
+
+def trace(
+    fetch: Fetch,
+    address: str,
+    direction: str = "forward",
+    mode: str = "proportional",
+    from_block: Optional[int] = None,
+    to_block: Optional[int] = None,
+    max_hops: int = 4,
+    max_nodes: int = 200,
+    max_edges: int = 1000,
+    max_events: int = 500,
+    max_fanout: int = 25,
+    min_share: float = 0.001,
+    time_budget_ms: float = 2000.0,
+    stop_at: Optional[Mapping[str, str]] = None,
+) -> Iterator[Dict]:
+    """Trace value from (forward) or into (backward) `address`, yielding events as it expands.
+
+    Events: `node` (an address processed at a hop, with the traced value it
+    received and still holds), `edge` (a transfer carrying traced value),
+    `hop` (a level finished) and a final `done` with totals and the largest
+    remaining holders.
+    """
+    if direction not in ("forward", "backward"):
+        raise ValueError(f"unknown direction {direction!r}")
+    if mode not in ("proportional", "fifo"):
+        raise ValueError(f"unknown attribution mode {mode!r}")
+    t0 = time.perf_counter()
+    deadline = t0 + time_budget_ms / 1000.0
+    backward = direction == "backward"
+    stop_at = stop_at or {}
+    root = address.lower()
+
+    # address -> {(tx_hash, asset, counterparty): (block, traced)} still to process
+    frontier: Dict[str, Optional[Dict[Tuple[str, str, str], Tuple[int, int]]]] = {root: None}
+    bounds: Dict[str, Tuple[Optional[int], Optional[int]]] = {root: (from_block, to_block)}
+    seen = {root}
+    holdings: Dict[Tuple[str, str], int] = defaultdict(int)
+    root_total: Dict[str, int] = {}
+    n_edges = dust = hops = 0
+    truncated, reason = False, None
+
+    for hop in range(1, max_hops + 1):
+        if not frontier:
+            break
+        remaining = (deadline - time.perf_counter()) * 1000.0
+        fetched = fetch(bounds, max_events, remaining) if remaining > 0 else None
+        if fetched is None:
+            truncated, reason = True, "time_budget"
+            break
+        next_frontier: Dict[str, Dict[Tuple[str, str, str], Tuple[int, int]]] = defaultdict(dict)
+        next_bounds: Dict[str, Tuple[int, int]] = {}
+        for node in list(frontier):
+            arrivals = frontier.pop(node)
+            transfers, busy = fetched.get(node, ([], False))
+            onward, held = attribute(node, transfers, arrivals, mode, backward)
+            received: Dict[str, int] = defaultdict(int)
+            for (_, asset, _), (_, v) in (arrivals or {}).items():
+                received[asset] += v
+            for asset, v in held.items():
+                holdings[(node, asset)] += v
+            if arrivals is None:
+                for t, share in onward:
+                    root_total[t[1]] = root_total.get(t[1], 0) + share
+            yield {
+                "type": "node",
+                "address": node,
+                "hop": hop - 1,
+                "received": {a: _amount(v) for a, v in received.items()},
+                "held": {a: _amount(v) for a, v in held.items()},
+                "busy": busy,
+            }
+            keep = [(t, s) for t, s in onward if s >= min_share * root_total.get(t[1], 0)]
+            dust += len(onward) - len(keep)
+            for t, share in heapq.nlargest(max_fanout, keep, key=lambda x: x[1]):
+                if n_edges >= max_edges:
+                    truncated, reason = True, "edge_budget"
+                    break
+                block, asset, src, dst, amount, tx_hash, ts = t
+                nxt = src if backward else dst
+                n_edges += 1
+                yield {
+                    "type": "edge",
+                    "hop": hop,
+                    "src": src,
+                    "dst": dst,
+                    "asset": asset,
+                    "block_number": block,
+                    "timestamp": ts,
+                    "tx_hash": tx_hash,
+                    "amount": _amount(amount),
+                    "traced": _amount(share),
+                }
+                if nxt in stop_at or (nxt not in seen and len(seen) >= max_nodes):
+                    if nxt not in stop_at:
+                        truncated, reason = True, "node_budget"
+                    holdings[(nxt, asset)] += share
+                    continue
+                seen.add(nxt)
+                key = (tx_hash, asset, node)
+                prev = next_frontier[nxt].get(key, (block, 0))[1]
+                next_frontier[nxt][key] = (block, prev + share)
+                lo, hi = next_bounds.get(nxt, (block, block))
+                next_bounds[nxt] = (min(lo, block), max(hi, block))
+            if reason == "edge_budget":
+                break
+            if time.perf_counter() > deadline:
+                truncated, reason = True, "time_budget"
+                break
+        # Nodes left unprocessed by a budget keep what reached them.
+        for node, arrivals in frontier.items():
+            for (_, asset, _), (_, v) in (arrivals or {}).items():
+                holdings[(node, asset)] += v
+        hops = hop
+        frontier = dict(next_frontier)
+        bounds = {a: (lo, to_block) if not backward else (from_block, hi) for a, (lo, hi) in next_bounds.items()}
+        yield {"type": "hop", "hop": hop, "frontier": len(frontier), "edges": n_edges, "elapsed_ms": round((time.perf_counter() - t0) * 1000, 2)}
+        if reason in ("edge_budget", "time_budget"):
+            break
+
+    # Value still in flight after the last hop stays with the frontier.
+    for node, arrivals in frontier.items():
+        for (_, asset, _), (_, v) in (arrivals or {}).items():
+            holdings[(node, asset)] += v
+    top = heapq.nlargest(25, holdings.items(), key=lambda kv: kv[1])
+    yield {
+        "type": "done",
+        "address": root,
+        "direction": direction,
+        "attribution": mode,
+        "node_count": len(seen),
+        "edge_count": n_edges,
+        "hops": hops,
+        "dust_dropped": dust,
+        "traced_total": {a: _amount(v) for a, v in root_total.items()},
+        "holders": [
+            {"address": a, "asset": asset, "held": _amount(v), **({"label": stop_at[a]} if a in stop_at else {})}
+            for (a, asset), v in top
+            if v > 0
+        ],
+        "truncated": truncated,
+        "truncated_reason": reason,
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 2),
+    }
+
+
+def _amount(v: int) -> str:
+    return str(int(v))
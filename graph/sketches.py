@@ -0,0 +1,299 @@
+"""Approximate per-address degree sketches.
+
+Ingest feeds every committed transaction into hourly buckets holding:
+
+- Count-Min sketches for outbound and inbound degree per address. With width
+  `w` and depth `d`, an estimate never undercounts and overcounts by at most
+  `e / w * N` with probability `1 - exp(-d)`, where `N` is the number of
+  events in the queried window. The defaults (w=4096, d=4) give at most
+  0.066% of `N` with 98% probability.
+- A Space-Saving summary of total degree with `k` counters. Any address whose
+  degree exceeds `N / k` is guaranteed to be tracked, and a tracked count
+  overestimates by at most its recorded `error` (<= `N / k`).
+
+Sketches of equal shape merge by addition (Count-Min) and by the upper-bound
+Space-Saving merge, so buckets combine into windows and several ingest
+replicas combine into one view. `to_bytes`/`from_bytes` give a versioned
+snapshot for persistence.
+"""
+
+import base64
+import hashlib
+import heapq
+import json
+import math
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SNAPSHOT_VERSION = 1
+BUCKET_SECONDS = 3600
+
+
+def _hashes(key: str, depth: int, width: int) -> List[int]:
+    h = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=16).digest(), "little")
+    h1, h2 = h & 0xFFFFFFFFFFFFFFFF, (h >> 64) | 1
+    return [(h1 + i * h2) % width for i in range(depth)]
+
+
+class CountMinSketch:
+    def __init__(self, width: int = 4096, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self.table = array("q", bytes(8 * width * depth))
+
+    def add(self, key: str, n: int = 1, idx: Optional[List[int]] = None) -> None:
+        for row, col in enumerate(idx or _hashes(key, self.depth, self.width)):
+            self.table[row * self.width + col] += n
+        self.total += n
+
+    def estimate(self, key: str, idx: Optional[List[int]] = None) -> int:
+        return min(self.table[row * self.width + col] for row, col in enumerate(idx or _hashes(key, self.depth, self.width)))
+
+    def merge(self, other: "CountMinSketch") -> None:
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("cannot merge Count-Min sketches of different shape")
+        t, o = self.table, other.table
+        for i in range(len(t)):
+            t[i] += o[i]
+        self.total += other.total
+
+    def to_dict(self) -> dict:
+        return {"width": self.width, "depth": self.depth, "total": self.total, "table": base64.b64encode(self.table.tobytes()).decode()}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "CountMinSketch":
+        cms = cls(int(d["width"]), int(d["depth"]))
+        cms.total = int(d["total"])
+        cms.table = array("q")
+        cms.table.frombytes(base64.b64decode(d["table"]))
+        return cms
+
+
+class SpaceSaving:
+    def __init__(self, k: int = 1024):
+        self.k = k
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self._heap: List[Tuple[int, str]] = []  # lazy min-heap; stale entries skipped on pop
+
+    def add(self, key: str, n: int = 1) -> None:
+        if key in self.counts:
+            self.counts[key] += n
+            return
+        if len(self.counts) < self.k:
+            self.counts[key] = n
+            self.errors[key] = 0
+            heapq.heappush(self._heap, (n, key))
+            return
+        while True:
+            c, victim = heapq.heappop(self._heap)
+            current = self.counts.get(victim)
+            if current == c:
+                break
+            if current is not None:
+                heapq.heappush(self._heap, (current, victim))
+        del self.counts[victim]
+        self.errors.pop(victim, None)
+        self.counts[key] = c + n
+        self.errors[key] = c
+        heapq.heappush(self._heap, (c + n, key))
+        if len(self._heap) > 4 * self.k:
+            self._rebuild_heap()
+
+    def _rebuild_heap(self) -> None:
+        self._heap = [(c, key) for key, c in self.counts.items()]
+        heapq.heapify(self._heap)
+
+    def _floor(self) -> int:
+        return min(self.counts.values()) if len(self.counts) >= self.k else 0
+
+    def merge(self, other: "SpaceSaving") -> None:
+        f_self, f_other = self._floor(), other._floor()
+        merged = {}
+        for key in set(self.counts) | set(other.counts):
+            c = self.counts.get(key, f_self) + other.counts.get(key, f_other)
+            e = self.errors.get(key, f_self) + other.errors.get(key, f_other)
+            merged[key] = (c, e)
+        keep = sorted(merged.items(), key=lambda kv: kv[1][0], reverse=True)[: self.k]
+        self.counts = {key: c for key, (c, _) in keep}
+        self.errors = {key: e for key, (_, e) in keep}
+        self._rebuild_heap()
+
+    @classmethod
+    def merge_all(cls, summaries: List["SpaceSaving"], k: int) -> "SpaceSaving":
+        """One-pass equivalent of folding `merge` over many summaries."""
+        floors = [s._floor() for s in summaries]
+        base = sum(floors)
+        counts: Dict[str, int] = {}
+        errors: Dict[str, int] = {}
+        for s, f in zip(summaries, floors):
+            for key, c in s.counts.items():
+                counts[key] = counts.get(key, base) + c - f
+                errors[key] = errors.get(key, base) + s.errors.get(key, 0) - f
+        out = cls(k)
+        keep = sorted(counts.items(), key=lambda kv: kv[1], reverse=True)[:k]
+        out.counts = dict(keep)
+        out.errors = {key: errors[key] for key, _ in keep}
+        out._rebuild_heap()
+        return out
+
+    def top(self, n: int) -> List[Tuple[str, int, int]]:
+        ranked = sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)[:n]
+        return [(key, c, self.errors.get(key, 0)) for key, c in ranked]
+
+    def to_dict(self) -> dict:
+        return {"k": self.k, "counts": self.counts, "errors": self.errors}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "SpaceSaving":
+        ss = cls(int(d["k"]))
+        ss.counts = {k: int(v) for k, v in d["counts"].items()}
+        ss.errors = {k: int(v) for k, v in d["errors"].items()}
+        ss._rebuild_heap()
+        return ss
+
+
+class DegreeBucket:
+    def __init__(self, start: int, width: int, depth: int, k: int):
+        self.start = start
+        self.outbound = CountMinSketch(width, depth)
+        self.inbound = CountMinSketch(width, depth)
+        self.heavy = SpaceSaving(k)
+
+    def merge(self, other: "DegreeBucket") -> None:
+        self.outbound.merge(other.outbound)
+        self.inbound.merge(other.inbound)
+        self.heavy.merge(other.heavy)
+
+    def to_dict(self) -> dict:
+        return {"start": self.start, "outbound": self.outbound.to_dict(), "inbound": self.inbound.to_dict(), "heavy": self.heavy.to_dict()}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "DegreeBucket":
+        b = cls.__new__(cls)
+        b.start = int(d["start"])
+        b.outbound = CountMinSketch.from_dict(d["outbound"])
+        b.inbound = CountMinSketch.from_dict(d["inbound"])
+        b.heavy = SpaceSaving.from_dict(d["heavy"])
+        return b
+
+
+class DegreeSketches:
+    """Hourly-bucketed degree sketches retaining `retention_hours` of history."""
+
+    def __init__(self, width: int = 4096, depth: int = 4, k: int = 1024, retention_hours: int = 48):
+        self.width = width
+        self.depth = depth
+        self.k = k
+        self.retention_hours = retention_hours
+        self.buckets: Dict[int, DegreeBucket] = {}
+        self.last_block = -1
+        self._heavy_cache: Dict[Tuple[int, int], SpaceSaving] = {}
+
+    def _bucket(self, ts: float) -> DegreeBucket:
+        start = int(ts // BUCKET_SECONDS) * BUCKET_SECONDS
+        b = self.buckets.get(start)
+        if b is None:
+            b = self.buckets[start] = DegreeBucket(start, self.width, self.depth, self.k)
+            horizon = max(self.buckets) - self.retention_hours * BUCKET_SECONDS
+            for old in [s for s in self.buckets if s <= horizon]:
+                del self.buckets[old]
+        return b
+
+    def add_block(self, block_number: int, timestamp: datetime | float | None, txs: Iterable[Tuple[Optional[str], Optional[str]]]) -> None:
+        if block_number <= self.last_block:
+            return
+        self.last_block = block_number
+        if timestamp is None:
+            return
+        self._heavy_cache.clear()
+        b = self._bucket(timestamp.timestamp() if isinstance(timestamp, datetime) else float(timestamp))
+        for from_a, to_a in txs:
+            if from_a:
+                b.outbound.add(from_a.lower())
+                b.heavy.add(from_a.lower())
+            if to_a:
+                b.inbound.add(to_a.lower())
+                b.heavy.add(to_a.lower())
+
+    def _range(self, hours: int, now: Optional[float]) -> List[DegreeBucket]:
+        head = int((now if now is not None else max(self.buckets)) // BUCKET_SECONDS) * BUCKET_SECONDS
+        lo = head - (hours - 1) * BUCKET_SECONDS
+        return [b for start, b in self.buckets.items() if lo <= start <= head]
+
+    def _estimate(self, buckets: List[DegreeBucket], address: str) -> Tuple[int, int]:
+        # Count-Min over a window: per-row sums across buckets, then the row minimum.
+        idx = _hashes(address, self.depth, self.width)
+        cells = [row * self.width + col for row, col in enumerate(idx)]
+        out_c = min(sum(b.outbound.table[c] for b in buckets) for c in cells)
+        in_c = min(sum(b.inbound.table[c] for b in buckets) for c in cells)
+        return out_c, in_c
+
+    def top_degree(self, n: int = 20, hours: int = 24, now: Optional[float] = None) -> List[dict]:
+        if not self.buckets:
+            return []
+        buckets = self._range(hours, now)
+        key = (min((b.start for b in buckets), default=0), hours)
+        heavy = self._heavy_cache.get(key)
+        if heavy is None:
+            heavy = self._heavy_cache[key] = SpaceSaving.merge_all([b.heavy for b in buckets], self.k)
+        out = []
+        for addr, count, err in heavy.top(n * 2):
+            out_c, in_c = self._estimate(buckets, addr)
+            out.append({"address": addr, "degree": min(count, out_c + in_c), "outbound": out_c, "inbound": in_c, "max_error": err})
+        out.sort(key=lambda r: r["degree"], reverse=True)
+        return out[:n]
+
+    def degree(self, address: str, hours: int = 24, now: Optional[float] = None) -> dict:
+        a = address.lower()
+        if not self.buckets:
+            return {"address": a, "outbound": 0, "inbound": 0}
+        out_c, in_c = self._estimate(self._range(hours, now), a)
+        return {"address": a, "outbound": out_c, "inbound": in_c}
+
+    def error_bounds(self, hours: int = 24, now: Optional[float] = None) -> dict:
+        """Additive error bounds for the window, in degree units."""
+        buckets = self._range(hours, now) if self.buckets else []
+        events = sum(b.outbound.total + b.inbound.total for b in buckets)
+        return {
+            "events": events,
+            "count_min_overcount_max": round(math.e / self.width * events, 2),
+            "count_min_confidence": round(1 - math.exp(-self.depth), 4),
+            "space_saving_overcount_max": round(events / self.k, 2),
+        }
+
+    def merge(self, other: "DegreeSketches") -> None:
+        if (self.width, self.depth, self.k) != (other.width, other.depth, other.k):
+            raise ValueError("cannot merge sketches of different shape")
+        self._heavy_cache.clear()
+        for start, b in other.buckets.items():
+            if start in self.buckets:
+                self.buckets[start].merge(b)
+            else:
+                self.buckets[start] = DegreeBucket.from_dict(b.to_dict())
+        self.last_block = max(self.last_block, other.last_block)
+
+    def to_bytes(self) -> bytes:
+        return json.dumps({
+            "version": SNAPSHOT_VERSION,
+            "width": self.width,
+            "depth": self.depth,
+            "k": self.k,
+            "retention_hours": self.retention_hours,
+            "last_block": self.last_block,
+            "buckets": [b.to_dict() for b in self.buckets.values()],
+        }, separators=(",", ":")).encode()
+
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> "DegreeSketches":
+        d = json.loads(bytes(raw))
+        if d.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"unsupported sketch snapshot version: {d.get('version')}")
+        s = cls(int(d["width"]), int(d["depth"]), int(d["k"]), int(d["retention_hours"]))
+        s.last_block = int(d["last_block"])
+        for bd in d["buckets"]:
+            b = DegreeBucket.from_dict(bd)
+            s.buckets[b.start] = b
+        return s
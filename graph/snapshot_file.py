@@ -0,0 +1,155 @@
+"""Versioned on-disk format for `CSRGraph` snapshots, opened with mmap.
+
+A builder process writes the snapshot; every API worker maps the same file
+read-only, so the arrays live once in the page cache and are shared across
+processes instead of being rebuilt from Postgres and held privately by
+each worker.
+
+Layout (little endian):
+
+- 32-byte prefix: magic `BTGRAPH\\0`, format version (u32), header length
+  (u32), CRC32 of the header (u32), zero padding.
+- JSON header: watermark, node and edge counts, creation time, CRC32 of the
+  payload and, per array, its name, dtype, length and byte offset.
+- Payload from the first 4 KiB boundary after the header: the arrays of
+  `ARRAYS` back to back, each 64-byte aligned.
+
+Version 2 stores edge values as exact `value_hi`/`value_lo` uint64 limbs;
+version 1 files held lossy float64 `value_wei` and are rejected, so the
+builder rebuilds them from Postgres instead of resuming.
+
+The layout is not graph specific: `write_arrays` / `open_arrays` store any
+named arrays under another magic (features/store.py uses them).
+
+`write_snapshot` writes to a temporary file in the same directory, fsyncs
+it and renames it over the target, so readers see either the old or the
+new snapshot, never a partial one. A reader keeps its mapping (and the old
+inode) until it drops the graph. Arrays of an opened snapshot are read-only:
+`CSRGraph.merge` copies, so a mapped snapshot can still be extended in
+memory.
+"""
+
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+from graph.csr import AddressIndex, CSRGraph
+
+MAGIC = b"BTGRAPH\x00"
+FORMAT_VERSION = 2
+_PREFIX = struct.Struct("<8sIII12x")
+_PAGE = 4096
+_ALIGN = 64
+ARRAYS = ("addresses", "order", "out_offsets", "out_dst", "tx_count", "value_hi", "value_lo", "first_ts", "last_ts", "in_offsets", "in_src", "in_edge")
+
+
+def _align(n: int, to: int) -> int:
+    return -(-n // to) * to
+
+
+def _arrays(graph: CSRGraph) -> Dict[str, np.ndarray]:
+    cols = {"addresses": graph.index.addresses, "order": graph.index.order}
+    cols.update({k: getattr(graph, k) for k in ARRAYS if k not in cols})
+    return cols
+
+
+def write_arrays(path: str, arrays: Dict[str, np.ndarray], meta: Dict[str, Any], magic: bytes = MAGIC, version: int = FORMAT_VERSION) -> Dict[str, Any]:
+    """Atomically write named `arrays` in this layout, `meta` merged into the header; returns the header.
+
+    Shared by every mmap-able file of the service (graph snapshots, the
+    feature store); `magic` and `version` tell the formats apart.
+    """
+    cols = {k: np.ascontiguousarray(v) for k, v in arrays.items()}
+    layout, offset, crc = [], 0, 0
+    for name, a in cols.items():
+        layout.append({"name": name, "dtype": a.dtype.str, "length": len(a), "offset": offset})
+        offset = _align(offset + a.nbytes, _ALIGN)
+        crc = zlib.crc32(memoryview(a).cast("B"), crc)
+    header = dict(meta, created_at=time.time(), payload_crc32=crc, arrays=layout)
+    raw = json.dumps(header, separators=(",", ":")).encode()
+    start = _align(_PREFIX.size + len(raw), _PAGE)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(_PREFIX.pack(magic, version, len(raw), zlib.crc32(raw)))
+            f.write(raw)
+            for entry in layout:
+                f.seek(start + entry["offset"])
+                f.write(memoryview(cols[entry["name"]]).cast("B"))
+            f.truncate(start + offset)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    dir_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+    return header
+
+
+def write_snapshot(graph: CSRGraph, path: str) -> Dict[str, Any]:
+    """Atomically write `graph` to `path`; returns the header."""
+    meta = {"watermark": int(graph.watermark), "nodes": graph.n_nodes, "edges": graph.n_edges}
+    return write_arrays(path, _arrays(graph), meta)
+
+
+def read_header(buf, magic: bytes = MAGIC, version: int = FORMAT_VERSION, kind: str = "graph snapshot") -> Tuple[Dict[str, Any], int]:
+    """(header, payload start) of a mapped file; ValueError when it is not a valid `kind`."""
+    if len(buf) < _PREFIX.size:
+        raise ValueError(f"{kind} truncated")
+    found, found_version, length, crc = _PREFIX.unpack_from(buf, 0)
+    if found != magic:
+        raise ValueError(f"not a {kind}")
+    if found_version != version:
+        raise ValueError(f"unsupported {kind} version {found_version} (expected {version})")
+    raw = bytes(buf[_PREFIX.size:_PREFIX.size + length])
+    if len(raw) != length or zlib.crc32(raw) != crc:
+        raise ValueError(f"{kind} header checksum mismatch")
+    return json.loads(raw), _align(_PREFIX.size + length, _PAGE)
+
+
+def open_arrays(
+    path: str, magic: bytes = MAGIC, version: int = FORMAT_VERSION, kind: str = "graph snapshot", verify: bool = False
+) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """Map `path` read-only as ({name: array}, header); `verify` also checks the payload CRC (reads every page)."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+    header, start = read_header(mm, magic, version, kind)
+    cols, crc = {}, 0
+    for entry in header["arrays"]:
+        dtype = np.dtype(entry["dtype"])
+        end = start + entry["offset"] + dtype.itemsize * entry["length"]
+        if end > size:
+            raise ValueError(f"{kind} truncated")
+        cols[entry["name"]] = np.frombuffer(mm, dtype=dtype, count=entry["length"], offset=start + entry["offset"])
+        if verify:
+            crc = zlib.crc32(memoryview(cols[entry["name"]]).cast("B"), crc)
+    if verify and crc != header["payload_crc32"]:
+        raise ValueError(f"{kind} payload checksum mismatch")
+    return cols, header
+
+
+def open_snapshot(path: str, verify: bool = False) -> Tuple[CSRGraph, Dict[str, Any]]:
+    """Map `path` read-only as a `CSRGraph`; `verify` also checks the payload CRC (reads every page)."""
+    cols, header = open_arrays(path, verify=verify)
+    missing = set(ARRAYS) - set(cols)
+    if missing:
+        raise ValueError(f"graph snapshot lacks arrays: {sorted(missing)}")
+    graph = CSRGraph(
+        AddressIndex(cols.pop("addresses"), cols.pop("order")),
+        **cols,
+        watermark=int(header["watermark"]),
+    )
+    return graph, header
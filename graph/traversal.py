@@ -0,0 +1,116 @@
+"""Bounded traversals over a `CSRGraph` snapshot.
+
+Each hop keeps only the heaviest pairs (by tx_count) of every frontier node
+and at most `frontier_cap` new nodes, so hubs such as WETH cannot blow up the
+result. Addresses in `skip` (by default the infrastructure contracts in
+BASE_KNOWN_LABELS) are reported as leaves but never expanded. Node and
+wall-clock budgets stop the walk early; the partial result is returned with
+`truncated` set and the reason.
+"""
+
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from graph.csr import CSRGraph
+from labels.known_entities import BASE_KNOWN_LABELS
+
+INFRA_ADDRESSES = frozenset(BASE_KNOWN_LABELS)
+
+
+def skip_ids(graph: CSRGraph, addresses: Iterable[str]) -> np.ndarray:
+    ids = graph.index.lookup_many(list(addresses)) if addresses else np.zeros(0, np.int64)
+    return ids[ids >= 0]
+
+
+def bounded_bfs(
+    graph: CSRGraph,
+    address: str,
+    depth: int = 2,
+    frontier_cap: int = 25,
+    max_nodes: int = 500,
+    time_budget_ms: float = 150.0,
+    skip: Optional[Iterable[str]] = INFRA_ADDRESSES,
+    max_edges: int = 2000,
+) -> Dict:
+    """Breadth-first neighborhood of `address` up to `depth` hops.
+
+    Returns the heaviest `max_edges` pairs among the reached nodes;
+    `edges_truncated` says whether more existed.
+    """
+    t0 = time.perf_counter()
+    deadline = t0 + time_budget_ms / 1000.0
+    addr = address.lower()
+    seed = graph.index.lookup(addr)
+    if seed < 0:
+        return {"nodes": [{"id": addr, "hop": 0}], "edges": [], "hops": 0, "truncated": False, "truncated_reason": None, "edges_truncated": False, "elapsed_ms": 0.0}
+
+    hop_of = np.full(graph.n_nodes, -1, dtype=np.int8)
+    hop_of[seed] = 0
+    skipped = np.zeros(graph.n_nodes, dtype=bool)
+    skipped[skip_ids(graph, skip or ())] = True
+    skipped[seed] = False
+    order_seen = [np.array([seed])]
+    n_seen = 1
+    edges: List[np.ndarray] = []
+    frontier = np.array([seed])
+    truncated, reason, hops_done = False, None, 0
+
+    for hop in range(1, depth + 1):
+        if not len(frontier):
+            break
+        cand_e, cand_other = [], []
+        for i in frontier.tolist():
+            if time.perf_counter() > deadline:
+                truncated, reason = True, "time_budget"
+                break
+            e, other = graph.heaviest_incident(i, frontier_cap)
+            cand_e.append(e)
+            cand_other.append(other)
+        if not cand_e:
+            break
+        e = np.concatenate(cand_e)
+        other = np.concatenate(cand_other).astype(np.int64)
+        order = np.argsort(-graph.tx_count[e], kind="stable")
+        e, other = e[order], other[order]
+
+        # New nodes in weight order: expandable ones are capped at frontier_cap,
+        # skipped (infrastructure) ones ride along as leaves.
+        fresh = other[hop_of[other] < 0]
+        uniq, first = np.unique(fresh, return_index=True)
+        fresh = uniq[np.argsort(first)]
+        expandable = fresh[~skipped[fresh]][:frontier_cap]
+        added = np.concatenate([expandable, fresh[skipped[fresh]]])
+        if n_seen + len(added) > max_nodes:
+            keep_new = np.isin(fresh, added)
+            added = fresh[keep_new][: max(0, max_nodes - n_seen)]
+            expandable = added[~skipped[added]]
+            truncated, reason = True, reason or "node_budget"
+        hop_of[added] = hop
+        order_seen.append(added)
+        n_seen += len(added)
+        edges.append(e[hop_of[other] >= 0])
+        frontier = expandable
+        hops_done = hop
+        if truncated:
+            break
+
+    e = np.unique(np.concatenate(edges)) if edges else np.zeros(0, np.int64)
+    edges_truncated = len(e) > max_edges
+    e = graph.heaviest(e, max_edges)
+    ids = np.concatenate(order_seen)
+    nodes = [
+        {"id": n, "hop": int(hop_of[i]), **({"skipped": True} if skipped[i] else {})}
+        for n, i in zip(graph.index.decode(ids), ids.tolist())
+    ]
+    nodes.sort(key=lambda x: (x["hop"], x["id"]))
+    return {
+        "nodes": nodes,
+        "edges": graph.edge_rows(e),
+        "hops": hops_done,
+        "truncated": truncated,
+        "truncated_reason": reason,
+        "edges_truncated": edges_truncated,
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 2),
+    }
@@ -5,9 +5,13 @@ Features:
 - adaptive eth_getLogs chunking for ERC20 Transfer backfills
 - dead-letter tracking in ingest_failures
 - replay mode for failed ranges
+- optional streaming alert evaluation per committed block (ALERT_STREAMING=1)
+- optional approximate degree sketches per committed block, caught up from
+  committed transactions on startup (DEGREE_SKETCHES=1)
 """
 
 import os
+import socket
 import time
 from datetime import datetime, timezone
 
@@ -15,6 +19,11 @@ import httpx
 import psycopg2
 from dotenv import load_dotenv
 
+from alerts.engine import StreamingAlertEngine
+from api.services.alert_service import get_thresholds, persist_candidates
+from api.services.label_service import mark_dirty
+from graph.sketches import DegreeSketches
+
 TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55aebf8a5b84"
 
 
@@ -151,6 +160,7 @@ def ingest_block_txs(conn, client, rpc_urls: list[str], block_number: int):
     txs = block.get("transactions", [])
     cur = conn.cursor()
     tx_count = 0
+    touched = set()
 
     for tx in txs:
         tx_hash = tx.get("hash")
@@ -173,6 +183,7 @@ def ingest_block_txs(conn, client, rpc_urls: list[str], block_number: int):
             upsert_address(cur, to_a, block_number, tx_inc=0, deploy_inc=0)
         if from_a and deploy_inc:
             upsert_address(cur, from_a, block_number, tx_inc=0, deploy_inc=1)
+        touched.update((from_a, to_a))
 
         if from_a and to_a:
             cur.execute(
@@ -185,6 +196,7 @@ def ingest_block_txs(conn, client, rpc_urls: list[str], block_number: int):
 
         tx_count += 1
 
+    mark_dirty(cur, touched)  # relabel queue (migration 0015)
     set_state(conn, "current_rpc", rpc_used)
     set_state(conn, "last_rpc_attempt", str(rpc_attempt))
     return tx_count
@@ -279,6 +291,133 @@ def replay_failures(conn, client, rpc_urls: list[str], max_rows: int = 25):
     return resolved, len(rows)
 
 
+def committed_block_txs(conn, block_number: int):
+    """Return `(timestamp, [(from, to), ...])` for a committed block."""
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT from_address, to_address, timestamp FROM transactions WHERE block_number=%s",
+        (block_number,),
+    )
+    rows = cur.fetchall()
+    ts = rows[0][2] if rows else None
+    return ts, [(f, t) for f, t, _ in rows]
+
+
+def load_degree_sketches(conn, replica: str) -> DegreeSketches:
+    cur = conn.cursor()
+    cur.execute("SELECT payload FROM degree_sketches WHERE replica=%s", (replica,))
+    row = cur.fetchone()
+    conn.commit()
+    if row:
+        try:
+            return DegreeSketches.from_bytes(row[0])
+        except ValueError as e:
+            print(f"[sketches] snapshot unreadable, starting empty: {e}")
+    return DegreeSketches()
+
+
+def seed_degree_sketches(conn, replica: str) -> DegreeSketches:
+    sketches = load_degree_sketches(conn, replica)
+    last = get_state_int(conn, "last_block", -1)
+    if sketches.last_block < last:
+        blocks = catch_up_degree_sketches(conn, sketches, last)
+        save_degree_sketches(conn, replica, sketches)
+        conn.commit()
+        print(f"[sketches] caught up to block={last} blocks={blocks}")
+    return sketches
+
+
+def save_degree_sketches(conn, replica: str, sketches: DegreeSketches):
+    cur = conn.cursor()
+    cur.execute(
+        """
+        INSERT INTO degree_sketches(replica, last_block, payload, updated_at)
+        VALUES(%s, %s, %s, now())
+        ON CONFLICT (replica) DO UPDATE SET
+          last_block = EXCLUDED.last_block, payload = EXCLUDED.payload, updated_at = now()
+        """,
+        (replica, sketches.last_block, psycopg2.Binary(sketches.to_bytes())),
+    )
+
+
+def catch_up_degree_sketches(conn, sketches: DegreeSketches, upto_block: int) -> int:
+    """Replay committed blocks the sketches have not seen; only their retention window matters.
+
+    A missing snapshot seeds from the last `retention_hours` of transactions, and a
+    snapshot saved a few blocks back picks up the blocks committed since.
+    """
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT block_number, from_address, to_address, timestamp
+        FROM transactions
+        WHERE block_number > %s AND block_number <= %s
+          AND timestamp >= now() - make_interval(hours => %s)
+        ORDER BY block_number
+        """,
+        (sketches.last_block, upto_block, sketches.retention_hours),
+    )
+    blocks = 0
+    block, ts, txs = None, None, []
+    for bn, from_a, to_a, t in cur.fetchall():
+        if bn != block and block is not None:
+            sketches.add_block(int(block), ts, txs)
+            blocks += 1
+            txs = []
+        block, ts = bn, t
+        txs.append((from_a, to_a))
+    if block is not None:
+        sketches.add_block(int(block), ts, txs)
+        blocks += 1
+    sketches.last_block = max(sketches.last_block, upto_block)
+    return blocks
+
+
+def catch_up_alert_engine(conn, engine: StreamingAlertEngine, upto_block: int) -> list[dict]:
+    """Replay committed blocks the engine has not seen; only the last 48h matter."""
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT block_number, from_address, to_address, timestamp
+        FROM transactions
+        WHERE block_number > %s AND block_number <= %s
+          AND timestamp >= now() - interval '48 hours'
+        ORDER BY block_number
+        """,
+        (engine.last_block, upto_block),
+    )
+    candidates = []
+    block, ts, txs = None, None, []
+    for bn, from_a, to_a, t in cur.fetchall():
+        if bn != block and block is not None:
+            candidates.extend(engine.consume_block(int(block), ts, txs))
+            txs = []
+        block, ts = bn, t
+        txs.append((from_a, to_a))
+    if block is not None:
+        candidates.extend(engine.consume_block(int(block), ts, txs))
+    engine.last_block = max(engine.last_block, upto_block)
+    return candidates
+
+
+def load_alert_engine(conn, checkpoint_path: str, bucket_seconds: int) -> StreamingAlertEngine:
+    thresholds = get_thresholds()
+    engine = None
+    try:
+        engine = StreamingAlertEngine.restore(checkpoint_path, thresholds)
+    except Exception as e:
+        print(f"[alerts] checkpoint unreadable, rebuilding: {e}")
+    if engine is None:
+        engine = StreamingAlertEngine(thresholds, bucket_seconds=bucket_seconds)
+    last = get_state_int(conn, "last_block", -1)
+    if engine.last_block < last:
+        candidates = catch_up_alert_engine(conn, engine, last)
+        persist_candidates(candidates, thresholds)
+        engine.checkpoint(checkpoint_path)
+        print(f"[alerts] engine caught up to block={last} candidates={len(candidates)}")
+    return engine
+
+
 def run_ingest_loop():
     load_dotenv()
 
@@ -291,10 +430,25 @@ def run_ingest_loop():
     start_block_env = int(os.getenv("INGEST_START_BLOCK", "0"))
     log_chunk = int(os.getenv("INGEST_LOG_CHUNK", "200"))
     replay_mode = os.getenv("INGEST_REPLAY_MODE", "0") == "1"
+    alert_streaming = os.getenv("ALERT_STREAMING", "0") == "1"
+    checkpoint_path = os.getenv("ALERT_ENGINE_CHECKPOINT", "state/alert_engine.json")
+    checkpoint_every = int(os.getenv("ALERT_ENGINE_CHECKPOINT_EVERY", "25"))
+    bucket_seconds = int(os.getenv("ALERT_ENGINE_BUCKET_SECONDS", "300"))
+    degree_sketches = os.getenv("DEGREE_SKETCHES", "0") == "1"
+    replica = os.getenv("INGEST_REPLICA_ID", socket.gethostname())
 
     conn = psycopg2.connect(dsn)
     ensure_state(conn)
 
+    engine = None
+    if alert_streaming and not replay_mode:
+        engine = load_alert_engine(conn, checkpoint_path, bucket_seconds)
+    sketches = None
+    if degree_sketches and not replay_mode:
+        sketches = seed_degree_sketches(conn, replica)
+    thresholds_loaded_at = time.time()
+    blocks_since_checkpoint = 0
+
     with httpx.Client() as client:
         while True:
             try:
@@ -322,10 +476,36 @@ def run_ingest_loop():
 
                 if nxt <= safe_head:
                     txc = ingest_block_txs(conn, client, rpc_urls, nxt)
+                    conn.cursor().execute("SELECT rollup_edge_buckets()")  # hourly edge buckets (migration 0012)
                     set_state(conn, "last_block", str(nxt))
                     conn.commit()
                     print(f"[ingest] tx block={nxt} tx={txc}")
 
+                    if engine is not None or sketches is not None:
+                        block_ts, block_txs = committed_block_txs(conn, nxt)
+                        conn.commit()
+                        blocks_since_checkpoint += 1
+                        checkpoint_due = blocks_since_checkpoint >= checkpoint_every
+                        if checkpoint_due:
+                            blocks_since_checkpoint = 0
+
+                    if engine is not None:
+                        if time.time() - thresholds_loaded_at > 60:
+                            engine.thresholds = get_thresholds()
+                            thresholds_loaded_at = time.time()
+                        candidates = engine.consume_block(nxt, block_ts, block_txs)
+                        if candidates:
+                            persist_candidates(candidates, engine.thresholds)
+                            print(f"[alerts] block={nxt} candidates={len(candidates)}")
+                        if checkpoint_due:
+                            engine.checkpoint(checkpoint_path)
+
+                    if sketches is not None:
+                        sketches.add_block(nxt, block_ts, block_txs)
+                        if checkpoint_due:
+                            save_degree_sketches(conn, replica, sketches)
+                            conn.commit()
+
                 if logs_next <= safe_head:
                     end = min(safe_head, logs_next + log_chunk - 1)
                     trc = fetch_logs_adaptive(conn, client, rpc_urls, logs_next, end)
@@ -0,0 +1,124 @@
+"""Label rule expressions: parse once, evaluate as NumPy columns or as SQL.
+
+The language is the one `labels.taxonomy` was already written in:
+
+    inbound_edges > 500 AND outbound_edges < inbound_edges * 0.15
+    min(0.95, 0.6 + contracts_deployed * 0.05)
+
+- names are feature columns (`labels.rules.FEATURES`),
+- integer and decimal literals,
+- `+ - *` and unary minus,
+- one comparison per operand pair (`> >= < <= == !=`),
+- `AND` / `OR` / `NOT`, parentheses,
+- `min(...)` / `max(...)`.
+
+Division is left out on purpose: it is the one operator whose integer,
+float and zero-divisor behaviour differs between Postgres and NumPy.
+Both targets evaluate integers as 64-bit integers and decimals as IEEE
+doubles, so a rule selects the same rows in either.
+"""
+
+import ast
+import re
+from typing import Callable, Dict, Iterable, NamedTuple
+
+import numpy as np
+
+_KEYWORDS = re.compile(r"\b(AND|OR|NOT)\b")
+_BINOPS = {ast.Add: ("+", np.add), ast.Sub: ("-", np.subtract), ast.Mult: ("*", np.multiply)}
+_CMPOPS = {
+    ast.Gt: (">", np.greater), ast.GtE: (">=", np.greater_equal), ast.Lt: ("<", np.less),
+    ast.LtE: ("<=", np.less_equal), ast.Eq: ("=", np.equal), ast.NotEq: ("<>", np.not_equal),
+}
+_FUNCS = {"min": ("LEAST", np.minimum), "max": ("GREATEST", np.maximum)}
+
+
+class Expr(NamedTuple):
+    """A checked expression: its source, the SQL text and a column evaluator."""
+
+    text: str
+    names: frozenset
+    sql: str
+    boolean: bool
+    evaluate: Callable[[Dict[str, np.ndarray]], np.ndarray]
+
+    def __call__(self, cols: Dict[str, np.ndarray]) -> np.ndarray:
+        return self.evaluate(cols)
+
+
+def _fold(fn, parts):
+    def run(cols):
+        out = parts[0](cols)
+        for p in parts[1:]:
+            out = fn(out, p(cols))
+        return out
+    return run
+
+
+def _compile(node: ast.AST, names: frozenset, used: set) -> tuple:
+    """(sql, is_boolean, evaluator) for one node, or ValueError for anything outside the language."""
+    if isinstance(node, ast.BoolOp):
+        parts = [_compile(v, names, used) for v in node.values]
+        if not all(b for _, b, _ in parts):
+            raise ValueError("AND/OR operands must be comparisons")
+        op, fn = ("AND", np.logical_and) if isinstance(node.op, ast.And) else ("OR", np.logical_or)
+        return "(" + f" {op} ".join(s for s, _, _ in parts) + ")", True, _fold(fn, [e for _, _, e in parts])
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        sql, boolean, ev = _compile(node.operand, names, used)
+        if not boolean:
+            raise ValueError("NOT needs a comparison")
+        return f"(NOT {sql})", True, lambda cols: np.logical_not(ev(cols))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        sql, boolean, ev = _compile(node.operand, names, used)
+        if boolean:
+            raise ValueError("cannot negate a comparison")
+        return f"(-{sql})", False, lambda cols: np.negative(ev(cols))
+    if isinstance(node, ast.Compare):
+        if len(node.ops) != 1 or type(node.ops[0]) not in _CMPOPS:
+            raise ValueError("write chained comparisons with AND")
+        (ls, lb, le), (rs, rb, re_) = _compile(node.left, names, used), _compile(node.comparators[0], names, used)
+        if lb or rb:
+            raise ValueError("comparison operands must be numeric")
+        op, fn = _CMPOPS[type(node.ops[0])]
+        return f"({ls} {op} {rs})", True, lambda cols: fn(le(cols), re_(cols))
+    if isinstance(node, ast.BinOp):
+        if type(node.op) not in _BINOPS:
+            raise ValueError(f"unsupported operator {type(node.op).__name__}")
+        (ls, lb, le), (rs, rb, re_) = _compile(node.left, names, used), _compile(node.right, names, used)
+        if lb or rb:
+            raise ValueError("arithmetic operands must be numeric")
+        op, fn = _BINOPS[type(node.op)]
+        return f"({ls} {op} {rs})", False, lambda cols: fn(le(cols), re_(cols))
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in _FUNCS or node.keywords or len(node.args) < 2:
+            raise ValueError("only min(a, b, ...) and max(a, b, ...) can be called")
+        parts = [_compile(a, names, used) for a in node.args]
+        if any(b for _, b, _ in parts):
+            raise ValueError(f"{node.func.id}() arguments must be numeric")
+        sql_fn, fn = _FUNCS[node.func.id]
+        return f"{sql_fn}({', '.join(s for s, _, _ in parts)})", False, _fold(fn, [e for _, _, e in parts])
+    if isinstance(node, ast.Name):
+        if node.id not in names:
+            raise ValueError(f"unknown feature {node.id!r}")
+        used.add(node.id)
+        return node.id, False, lambda cols: np.asarray(cols[node.id], dtype=np.int64)
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        v = node.value
+        # float8 on the SQL side: a bare decimal literal would be exact NUMERIC there.
+        return (str(v) if isinstance(v, int) else f"{v!r}::float8"), False, lambda cols: v
+    raise ValueError(f"unsupported syntax: {ast.dump(node)[:60]}")
+
+
+def compile_expr(text: str, names: Iterable[str]) -> Expr:
+    """Parse and check `text` against the feature `names`; raises ValueError."""
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError("empty expression")
+    if re.search(r"\b(and|or|not|in|is|if|lambda)\b", text):
+        raise ValueError("use AND / OR / NOT")
+    try:
+        tree = ast.parse(_KEYWORDS.sub(lambda m: m.group(1).lower(), text), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"syntax error in {text!r}: {e.msg}") from None
+    used: set = set()
+    sql, boolean, evaluate = _compile(tree.body, frozenset(names), used)
+    return Expr(text, frozenset(used), sql, boolean, evaluate)
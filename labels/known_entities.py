@@ -1,3 +1,33 @@
+"""Known-entity registry: built-in Base system contracts plus external label files.
+
+KNOWN_ENTITIES_PATH names a CSV / JSONL file (optionally .gz) or a directory
+of them. Each row has `address` and `label` (a known-sourced label of
+`labels.taxonomy`), optionally `name` and `source` (default: the file
+name). Rows with a malformed address or a label outside the taxonomy are
+counted and skipped.
+
+Entries are held in flat arrays rather than dicts: raw 20-byte addresses
+sorted for binary search (an address may carry several labels), small
+integer label/source codes, names in one UTF-8 blob, and a Bloom filter
+over the addresses so the common "not known" answer costs a few bit
+probes. `registry()` re-stats the files at most every
+KNOWN_ENTITIES_RELOAD_SECONDS and swaps in a rebuilt registry when any
+changed; readers keep the one they already hold.
+"""
+
+import csv
+import gzip
+import io
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from labels.taxonomy import LABEL_TAXONOMY
+
 BASE_KNOWN_LABELS = {
     "0x4200000000000000000000000000000000000010": "bridge",  # L2StandardBridge
     "0x4200000000000000000000000000000000000007": "bridge",  # L2CrossDomainMessenger
@@ -6,3 +36,294 @@ BASE_KNOWN_LABELS = {
     "0x420000000000000000000000000000000000001a": "treasury",  # L1FeeVault
     "0x4200000000000000000000000000000000000006": "router",  # WETH9 (infra proxy)
 }
+BASE_SOURCE = "base_known_system_contracts"
+KNOWN_LABELS = tuple(k for k, v in LABEL_TAXONOMY.items() if "known" in v["source"])
+
+KEY_DTYPE = np.dtype("S20")
+BLOOM_BITS_PER_ENTRY = 10  # ~1% false positives with 7 probes
+BLOOM_PROBES = 7
+_M64 = (1 << 64) - 1
+
+
+def _mix(x):
+    """splitmix64 finalizer; works on Python ints and uint64 arrays alike."""
+    x = (x ^ (x >> 30)) * 0xBF58476D1CE4E5B9 & _M64
+    x = (x ^ (x >> 27)) * 0x94D049BB133111EB & _M64
+    return x ^ (x >> 31)
+
+
+def _key(address: str) -> Optional[bytes]:
+    a = (address or "").strip()
+    if len(a) != 42 or a[:2] not in ("0x", "0X"):
+        return None
+    try:
+        return bytes.fromhex(a[2:])
+    except ValueError:
+        return None
+
+
+class KnownEntities:
+    def __init__(self, keys, label_ids, source_ids, name_offsets, names: bytes, sources: Tuple[str, ...], bloom_bits: int):
+        self.keys = keys
+        self.label_ids = label_ids
+        self.source_ids = source_ids
+        self.name_offsets = name_offsets
+        self.names = names
+        self.sources = sources
+        self.bloom_mask = (1 << bloom_bits) - 1
+        self.bloom = np.zeros(max(1, (1 << bloom_bits) // 64), dtype=np.uint64)
+        if len(keys):
+            h1, h2 = self._hashes(keys)
+            for i in range(BLOOM_PROBES):
+                pos = (h1 + np.uint64(i) * h2) & np.uint64(self.bloom_mask)
+                np.bitwise_or.at(self.bloom, pos >> np.uint64(6), np.uint64(1) << (pos & np.uint64(63)))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @classmethod
+    def build(cls, records: Iterable[Tuple[str, str, str, str]], stats: Optional[Dict[str, int]] = None) -> "KnownEntities":
+        """Registry of (address, label, source, name) records; repeated (address, label) pairs keep the first.
+
+        Malformed records are skipped and counted in `stats["rejected"]`.
+        """
+        keys, label_ids, source_ids, names, sources = [], [], [], [], {}
+        label_index = {lb: i for i, lb in enumerate(KNOWN_LABELS)}
+        rejected = 0
+        for address, label, source, name in records:
+            key = _key(address)
+            if key is None or label not in label_index:
+                rejected += 1
+                continue
+            keys.append(key)
+            label_ids.append(label_index[label])
+            source_ids.append(sources.setdefault(source, len(sources)))
+            names.append((name or "").encode())
+        if stats is not None:
+            stats["rejected"] = stats.get("rejected", 0) + rejected
+        keys = np.array(keys, dtype=KEY_DTYPE)
+        label_ids = np.array(label_ids, dtype=np.uint8)
+        order = np.argsort(keys, kind="stable")
+        keys, label_ids = keys[order], label_ids[order]
+        # Only addresses listed more than once need the (address, label) check.
+        keep = np.ones(len(keys), dtype=bool)
+        repeated = np.flatnonzero(keys[1:] == keys[:-1]) + 1
+        prev, labels_seen = -2, set()
+        for i in repeated.tolist():
+            if i - 1 != prev:  # first repeat of a new address
+                labels_seen = {int(label_ids[i - 1])}
+            if int(label_ids[i]) in labels_seen:
+                keep[i] = False
+            labels_seen.add(int(label_ids[i]))
+            prev = i
+        order = order[keep]
+        name_parts = [names[i] for i in order.tolist()]
+        offsets = np.zeros(len(order) + 1, dtype=np.uint32)
+        np.cumsum([len(n) for n in name_parts], out=offsets[1:])
+        bloom_bits = max(6, int(np.ceil(np.log2(max(1, len(order)) * BLOOM_BITS_PER_ENTRY))))
+        return cls(
+            keys[keep],
+            label_ids[keep],
+            np.array(source_ids, dtype=np.uint16)[order],
+            offsets,
+            b"".join(name_parts),
+            tuple(sources),
+            bloom_bits,
+        )
+
+    @staticmethod
+    def _hashes(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # Zero-padded 24-byte view: three little-endian words per address.
+        words = np.frombuffer(np.asarray(keys, dtype="S24").tobytes(), dtype="<u8").reshape(-1, 3)
+        h1 = _mix(words[:, 0] ^ _mix(words[:, 1] ^ _mix(words[:, 2])))
+        return h1, _mix(h1) | np.uint64(1)
+
+    def _maybe(self, keys: np.ndarray) -> np.ndarray:
+        h1, h2 = self._hashes(keys)
+        hit = np.ones(len(keys), dtype=bool)
+        for i in range(BLOOM_PROBES):
+            pos = (h1 + np.uint64(i) * h2) & np.uint64(self.bloom_mask)
+            hit &= (self.bloom[pos >> np.uint64(6)] >> (pos & np.uint64(63))) & np.uint64(1) == 1
+        return hit
+
+    def lookup_many(self, addresses: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(row, entry) index pairs for every known label of `addresses`, by row then entry."""
+        empty = np.zeros(0, dtype=np.int64)
+        if not len(self.keys) or not len(addresses):
+            return empty, empty
+        raw = [_key(a) for a in addresses]
+        valid = np.array([k is not None for k in raw])
+        keys = np.array([k or b"" for k in raw], dtype=KEY_DTYPE)
+        rows = np.flatnonzero(valid & self._maybe(keys))
+        if not len(rows):
+            return empty, empty
+        lo = np.searchsorted(self.keys, keys[rows], side="left")
+        hi = np.searchsorted(self.keys, keys[rows], side="right")
+        counts = hi - lo
+        rows = np.repeat(rows, counts)
+        entries = np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(len(rows))
+        return rows.astype(np.int64), entries.astype(np.int64)
+
+    def lookup(self, address: str) -> List[Dict[str, Any]]:
+        key = _key(address)
+        if key is None or not len(self.keys):
+            return []
+        words = [int.from_bytes(key[j:j + 8].ljust(8, b"\x00"), "little") for j in (0, 8, 16)]
+        h1 = _mix(words[0] ^ _mix(words[1] ^ _mix(words[2])))
+        h2 = _mix(h1) | 1
+        for i in range(BLOOM_PROBES):
+            pos = (h1 + i * h2) & _M64 & self.bloom_mask
+            if not int(self.bloom[pos >> 6]) >> (pos & 63) & 1:
+                return []
+        lo = int(np.searchsorted(self.keys, key, side="left"))
+        hi = int(np.searchsorted(self.keys, key, side="right"))
+        return [self.entry(e) for e in range(lo, hi)]
+
+    def entry(self, e: int) -> Dict[str, Any]:
+        name = self.names[int(self.name_offsets[e]):int(self.name_offsets[e + 1])].decode()
+        out = {"label": KNOWN_LABELS[int(self.label_ids[e])], "source": self.sources[int(self.source_ids[e])]}
+        if name:
+            out["name"] = name
+        return out
+
+    def address(self, e: int) -> str:
+        return "0x" + self.keys[e].ljust(20, b"\x00").hex()
+
+    def entries(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for e in range(len(self.keys)):
+            yield self.address(e), self.entry(e)
+
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.keys, self.label_ids, self.source_ids, self.name_offsets, self.bloom)) + len(self.names)
+
+    def _records(self, widths: Tuple[int, int]) -> np.ndarray:
+        out = np.empty(len(self.keys), dtype=[("key", KEY_DTYPE), ("label", np.uint8), ("source", f"S{widths[0]}"), ("name", f"S{widths[1]}")])
+        out["key"], out["label"] = self.keys, self.label_ids
+        out["source"] = np.array([x.encode() for x in self.sources] or [b""], dtype=f"S{widths[0]}")[self.source_ids]
+        out["name"] = [self.names[a:b] for a, b in zip(self.name_offsets[:-1].tolist(), self.name_offsets[1:].tolist())]
+        return out
+
+    def _widths(self) -> Tuple[int, int]:
+        names = int(np.diff(self.name_offsets).max()) if len(self.keys) else 0
+        return max((len(x.encode()) for x in self.sources), default=0) or 1, names or 1
+
+    def changed(self, other: "KnownEntities") -> List[str]:
+        """Addresses whose entries differ between this registry and `other`."""
+        widths = tuple(max(a, b) for a, b in zip(self._widths(), other._widths()))
+        diff = np.setxor1d(self._records(widths), other._records(widths))
+        return ["0x" + k.ljust(20, b"\x00").hex() for k in np.unique(diff["key"]).tolist()]
+
+
+def _open(path: str):
+    raw = gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+    return io.TextIOWrapper(raw, encoding="utf-8", newline="")
+
+
+def read_file(path: str) -> Iterator[Tuple[str, str, str, str]]:
+    """(address, label, source, name) records of one CSV or JSONL file."""
+    stem = os.path.basename(path).split(".")[0]
+    with _open(path) as f:
+        if ".jsonl" in path or ".ndjson" in path:
+            for line in f:
+                if line.strip():
+                    r = json.loads(line)
+                    yield (str(r.get("address") or "").lower(), str(r.get("label") or "").strip().lower(), r.get("source") or stem, r.get("name") or "")
+            return
+        reader = csv.reader(f)
+        header = [h.strip().lower() for h in next(reader, [])]
+        col = {k: header.index(k) if k in header else None for k in ("address", "label", "source", "name")}
+        if col["address"] is None or col["label"] is None:
+            raise ValueError(f"{path}: CSV needs address and label columns")
+        width = len(header)
+        for r in reader:
+            if len(r) < width:
+                r += [""] * (width - len(r))
+            yield (
+                r[col["address"]].lower(),
+                r[col["label"]].strip().lower(),
+                (r[col["source"]] if col["source"] is not None else "") or stem,
+                r[col["name"]] if col["name"] is not None else "",
+            )
+
+
+def entity_files(path: Optional[str]) -> List[str]:
+    if not path:
+        return []
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(path, n) for n in os.listdir(path)
+            if n.split(".", 1)[-1] in ("csv", "csv.gz", "jsonl", "jsonl.gz", "ndjson", "ndjson.gz")
+        )
+    return [path] if os.path.exists(path) else []
+
+
+def load(files: Sequence[str]) -> Tuple[KnownEntities, Dict[str, Any]]:
+    """Registry of the built-ins plus `files`, and load statistics."""
+    t0 = time.perf_counter()
+    stats = {"rows": 0, "rejected": 0}
+
+    def records():
+        for a, lb in BASE_KNOWN_LABELS.items():
+            yield a, lb, BASE_SOURCE, ""
+        for path in files:
+            for rec in read_file(path):
+                stats["rows"] += 1
+                yield rec
+
+    reg = KnownEntities.build(records(), stats)
+    stats.update({"files": list(files), "entries": len(reg), "bytes": reg.nbytes(), "load_seconds": round(time.perf_counter() - t0, 3)})
+    return reg, stats
+
+
+def _signature(files: Sequence[str]) -> tuple:
+    out = []
+    for path in files:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        out.append((path, st.st_ino, st.st_mtime_ns, st.st_size))
+    return tuple(out)
+
+
+_state: Dict[str, Any] = {"registry": None, "signature": None, "checked": 0.0, "stats": {}, "loaded_at": None, "version": 0}
+_lock = threading.Lock()
+
+
+def registry() -> KnownEntities:
+    """The current registry, reloaded first when the entity files changed."""
+    now = time.monotonic()
+    if _state["registry"] is not None and now - _state["checked"] < float(os.getenv("KNOWN_ENTITIES_RELOAD_SECONDS", "30")):
+        return _state["registry"]
+    # One thread reloads; the others keep answering from the current registry.
+    if not _lock.acquire(blocking=_state["registry"] is None):
+        return _state["registry"]
+    try:
+        if _state["registry"] is None or now - _state["checked"] >= float(os.getenv("KNOWN_ENTITIES_RELOAD_SECONDS", "30")):
+            files = entity_files(os.getenv("KNOWN_ENTITIES_PATH"))
+            signature = _signature(files)
+            if _state["registry"] is None or signature != _state["signature"]:
+                try:
+                    reg, stats = load(files)
+                except Exception as e:
+                    print(f"[labels] known-entity reload failed: {e}")
+                    if _state["registry"] is None:
+                        reg, stats = load([])
+                    else:
+                        reg = None
+                if reg is not None:
+                    _state.update(registry=reg, signature=signature, stats=stats, loaded_at=time.time(), version=_state["version"] + 1)
+            _state["checked"] = time.monotonic()
+        return _state["registry"]
+    finally:
+        _lock.release()
+
+
+def registry_version() -> int:
+    registry()
+    return _state["version"]
+
+
+def registry_status() -> Dict[str, Any]:
+    reg = registry()
+    return {**_state["stats"], "loaded_at": _state["loaded_at"], "version": _state["version"], "entries": len(reg)}
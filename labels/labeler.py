@@ -0,0 +1,68 @@
+"""Batch labeler and relabel-queue worker.
+
+Computes label features for many addresses with set-based aggregate queries,
+evaluates the rules over feature columns (`labels.rules.label_columns`) and
+merges the results into `labels` in bulk (`api.services.label_service`).
+
+By default it drains `label_dirty`, the queue of addresses ingest changed,
+in batches of `LABEL_QUEUE_BATCH` oldest first, and sleeps
+`LABEL_INTERVAL_SECONDS` whenever the queue is empty. Read endpoints only
+ever serve what it stored. When the known-entity files change
+(`labels.known_entities`), the addresses whose entries changed are queued.
+
+Run with `python -m labels.labeler` (`--once` to drain the queue and exit),
+or relabel directly: `--all`, `--since 2026-10-01T00:00:00Z` for addresses
+whose counters changed since then, `--address A --address B`; add `--in-db`
+to evaluate the rules as SQL without moving features out of Postgres.
+"""
+
+import argparse
+import os
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from api.services.label_service import drain_dirty, queue_known_changes, relabel
+from labels.known_entities import registry
+
+
+def main() -> None:
+    load_dotenv()
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--once", action="store_true")
+    p.add_argument("--all", action="store_true")
+    p.add_argument("--since", type=datetime.fromisoformat)
+    p.add_argument("--address", action="append")
+    p.add_argument("--in-db", action="store_true", help="evaluate the rules as SQL inside Postgres")
+    args = p.parse_args()
+    if args.all or args.since or args.address:
+        out = relabel(addresses=args.address, since=args.since, batch_size=int(os.getenv("LABEL_BATCH_SIZE", "50000")), in_database=args.in_db)
+        print(
+            f"[labeler] {out['addresses']} addresses, {out['labels']} labels "
+            f"(+{out['inserted']} -{out['deleted']} rows) in {out['seconds']}s, {out['addresses_per_sec']} addresses/s"
+        )
+        return
+
+    batch = int(os.getenv("LABEL_QUEUE_BATCH", "5000"))
+    interval = float(os.getenv("LABEL_INTERVAL_SECONDS", "5"))
+    known = registry()
+    while True:
+        try:
+            current = registry()
+            if current is not known:
+                print(f"[labeler] known-entity registry reloaded ({len(current)} entries), queued {queue_known_changes(known, current)} changed addresses")
+                known = current
+            out = drain_dirty(batch)
+            if out["addresses"]:
+                print(f"[labeler] relabeled {out['addresses']} queued addresses (oldest marked {out['oldest_marked_at']}), +{out['inserted']} -{out['deleted']} label rows in {out['seconds']}s")
+                continue
+        except Exception as e:
+            print(f"[labeler] batch failed: {e}")
+        if args.once:
+            break
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,51 +1,113 @@
-"""Labeling heuristics v1."""
+"""Labeling heuristics v1, compiled from `labels.taxonomy.LABEL_TAXONOMY`."""
 
-from labels.known_entities import BASE_KNOWN_LABELS
+from typing import List, NamedTuple
+
+import numpy as np
+
+from labels.dsl import Expr, compile_expr
+from labels.known_entities import registry
+from labels.taxonomy import KNOWN_CONFIDENCE, LABEL_TAXONOMY
+
+FEATURES = ("tx_count", "contracts_deployed", "unique_counterparties", "inbound_edges", "outbound_edges")
+
+
+class Rule(NamedTuple):
+    label: str
+    predicate: Expr
+    confidence: Expr
+    evidence: tuple
+
+
+def compile_rules(taxonomy: dict) -> List[Rule]:
+    """Heuristic rules of `taxonomy`, in order; raises ValueError naming the bad entry."""
+    rules = []
+    for label, spec in taxonomy.items():
+        if spec.get("rule") is None:
+            continue
+        try:
+            predicate = compile_expr(spec["rule"], FEATURES)
+            confidence = compile_expr(spec["confidence_model"], FEATURES)
+            if not predicate.boolean or confidence.boolean:
+                raise ValueError("rule must be a condition and confidence_model a number")
+            evidence = tuple(spec.get("evidence", ()))
+            unknown = set(evidence) - set(FEATURES)
+            if unknown:
+                raise ValueError(f"unknown evidence features {sorted(unknown)}")
+        except (KeyError, ValueError) as e:
+            raise ValueError(f"label {label!r}: {e}") from None
+        rules.append(Rule(label, predicate, confidence, evidence))
+    return rules
+
+
+RULES = compile_rules(LABEL_TAXONOMY)
+
+
+def label_columns(addresses, features) -> list[tuple[int, dict]]:
+    """Labels for whole feature columns: (row, label) pairs, each row's labels in rule order.
+
+    `features` maps every name in FEATURES to an integer array aligned with
+    `addresses`. Rule predicates are evaluated as array masks; only matching
+    rows are turned into label dicts.
+    """
+    cols = {k: np.asarray(features[k], dtype=np.int64) for k in FEATURES}
+    n = len(addresses)
+    out = []
+
+    known = registry()
+    for i, e in zip(*(a.tolist() for a in known.lookup_many(addresses))):
+        out.append((i, -1, known_label(known.entry(e))))
+
+    for order, rule in enumerate(RULES):
+        rows = np.flatnonzero(np.broadcast_to(rule.predicate(cols), n))
+        if not len(rows):
+            continue
+        confidence = np.broadcast_to(np.asarray(rule.confidence(cols), dtype=np.float64), n)
+        for i in rows.tolist():
+            out.append((i, order, {
+                "label": rule.label,
+                "confidence": float(confidence[i]),
+                "evidence": {k: int(cols[k][i]) for k in rule.evidence},
+            }))
+
+    out.sort(key=lambda r: (r[0], r[1]))
+    return [(i, lb) for i, _, lb in out]
+
+
+def known_label(entry: dict) -> dict:
+    """Label dict of a known-entity registry entry."""
+    evidence = {"source": entry["source"]}
+    if entry.get("name"):
+        evidence["name"] = entry["name"]
+    return {"label": entry["label"], "confidence": KNOWN_CONFIDENCE, "evidence": evidence}
 
 
 def label_address(address: str, features: dict) -> list[dict]:
     a = (address or "").lower()
-    labels = []
-
-    if a in BASE_KNOWN_LABELS:
-        labels.append({
-            "label": BASE_KNOWN_LABELS[a],
-            "confidence": 0.98,
-            "evidence": {"source": "base_known_system_contracts"},
-        })
-
-    tx_count = int(features.get("tx_count", 0) or 0)
-    contracts_deployed = int(features.get("contracts_deployed", 0) or 0)
-    unique_counterparties = int(features.get("unique_counterparties", 0) or 0)
-    inbound_edges = int(features.get("inbound_edges", 0) or 0)
-    outbound_edges = int(features.get("outbound_edges", 0) or 0)
-
-    if contracts_deployed >= 3:
-        labels.append({
-            "label": "deployer",
-            "confidence": min(0.95, 0.6 + contracts_deployed * 0.05),
-            "evidence": {"contracts_deployed": contracts_deployed},
-        })
-
-    if tx_count > 500 and unique_counterparties > 200:
-        labels.append({
-            "label": "router",
-            "confidence": 0.72,
-            "evidence": {"tx_count": tx_count, "unique_counterparties": unique_counterparties},
-        })
-
-    if inbound_edges > 500 and outbound_edges < inbound_edges * 0.15:
-        labels.append({
-            "label": "exchange-facing",
-            "confidence": 0.67,
-            "evidence": {"inbound_edges": inbound_edges, "outbound_edges": outbound_edges},
-        })
-
-    if tx_count > 1000 and outbound_edges > 500 and inbound_edges > 500:
-        labels.append({
-            "label": "high-activity",
-            "confidence": 0.6,
-            "evidence": {"tx_count": tx_count},
-        })
-
-    return labels
+    cols = {k: [int(features.get(k, 0) or 0)] for k in FEATURES}
+    return [lb for _, lb in label_columns([a], cols)]
+
+
+def _quote(s: str) -> str:
+    return "'" + s.replace("'", "''") + "'"
+
+
+def label_sql(source: str, known: str) -> str:
+    """SELECT (address, label, confidence, evidence) labeling every row of `source`.
+
+    `source` is a table or parenthesized subquery with `address` and the
+    FEATURES columns (bigint); `known` has (address, label, evidence) rows
+    of known-entity labels (see `known_label`). Confidence goes through
+    float8's shortest text form so the NUMERIC stored equals what the NumPy
+    path writes.
+    """
+    parts = [
+        f"SELECT f.address, k.label, {KNOWN_CONFIDENCE!r}::float8::text::numeric AS confidence, k.evidence::jsonb AS evidence "
+        f"FROM {source} f JOIN {known} k ON k.address = f.address"
+    ]
+    for rule in RULES:
+        evidence = ", ".join(f"{_quote(k)}, {k}" for k in rule.evidence)
+        parts.append(
+            f"SELECT address, {_quote(rule.label)}, ({rule.confidence.sql})::float8::text::numeric, jsonb_build_object({evidence}) "
+            f"FROM {source} f WHERE {rule.predicate.sql}"
+        )
+    return "\nUNION ALL\n".join(parts)
@@ -1,32 +1,74 @@
+# The single source of the labeling rules. `rule` and `confidence_model` are
+# `labels.dsl` expressions over `labels.rules.FEATURES`, compiled to NumPy
+# (batch labeling) and SQL (in-database labeling); `evidence` lists the
+# features stored with each label. Labels with a `known` source also come
+# from the known-entity registry (labels/known_entities.py) at
+# KNOWN_CONFIDENCE; `rule` is None when that is their only source.
+# Heuristic labels are emitted in this order.
 LABEL_TAXONOMY = {
     "deployer": {
         "source": "heuristic",
         "description": "Address deploys multiple contracts.",
         "rule": "contracts_deployed >= 3",
         "confidence_model": "min(0.95, 0.6 + contracts_deployed * 0.05)",
+        "evidence": ["contracts_deployed"],
     },
     "router": {
         "source": "known+heuristic",
         "description": "High-throughput routing behavior or known infra/router contract.",
-        "rule": "known label OR (tx_count > 500 AND unique_counterparties > 200)",
-        "confidence_model": "0.98 known, 0.72 heuristic",
+        "rule": "tx_count > 500 AND unique_counterparties > 200",
+        "confidence_model": "0.72",
+        "evidence": ["tx_count", "unique_counterparties"],
     },
     "bridge": {
         "source": "known",
         "description": "Known bridge-system contracts.",
-        "rule": "address in BASE_KNOWN_LABELS with value=bridge",
+        "rule": None,
         "confidence_model": "0.98",
+        "evidence": [],
     },
     "treasury": {
         "source": "known",
         "description": "Known protocol treasury/vault system contracts.",
-        "rule": "address in BASE_KNOWN_LABELS with value=treasury",
+        "rule": None,
         "confidence_model": "0.98",
+        "evidence": [],
+    },
+    "exchange": {
+        "source": "known",
+        "description": "Centralized exchange hot/deposit wallets from external entity lists.",
+        "rule": None,
+        "confidence_model": "0.98",
+        "evidence": [],
+    },
+    "mev-bot": {
+        "source": "known",
+        "description": "Searcher / MEV bot contracts and operators from external entity lists.",
+        "rule": None,
+        "confidence_model": "0.98",
+        "evidence": [],
+    },
+    "sanctioned": {
+        "source": "known",
+        "description": "Addresses on sanctions lists.",
+        "rule": None,
+        "confidence_model": "0.98",
+        "evidence": [],
     },
     "exchange-facing": {
         "source": "heuristic",
         "description": "Collects large inbound flow relative to outbound edges.",
         "rule": "inbound_edges > 500 AND outbound_edges < inbound_edges * 0.15",
         "confidence_model": "0.67",
+        "evidence": ["inbound_edges", "outbound_edges"],
+    },
+    "high-activity": {
+        "source": "heuristic",
+        "description": "Very busy in both directions.",
+        "rule": "tx_count > 1000 AND outbound_edges > 500 AND inbound_edges > 500",
+        "confidence_model": "0.6",
+        "evidence": ["tx_count"],
     },
 }
+
+KNOWN_CONFIDENCE = 0.98
@@ -0,0 +1,37 @@
+"""Periodic risk-scoring job.
+
+Every `RISK_INTERVAL_SECONDS` scores all addresses with a non-zero risk
+input in one set-based pass (`api.services.risk_service.score_all`), so
+`/entity/{address}/risk` and `/risk/top` are lookups into `address_risk`.
+
+Run with `python -m risk.risk_job` (`--once` for a single run).
+"""
+
+import argparse
+import os
+import time
+
+from dotenv import load_dotenv
+
+from api.services.risk_service import score_all
+
+
+def main() -> None:
+    load_dotenv()
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--once", action="store_true")
+    args = p.parse_args()
+    interval = float(os.getenv("RISK_INTERVAL_SECONDS", "300"))
+    while True:
+        try:
+            run = score_all()
+            print(f"[risk] run {run['id']}: {run['addresses']} addresses, {run['high']} high, {run['medium']} medium, {run['seconds']}s")
+        except Exception as e:
+            print(f"[risk] run failed: {e}")
+        if args.once:
+            break
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    main()
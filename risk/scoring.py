@@ -0,0 +1,67 @@
+"""Risk factors as column arithmetic over every scored address at once.
+
+Alert and flow weights, and the heuristic label weights, are the ones the
+per-request `/entity/{address}/risk` used. Two parts deliberately score
+differently: known-entity labels carry weight (`sanctioned` 75, `mev-bot`
+25, `exchange` 20), and centrality comes from the PageRank percentile, with
+24h degree only as the fallback for unscored addresses:
+
+- label_risk: confidence x LABEL_WEIGHTS per stored label (a sanctions-list
+  entry alone reaches the high band),
+- alert_risk: 4 per new and 8 per high-severity alert in 7 days, plus
+  10 x their mean confidence, capped at 45,
+- centrality_risk: up to 25 for the top 5% by PageRank percentile; an
+  address without a PageRank score falls back to 24h degree / 50 (capped),
+- flow_risk: 7-day in + out volume / 1e21 wei, capped at 20,
+
+summed and clipped to 0..100. An address whose inputs are all zero scores 0,
+which is why the batch job only needs the addresses with a non-zero input.
+"""
+
+from typing import Dict
+
+import numpy as np
+
+LABEL_WEIGHTS = {
+    "sanctioned": 75.0,
+    "mev-bot": 25.0,
+    "bridge": 20.0,
+    "exchange": 20.0,
+    "exchange-facing": 20.0,
+    "high-activity": 20.0,
+    "router": 20.0,
+    "deployer": 10.0,
+    "treasury": 10.0,
+}
+CENTRALITY_PCT_FLOOR = 0.95
+BAND_HIGH = 70.0
+BAND_MEDIUM = 40.0
+
+FACTORS = ("label_risk", "alert_risk", "centrality_risk", "flow_risk")
+
+
+def risk_factors(cols: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Factor columns and `risk_score` from input columns.
+
+    Inputs: label_weight (sum of confidence x weight), new_alerts,
+    high_alerts, avg_alert_conf, pagerank_pct (NaN when the address has no
+    PageRank score), txs_24h and wei_7d.
+    """
+    pct = np.asarray(cols["pagerank_pct"], dtype=np.float64)
+    scored = ~np.isnan(pct)
+    out = {
+        "label_risk": np.asarray(cols["label_weight"], dtype=np.float64),
+        "alert_risk": np.minimum(45.0, cols["new_alerts"] * 4.0 + cols["high_alerts"] * 8.0 + cols["avg_alert_conf"] * 10.0),
+        "centrality_risk": np.where(
+            scored,
+            25.0 * np.maximum(0.0, (np.where(scored, pct, 0.0) - CENTRALITY_PCT_FLOOR) / (1.0 - CENTRALITY_PCT_FLOOR)),
+            np.minimum(25.0, cols["txs_24h"] / 50.0),
+        ),
+        "flow_risk": np.minimum(20.0, np.asarray(cols["wei_7d"], dtype=np.float64) / 1e21),
+    }
+    out["risk_score"] = np.clip(sum(out[k] for k in FACTORS), 0.0, 100.0)
+    return out
+
+
+def band(score: float) -> str:
+    return "high" if score >= BAND_HIGH else "medium" if score >= BAND_MEDIUM else "low"
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Replay alert rules over a historical range and score them against incidents.
+
+Example:
+  PYTHONPATH=. python scripts/backtest_alerts.py --start 2026-01-01T00:00:00Z \
+    --end 2026-01-31T00:00:00Z --step-minutes 60 --incidents incidents.jsonl
+"""
+
+import argparse
+import json
+from datetime import timedelta
+
+from alerts.backtest import load_incidents, run_backtest
+from api.services.alert_service import get_thresholds
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--start", required=True, help="ISO-8601 timestamp with timezone")
+    p.add_argument("--end", required=True, help="ISO-8601 timestamp with timezone")
+    p.add_argument("--step-minutes", type=int, default=60)
+    p.add_argument("--workers", type=int, default=None)
+    p.add_argument("--limit", type=int, default=50, help="per-rule candidate limit, as in /alerts/recent")
+    p.add_argument("--incidents", help="JSON/JSONL incident file")
+    p.add_argument("--thresholds", help="JSON file of per-rule overrides merged over the stored thresholds")
+    p.add_argument("--summary", action="store_true", help="omit individual alerts from the output")
+    args = p.parse_args()
+
+    thresholds = get_thresholds()
+    if args.thresholds:
+        with open(args.thresholds, encoding="utf-8") as f:
+            for rule_type, vals in json.load(f).items():
+                thresholds.setdefault(rule_type, {}).update(vals)
+
+    report = run_backtest(
+        args.start,
+        args.end,
+        step=timedelta(minutes=args.step_minutes),
+        thresholds=thresholds,
+        incidents=load_incidents(args.incidents) if args.incidents else None,
+        workers=args.workers,
+        limit=args.limit,
+    )
+    if args.summary:
+        report.pop("alerts", None)
+    print(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
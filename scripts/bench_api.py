@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Measure per-request latency and DB round trips for API endpoints.
+
+Runs each path in-process through the FastAPI test client against DATABASE_URL
+and counts connections and statements by wrapping psycopg2.
+
+Example:
+  PYTHONPATH=. python scripts/bench_api.py /alerts/recent /runbook/thresholds -n 50
+"""
+
+import argparse
+import statistics
+import time
+
+import psycopg2
+import psycopg2.extensions
+
+COUNTS = {"connections": 0, "statements": 0}
+
+
+class _CountingCursor(psycopg2.extensions.cursor):
+    def execute(self, query, vars=None):
+        COUNTS["statements"] += 1
+        return super().execute(query, vars)
+
+
+class _CountingConnection(psycopg2.extensions.connection):
+    def cursor(self, *args, **kwargs):
+        kwargs.setdefault("cursor_factory", _CountingCursor)
+        return super().cursor(*args, **kwargs)
+
+
+_connect = psycopg2.connect
+
+
+def _counting_connect(*args, **kwargs):
+    COUNTS["connections"] += 1
+    kwargs.setdefault("connection_factory", _CountingConnection)
+    return _connect(*args, **kwargs)
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("paths", nargs="+")
+    p.add_argument("-n", type=int, default=50, help="requests per path")
+    p.add_argument("--warmup", type=int, default=2)
+    args = p.parse_args()
+
+    psycopg2.connect = _counting_connect
+    from fastapi.testclient import TestClient
+
+    from api.main import app
+
+    client = TestClient(app)
+    for path in args.paths:
+        for _ in range(args.warmup):
+            client.get(path)
+        COUNTS.update(connections=0, statements=0)
+        samples = []
+        for _ in range(args.n):
+            t0 = time.perf_counter()
+            r = client.get(path)
+            samples.append((time.perf_counter() - t0) * 1000)
+            r.raise_for_status()
+        samples.sort()
+        print(
+            f"{path}: p50={statistics.median(samples):.2f}ms p95={samples[int(len(samples) * 0.95) - 1]:.2f}ms "
+            f"connections/req={COUNTS['connections'] / args.n:.2f} statements/req={COUNTS['statements'] / args.n:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
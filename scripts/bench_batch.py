@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""Benchmark the batch endpoints against the per-address ones.
+
+Seeds `--transactions` transfers between `--addresses` random addresses over
+the last 30 days, their `edges`, and labels for 5% of the addresses (tagged
+with a per-run prefix) into DATABASE_URL, runs one risk-scoring pass, then
+reports addresses/sec through the API (in-process TestClient) for
+
+- GET /entity/{address} and GET /entity/{address}/risk, one address per call,
+- POST /entity/batch and POST /risk/batch with `--batch` addresses per call,
+
+and how soon the first chunk (BATCH_CHUNK_ADDRESSES) is ready to stream.
+Seeded rows are deleted afterwards.
+
+Example:
+  PYTHONPATH=. python scripts/bench_batch.py --addresses 100000 --transactions 1000000 --batch 5000
+"""
+
+import argparse
+import io
+import os
+import time
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from api.main import app
+from api.services.db import get_conn
+from api.services.entity_service import stream_entity_profiles
+from api.services.risk_service import score_all, stream_entity_risks
+
+CHUNK = 500_000
+
+
+def _seed(prefix: str, n_addr: int, n_tx: int) -> list:
+    rng = np.random.default_rng(13)
+    addrs = [f"{prefix}{i:08x}" for i in range(n_addr)]
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("CREATE TEMP TABLE bench_tx (tx_hash TEXT, from_address TEXT, to_address TEXT, value_wei NUMERIC, ago INT)")
+        for lo in range(0, n_tx, CHUNK):
+            m = min(CHUNK, n_tx - lo)
+            src = np.minimum((rng.pareto(1.1, m) * n_addr / 50).astype(np.int64), n_addr - 1)
+            dst = rng.integers(0, n_addr, m)
+            ago = rng.integers(0, 30 * 86400, m)
+            wei = rng.integers(0, 10**9, m) * 10**9
+            cur.execute("TRUNCATE bench_tx")
+            cur.copy_expert("COPY bench_tx FROM STDIN", io.StringIO("".join(
+                f"{prefix}t{lo + i}\t{addrs[s]}\t{addrs[d]}\t{w}\t{a}\n"
+                for i, (s, d, w, a) in enumerate(zip(src.tolist(), dst.tolist(), wei.tolist(), ago.tolist()))
+            )))
+            cur.execute(
+                """
+                INSERT INTO transactions(tx_hash, block_number, from_address, to_address, value_wei, success, timestamp)
+                SELECT tx_hash, 1, from_address, to_address, value_wei, true, now() - make_interval(secs => ago) FROM bench_tx
+                """
+            )
+            cur.execute(
+                """
+                INSERT INTO edges(src_address, dst_address, tx_count, total_value_wei, window_start, window_end)
+                SELECT from_address, to_address, COUNT(*), SUM(value_wei), now(), now() FROM bench_tx GROUP BY 1, 2
+                """
+            )
+            conn.commit()
+            print(f"  seeded {lo + m:,} transactions")
+        cur.executemany(
+            "INSERT INTO labels(address, label, confidence, evidence) VALUES (%s, %s, 0.7, '{}')",
+            [(addrs[i], ("router", "deployer", "contract")[i % 3]) for i in range(0, n_addr, 20)],
+        )
+        cur.execute("ANALYZE transactions")
+        cur.execute("ANALYZE edges")
+    return addrs
+
+
+def _rate(label: str, n: int, seconds: float) -> None:
+    print(f"{label}: {n / seconds:,.0f} addresses/s ({n:,} in {seconds:.2f}s)")
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--addresses", type=int, default=100_000)
+    p.add_argument("--transactions", type=int, default=1_000_000)
+    p.add_argument("--single", type=int, default=300, help="addresses fetched one call at a time")
+    p.add_argument("--batch", type=int, default=5000)
+    args = p.parse_args()
+    prefix = f"0xbb{os.getpid():x}"
+
+    addrs = _seed(prefix, args.addresses, args.transactions)
+    try:
+        score_all()
+        client = TestClient(app)
+        rng = np.random.default_rng(1)
+        pick = [addrs[i] for i in rng.choice(len(addrs), args.batch, replace=False).tolist()]
+
+        t = time.perf_counter()
+        for a in pick[: args.single]:
+            client.get(f"/entity/{a}").raise_for_status()
+        _rate("GET /entity/{address}", args.single, time.perf_counter() - t)
+        t = time.perf_counter()
+        for a in pick[: args.single]:
+            client.get(f"/entity/{a}/risk").raise_for_status()
+        _rate("GET /entity/{address}/risk", args.single, time.perf_counter() - t)
+
+        for path in ("/entity/batch", "/risk/batch"):
+            t = time.perf_counter()
+            r = client.post(path, json={"addresses": pick})
+            r.raise_for_status()
+            _rate(f"POST {path} x{args.batch}", len(r.text.splitlines()), time.perf_counter() - t)
+        for name, stream in (("entity", stream_entity_profiles), ("risk", stream_entity_risks)):
+            t = time.perf_counter()
+            records = stream(pick)
+            next(records)
+            records.close()
+            print(f"first {name} record ready after {(time.perf_counter() - t) * 1000:.0f}ms")
+    finally:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM transactions WHERE tx_hash LIKE %s", (f"{prefix}%",))
+            cur.execute("DELETE FROM edges WHERE src_address LIKE %s", (f"{prefix}%",))
+            cur.execute("DELETE FROM labels WHERE address LIKE %s", (f"{prefix}%",))
+        score_all()
+
+
+if __name__ == "__main__":
+    main()
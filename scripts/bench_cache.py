@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Benchmark the response cache under simulated dashboard polling.
+
+`--pollers` threads poll /dashboard/summary, /graph/global, /metrics and
+/runbook/alerts in turn (in-process TestClient), each sending back the last
+ETag it got as If-None-Match, for `--seconds` per run. Meanwhile a writer
+advances `ingest_state.last_block` every `--block-ms` and inserts an alert
+every `--alert-ms` (tagged with a per-run address prefix) in DATABASE_URL.
+One run has the cache off (RESPONSE_CACHE=0), one has it on; each reports
+requests, 304s, latency, the SQL statements the API issued (counted at the
+cursor) and the cache hit rate. Seeded rows and `last_block` are restored
+afterwards.
+
+Example:
+  PYTHONPATH=. python scripts/bench_cache.py --pollers 32 --seconds 20
+"""
+
+import argparse
+import os
+import statistics
+import threading
+import time
+
+os.environ.setdefault("BASE_RPC_URL", "http://127.0.0.1:9")  # /metrics asks the RPC for the chain head: fail fast
+
+import numpy as np  # noqa: E402
+import psycopg2  # noqa: E402
+import psycopg2.extensions  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from api.main import app  # noqa: E402
+from api.services.cache_service import cache_stats, clear_cache  # noqa: E402
+from api.services.db import get_conn  # noqa: E402
+
+PATHS = ("/dashboard/summary", "/graph/global", "/metrics", "/runbook/alerts")
+
+_statements = [0]
+_count_lock = threading.Lock()
+
+
+class _CountingCursor(psycopg2.extensions.cursor):
+    def execute(self, query, vars=None):
+        with _count_lock:
+            _statements[0] += 1
+        return super().execute(query, vars)
+
+
+def _count_statements() -> None:
+    connect = psycopg2.connect
+    psycopg2.connect = lambda *a, **kw: connect(*a, cursor_factory=_CountingCursor, **kw)
+
+
+def _writer(stop: threading.Event, prefix: str, block_ms: int, alert_ms: int) -> None:
+    next_block = next_alert = time.monotonic()
+    while not stop.is_set():
+        now = time.monotonic()
+        with get_conn() as conn:
+            cur = conn.cursor()
+            if now >= next_block:
+                cur.execute("UPDATE ingest_state SET value = (value::bigint + 1)::text, updated_at = now() WHERE key = 'last_block'")
+                next_block = now + block_ms / 1000
+            if now >= next_alert:
+                cur.execute("INSERT INTO alerts(type, address, severity, confidence) VALUES ('fan_out_spike', %s, 'medium', 0.6)", (prefix,))
+                next_alert = now + alert_ms / 1000
+        stop.wait(max(0.0, min(next_block, next_alert) - time.monotonic()))
+
+
+def _poller(client: TestClient, stop: threading.Event, offset: int, interval: float, out: dict) -> None:
+    etags, i = {}, offset
+    while not stop.is_set():
+        path = PATHS[i % len(PATHS)]
+        i += 1
+        t = time.perf_counter()
+        r = client.get(path, headers={"If-None-Match": etags[path]} if path in etags else {})
+        ms = (time.perf_counter() - t) * 1000
+        if "etag" in r.headers:
+            etags[path] = r.headers["etag"]
+        with _count_lock:
+            out["ms"].append(ms)
+            out["304"] += r.status_code == 304
+            out["errors"] += r.status_code >= 400
+        stop.wait(interval)
+
+
+def _run(label: str, args, prefix: str) -> dict:
+    os.environ["RESPONSE_CACHE"] = "1" if label == "cache on" else "0"
+    clear_cache()
+    client = TestClient(app)
+    out = {"ms": [], "304": 0, "errors": 0}
+    stop = threading.Event()
+    threads = [threading.Thread(target=_writer, args=(stop, prefix, args.block_ms, args.alert_ms))]
+    threads += [threading.Thread(target=_poller, args=(client, stop, k, args.interval_ms / 1000, out)) for k in range(args.pollers)]
+    before = _statements[0]
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    n = len(out["ms"])
+    statements = _statements[0] - before
+    stats = cache_stats()
+    print(
+        f"{label}: {n:,} requests ({n / args.seconds:,.0f}/s), {out['304']:,} x 304, {out['errors']} errors, "
+        f"p50={statistics.median(out['ms']):.1f}ms p95={np.percentile(out['ms'], 95):.1f}ms, "
+        f"{statements:,} SQL statements ({statements / max(n, 1):.2f}/request incl. writer)"
+    )
+    if label == "cache on":
+        print(f"  hit rate {stats['hit_rate']}: {stats['hits']:,} hits, {stats['coalesced']:,} coalesced, {stats['misses']:,} misses")
+    return {"requests": n, "statements": statements}
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--pollers", type=int, default=32)
+    p.add_argument("--seconds", type=float, default=20)
+    p.add_argument("--interval-ms", type=int, default=250, help="pause between a poller's requests")
+    p.add_argument("--block-ms", type=int, default=2000)
+    p.add_argument("--alert-ms", type=int, default=5000)
+    args = p.parse_args()
+    prefix = f"0xbc{os.getpid():x}"
+    _count_statements()
+
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT value FROM ingest_state WHERE key = 'last_block'")
+        row = cur.fetchone()
+        original = row[0] if row else None
+        cur.execute(
+            "INSERT INTO ingest_state(key, value) VALUES ('last_block', '1000') ON CONFLICT (key) DO UPDATE SET value = COALESCE(NULLIF(ingest_state.value, ''), '1000')"
+        )
+    try:
+        off = _run("cache off", args, prefix)
+        on = _run("cache on", args, prefix)
+        per_off = off["statements"] / max(off["requests"], 1)
+        per_on = on["statements"] / max(on["requests"], 1)
+        print(f"SQL statements per request: {per_off:.2f} -> {per_on:.3f} ({per_off / max(per_on, 1e-9):,.0f}x fewer)")
+    finally:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM alerts WHERE address = %s", (prefix,))
+            if original is None:
+                cur.execute("DELETE FROM ingest_state WHERE key = 'last_block'")
+            else:
+                cur.execute("UPDATE ingest_state SET value = %s WHERE key = 'last_block'", (original,))
+
+
+if __name__ == "__main__":
+    main()
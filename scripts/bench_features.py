@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""Benchmark feature fetches: per-request SQL vs the mapped feature store.
+
+Seeds `--transactions` transfers between `--addresses` random addresses over
+the last 30 days, their `edges` and `addresses` counters, and alerts for 5%
+of them (tagged with a per-run prefix) into DATABASE_URL, builds the feature
+store (full, then one incremental refresh after another block), writes and
+maps it, then reports the time to fetch the features of 1 address and of
+`--many` addresses
+
+- through SQL: the label features (`features_for`) plus the 7d/30d flows
+  and 7-day alert counts the profile and risk paths computed per request,
+- from the store: one `features_many` call for every column.
+
+Seeded rows are deleted afterwards.
+
+Example:
+  PYTHONPATH=. python scripts/bench_features.py --addresses 100000 --transactions 1000000 --many 100000
+"""
+
+import argparse
+import io
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from api.services.db import get_conn
+from api.services.entity_service import _FLOWS_SQL
+from api.services.feature_service import refresh_store
+from api.services.label_service import features_for
+from features.store import COLUMNS, FeatureStore, open_store, write_store
+
+CHUNK = 500_000
+
+_ALERTS_SQL = """
+    SELECT address, COUNT(*), COUNT(*) FILTER (WHERE status = 'new'), COUNT(*) FILTER (WHERE severity = 'high'), SUM(confidence)
+    FROM alerts WHERE address = ANY(%(a)s) AND created_at >= now() - interval '7 days' GROUP BY address
+"""
+
+
+def _seed(cur, prefix: str, addrs: list, n_tx: int, block: int, rng) -> None:
+    n_addr = len(addrs)
+    cur.execute("CREATE TEMP TABLE IF NOT EXISTS bench_tx (tx_hash TEXT, from_address TEXT, to_address TEXT, value_wei NUMERIC, ago INT)")
+    for lo in range(0, n_tx, CHUNK):
+        m = min(CHUNK, n_tx - lo)
+        src = np.minimum((rng.pareto(1.1, m) * n_addr / 50).astype(np.int64), n_addr - 1)
+        dst = rng.integers(0, n_addr, m)
+        ago = rng.integers(0, 30 * 86400, m)
+        wei = rng.integers(0, 10**9, m) * 10**9
+        cur.execute("TRUNCATE bench_tx")
+        cur.copy_expert("COPY bench_tx FROM STDIN", io.StringIO("".join(
+            f"{prefix}b{block}t{lo + i}\t{addrs[s]}\t{addrs[d]}\t{w}\t{a}\n"
+            for i, (s, d, w, a) in enumerate(zip(src.tolist(), dst.tolist(), wei.tolist(), ago.tolist()))
+        )))
+        cur.execute(
+            """
+            INSERT INTO transactions(tx_hash, block_number, from_address, to_address, value_wei, success, timestamp)
+            SELECT tx_hash, %s, from_address, to_address, value_wei, true, now() - make_interval(secs => ago) FROM bench_tx
+            """,
+            (block,),
+        )
+        cur.execute(
+            """
+            INSERT INTO edges(src_address, dst_address, tx_count, total_value_wei, window_start, window_end)
+            SELECT from_address, to_address, COUNT(*), SUM(value_wei), now(), now() FROM bench_tx GROUP BY 1, 2
+            """
+        )
+        cur.execute(
+            """
+            INSERT INTO addresses(address, tx_count, contracts_deployed)
+            SELECT address, COUNT(*), 0 FROM (SELECT from_address AS address FROM bench_tx UNION ALL SELECT to_address FROM bench_tx) t
+            GROUP BY address
+            ON CONFLICT (address) DO UPDATE SET tx_count = addresses.tx_count + EXCLUDED.tx_count, updated_at = now()
+            """
+        )
+        print(f"  seeded {lo + m:,} transactions at block {block}")
+
+
+def _sql(cur, addrs: list) -> None:
+    features_for(cur, addrs)
+    cur.execute(_FLOWS_SQL, {"a": addrs})
+    cur.fetchall()
+    cur.execute(_ALERTS_SQL, {"a": addrs})
+    cur.fetchall()
+
+
+def _timed(fn, calls) -> str:
+    ms = []
+    for args in calls:
+        t = time.perf_counter()
+        fn(*args)
+        ms.append((time.perf_counter() - t) * 1000)
+    return f"p50={statistics.median(ms):.2f}ms p95={np.percentile(ms, 95):.2f}ms (n={len(ms)})"
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--addresses", type=int, default=100_000)
+    p.add_argument("--transactions", type=int, default=1_000_000)
+    p.add_argument("--many", type=int, default=100_000)
+    p.add_argument("--single", type=int, default=200, help="single-address fetches to time")
+    args = p.parse_args()
+    prefix = f"0xbf{os.getpid():x}"
+    rng = np.random.default_rng(17)
+    addrs = [f"{prefix}{i:08x}" for i in range(args.addresses)]
+
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT COALESCE(MAX(block_number), 0) FROM transactions")
+        block = int(cur.fetchone()[0]) + 1000
+    try:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            _seed(cur, prefix, addrs, args.transactions, block, rng)
+            sample = rng.choice(len(addrs), len(addrs) // 20, replace=False).tolist()
+            cur.executemany(
+                "INSERT INTO alerts(type, address, severity, confidence, status) VALUES ('fan_out_spike', %s, %s, 0.7, 'new')",
+                [(addrs[i], "high" if i % 3 == 0 else "medium") for i in sample],
+            )
+            for t in ("transactions", "edges", "addresses", "alerts"):
+                cur.execute(f"ANALYZE {t}")
+
+        with get_conn() as conn:
+            store, run = refresh_store(FeatureStore.empty(), conn, full=True)
+        print(f"full build: {run['size']:,} addresses in {run['seconds']}s")
+        with get_conn() as conn:
+            _seed(conn.cursor(), prefix, addrs, max(1, args.transactions // 1000), block + 1, rng)
+        with get_conn() as conn:
+            store, run = refresh_store(store, conn)
+        print(f"incremental refresh (+{max(1, args.transactions // 1000):,} transactions): {run['flows']:,} flow rows, {run['expired']:,} expired in {run['seconds']}s")
+
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "features.store")
+            t = time.perf_counter()
+            write_store(store, path)
+            print(f"write: {os.path.getsize(path) / 2**20:.1f} MiB in {time.perf_counter() - t:.2f}s")
+            t = time.perf_counter()
+            mapped, _ = open_store(path)
+            print(f"map: {(time.perf_counter() - t) * 1000:.2f}ms")
+
+            singles = [([addrs[i]],) for i in rng.choice(len(addrs), args.single, replace=False).tolist()]
+            many = [addrs[i] for i in rng.choice(len(addrs), min(args.many, len(addrs)), replace=False).tolist()]
+            with get_conn() as conn:
+                cur = conn.cursor()
+                print(f"SQL, 1 address: {_timed(lambda a: _sql(cur, a), singles)}")
+                print(f"store, 1 address ({len(COLUMNS)} columns): {_timed(mapped.features_many, singles)}")
+                print(f"SQL, {len(many):,} addresses: {_timed(lambda a: _sql(cur, a), [(many,)])}")
+            print(f"store, {len(many):,} addresses ({len(COLUMNS)} columns): {_timed(mapped.features_many, [(many,)] * 5)}")
+    finally:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM transactions WHERE tx_hash LIKE %s", (f"{prefix}%",))
+            cur.execute("DELETE FROM edges WHERE src_address LIKE %s", (f"{prefix}%",))
+            cur.execute("DELETE FROM addresses WHERE address LIKE %s", (f"{prefix}%",))
+            cur.execute("DELETE FROM alerts WHERE address LIKE %s", (f"{prefix}%",))
+
+
+if __name__ == "__main__":
+    main()
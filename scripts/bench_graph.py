@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Benchmark the in-memory graph snapshot on a synthetic power-law graph.
+
+Endpoints are drawn from a Zipf-like distribution over `--nodes` addresses,
+so a few hubs carry most transfers, as on Base (WETH, routers, bridges).
+Reports build time, memory footprint, incremental merge time and query
+latency for the services served from the snapshot.
+
+Example:
+  PYTHONPATH=. python scripts/bench_graph.py --edges 10000000 --nodes 2000000
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from graph.centrality import degree_centrality, pagerank, rank_percentiles
+from graph.clustering import Clustering
+from graph.csr import ADDRESS_DTYPE, AddressIndex, CSRGraph
+from graph.paths import shortest_paths
+from graph.traversal import bounded_bfs
+
+T0 = 1_700_000_000
+
+
+def synthetic_index(n_nodes: int) -> AddressIndex:
+    addresses = np.char.add(b"0x", np.char.zfill(np.char.encode(np.char.mod("%x", np.arange(n_nodes) * 2654435761 % (1 << 40))), 40))
+    return AddressIndex(addresses.astype(ADDRESS_DTYPE))
+
+
+def synthetic_columns(n_edges: int, n_nodes: int, seed: int = 7, skew: float = 1.1):
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, n_nodes + 1) ** skew
+    cdf = np.cumsum(weights / weights.sum())
+    perm = rng.permutation(n_nodes).astype(np.int32)
+    src = perm[np.minimum(np.searchsorted(cdf, rng.random(n_edges)), n_nodes - 1)]
+    dst = perm[np.minimum(np.searchsorted(cdf, rng.random(n_edges)), n_nodes - 1)]
+    ts = (T0 + rng.integers(0, 30 * 86400, n_edges)).astype(np.uint32)
+    value = np.floor(np.minimum(rng.pareto(1.5, n_edges) * 1e16, 1e19)).astype(np.uint64)
+    return src, dst, np.ones(n_edges, np.int64), np.zeros(n_edges, np.uint64), value, ts, ts
+
+
+def _timed(fn, n: int):
+    samples = []
+    for _ in range(n):
+        t = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t) * 1000)
+    samples.sort()
+    return f"p50={statistics.median(samples):.2f}ms p95={samples[int(len(samples) * 0.95) - 1]:.2f}ms max={samples[-1]:.2f}ms"
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--edges", type=int, default=10_000_000)
+    p.add_argument("--nodes", type=int, default=2_000_000)
+    p.add_argument("--queries", type=int, default=200)
+    p.add_argument("--merge-rows", type=int, default=50_000)
+    args = p.parse_args()
+
+    t = time.perf_counter()
+    index = synthetic_index(args.nodes)
+    cols = synthetic_columns(args.edges, args.nodes)
+    print(f"generated {args.edges:,} transfers over {args.nodes:,} addresses in {time.perf_counter() - t:.1f}s")
+
+    t = time.perf_counter()
+    g = CSRGraph.from_pairs(index, *cols, watermark=args.edges)
+    print(f"build: {time.perf_counter() - t:.2f}s -> {g.n_nodes:,} nodes, {g.n_edges:,} aggregated pairs, {g.nbytes() / 2**20:.0f} MiB")
+    t = time.perf_counter()
+    g.degree()
+    print(f"degree cache: {time.perf_counter() - t:.2f}s")
+
+    t = time.perf_counter()
+    pr = pagerank(g, max_iter=100)
+    rank_percentiles(pr["scores"])
+    degree_centrality(g)
+    print(f"pagerank + degree centrality: {time.perf_counter() - t:.2f}s, {pr['iterations']} iterations, residual={pr['residual']:.1e}, converged={pr['converged']}")
+
+    clustering = Clustering(min_tx=1)
+    t = time.perf_counter()
+    clustering.full(g)
+    print(f"clustering (min_tx=1): {time.perf_counter() - t:.2f}s, {len(np.unique(clustering.cluster_key)):,} clusters, {clustering.iterations} rounds")
+
+    src, dst, cnt, hi, lo, first, last = synthetic_columns(args.merge_rows, args.nodes, seed=11)
+    t = time.perf_counter()
+    g2 = g.merge_ids(index, src, dst, cnt, hi, lo, first + 86400, last + 86400, watermark=args.edges + args.merge_rows)
+    print(f"incremental merge of {args.merge_rows:,} new rows: {time.perf_counter() - t:.2f}s ({g2.n_edges - g.n_edges:,} new pairs)")
+    t = time.perf_counter()
+    changed = clustering.update(g2)
+    print(f"clustering update ({clustering.mode}): {time.perf_counter() - t:.2f}s, {len(changed):,} addresses reassigned")
+
+    rng = np.random.default_rng(3)
+    hubs = [g.index.address(int(i)) for i in g.top_nodes(10)]
+    sample = [g.index.address(int(i)) for i in rng.integers(0, g.n_nodes, args.queries)]
+    print(f"neighbors(limit=25), random: {_timed(lambda: g.neighbors(sample[rng.integers(len(sample))], 25), args.queries)}")
+    print(f"neighbors(limit=25), top-10 hubs: {_timed(lambda: g.neighbors(hubs[rng.integers(len(hubs))], 25), 50)}")
+    print(f"cluster(limit=200), random: {_timed(lambda: g.cluster(sample[rng.integers(len(sample))], 200), args.queries)}")
+    print(f"cluster(limit=200), top-10 hubs: {_timed(lambda: g.cluster(hubs[rng.integers(len(hubs))], 200), 20)}")
+    print(f"global_graph(limit=80): {_timed(lambda: g.global_graph(80), 20)}")
+
+    truncated = []
+
+    def bfs(address):
+        truncated.append(bounded_bfs(g, address, depth=3, frontier_cap=25, time_budget_ms=150)["truncated"])
+
+    t = time.perf_counter()
+    for h in hubs:
+        bfs(h)
+    print(f"bfs(depth=3, frontier=25), top-10 hubs cold: {(time.perf_counter() - t) * 100:.1f}ms avg")
+    print(f"bfs(depth=3, frontier=25), top-10 hubs warm: {_timed(lambda: bfs(hubs[rng.integers(len(hubs))]), 50)}")
+    print(f"bfs(depth=3, frontier=25), random: {_timed(lambda: bfs(sample[rng.integers(len(sample))]), args.queries)}")
+    print(f"bfs truncated by budget: {sum(truncated)}/{len(truncated)}")
+
+    found = []
+    pairs = [(sample[i], sample[(i + 1) % len(sample)]) for i in range(min(50, len(sample)))]
+    for weighted, k in ((False, 1), (True, 1), (True, 3)):
+        found.clear()
+        it = iter(pairs * 2)
+
+        def path():
+            a, b = next(it)
+            found.append(bool(shortest_paths(g, a, b, k=k, weighted=weighted, skip=hubs)["paths"]))
+
+        print(f"path(weighted={weighted}, k={k}), random pairs: {_timed(path, len(pairs))} found={sum(found)}/{len(found)}")
+
+
+if __name__ == "__main__":
+    main()
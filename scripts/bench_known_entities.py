@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Benchmark the known-entity registry: load time, memory and lookup throughput.
+
+Writes `--entries` random entity rows to a CSV, loads them through
+`labels.known_entities.load` and reports bytes per entry (arrays + Bloom
+filter, and process RSS growth) against a plain dict of the same entries,
+then lookups/sec for single addresses (`lookup`) and batches
+(`lookup_many`), for known addresses and for the common unknown case, with
+and without the Bloom pre-check.
+
+Example:
+  PYTHONPATH=. python scripts/bench_known_entities.py --entries 1000000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from labels.known_entities import load
+
+LABELS = ("exchange", "sanctioned", "mev-bot", "bridge")
+
+
+def _rss_mib() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _rate(fn, items) -> float:
+    t = time.perf_counter()
+    fn(items)
+    return len(items) / (time.perf_counter() - t)
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--entries", type=int, default=1_000_000)
+    p.add_argument("--probes", type=int, default=200_000)
+    p.add_argument("--batch", type=int, default=50_000)
+    args = p.parse_args()
+    rng = random.Random(1)
+
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "entities.csv")
+        with open(path, "w") as f:
+            f.write("address,label,name\n")
+            for i in range(args.entries):
+                f.write(f"0x{rng.getrandbits(160):040x},{LABELS[i % 4]},entity {i % 5000}\n")
+        rss0 = _rss_mib()
+        reg, stats = load([path])
+        rss1 = _rss_mib()
+        print(
+            f"load: {stats['entries']:,} entries in {stats['load_seconds']}s; arrays {reg.nbytes() / 2**20:.1f} MiB "
+            f"({reg.nbytes() / len(reg):.1f} B/entry, Bloom {reg.bloom.nbytes / 2**20:.1f} MiB), RSS +{rss1 - rss0:.0f} MiB"
+        )
+        known = [reg.address(e) for e in range(0, len(reg), max(1, len(reg) // args.probes))][: args.probes]
+
+        rss2 = _rss_mib()
+        as_dict = {a: e for a, e in reg.entries()}
+        rss3 = _rss_mib()
+        print(f"dict of the same entries: RSS +{rss3 - rss2:.0f} MiB ({(rss3 - rss2) * 2**20 / len(as_dict):.0f} B/entry)")
+        del as_dict
+
+    unknown = [f"0x{rng.getrandbits(160):040x}" for _ in range(args.probes)]
+    for name, probes in (("known", known), ("unknown", unknown)):
+        single = _rate(lambda xs: [reg.lookup(a) for a in xs], probes[:50_000])
+        batch = _rate(lambda xs: [reg.lookup_many(xs[i:i + args.batch]) for i in range(0, len(xs), args.batch)], probes)
+        print(f"{name:>7}: lookup {single:,.0f}/s, lookup_many {batch:,.0f}/s")
+
+    # The Bloom pre-check against binary searching every probe.
+    keys = np.array([bytes.fromhex(a[2:]) for a in unknown], dtype="S20")
+    t = time.perf_counter()
+    maybe = reg._maybe(keys)
+    np.searchsorted(reg.keys, keys[maybe])
+    bloom = time.perf_counter() - t
+    t = time.perf_counter()
+    pos = np.minimum(np.searchsorted(reg.keys, keys), len(reg.keys) - 1)
+    _ = reg.keys[pos] == keys
+    plain = time.perf_counter() - t
+    print(f"unknown batch of {len(keys):,}: Bloom + search {len(keys) / bloom:,.0f}/s ({maybe.mean():.2%} pass), search only {len(keys) / plain:,.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Benchmark `/labels/{address}` reads: recompute-and-rewrite vs stored state.
+
+Seeds `--addresses` addresses and `--edges` edge rows with Zipf-distributed
+endpoints into DATABASE_URL under a unique prefix, then reports read latency
+p50/p95 over a sample for
+
+- recompute: the former read path (features queried, rules evaluated, the
+  address's label rows deleted and reinserted on every read),
+- stored: `get_labels`, reading the state the relabel queue stored,
+
+and the drain throughput of `drain_dirty` over the seeded addresses. Seeded
+rows are deleted afterwards.
+
+Example:
+  PYTHONPATH=. python scripts/bench_label_reads.py --addresses 200000 --edges 1000000
+"""
+
+import argparse
+import io
+import os
+import statistics
+import time
+
+import numpy as np
+
+from api.services.db import get_conn
+from api.services.label_service import drain_dirty, features_for, get_labels, json_dumps, mark_dirty
+from labels.rules import label_address
+
+
+def _seed(prefix: str, n_addr: int, n_edges: int) -> list:
+    rng = np.random.default_rng(11)
+    weights = 1.0 / np.arange(1, n_addr + 1) ** 1.05
+    cdf = np.cumsum(weights / weights.sum())
+    src = np.minimum(np.searchsorted(cdf, rng.random(n_edges)), n_addr - 1)
+    dst = np.minimum(np.searchsorted(cdf, rng.random(n_edges)), n_addr - 1)
+    addresses = [f"{prefix}{i:x}" for i in range(n_addr)]
+    tx = np.bincount(src, minlength=n_addr)
+    deployed = rng.poisson(0.3, n_addr)
+    with get_conn() as conn:
+        cur = conn.cursor()
+        buf = io.StringIO("".join(f"{a}\t{t}\t{d}\n" for a, t, d in zip(addresses, tx.tolist(), deployed.tolist())))
+        cur.copy_expert("COPY addresses(address, tx_count, contracts_deployed) FROM STDIN", buf)
+        buf = io.StringIO("".join(f"{addresses[s]}\t{addresses[d]}\t1\t1\n" for s, d in zip(src.tolist(), dst.tolist())))
+        cur.copy_expert("COPY edges(src_address, dst_address, tx_count, total_value_wei) FROM STDIN", buf)
+        cur.execute("ANALYZE addresses")
+        cur.execute("ANALYZE edges")
+    return addresses
+
+
+def _recompute(address: str) -> dict:
+    with get_conn() as conn:
+        cur = conn.cursor()
+        features = features_for(cur, [address])[address]
+        labels = label_address(address, features)
+        cur.execute("DELETE FROM labels WHERE address = %s", (address,))
+        for lb in labels:
+            cur.execute(
+                "INSERT INTO labels(address, label, confidence, evidence) VALUES (%s, %s, %s, %s::jsonb)",
+                (address, lb["label"], lb["confidence"], json_dumps(lb["evidence"])),
+            )
+    return {"address": address, "features": features, "labels": labels}
+
+
+def _timed(fn, sample) -> str:
+    ms = []
+    for a in sample:
+        t = time.perf_counter()
+        fn(a)
+        ms.append((time.perf_counter() - t) * 1000)
+    return f"p50={statistics.median(ms):.2f}ms p95={np.percentile(ms, 95):.2f}ms"
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--addresses", type=int, default=200_000)
+    p.add_argument("--edges", type=int, default=1_000_000)
+    p.add_argument("--sample", type=int, default=1000)
+    p.add_argument("--batch", type=int, default=5000)
+    args = p.parse_args()
+    prefix = f"0xlr{os.getpid():x}x"
+
+    t = time.perf_counter()
+    addresses = _seed(prefix, args.addresses, args.edges)
+    print(f"seeded {args.addresses:,} addresses and {args.edges:,} edge rows in {time.perf_counter() - t:.1f}s")
+    try:
+        with get_conn() as conn:
+            mark_dirty(conn.cursor(), addresses)
+        t, n = time.perf_counter(), 0
+        while True:
+            out = drain_dirty(args.batch)
+            if not out["addresses"]:
+                break
+            n += out["addresses"]
+        dt = time.perf_counter() - t
+        print(f"drain_dirty (batches of {args.batch:,}): {n:,} addresses in {dt:.1f}s, {n / dt:,.0f} addresses/s")
+
+        rng = np.random.default_rng(2)
+        sample = [addresses[i] for i in rng.integers(0, len(addresses), args.sample)]
+        print(f"recompute + rewrite: {_timed(_recompute, sample)}")
+        print(f"stored read:         {_timed(get_labels, sample)}")
+        # The hottest addresses are where recomputing hurts most.
+        hubs = addresses[: max(1, args.sample // 10)]
+        print(f"recompute, top {len(hubs)}:  {_timed(_recompute, hubs)}")
+        print(f"stored read, top {len(hubs)}: {_timed(get_labels, hubs)}")
+    finally:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM edges WHERE src_address LIKE %s", (f"{prefix}%",))
+            cur.execute("DELETE FROM labels WHERE address LIKE %s", (f"{prefix}%",))
+            cur.execute("DELETE FROM label_dirty WHERE address LIKE %s", (f"{prefix}%",))
+            cur.execute("DELETE FROM address_label_state WHERE address LIKE %s", (f"{prefix}%",))
+            cur.execute("DELETE FROM addresses WHERE address LIKE %s", (f"{prefix}%",))
+
+
+if __name__ == "__main__":
+    main()
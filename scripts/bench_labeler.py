@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Benchmark label throughput: per-address `get_labels` vs the batch labeler (NumPy and in-database rules).
+
+Seeds `--addresses` addresses and `--edges` edge rows with Zipf-distributed
+endpoints into DATABASE_URL under a unique prefix, then reports
+addresses/sec for the per-address path (on a sample), the batch labeler on
+the seeded subset, and the batch labeler over every address in the
+database, each with the rules evaluated in NumPy and as SQL. Seeded rows
+and their labels are deleted afterwards.
+
+Example:
+  PYTHONPATH=. python scripts/bench_labeler.py --addresses 200000 --edges 1000000
+"""
+
+import argparse
+import io
+import os
+import time
+
+import numpy as np
+
+from api.services.db import get_conn
+from api.services.label_service import get_labels, relabel
+
+
+def _seed(prefix: str, n_addr: int, n_edges: int) -> list:
+    rng = np.random.default_rng(11)
+    weights = 1.0 / np.arange(1, n_addr + 1) ** 1.05
+    cdf = np.cumsum(weights / weights.sum())
+    src = np.minimum(np.searchsorted(cdf, rng.random(n_edges)), n_addr - 1)
+    dst = np.minimum(np.searchsorted(cdf, rng.random(n_edges)), n_addr - 1)
+    addresses = [f"{prefix}{i:x}" for i in range(n_addr)]
+    tx = np.bincount(src, minlength=n_addr)
+    deployed = rng.poisson(0.3, n_addr)
+    with get_conn() as conn:
+        cur = conn.cursor()
+        buf = io.StringIO("".join(f"{a}\t{t}\t{d}\n" for a, t, d in zip(addresses, tx.tolist(), deployed.tolist())))
+        cur.copy_expert("COPY addresses(address, tx_count, contracts_deployed) FROM STDIN", buf)
+        buf = io.StringIO("".join(f"{addresses[s]}\t{addresses[d]}\t1\t1\n" for s, d in zip(src.tolist(), dst.tolist())))
+        cur.copy_expert("COPY edges(src_address, dst_address, tx_count, total_value_wei) FROM STDIN", buf)
+        cur.execute("ANALYZE addresses")
+        cur.execute("ANALYZE edges")
+    return addresses
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--addresses", type=int, default=200_000)
+    p.add_argument("--edges", type=int, default=1_000_000)
+    p.add_argument("--sample", type=int, default=500)
+    p.add_argument("--skip-full", action="store_true", help="skip relabeling every address in the database")
+    args = p.parse_args()
+    prefix = f"0xbl{os.getpid():x}x"
+
+    t = time.perf_counter()
+    addresses = _seed(prefix, args.addresses, args.edges)
+    print(f"seeded {args.addresses:,} addresses and {args.edges:,} edge rows in {time.perf_counter() - t:.1f}s")
+    try:
+        rng = np.random.default_rng(2)
+        sample = [addresses[i] for i in rng.integers(0, len(addresses), args.sample)]
+        t = time.perf_counter()
+        for a in sample:
+            get_labels(a)
+        dt = time.perf_counter() - t
+        print(f"per-address get_labels: {len(sample) / dt:,.0f} addresses/s ({dt / len(sample) * 1000:.2f}ms each)")
+
+        out = relabel(addresses=addresses)
+        print(f"batch, seeded subset:   {out['addresses_per_sec']:,} addresses/s ({out['addresses']:,} addresses, {out['labels']:,} labels, {out['seconds']}s)")
+        out = relabel(addresses=addresses)
+        print(f"batch, subset rerun:    {out['addresses_per_sec']:,} addresses/s (+{out['inserted']} -{out['deleted']} rows)")
+        out = relabel(addresses=addresses, in_database=True)
+        print(f"in-db, subset rerun:    {out['addresses_per_sec']:,} addresses/s (+{out['inserted']} -{out['deleted']} rows)")
+        if not args.skip_full:
+            out = relabel()
+            print(f"batch, all addresses:   {out['addresses_per_sec']:,} addresses/s ({out['addresses']:,} addresses, {out['seconds']}s)")
+            out = relabel(in_database=True)
+            print(f"in-db, all addresses:   {out['addresses_per_sec']:,} addresses/s ({out['addresses']:,} addresses, {out['seconds']}s, +{out['inserted']} -{out['deleted']} rows)")
+    finally:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM edges WHERE src_address LIKE %s", (f"{prefix}%",))
+            cur.execute("DELETE FROM labels WHERE address LIKE %s", (f"{prefix}%",))
+            cur.execute("DELETE FROM address_label_state WHERE address LIKE %s", (f"{prefix}%",))
+            cur.execute("DELETE FROM addresses WHERE address LIKE %s", (f"{prefix}%",))
+
+
+if __name__ == "__main__":
+    main()
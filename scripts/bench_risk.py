@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""Benchmark risk scoring: the former per-call queries vs the materialized scores.
+
+Seeds `--transactions` transfers between `--addresses` random addresses over
+the last 7 days, plus alerts and labels for a fraction of them (tagged with
+a per-run tx_hash / address prefix) into DATABASE_URL, then reports
+
+- the old /entity/{address}/risk queries (7-day alerts, a 24h aggregate
+  over every address, 7-day value sums) per call,
+- one `score_all` run (addresses/sec),
+- `entity_risk` point lookups and `top_risk` leaderboard reads.
+
+Seeded rows are deleted afterwards.
+
+Example:
+  PYTHONPATH=. python scripts/bench_risk.py --addresses 200000 --transactions 2000000
+"""
+
+import argparse
+import io
+import os
+import statistics
+import time
+
+import numpy as np
+
+from api.services.db import get_conn
+from api.services.risk_service import entity_risk, score_all, top_risk
+
+OLD_QUERIES = (
+    """
+    SELECT COUNT(*) FILTER (WHERE status='new'), COUNT(*) FILTER (WHERE severity='high'), COALESCE(AVG(confidence),0)
+    FROM alerts WHERE address = %(a)s AND created_at >= now() - interval '7 days'
+    """,
+    """
+    WITH recent AS (
+      SELECT from_address AS a, COUNT(*) AS out_c, 0::bigint AS in_c FROM transactions
+      WHERE timestamp >= now() - interval '24 hours' AND from_address IS NOT NULL GROUP BY from_address
+      UNION ALL
+      SELECT to_address AS a, 0::bigint AS out_c, COUNT(*) AS in_c FROM transactions
+      WHERE timestamp >= now() - interval '24 hours' AND to_address IS NOT NULL GROUP BY to_address
+    ), agg AS (SELECT a, SUM(out_c) AS out_c, SUM(in_c) AS in_c FROM recent GROUP BY a)
+    SELECT COALESCE(out_c,0), COALESCE(in_c,0) FROM agg WHERE a = %(a)s
+    """,
+    """
+    SELECT COALESCE(SUM(CASE WHEN from_address = %(a)s THEN value_wei ELSE 0 END),0),
+           COALESCE(SUM(CASE WHEN to_address = %(a)s THEN value_wei ELSE 0 END),0)
+    FROM transactions WHERE timestamp >= now() - interval '7 days' AND (from_address = %(a)s OR to_address = %(a)s)
+    """,
+    "SELECT label, confidence, evidence FROM labels WHERE address = %(a)s ORDER BY id",
+)
+
+CHUNK = 500_000
+
+
+def _seed(prefix: str, n_addr: int, n_tx: int) -> list:
+    rng = np.random.default_rng(11)
+    addrs = [f"{prefix}{i:08x}" for i in range(n_addr)]
+    with get_conn() as conn:
+        cur = conn.cursor()
+        for lo in range(0, n_tx, CHUNK):
+            m = min(CHUNK, n_tx - lo)
+            # Skewed endpoints so some addresses are hubs.
+            src = np.minimum((rng.pareto(1.1, m) * n_addr / 50).astype(np.int64), n_addr - 1)
+            dst = rng.integers(0, n_addr, m)
+            ago = rng.integers(0, 7 * 86400, m)
+            wei = [f"{w}000000000000000" for w in rng.integers(0, 10**6, m).tolist()]  # up to 1e21, past int64
+            buf = io.StringIO("".join(
+                f"{prefix}t{lo + i}\t1\t{addrs[s]}\t{addrs[d]}\t{w}\ttrue\t{a}\n"
+                for i, (s, d, w, a) in enumerate(zip(src.tolist(), dst.tolist(), wei, ago.tolist()))
+            ))
+            cur.execute("CREATE TEMP TABLE IF NOT EXISTS bench_tx (tx_hash TEXT, block_number BIGINT, from_address TEXT, to_address TEXT, value_wei NUMERIC, success BOOLEAN, ago INT)")
+            cur.execute("TRUNCATE bench_tx")
+            cur.copy_expert("COPY bench_tx FROM STDIN", buf)
+            cur.execute(
+                """
+                INSERT INTO transactions(tx_hash, block_number, from_address, to_address, value_wei, success, timestamp)
+                SELECT tx_hash, block_number, from_address, to_address, value_wei, success, now() - make_interval(secs => ago) FROM bench_tx
+                """
+            )
+            conn.commit()
+            print(f"  seeded {lo + m:,} transactions")
+        sample = rng.choice(n_addr, n_addr // 20, replace=False).tolist()
+        cur.executemany(
+            "INSERT INTO alerts(type, address, severity, confidence, status) VALUES ('fan_out_spike', %s, %s, %s, 'new')",
+            [(addrs[i], "high" if i % 3 == 0 else "medium", 0.5 + (i % 5) / 10) for i in sample],
+        )
+        cur.executemany(
+            "INSERT INTO labels(address, label, confidence, evidence) VALUES (%s, %s, 0.7, '{}')",
+            [(addrs[i], ("router", "deployer", "contract")[i % 3]) for i in sample],
+        )
+        cur.execute("ANALYZE transactions")
+    return addrs
+
+
+def _timed(fn, args) -> str:
+    ms = []
+    for a in args:
+        t = time.perf_counter()
+        fn(a)
+        ms.append((time.perf_counter() - t) * 1000)
+    return f"p50={statistics.median(ms):.1f}ms p95={np.percentile(ms, 95):.1f}ms (n={len(ms)})"
+
+
+def _old(address: str) -> None:
+    with get_conn() as conn:
+        cur = conn.cursor()
+        for q in OLD_QUERIES:
+            cur.execute(q, {"a": address})
+            cur.fetchall()
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--addresses", type=int, default=200_000)
+    p.add_argument("--transactions", type=int, default=2_000_000)
+    p.add_argument("--lookups", type=int, default=500)
+    args = p.parse_args()
+    prefix = f"0xbr{os.getpid():x}"
+
+    t = time.perf_counter()
+    addrs = _seed(prefix, args.addresses, args.transactions)
+    print(f"seeded in {time.perf_counter() - t:.0f}s")
+    try:
+        probe = addrs[:: max(1, len(addrs) // args.lookups)][: args.lookups]
+        print(f"old per-call queries: {_timed(_old, probe[:10])}")
+        run = score_all()
+        print(f"score_all: {run['addresses']:,} addresses in {run['seconds']}s ({run['addresses'] / run['seconds']:,.0f}/s), {run['high']} high, {run['medium']} medium")
+        print(f"entity_risk lookup: {_timed(entity_risk, probe)}")
+        print(f"top_risk(50): {_timed(lambda _: top_risk(50), range(100))}")
+        print(f"top_risk(50, band=high): {_timed(lambda _: top_risk(50, min_band='high'), range(100))}")
+    finally:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM transactions WHERE tx_hash LIKE %s", (f"{prefix}%",))
+            cur.execute("DELETE FROM alerts WHERE address LIKE %s", (f"{prefix}%",))
+            cur.execute("DELETE FROM labels WHERE address LIKE %s", (f"{prefix}%",))
+        score_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Benchmark /search: the former LIKE '%q%' scan vs the prefix/top-K index.
+
+Seeds `--addresses` random hex addresses with Zipf-like tx_count into
+DATABASE_URL (tagged with first_seen_block = -pid), builds `search_top`
+(full refresh), then reports latency p50/p95 of
+
+- the old query (substring LIKE over addresses + labels, sorted by
+  tx_count) on a few prefixes, cut off after `--old-timeout-ms`,
+- `search_entities(typeahead=True)` for hex prefixes of 1..8 digits,
+  label text and known-entity names,
+- an incremental refresh after `--updates` addresses changed.
+
+Seeded rows are deleted afterwards (and search_top rebuilt) unless --keep.
+
+Example:
+  PYTHONPATH=. python scripts/bench_search.py --addresses 50000000
+"""
+
+import argparse
+import io
+import os
+import random
+import statistics
+import time
+
+import numpy as np
+from psycopg2 import errors
+
+from api.services.db import get_conn
+from api.services.search_service import refresh_search_index, search_entities
+
+OLD_SQL = """
+    SELECT DISTINCT a.address, a.tx_count, a.contracts_deployed,
+           COALESCE(l.label, '') as top_label, COALESCE(l.confidence, 0) as top_confidence
+    FROM addresses a
+    LEFT JOIN LATERAL (
+      SELECT label, confidence FROM labels WHERE address = a.address ORDER BY confidence DESC LIMIT 1
+    ) l ON true
+    WHERE a.address LIKE %s
+       OR EXISTS (SELECT 1 FROM labels x WHERE x.address = a.address AND x.label LIKE %s)
+    ORDER BY a.tx_count DESC
+    LIMIT %s
+"""
+
+CHUNK = 1_000_000
+
+
+def _seed(n: int, tag: int) -> None:
+    rng = np.random.default_rng(5)
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT now() - interval '1 day'")
+        stamp = cur.fetchone()[0].isoformat()
+        for lo in range(0, n, CHUNK):
+            m = min(CHUNK, n - lo)
+            raw = rng.integers(0, 256, (m, 20), dtype=np.uint8)
+            tx = np.floor(rng.pareto(1.2, m) * 3).astype(np.int64)
+            h = raw.tobytes().hex()
+            # Last touched a day ago, so only the --updates rows are new to an incremental refresh.
+            buf = io.StringIO("".join(f"0x{h[40 * i:40 * i + 40]}\t{t}\t{tag}\t{stamp}\n" for i, t in enumerate(tx.tolist())))
+            cur.copy_expert("COPY addresses(address, tx_count, first_seen_block, updated_at) FROM STDIN", buf)
+            conn.commit()
+            print(f"  seeded {lo + m:,}")
+        cur.execute("ANALYZE addresses")
+
+
+def _timed(fn, args) -> str:
+    ms = []
+    for a in args:
+        t = time.perf_counter()
+        fn(a)
+        ms.append((time.perf_counter() - t) * 1000)
+    return f"p50={statistics.median(ms):.1f}ms p95={np.percentile(ms, 95):.1f}ms max={max(ms):.1f}ms (n={len(ms)})"
+
+
+def _old(q: str, timeout_ms: int):
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SET LOCAL statement_timeout = %s", (timeout_ms,))
+        try:
+            cur.execute(OLD_SQL, (f"%{q}%", f"%{q}%", 10))
+            return cur.fetchall()
+        except errors.QueryCanceled:
+            conn.rollback()
+            return None
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--addresses", type=int, default=5_000_000)
+    p.add_argument("--queries", type=int, default=200)
+    p.add_argument("--updates", type=int, default=20_000)
+    p.add_argument("--old-timeout-ms", type=int, default=60_000)
+    p.add_argument("--keep", action="store_true", help="keep the seeded rows (and reuse them with --reuse)")
+    p.add_argument("--reuse", type=int, help="tag of rows kept by an earlier --keep run")
+    args = p.parse_args()
+    tag = -(args.reuse or os.getpid())
+    rng = random.Random(7)
+
+    if args.reuse is None:
+        t = time.perf_counter()
+        _seed(args.addresses, tag)
+        print(f"seeded {args.addresses:,} addresses in {time.perf_counter() - t:.0f}s (tag {tag})")
+    try:
+        out = refresh_search_index(full=True)
+        print(f"full index build: {out['seconds']}s ({out['rows_written']:,} rows written)")
+
+        hexq = lambda d: "0x" + "".join(rng.choice("0123456789abcdef") for _ in range(d))
+        t = time.perf_counter()
+        r = _old(hexq(3), args.old_timeout_ms)
+        print(f"old LIKE '%q%' query, 3-digit prefix: {(time.perf_counter() - t) * 1000:.0f}ms{' (timed out)' if r is None else ''}")
+        t = time.perf_counter()
+        r = _old("exchange", args.old_timeout_ms)
+        print(f"old LIKE '%q%' query, label text:     {(time.perf_counter() - t) * 1000:.0f}ms{' (timed out)' if r is None else ''}")
+
+        for digits in (0, 1, 2, 3, 4, 5, 6, 8):
+            qs = [hexq(digits) for _ in range(args.queries)]
+            print(f"typeahead 0x+{digits} digits: {_timed(lambda q: search_entities(q, typeahead=True), qs)}")
+        print(f"typeahead label text:   {_timed(lambda q: search_entities(q, typeahead=True), ['rout', 'exchange', 'deploy', 'high-a'] * (args.queries // 4))}")
+        print(f"typeahead unknown text: {_timed(lambda q: search_entities(q, typeahead=True), ['qqqq', 'zzz'] * (args.queries // 2))}")
+        print(f"full search 0x+2, limit 50 (range scan): {_timed(lambda q: search_entities(q, limit=50), [hexq(2) for _ in range(5)])}")
+
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "UPDATE addresses SET tx_count = tx_count + 1000, updated_at = now() WHERE address IN (SELECT address FROM addresses TABLESAMPLE SYSTEM (0.1) WHERE first_seen_block = %s LIMIT %s)",
+                (tag, args.updates),
+            )
+            n = cur.rowcount
+        out = refresh_search_index()
+        print(f"incremental refresh after {n:,} updates: {out['seconds']}s ({out['prefixes']:,} prefixes)")
+    finally:
+        if not args.keep:
+            with get_conn() as conn:
+                conn.cursor().execute("DELETE FROM addresses WHERE first_seen_block = %s", (tag,))
+            refresh_search_index(full=True)
+
+
+if __name__ == "__main__":
+    main()
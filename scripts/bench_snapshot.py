@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""Benchmark worker startup and memory: mmap'd snapshot file vs per-worker rebuild.
+
+Builds a synthetic graph of `--pairs` pairs over `--nodes` addresses, writes
+it with graph.snapshot_file, then starts 4 and 16 worker processes per mode:
+
+- rebuild: every worker builds its own CSR from address rows the way
+  `load_edges` does after fetching them (a lower bound for the Postgres
+  path: the query itself is not included).
+- mmap: every worker maps the snapshot file read-only.
+
+Each worker then answers neighbor queries for random addresses, makes one
+full pass over the edge arrays (top nodes by degree) and reports its load
+time and RSS / PSS / private memory from /proc/self/smaps_rollup
+while all workers are alive (PSS splits shared pages across the processes
+mapping them).
+
+Example:
+  PYTHONPATH=. python scripts/bench_snapshot.py --pairs 2000000 --nodes 500000
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from api.services.snapshot_service import CHUNK_ROWS
+
+
+def _memory() -> dict:
+    out = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:", "Private_Clean:", "Private_Dirty:"):
+                out[parts[0][:-1]] = int(parts[1]) / 1024
+    out["Private"] = out.pop("Private_Clean", 0) + out.pop("Private_Dirty", 0)
+    return out
+
+
+def _worker(mode: str, workdir: str, queries: int, start: mp.Barrier, done: mp.Barrier, results) -> None:
+    from graph.csr import CSRGraph
+    from graph.snapshot_file import open_snapshot
+
+    start.wait()
+    t0 = time.perf_counter()
+    if mode == "mmap":
+        graph, _ = open_snapshot(os.path.join(workdir, "graph.snapshot"))
+    else:
+        data = np.load(os.path.join(workdir, "rows.npz"))
+        addresses = data["addresses"]
+        src, dst = data["src"], data["dst"]
+        index, parts = CSRGraph.empty().index, []
+        for lo in range(0, len(src), CHUNK_ROWS):
+            rows_src = addresses[src[lo:lo + CHUNK_ROWS]].astype("U42").tolist()
+            rows_dst = addresses[dst[lo:lo + CHUNK_ROWS]].astype("U42").tolist()
+            index, ids = index.extend(rows_src + rows_dst)
+            parts.append((ids[: len(rows_src)], ids[len(rows_src):]))
+        ids_src, ids_dst = (np.concatenate(c) for c in zip(*parts))
+        graph = CSRGraph.empty().merge_ids(index, ids_src, ids_dst, data["tx_count"], data["value_hi"], data["value_lo"], data["first_ts"], data["last_ts"], watermark=1)
+    loaded = time.perf_counter() - t0
+    rng = np.random.default_rng(os.getpid())
+    t1 = time.perf_counter()
+    for i in rng.integers(0, graph.n_nodes, queries).tolist():
+        graph.neighbors(graph.index.address(i), limit=25)
+    query_ms = (time.perf_counter() - t1) * 1000 / queries
+    t2 = time.perf_counter()
+    graph.top_nodes(80)  # full pass over the edge arrays
+    scan = time.perf_counter() - t2
+    done.wait()
+    results.put({"load": loaded, "query_ms": query_ms, "scan": scan, **_memory()})
+    done.wait()
+
+
+def _run(mode: str, workers: int, workdir: str, queries: int) -> dict:
+    ctx = mp.get_context("spawn")
+    start, done, results = ctx.Barrier(workers), ctx.Barrier(workers), ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(mode, workdir, queries, start, done, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    out = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return {
+        "load_p50": statistics.median(r["load"] for r in out),
+        "load_max": max(r["load"] for r in out),
+        "query_ms": statistics.median(r["query_ms"] for r in out),
+        "scan": statistics.median(r["scan"] for r in out),
+        "rss": statistics.median(r["Rss"] for r in out),
+        "pss_total": sum(r["Pss"] for r in out),
+        "private": statistics.median(r["Private"] for r in out),
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--pairs", type=int, default=2_000_000)
+    p.add_argument("--nodes", type=int, default=500_000)
+    p.add_argument("--queries", type=int, default=2000)
+    p.add_argument("--workers", type=int, nargs="+", default=[4, 16])
+    p.add_argument("--modes", nargs="+", default=["rebuild", "mmap"], choices=["rebuild", "mmap"])
+    args = p.parse_args()
+
+    from graph.csr import AddressIndex, CSRGraph
+    from graph.snapshot_file import open_snapshot, write_snapshot
+
+    rng = np.random.default_rng(3)
+    weights = 1.0 / np.arange(1, args.nodes + 1) ** 1.1
+    cdf = np.cumsum(weights / weights.sum())
+    src = np.minimum(np.searchsorted(cdf, rng.random(args.pairs)), args.nodes - 1)
+    dst = rng.integers(0, args.nodes, args.pairs)
+    cols = {
+        "tx_count": rng.integers(1, 50, args.pairs),
+        "value_hi": np.zeros(args.pairs, np.uint64),
+        "value_lo": (rng.random(args.pairs) * 1e18).astype(np.uint64),
+        "first_ts": rng.integers(1_600_000_000, 1_700_000_000, args.pairs).astype(np.uint32),
+    }
+    cols["last_ts"] = cols["first_ts"] + rng.integers(0, 1_000_000, args.pairs).astype(np.uint32)
+    addresses = np.array([f"0x{i:040x}".encode() for i in rng.permutation(args.nodes * 4)[: args.nodes]], dtype="S42")
+    graph = CSRGraph.from_pairs(AddressIndex(addresses), src, dst, watermark=1, **cols)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        np.savez(os.path.join(workdir, "rows.npz"), addresses=addresses, src=src, dst=dst, **cols)
+        path = os.path.join(workdir, "graph.snapshot")
+        t = time.perf_counter()
+        write_snapshot(graph, path)
+        print(f"graph: {graph.n_nodes:,} nodes, {graph.n_edges:,} pairs, {graph.nbytes() / 2**20:.0f} MiB arrays; snapshot write {time.perf_counter() - t:.2f}s, {os.path.getsize(path) / 2**20:.0f} MiB")
+        t = time.perf_counter()
+        open_snapshot(path, verify=True)
+        print(f"open + verify CRC: {(time.perf_counter() - t) * 1000:.0f}ms")
+        del graph
+        for workers in args.workers:
+            for mode in args.modes:
+                r = _run(mode, workers, workdir, args.queries)
+                print(
+                    f"{mode:>7} x{workers:<2}: load p50={r['load_p50'] * 1000:.0f}ms max={r['load_max'] * 1000:.0f}ms, "
+                    f"neighbors {r['query_ms']:.3f}ms/query, first full scan {r['scan'] * 1000:.0f}ms, RSS {r['rss']:.0f} MiB/worker, "
+                    f"private {r['private']:.0f} MiB/worker, PSS total {r['pss_total']:.0f} MiB"
+                )
+
+
+if __name__ == "__main__":
+    main()
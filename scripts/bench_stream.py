@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Load-test the /stream SSE endpoint with many concurrent clients.
+
+Opens N EventSource-style connections to a running API, inserts alerts
+directly into DATABASE_URL, and reports per-client delivery latency plus the
+database work (transactions, backends) done while clients are connected.
+
+Example:
+  uvicorn api.main:app --port 8000 &
+  PYTHONPATH=. python scripts/bench_stream.py --url http://127.0.0.1:8000 --clients 500 --alerts 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+import httpx
+
+from api.services.db import get_conn
+
+
+def _db_activity():
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT xact_commit + xact_rollback FROM pg_stat_database WHERE datname = current_database()")
+        xacts = int(cur.fetchone()[0])
+        cur.execute("SELECT COUNT(*) FROM pg_stat_activity WHERE datname = current_database()")
+        backends = int(cur.fetchone()[0])
+    return xacts, backends
+
+
+async def _client(http, url, prefix, expected, received, ready):
+    async with http.stream("GET", f"{url}/stream") as resp:
+        event = None
+        async for line in resp.aiter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: "):
+                if event == "counters" and not ready.is_set():
+                    ready.count += 1
+                    if ready.count >= ready.target:
+                        ready.set()
+                if event == "alert":
+                    data = json.loads(line[6:])
+                    if data.get("address", "").startswith(prefix):
+                        received.append(time.time())
+                        expected[0] -= 1
+                        if expected[0] <= 0:
+                            return
+
+
+def _insert(prefix, n):
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO alerts(type, address, severity, confidence, evidence, fingerprint)
+            SELECT 'fan_out_spike', %s || lpad(to_hex(i), 6, '0'), 'medium', 0.7, '{}'::jsonb, %s || i
+            FROM generate_series(1, %s) i
+            """,
+            (prefix, prefix, n),
+        )
+
+
+def _cleanup(prefix):
+    with get_conn() as conn:
+        conn.cursor().execute("DELETE FROM alerts WHERE address LIKE %s", (f"{prefix}%",))
+
+
+async def run(url, clients, alerts, idle):
+    prefix = f"0xsse{os.getpid():x}"
+    ready = asyncio.Event()
+    ready.count, ready.target = 0, clients
+    limits = httpx.Limits(max_connections=clients + 10, max_keepalive_connections=0)
+    async with httpx.AsyncClient(timeout=None, limits=limits) as http:
+        received = [[] for _ in range(clients)]
+        tasks = [asyncio.create_task(_client(http, url, prefix, [alerts], received[i], ready)) for i in range(clients)]
+        await asyncio.wait_for(ready.wait(), 60)
+
+        x0, backends = _db_activity()
+        await asyncio.sleep(idle)
+        x1, _ = _db_activity()
+
+        t_insert = time.time()
+        await asyncio.to_thread(_insert, prefix, alerts)
+        await asyncio.wait_for(asyncio.gather(*tasks), 60)
+        last = [r[-1] - t_insert for r in received if r]
+        first = [r[0] - t_insert for r in received if r]
+        stats = (await http.get(f"{url}/stream/stats")).json()
+    _cleanup(prefix)
+    print(f"clients={clients} alerts={alerts}")
+    print(f"idle {idle:.0f}s: {x1 - x0 - 1} db transactions (excl. probe), {backends} backends on the database")
+    print(f"first event: p50={statistics.median(first) * 1000:.0f}ms max={max(first) * 1000:.0f}ms")
+    print(f"all {alerts} events: p50={statistics.median(last) * 1000:.0f}ms max={max(last) * 1000:.0f}ms")
+    print(f"hub: {stats}")
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--url", default="http://127.0.0.1:8000")
+    p.add_argument("--clients", type=int, default=200)
+    p.add_argument("--alerts", type=int, default=20)
+    p.add_argument("--idle", type=float, default=10.0, help="seconds to measure DB activity with all clients connected")
+    args = p.parse_args()
+    asyncio.run(run(args.url.rstrip("/"), args.clients, args.alerts, args.idle))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Benchmark time-bounded graph queries (edge_buckets) against all-time ones.
+
+Seeds `--rows` synthetic transfer rows into `edges` of DATABASE_URL, spread
+uniformly over `--days` with Zipf-distributed endpoints under a unique
+prefix, rolls them into hourly buckets, times windowed and all-time queries
+for a hub and for random addresses, then deletes the seeded rows.
+
+Example:
+  PYTHONPATH=. python scripts/bench_temporal.py --rows 2000000 --days 60
+"""
+
+import argparse
+import io
+import os
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from api.services.db import get_conn
+from api.services.graph_service import get_neighbors
+from api.services.temporal_service import global_graph_in_window, graph_diff, neighbors_in_window, resolve_window
+
+
+def _seed(prefix: str, rows: int, days: int, nodes: int) -> datetime:
+    rng = np.random.default_rng(5)
+    weights = 1.0 / np.arange(1, nodes + 1) ** 1.1
+    cdf = np.cumsum(weights / weights.sum())
+    src = np.minimum(np.searchsorted(cdf, rng.random(rows)), nodes - 1)
+    dst = np.minimum(np.searchsorted(cdf, rng.random(rows)), nodes - 1)
+    now = datetime.now(timezone.utc)
+    ts = np.sort(now.timestamp() - rng.random(rows) * days * 86400)
+    buf = io.StringIO()
+    buf.writelines(
+        f"{prefix}{s:x}\t{prefix}{d:x}\t1\t{v}\t{datetime.fromtimestamp(t, timezone.utc).isoformat()}\t{datetime.fromtimestamp(t, timezone.utc).isoformat()}\n"
+        for s, d, v, t in zip(src.tolist(), dst.tolist(), rng.integers(1, 10**18, rows).tolist(), ts.tolist())
+    )
+    buf.seek(0)
+    with get_conn() as conn:
+        conn.cursor().copy_expert("COPY edges(src_address, dst_address, tx_count, total_value_wei, window_start, window_end) FROM STDIN", buf)
+    return now
+
+
+def _timed(fn, n: int) -> str:
+    samples = []
+    for _ in range(n):
+        t = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t) * 1000)
+    samples.sort()
+    return f"p50={statistics.median(samples):.1f}ms p95={samples[max(0, int(len(samples) * 0.95) - 1)]:.1f}ms"
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--rows", type=int, default=2_000_000)
+    p.add_argument("--days", type=int, default=60)
+    p.add_argument("--nodes", type=int, default=200_000)
+    p.add_argument("--queries", type=int, default=20)
+    args = p.parse_args()
+    prefix = f"0xbt{os.getpid():x}x"
+
+    t = time.perf_counter()
+    now = _seed(prefix, args.rows, args.days, args.nodes)
+    print(f"seeded {args.rows:,} edge rows over {args.days}d in {time.perf_counter() - t:.1f}s")
+    try:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            t = time.perf_counter()
+            cur.execute("SELECT rollup_edge_buckets()")
+            print(f"rollup: {cur.fetchone()[0]:,} bucket rows in {time.perf_counter() - t:.1f}s")
+            cur.execute("ANALYZE edges")
+            cur.execute("ANALYZE edge_buckets")
+
+        hub = f"{prefix}0"
+        rng = np.random.default_rng(1)
+        sample = [f"{prefix}{i:x}" for i in rng.integers(0, args.nodes, 200)]
+        pick = lambda: sample[rng.integers(len(sample))]  # noqa: E731
+        for label in ("1h", "24h", "7d"):
+            bounds = resolve_window(label, now=now)
+            print(f"neighbors {label:>3}, hub:    {_timed(lambda: neighbors_in_window(hub, *bounds), args.queries)}")
+            print(f"neighbors {label:>3}, random: {_timed(lambda: neighbors_in_window(pick(), *bounds), args.queries)}")
+        print(f"neighbors all-time (edges), hub:    {_timed(lambda: get_neighbors(hub), args.queries)}")
+        print(f"neighbors all-time (edges), random: {_timed(lambda: get_neighbors(pick()), args.queries)}")
+        for label in ("1h", "24h", "7d"):
+            bounds = resolve_window(label, now=now)
+            print(f"global {label:>3}: {_timed(lambda: global_graph_in_window(*bounds), 5)}")
+        day = resolve_window("24h", now=now)
+        week_before = (day[0] - timedelta(days=7), day[0])
+        print(f"diff 24h vs previous 7d, all pairs: {_timed(lambda: graph_diff(*day, *week_before), 5)}")
+        print(f"diff 24h vs previous 7d, hub:       {_timed(lambda: graph_diff(*day, *week_before, address=hub), args.queries)}")
+    finally:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM edges WHERE src_address LIKE %s", (f"{prefix}%",))
+            cur.execute("DELETE FROM edge_buckets WHERE src_address LIKE %s", (f"{prefix}%",))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Benchmark /graph/trace value-flow traces over raw transfers.
+
+Seeds `--rows` native transactions and `--rows // 4` token transfers into
+DATABASE_URL over `--blocks` blocks with Zipf-distributed endpoints under a
+unique prefix, times forward and backward traces from random addresses and
+from the busiest one, then deletes the seeded rows.
+
+Example:
+  PYTHONPATH=. python scripts/bench_trace.py --rows 1000000
+"""
+
+import argparse
+import io
+import os
+import statistics
+import time
+
+import numpy as np
+
+from api.services.db import get_conn
+from api.services.trace_service import collect, trace_flow
+
+
+def _seed(prefix: str, rows: int, blocks: int, nodes: int) -> None:
+    rng = np.random.default_rng(7)
+    weights = 1.0 / np.arange(1, nodes + 1) ** 1.1
+    cdf = np.cumsum(weights / weights.sum())
+
+    def ends(n):
+        return np.minimum(np.searchsorted(cdf, rng.random(n)), nodes - 1), np.minimum(np.searchsorted(cdf, rng.random(n)), nodes - 1)
+
+    src, dst = ends(rows)
+    block = np.sort(rng.integers(0, blocks, rows))
+    buf = io.StringIO()
+    buf.writelines(
+        f"{prefix}t{i:x}\t{b}\t{prefix}{s:x}\t{prefix}{d:x}\t{v}\tt\n"
+        for i, (b, s, d, v) in enumerate(zip(block.tolist(), src.tolist(), dst.tolist(), rng.integers(1, 10**18, rows).tolist()))
+    )
+    buf.seek(0)
+    n_tok = rows // 4
+    tsrc, tdst = ends(n_tok)
+    tblock = np.sort(rng.integers(0, blocks, n_tok))
+    tbuf = io.StringIO()
+    tbuf.writelines(
+        f"{prefix}k{i:x}\t{prefix}tok{i % 5}\t{b}\t{prefix}{s:x}\t{prefix}{d:x}\t{v}\n"
+        for i, (b, s, d, v) in enumerate(zip(tblock.tolist(), tsrc.tolist(), tdst.tolist(), rng.integers(1, 10**9, n_tok).tolist()))
+    )
+    tbuf.seek(0)
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.copy_expert("COPY transactions(tx_hash, block_number, from_address, to_address, value_wei, success) FROM STDIN", buf)
+        cur.copy_expert("COPY token_transfers(tx_hash, token_address, block_number, from_address, to_address, amount) FROM STDIN", tbuf)
+        cur.execute("ANALYZE transactions")
+        cur.execute("ANALYZE token_transfers")
+
+
+def _timed(fn, n: int) -> str:
+    samples, sizes = [], []
+    for _ in range(n):
+        t = time.perf_counter()
+        out = fn()
+        samples.append((time.perf_counter() - t) * 1000)
+        sizes.append((out["node_count"], out["edge_count"], out["truncated_reason"]))
+    samples.sort()
+    nodes = statistics.median(s[0] for s in sizes)
+    edges = statistics.median(s[1] for s in sizes)
+    reasons = {r for _, _, r in sizes if r}
+    return f"p50={statistics.median(samples):.1f}ms p95={samples[max(0, int(len(samples) * 0.95) - 1)]:.1f}ms nodes~{nodes:.0f} edges~{edges:.0f} truncated={sorted(reasons) or '-'}"
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--rows", type=int, default=1_000_000)
+    p.add_argument("--blocks", type=int, default=500_000)
+    p.add_argument("--nodes", type=int, default=100_000)
+    p.add_argument("--queries", type=int, default=20)
+    args = p.parse_args()
+    prefix = f"0xbf{os.getpid():x}x"
+
+    t = time.perf_counter()
+    _seed(prefix, args.rows, args.blocks, args.nodes)
+    print(f"seeded {args.rows:,} transactions + {args.rows // 4:,} token transfers in {time.perf_counter() - t:.1f}s")
+    try:
+        rng = np.random.default_rng(1)
+        sample = [f"{prefix}{i:x}" for i in rng.integers(50, args.nodes, 200)]
+        pick = lambda: sample[rng.integers(len(sample))]  # noqa: E731
+        hub = f"{prefix}0"
+        mid = args.blocks // 2
+        for mode in ("proportional", "fifo"):
+            print(f"forward {mode:>12}, random: {_timed(lambda: collect(trace_flow(pick(), attribution=mode, from_block=mid)), args.queries)}")
+        print(f"forward proportional, hub:    {_timed(lambda: collect(trace_flow(hub, from_block=mid)), 5)}")
+        print(f"backward proportional, random: {_timed(lambda: collect(trace_flow(pick(), direction='backward', to_block=mid)), args.queries)}")
+        print(f"forward 6 hops, random:        {_timed(lambda: collect(trace_flow(pick(), from_block=mid, max_hops=6)), args.queries)}")
+    finally:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM transactions WHERE tx_hash LIKE %s", (f"{prefix}%",))
+            cur.execute("DELETE FROM token_transfers WHERE tx_hash LIKE %s", (f"{prefix}%",))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,15 @@
 #!/usr/bin/env python3
-"""Validate MVP taxonomy coverage and heuristic consistency."""
+"""Validate MVP taxonomy coverage, the rule DSL and heuristic consistency."""
 
-from labels.rules import label_address
+import numpy as np
+
+from labels.dsl import compile_expr
+from labels.rules import FEATURES, compile_rules, label_address, label_columns
 from labels.taxonomy import LABEL_TAXONOMY
 from labels.known_entities import BASE_KNOWN_LABELS
 
 REQUIRED = {"deployer", "router", "bridge", "treasury", "exchange-facing"}
+SPEC_KEYS = {"source", "description", "rule", "confidence_model", "evidence"}
 
 
 def assert_required_taxonomy():
@@ -14,6 +18,32 @@ def assert_required_taxonomy():
         raise SystemExit(f"Missing taxonomy labels: {sorted(missing)}")
 
 
+def assert_rules_compile():
+    for label, spec in LABEL_TAXONOMY.items():
+        if set(spec) != SPEC_KEYS:
+            raise SystemExit(f"{label}: expected keys {sorted(SPEC_KEYS)}, got {sorted(spec)}")
+        heuristic = "heuristic" in spec["source"]
+        if heuristic != (spec["rule"] is not None):
+            raise SystemExit(f"{label}: source {spec['source']!r} does not match rule {spec['rule']!r}")
+        try:
+            confidence = compile_expr(spec["confidence_model"], FEATURES)
+        except ValueError as e:
+            raise SystemExit(f"{label}: confidence_model: {e}")
+        if confidence.boolean:
+            raise SystemExit(f"{label}: confidence_model must be a number")
+        # Confidence stays a probability over a wide feature range.
+        grid = {k: np.array([0, 1, 3, 10, 500, 10**6, 10**9]) for k in FEATURES}
+        c = np.asarray(confidence(grid), dtype=np.float64)
+        if c.min() < 0 or c.max() > 1:
+            raise SystemExit(f"{label}: confidence_model leaves [0, 1]")
+    try:
+        rules = compile_rules(LABEL_TAXONOMY)
+    except ValueError as e:
+        raise SystemExit(f"Invalid rule: {e}")
+    if not rules:
+        raise SystemExit("No heuristic rules")
+
+
 def labels_for(features, address="0x000000000000000000000000000000000000dead"):
     out = label_address(address, features)
     return {x["label"] for x in out}
@@ -26,6 +56,11 @@ def assert_heuristics():
     assert "router" in labels_for({"contracts_deployed": 0, "tx_count": 800, "unique_counterparties": 250, "inbound_edges": 10, "outbound_edges": 10})
     # exchange-facing heuristic
     assert "exchange-facing" in labels_for({"contracts_deployed": 0, "tx_count": 20, "unique_counterparties": 3, "inbound_edges": 800, "outbound_edges": 20})
+    # nothing fires on an idle address
+    assert not labels_for({k: 0 for k in FEATURES})
+    # the column evaluator agrees with the per-address path
+    cols = {k: np.array([5, 800, 20, 0]) for k in FEATURES}
+    assert len(label_columns(["0x1", "0x2", "0x3", "0x4"], cols)) == sum(len(label_address(a, {k: int(cols[k][i]) for k in FEATURES})) for i, a in enumerate(["0x1", "0x2", "0x3", "0x4"]))
 
 
 def assert_known_coverage():
@@ -33,13 +68,17 @@ def assert_known_coverage():
     for k in ["bridge", "treasury", "router"]:
         if k not in known_values:
             raise SystemExit(f"Known entity map missing expected class: {k}")
+    for label in known_values:
+        if "known" not in LABEL_TAXONOMY.get(label, {}).get("source", ""):
+            raise SystemExit(f"Known entity class {label!r} is not a known-sourced taxonomy label")
 
 
 def main():
     assert_required_taxonomy()
+    assert_rules_compile()
     assert_heuristics()
     assert_known_coverage()
-    print("PASS: taxonomy coverage and heuristic checks")
+    print("PASS: taxonomy coverage, rule DSL and heuristic checks")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,45 @@
+"""Search index job.
+
+Keeps `search_top` (the most active addresses under every short hex prefix
+and every label, see `api.services.search_service`) current: every
+`SEARCH_INDEX_INTERVAL_SECONDS` it revisits the prefixes of addresses
+updated since the previous run, and every `SEARCH_INDEX_FULL_EVERY` runs
+rebuilds from scratch (deleted addresses only leave the lists then).
+
+Run with `python -m search.indexer` (`--once` for a single run, `--full`
+to force a rebuild).
+"""
+
+import argparse
+import os
+import time
+
+from dotenv import load_dotenv
+
+from api.services.search_service import refresh_search_index
+
+
+def main() -> None:
+    load_dotenv()
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--once", action="store_true")
+    p.add_argument("--full", action="store_true")
+    args = p.parse_args()
+    interval = float(os.getenv("SEARCH_INDEX_INTERVAL_SECONDS", "60"))
+    full_every = max(1, int(os.getenv("SEARCH_INDEX_FULL_EVERY", "1440")))
+    runs = 0
+    while True:
+        try:
+            out = refresh_search_index(full=args.full or (runs > 0 and runs % full_every == 0))
+            runs += 1
+            print(f"[search] {'full' if out['full'] else 'incremental'} refresh: {out['prefixes']} prefixes, {out['rows_written']} rows written in {out['seconds']}s")
+        except Exception as e:
+            print(f"[search] refresh failed: {e}")
+        if args.once:
+            break
+        args.full = False
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""In-process trigram index for substring search over a set of names.
+
+Names are lowercased and deduplicated. Every distinct trigram is packed
+exactly into a uint64 (three 21-bit code points) and the postings are two
+flat arrays sorted by (trigram, name id), so a query intersects a few array
+slices instead of scanning every name. Queries shorter than a trigram fall
+back to a prefix range over the sorted names.
+"""
+
+from typing import Sequence
+
+import numpy as np
+
+
+def _grams(s: str) -> set:
+    return {(ord(s[i]) << 42) | (ord(s[i + 1]) << 21) | ord(s[i + 2]) for i in range(len(s) - 2)}
+
+
+class TrigramIndex:
+    def __init__(self, names: Sequence[str]):
+        self.names = np.array(sorted({(n or "").lower() for n in names} - {""}), dtype=object)
+        codes, ids = [], []
+        for i, n in enumerate(self.names.tolist()):
+            g = _grams(n)
+            codes.extend(g)
+            ids.extend([i] * len(g))
+        codes = np.array(codes, dtype=np.uint64)
+        ids = np.array(ids, dtype=np.uint32)
+        order = np.lexsort((ids, codes))
+        self.codes, self.ids = codes[order], ids[order]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.ids.nbytes + sum(len(n) + 49 for n in self.names.tolist())
+
+    def search(self, query: str) -> np.ndarray:
+        """Ids (into `names`) of the names containing `query`, ascending."""
+        q = (query or "").lower()
+        if not q or not len(self.names):
+            return np.zeros(0, dtype=np.int64)
+        if len(q) < 3:
+            lo = np.searchsorted(self.names, q, side="left")
+            hi = np.searchsorted(self.names, q + "\U0010ffff", side="left")
+            return np.arange(lo, hi, dtype=np.int64)
+        spans = []
+        for g in _grams(q):
+            lo, hi = np.searchsorted(self.codes, np.uint64(g), side="left"), np.searchsorted(self.codes, np.uint64(g), side="right")
+            if lo == hi:
+                return np.zeros(0, dtype=np.int64)
+            spans.append((hi - lo, lo, hi))
+        spans.sort()
+        cand = self.ids[spans[0][1]:spans[0][2]]
+        for _, lo, hi in spans[1:]:
+            cand = np.intersect1d(cand, self.ids[lo:hi], assume_unique=True)
+            if not len(cand):
+                break
+        # Shared trigrams do not make a substring ("abcab" vs "bcabc"): verify.
+        return np.array([i for i in cand.tolist() if q in self.names[i]], dtype=np.int64)
@@ -0,0 +1 @@
+CREATE INDEX IF NOT EXISTS idx_alerts_fingerprint_created ON alerts(fingerprint, created_at DESC);
@@ -0,0 +1 @@
+CREATE INDEX IF NOT EXISTS idx_tx_timestamp ON transactions(timestamp);
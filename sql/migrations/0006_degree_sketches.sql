@@ -0,0 +1,6 @@
+CREATE TABLE IF NOT EXISTS degree_sketches (
+  replica TEXT PRIMARY KEY,
+  last_block BIGINT NOT NULL,
+  payload BYTEA NOT NULL,
+  updated_at TIMESTAMPTZ DEFAULT now()
+);
@@ -0,0 +1,34 @@
+ALTER TABLE alerts ADD COLUMN IF NOT EXISTS assignee TEXT;
+ALTER TABLE alerts ADD COLUMN IF NOT EXISTS ack_at TIMESTAMPTZ;
+ALTER TABLE alerts ADD COLUMN IF NOT EXISTS resolved_at TIMESTAMPTZ;
+
+CREATE TABLE IF NOT EXISTS alert_thresholds (
+  rule_type TEXT PRIMARY KEY,
+  min_ratio NUMERIC,
+  min_delta INT,
+  min_count INT,
+  cooldown_hours INT DEFAULT 6,
+  enabled BOOLEAN DEFAULT TRUE,
+  updated_at TIMESTAMPTZ DEFAULT now()
+);
+
+INSERT INTO alert_thresholds(rule_type, min_ratio, min_delta, min_count, cooldown_hours, enabled)
+VALUES
+  ('fan_out_spike', 3.0, 20, 25, 6, TRUE),
+  ('fan_in_spike', 3.0, 20, 25, 6, TRUE),
+  ('new_high_centrality_node', 1.0, 0, 300, 6, TRUE),
+  ('anomalous_bridge_path', 4.0, 15, 1, 6, TRUE)
+ON CONFLICT (rule_type) DO NOTHING;
+
+-- API/ingest processes LISTEN on this channel to invalidate their cached thresholds.
+CREATE OR REPLACE FUNCTION notify_alert_thresholds() RETURNS trigger AS $$
+BEGIN
+  PERFORM pg_notify('alert_thresholds', COALESCE(NEW.rule_type, OLD.rule_type));
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_alert_thresholds_notify ON alert_thresholds;
+CREATE TRIGGER trg_alert_thresholds_notify
+  AFTER INSERT OR UPDATE OR DELETE ON alert_thresholds
+  FOR EACH ROW EXECUTE FUNCTION notify_alert_thresholds();
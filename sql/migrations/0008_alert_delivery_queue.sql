@@ -0,0 +1,8 @@
+ALTER TABLE alert_deliveries ADD COLUMN IF NOT EXISTS next_attempt_at TIMESTAMPTZ DEFAULT now();
+ALTER TABLE alert_deliveries ADD COLUMN IF NOT EXISTS locked_at TIMESTAMPTZ;
+ALTER TABLE alert_deliveries ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT now();
+
+-- Queue scan for the delivery worker: pending/retry rows due now, plus stale claims.
+CREATE INDEX IF NOT EXISTS idx_alert_deliveries_queue
+  ON alert_deliveries(next_attempt_at)
+  WHERE status IN ('pending', 'retry', 'sending');
@@ -0,0 +1,29 @@
+-- The API's /stream endpoint LISTENs on this channel; one notification per
+-- inserted alert or status change, so connected clients cost no queries.
+CREATE OR REPLACE FUNCTION notify_alert_events() RETURNS trigger AS $$
+BEGIN
+  PERFORM pg_notify('alert_events', json_build_object(
+    'op', lower(TG_OP),
+    'id', NEW.id,
+    'type', NEW.type,
+    'address', NEW.address,
+    'severity', NEW.severity,
+    'confidence', NEW.confidence,
+    'status', NEW.status,
+    'old_status', CASE WHEN TG_OP = 'UPDATE' THEN OLD.status END,
+    'created_at', NEW.created_at
+  )::text);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_alerts_notify_insert ON alerts;
+CREATE TRIGGER trg_alerts_notify_insert
+  AFTER INSERT ON alerts
+  FOR EACH ROW EXECUTE FUNCTION notify_alert_events();
+
+DROP TRIGGER IF EXISTS trg_alerts_notify_status ON alerts;
+CREATE TRIGGER trg_alerts_notify_status
+  AFTER UPDATE OF status ON alerts
+  FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status)
+  EXECUTE FUNCTION notify_alert_events();
@@ -0,0 +1,41 @@
+-- Periodic centrality job (graph/centrality_job.py): one row per run, the
+-- latest scores for every address, and top-N history per run.
+CREATE TABLE IF NOT EXISTS centrality_runs (
+  id BIGSERIAL PRIMARY KEY,
+  started_at TIMESTAMPTZ NOT NULL,
+  finished_at TIMESTAMPTZ DEFAULT now(),
+  edge_watermark BIGINT NOT NULL,
+  nodes INT NOT NULL,
+  edges BIGINT NOT NULL,
+  iterations INT NOT NULL,
+  residual DOUBLE PRECISION NOT NULL,
+  converged BOOLEAN NOT NULL,
+  seconds DOUBLE PRECISION NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS address_centrality (
+  address TEXT PRIMARY KEY,
+  run_id BIGINT NOT NULL,
+  pagerank DOUBLE PRECISION NOT NULL,
+  pagerank_rank INT NOT NULL,
+  pagerank_pct REAL NOT NULL,
+  in_degree INT NOT NULL,
+  out_degree INT NOT NULL,
+  in_tx BIGINT NOT NULL,
+  out_tx BIGINT NOT NULL,
+  updated_at TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_address_centrality_rank ON address_centrality(pagerank_rank);
+
+CREATE TABLE IF NOT EXISTS address_centrality_history (
+  run_id BIGINT NOT NULL REFERENCES centrality_runs(id) ON DELETE CASCADE,
+  address TEXT NOT NULL,
+  pagerank DOUBLE PRECISION NOT NULL,
+  pagerank_rank INT NOT NULL,
+  in_degree INT NOT NULL,
+  out_degree INT NOT NULL,
+  PRIMARY KEY (address, run_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_address_centrality_history_run ON address_centrality_history(run_id);
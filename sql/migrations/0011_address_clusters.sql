@@ -0,0 +1,31 @@
+-- Offline clustering job (graph/cluster_job.py): connected components and
+-- label-propagation communities over filtered edges, hubs as singletons.
+-- Ids are the smallest member address, stable across runs.
+CREATE TABLE IF NOT EXISTS address_clusters (
+  address TEXT PRIMARY KEY,
+  cluster_id TEXT NOT NULL,
+  component_id TEXT NOT NULL,
+  hub BOOLEAN NOT NULL DEFAULT FALSE,
+  updated_at TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_address_clusters_cluster ON address_clusters(cluster_id, address);
+
+CREATE TABLE IF NOT EXISTS clusters (
+  cluster_id TEXT PRIMARY KEY,
+  component_id TEXT NOT NULL,
+  size INT NOT NULL,
+  updated_at TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS clustering_runs (
+  id BIGSERIAL PRIMARY KEY,
+  started_at TIMESTAMPTZ NOT NULL,
+  finished_at TIMESTAMPTZ DEFAULT now(),
+  mode TEXT NOT NULL,
+  edge_watermark BIGINT NOT NULL,
+  nodes INT NOT NULL,
+  changed INT NOT NULL,
+  iterations INT NOT NULL,
+  seconds DOUBLE PRECISION NOT NULL
+);
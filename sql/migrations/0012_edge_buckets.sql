@@ -0,0 +1,55 @@
+-- Hourly rollup of `edges` for time-bounded graph queries: a window scans
+-- only its own buckets instead of all history. Ingest calls
+-- rollup_edge_buckets() in each block's transaction; it folds every edge row
+-- past the stored id watermark (single writer, so ids commit in order).
+CREATE TABLE IF NOT EXISTS edge_buckets (
+  bucket_start TIMESTAMPTZ NOT NULL,
+  src_address TEXT NOT NULL,
+  dst_address TEXT NOT NULL,
+  tx_count BIGINT NOT NULL,
+  total_value_wei NUMERIC NOT NULL,
+  first_seen TIMESTAMPTZ NOT NULL,
+  last_seen TIMESTAMPTZ NOT NULL,
+  PRIMARY KEY (bucket_start, src_address, dst_address)
+);
+
+CREATE INDEX IF NOT EXISTS idx_edge_buckets_src ON edge_buckets(src_address, bucket_start);
+CREATE INDEX IF NOT EXISTS idx_edge_buckets_dst ON edge_buckets(dst_address, bucket_start);
+
+CREATE TABLE IF NOT EXISTS edge_bucket_state (
+  id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+  last_edge_id BIGINT NOT NULL
+);
+
+INSERT INTO edge_bucket_state(id, last_edge_id) VALUES (TRUE, 0) ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION rollup_edge_buckets() RETURNS BIGINT AS $$
+DECLARE
+  from_id BIGINT;
+  upto BIGINT;
+  n BIGINT;
+BEGIN
+  SELECT last_edge_id INTO from_id FROM edge_bucket_state FOR UPDATE;
+  SELECT COALESCE(MAX(id), 0) INTO upto FROM edges;
+  IF upto <= from_id THEN
+    RETURN 0;
+  END IF;
+  INSERT INTO edge_buckets(bucket_start, src_address, dst_address, tx_count, total_value_wei, first_seen, last_seen)
+  SELECT date_trunc('hour', COALESCE(window_start, created_at)), src_address, dst_address,
+         SUM(tx_count), SUM(total_value_wei),
+         MIN(COALESCE(window_start, created_at)), MAX(COALESCE(window_end, window_start, created_at))
+  FROM edges
+  WHERE id > from_id AND id <= upto
+  GROUP BY 1, 2, 3
+  ON CONFLICT (bucket_start, src_address, dst_address) DO UPDATE SET
+    tx_count = edge_buckets.tx_count + EXCLUDED.tx_count,
+    total_value_wei = edge_buckets.total_value_wei + EXCLUDED.total_value_wei,
+    first_seen = LEAST(edge_buckets.first_seen, EXCLUDED.first_seen),
+    last_seen = GREATEST(edge_buckets.last_seen, EXCLUDED.last_seen);
+  GET DIAGNOSTICS n = ROW_COUNT;
+  UPDATE edge_bucket_state SET last_edge_id = upto;
+  RETURN n;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT rollup_edge_buckets();
@@ -0,0 +1,7 @@
+-- Per-address, block-ordered access to raw transfers for value-flow traces
+-- (/graph/trace): each hop reads the first or last N transfers of an address
+-- in a block range from both tables.
+CREATE INDEX IF NOT EXISTS idx_tx_from_block ON transactions(from_address, block_number);
+CREATE INDEX IF NOT EXISTS idx_tx_to_block ON transactions(to_address, block_number);
+CREATE INDEX IF NOT EXISTS idx_transfer_from_block ON token_transfers(from_address, block_number);
+CREATE INDEX IF NOT EXISTS idx_transfer_to_block ON token_transfers(to_address, block_number);
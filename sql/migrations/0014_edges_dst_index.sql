@@ -0,0 +1,3 @@
+-- Inbound edge lookups by address (label features of a dirty subset, graph
+-- fallbacks); idx_edges_src_dst only serves the outbound side.
+CREATE INDEX IF NOT EXISTS idx_edges_dst ON edges(dst_address);
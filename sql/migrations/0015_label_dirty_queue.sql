@@ -0,0 +1,25 @@
+-- Labels are computed off the read path: ingest marks addresses whose
+-- counters or edges changed in `label_dirty` (one row per address, oldest
+-- mark kept) and the relabeler (`python -m labels.labeler`) drains it in
+-- batches. `address_label_state` keeps the features behind the stored labels
+-- and when they were computed, so reads never recompute or rewrite them.
+CREATE TABLE IF NOT EXISTS label_dirty (
+  address TEXT PRIMARY KEY,
+  marked_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS idx_label_dirty_marked ON label_dirty(marked_at);
+
+CREATE TABLE IF NOT EXISTS address_label_state (
+  address TEXT PRIMARY KEY,
+  tx_count BIGINT NOT NULL,
+  contracts_deployed BIGINT NOT NULL,
+  unique_counterparties BIGINT NOT NULL,
+  inbound_edges BIGINT NOT NULL,
+  outbound_edges BIGINT NOT NULL,
+  labeled_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Everything known so far gets labeled once by the relabeler.
+INSERT INTO label_dirty(address)
+SELECT address FROM addresses
+ON CONFLICT (address) DO NOTHING;
@@ -0,0 +1,23 @@
+-- /search without full scans: hex prefixes range-scan the pattern index
+-- (any collation), and the most active addresses under every prefix of up to
+-- 4 hex digits and under every label are precomputed in `search_top` by
+-- `python -m search.indexer` (incrementally from addresses.updated_at),
+-- so short prefixes never sort their whole range.
+CREATE INDEX IF NOT EXISTS idx_addresses_address_prefix ON addresses(address text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_addresses_updated_at ON addresses(updated_at);
+
+CREATE TABLE IF NOT EXISTS search_top (
+  kind TEXT NOT NULL,          -- 'prefix' (key: '0x' + up to 4 hex digits) or 'label'
+  key TEXT NOT NULL,
+  address TEXT NOT NULL,
+  tx_count BIGINT NOT NULL,
+  PRIMARY KEY (kind, key, address)
+);
+CREATE INDEX IF NOT EXISTS idx_search_top_rank ON search_top(kind, key, tx_count DESC);
+
+CREATE TABLE IF NOT EXISTS search_index_state (
+  id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+  updated_through TIMESTAMPTZ,
+  refreshed_at TIMESTAMPTZ,
+  runs BIGINT NOT NULL DEFAULT 0
+);
@@ -0,0 +1,46 @@
+-- Materialized risk scores (`python -m risk.risk_job`): one row per run, the
+-- latest score and inputs of every address with a non-zero factor, and the
+-- top-N per run as history. /entity/{address}/risk and /risk/top only read.
+CREATE TABLE IF NOT EXISTS risk_runs (
+  id BIGSERIAL PRIMARY KEY,
+  started_at TIMESTAMPTZ NOT NULL,
+  finished_at TIMESTAMPTZ DEFAULT now(),
+  addresses INT NOT NULL,
+  high INT NOT NULL,
+  medium INT NOT NULL,
+  seconds DOUBLE PRECISION NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS address_risk (
+  address TEXT PRIMARY KEY,
+  run_id BIGINT NOT NULL,
+  risk_score REAL NOT NULL,
+  label_risk REAL NOT NULL,
+  alert_risk REAL NOT NULL,
+  centrality_risk REAL NOT NULL,
+  flow_risk REAL NOT NULL,
+  new_alerts_7d INT NOT NULL,
+  high_alerts_7d INT NOT NULL,
+  avg_alert_conf_7d DOUBLE PRECISION NOT NULL,
+  outbound_txs_24h BIGINT NOT NULL,
+  inbound_txs_24h BIGINT NOT NULL,
+  outbound_wei_7d NUMERIC NOT NULL,
+  inbound_wei_7d NUMERIC NOT NULL,
+  centrality_source TEXT NOT NULL,
+  updated_at TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_address_risk_score ON address_risk(risk_score DESC, address);
+
+CREATE TABLE IF NOT EXISTS address_risk_history (
+  run_id BIGINT NOT NULL REFERENCES risk_runs(id) ON DELETE CASCADE,
+  address TEXT NOT NULL,
+  risk_score REAL NOT NULL,
+  label_risk REAL NOT NULL,
+  alert_risk REAL NOT NULL,
+  centrality_risk REAL NOT NULL,
+  flow_risk REAL NOT NULL,
+  PRIMARY KEY (address, run_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_address_risk_history_run ON address_risk_history(run_id);
@@ -0,0 +1,36 @@
+-- API response cache (api/services/cache_service.py). Cached responses are
+-- keyed by watermarks; `cache_epochs` counts every write statement on the
+-- tables whose changes a new block or alert id does not reveal (alert
+-- status updates, dead-letter retries). The counter is bumped in the
+-- writing transaction, so a reader never sees a new epoch before the data.
+CREATE TABLE IF NOT EXISTS cache_epochs (
+  name TEXT PRIMARY KEY,
+  epoch BIGINT NOT NULL DEFAULT 0
+);
+INSERT INTO cache_epochs(name) VALUES ('alerts'), ('ingest_failures') ON CONFLICT (name) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_cache_epoch() RETURNS trigger AS $$
+BEGIN
+  UPDATE cache_epochs SET epoch = epoch + 1 WHERE name = TG_TABLE_NAME;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_alerts_cache_epoch ON alerts;
+CREATE TRIGGER trg_alerts_cache_epoch
+  AFTER INSERT OR UPDATE OR DELETE ON alerts
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_cache_epoch();
+
+DROP TRIGGER IF EXISTS trg_ingest_failures_cache_epoch ON ingest_failures;
+CREATE TRIGGER trg_ingest_failures_cache_epoch
+  AFTER INSERT OR UPDATE OR DELETE ON ingest_failures
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_cache_epoch();
+
+-- Shared backend (RESPONSE_CACHE_BACKEND=postgres): rendered bodies every
+-- API process can reuse. Unlogged: losing it on a crash only costs recomputes.
+CREATE UNLOGGED TABLE IF NOT EXISTS response_cache (
+  key TEXT PRIMARY KEY,
+  etag TEXT NOT NULL,
+  body BYTEA NOT NULL,
+  stored_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
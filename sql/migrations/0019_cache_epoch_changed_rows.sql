@@ -0,0 +1,39 @@
+-- Bump `cache_epochs` (0018) only for statements that changed rows. Alert
+-- inserts are already visible through MAX(alerts.id), and most evaluation
+-- runs insert nothing (cooldown), so alerts only count updates that changed
+-- a row and deletes; ingest_failures, which has no id watermark, also counts
+-- inserts. Statements that touch nothing no longer lock the counter row.
+CREATE OR REPLACE FUNCTION bump_cache_epoch() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'UPDATE' THEN
+    PERFORM 1 FROM new_rows n JOIN old_rows o ON o.id = n.id WHERE n IS DISTINCT FROM o LIMIT 1;
+  ELSIF TG_OP = 'INSERT' THEN
+    PERFORM 1 FROM new_rows LIMIT 1;
+  ELSE
+    PERFORM 1 FROM old_rows LIMIT 1;
+  END IF;
+  IF FOUND THEN
+    UPDATE cache_epochs SET epoch = epoch + 1 WHERE name = TG_TABLE_NAME;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_alerts_cache_epoch ON alerts;
+CREATE TRIGGER trg_alerts_cache_epoch_update
+  AFTER UPDATE ON alerts REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_cache_epoch();
+CREATE TRIGGER trg_alerts_cache_epoch_delete
+  AFTER DELETE ON alerts REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_cache_epoch();
+
+DROP TRIGGER IF EXISTS trg_ingest_failures_cache_epoch ON ingest_failures;
+CREATE TRIGGER trg_ingest_failures_cache_epoch_insert
+  AFTER INSERT ON ingest_failures REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_cache_epoch();
+CREATE TRIGGER trg_ingest_failures_cache_epoch_update
+  AFTER UPDATE ON ingest_failures REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_cache_epoch();
+CREATE TRIGGER trg_ingest_failures_cache_epoch_delete
+  AFTER DELETE ON ingest_failures REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_cache_epoch();
@@ -0,0 +1,13 @@
+import os
+
+import pytest
+
+
+@pytest.fixture
+def pg(monkeypatch):
+    """DSN of the migrated test Postgres, also set as DATABASE_URL; skips the test when TEST_DATABASE_URL is unset."""
+    dsn = os.getenv("TEST_DATABASE_URL")
+    if not dsn:
+        pytest.skip("TEST_DATABASE_URL not set (needs a migrated Postgres)")
+    monkeypatch.setenv("DATABASE_URL", dsn)
+    return dsn
@@ -0,0 +1,60 @@
+from alerts.engine import BRIDGES, SlidingWindowCounter, StreamingAlertEngine, evaluate_alerts
+from api.services.alert_service import DEFAULT_THRESHOLDS
+
+HOUR = 3600
+T0 = 1_700_006_400  # aligned to bucket boundaries
+SRC = "0x00000000000000000000000000000000000000aa"
+
+
+def _thresholds():
+    return {k: dict(v) for k, v in DEFAULT_THRESHOLDS.items()}
+
+
+def test_window_counter_rolls_current_into_previous():
+    w = SlidingWindowCounter(bucket_seconds=HOUR, window_seconds=24 * HOUR)
+    w.add("a", T0, 5)
+    w.add("a", T0 + 23 * HOUR, 2)
+    assert (w.current["a"], w.previous["a"]) == (7, 0)
+
+    w.advance(T0 + 24 * HOUR)
+    assert (w.current["a"], w.previous["a"]) == (2, 5)
+
+    dropped = w.advance(T0 + 48 * HOUR)
+    assert "a" in dropped
+    assert (w.current["a"], w.previous["a"]) == (0, 2)
+
+
+def test_fan_out_spike_emitted_once_per_cooldown():
+    eng = StreamingAlertEngine(_thresholds(), bucket_seconds=HOUR)
+    eng.consume_block(1, T0, [(SRC, "0x01")] * 5)
+    out = eng.consume_block(2, T0 + 25 * HOUR, [(SRC, f"0x{i:040x}") for i in range(30)])
+    spikes = [a for a in out if a["type"] == "fan_out_spike"]
+    assert len(spikes) == 1
+    assert spikes[0]["evidence"] == {"window": "24h_vs_prev24h", "now_outbound": 30, "prev_outbound": 5, "ratio": 6.0, "delta": 25}
+
+    again = eng.consume_block(3, T0 + 25 * HOUR + 60, [(SRC, "0x02")])
+    assert not [a for a in again if a["type"] == "fan_out_spike"]
+
+
+def test_streaming_matches_window_rule_semantics():
+    cfg = _thresholds()
+    bridge = sorted(BRIDGES)[0]
+    eng = StreamingAlertEngine(cfg, bucket_seconds=HOUR)
+    txs = [(bridge, SRC)] * 20 + [(SRC, bridge)] * 4
+    out = eng.consume_block(10, T0, txs)
+    expected = evaluate_alerts({"anomalous_bridge_path": [(SRC, 24, 0)], "fan_out_spike": [(SRC, 4, 0)]}, cfg)
+    assert [a for a in out if a["type"] == "anomalous_bridge_path"] == expected
+
+
+def test_checkpoint_round_trip(tmp_path):
+    eng = StreamingAlertEngine(_thresholds(), bucket_seconds=HOUR)
+    eng.consume_block(1, T0, [(SRC, "0x01")] * 3)
+    eng.consume_block(2, T0 + 30 * HOUR, [(SRC, "0x01")] * 4)
+    path = str(tmp_path / "engine.json")
+    eng.checkpoint(path)
+
+    restored = StreamingAlertEngine.restore(path, _thresholds())
+    assert restored.last_block == 2
+    assert restored.outbound.current[SRC] == 4
+    assert restored.outbound.previous[SRC] == 3
+    assert restored.consume_block(2, T0 + 31 * HOUR, [(SRC, "0x01")]) == []
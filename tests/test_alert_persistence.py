@@ -0,0 +1,60 @@
+import os
+import threading
+
+import pytest
+
+from api.services import alert_service
+from api.services.db import get_conn
+
+@pytest.fixture
+def candidates(pg):
+    prefix = f"0xtest{os.getpid():x}"
+    items = [
+        {
+            "type": "fan_out_spike",
+            "address": f"{prefix}{i:04x}",
+            "severity": "medium",
+            "confidence": 0.8,
+            "evidence": {"window": "24h_vs_prev24h", "delta": i},
+        }
+        for i in range(25)
+    ]
+    yield items
+    with get_conn() as conn:
+        conn.cursor().execute("DELETE FROM alerts WHERE address LIKE %s", (f"{prefix}%",))
+
+
+def test_persist_returns_ids_and_respects_cooldown(candidates):
+    cfg = alert_service.DEFAULT_THRESHOLDS
+    inserted = alert_service._persist_alerts(candidates + candidates[:5], cfg)
+    assert len(inserted) == len(candidates)
+    assert all(isinstance(a["id"], int) for a in inserted)
+    assert alert_service._persist_alerts(candidates, cfg) == []
+
+
+def test_parallel_evaluators_insert_each_fingerprint_once(candidates):
+    cfg = alert_service.DEFAULT_THRESHOLDS
+    workers = 8
+    barrier = threading.Barrier(workers)
+    results = []
+
+    def run():
+        barrier.wait()
+        results.append(alert_service._persist_alerts(list(reversed(candidates)) if len(results) % 2 else candidates, cfg))
+
+    threads = [threading.Thread(target=run) for _ in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sum(len(r) for r in results) == len(candidates)
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT fingerprint, COUNT(*) FROM alerts WHERE address = ANY(%s) GROUP BY fingerprint",
+            ([c["address"] for c in candidates],),
+        )
+        counts = dict(cur.fetchall())
+    assert len(counts) == len(candidates)
+    assert set(counts.values()) == {1}
@@ -0,0 +1,27 @@
+from api.services import alert_service
+
+
+def test_thresholds_served_from_cache_until_invalidated(monkeypatch):
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return {k: dict(v) for k, v in alert_service.DEFAULT_THRESHOLDS.items()}
+
+    monkeypatch.setenv("THRESHOLDS_LISTEN", "0")
+    monkeypatch.setattr(alert_service, "_fetch_thresholds", fetch)
+    alert_service.invalidate_thresholds()
+
+    first = alert_service.get_thresholds()
+    first["fan_out_spike"]["min_ratio"] = 99.0
+    assert alert_service.get_thresholds()["fan_out_spike"]["min_ratio"] == 3.0
+    assert len(calls) == 1
+
+    alert_service.invalidate_thresholds()
+    alert_service.get_thresholds()
+    assert len(calls) == 2
+
+    monkeypatch.setenv("THRESHOLDS_CACHE_TTL", "0")
+    alert_service.get_thresholds()
+    assert len(calls) == 3
+    alert_service.invalidate_thresholds()
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta, timezone
+
+from alerts import backtest
+from alerts.backtest import apply_cooldown, score_hits
+from api.services import alert_service
+from api.services.alert_service import DEFAULT_THRESHOLDS
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+ADDR = "0x00000000000000000000000000000000000000aa"
+
+
+def _alert(rule_type="fan_out_spike", address=ADDR):
+    return {"type": rule_type, "address": address, "severity": "medium", "confidence": 0.8, "evidence": {"window": "24h_vs_prev24h"}}
+
+
+def test_apply_cooldown_matches_live_dedupe():
+    steps = [(T0 + timedelta(hours=h), [_alert()]) for h in range(13)]
+    hits = apply_cooldown(list(reversed(steps)), DEFAULT_THRESHOLDS)
+    assert [h["as_of"] for h in hits] == [T0, T0 + timedelta(hours=6), T0 + timedelta(hours=12)]
+
+
+def test_score_hits_precision_and_recall():
+    incidents = [
+        {"incident": "dispersal", "start": T0, "end": T0 + timedelta(days=1), "addresses": {ADDR}, "rules": {"fan_out_spike"}},
+        {"incident": "bridge", "start": T0, "end": T0 + timedelta(days=1), "addresses": {"0xbb"}, "rules": set()},
+    ]
+    hits = [
+        {"as_of": T0 + timedelta(hours=2), **_alert()},
+        {"as_of": T0 + timedelta(hours=2), **_alert("fan_in_spike")},
+        {"as_of": T0 + timedelta(days=3), **_alert()},
+    ]
+    score = score_hits(hits, incidents)
+    assert score["true_positives"] == 1
+    assert score["precision"] == round(1 / 3, 4)
+    assert score["incidents_detected"] == ["dispersal"]
+    assert score["recall"] == 0.5
+
+
+def test_evaluate_step_applies_live_centrality(monkeypatch):
+    low = "0x00000000000000000000000000000000000000bb"
+    candidates = [
+        {"type": "new_high_centrality_node", "address": ADDR, "severity": "medium", "confidence": 0.5, "evidence": {}},
+        {"type": "new_high_centrality_node", "address": low, "severity": "medium", "confidence": 0.5, "evidence": {}},
+        _alert(),
+    ]
+    monkeypatch.setattr(backtest, "_generate_alert_candidates", lambda limit, thresholds, as_of: [dict(a) for a in candidates])
+    monkeypatch.setattr(
+        alert_service,
+        "centrality_for",
+        lambda addrs: {
+            ADDR: {"pagerank": 0.01, "pagerank_rank": 3, "pagerank_pct": 0.999},
+            low: {"pagerank": 0.0001, "pagerank_rank": 9000, "pagerank_pct": 0.4},
+        },
+    )
+    as_of, out, _ = backtest._evaluate_step((T0, DEFAULT_THRESHOLDS, 50))
+    assert as_of == T0
+    assert [(a["type"], a["address"]) for a in out] == [("new_high_centrality_node", ADDR), ("fan_out_spike", ADDR)]
+    assert out[0]["severity"] == "high"
+    assert out[0]["evidence"]["pagerank_rank"] == 3
@@ -0,0 +1,90 @@
+import json
+import os
+
+from fastapi.testclient import TestClient
+
+from api.main import app
+
+# The per-address queries /entity/{address} ran before the batch path.
+_FLOW_SQL = """
+    SELECT COALESCE(SUM(CASE WHEN from_address = %(a)s THEN value_wei ELSE 0 END),0),
+           COALESCE(SUM(CASE WHEN to_address = %(a)s THEN value_wei ELSE 0 END),0),
+           COUNT(*) FILTER (WHERE from_address = %(a)s), COUNT(*) FILTER (WHERE to_address = %(a)s)
+    FROM transactions
+    WHERE timestamp >= now() - %(w)s::interval AND (from_address = %(a)s OR to_address = %(a)s)
+"""
+_TOP_SQL = """
+    SELECT CASE WHEN src_address = %(a)s THEN dst_address ELSE src_address END AS cp, SUM(tx_count), SUM(total_value_wei)
+    FROM edges WHERE src_address = %(a)s OR dst_address = %(a)s
+    GROUP BY cp ORDER BY SUM(tx_count) DESC, cp LIMIT 10
+"""
+
+
+def _reference(cur, a):
+    flows = {}
+    for key, w in (("flow_7d", "7 days"), ("flow_30d", "30 days")):
+        cur.execute(_FLOW_SQL, {"a": a, "w": w})
+        o, i, ot, it = cur.fetchone()
+        flows[key] = {"outbound_wei": str(o), "inbound_wei": str(i), "outbound_txs": ot, "inbound_txs": it}
+    cur.execute(_TOP_SQL, {"a": a})
+    top = [{"address": cp, "tx_count": int(t), "total_value_wei": str(v)} for cp, t, v in cur.fetchall()]
+    return flows, top
+
+
+def test_batch_endpoints_match_per_address_reads(pg, monkeypatch):
+    monkeypatch.setenv("BATCH_CHUNK_ADDRESSES", "3")
+    monkeypatch.setenv("BATCH_MAX_ADDRESSES", "20")
+    from api.services.db import get_conn
+    from api.services.risk_service import entity_risk, score_all
+
+    p = f"0xb4{os.getpid():x}"
+    a = lambda i: f"{p}{i:04x}"  # noqa: E731
+    txs = [(a(0), a(1), 10, "1 hour"), (a(0), a(1), 20, "10 days"), (a(1), a(0), 5, "2 days"), (a(2), a(2), 7, "1 day"),
+           (a(3), a(0), None, "3 days"), (a(0), a(4), 1, "40 days")]
+    edges = [(a(0), a(1), 5), (a(1), a(0), 2), (a(2), a(2), 4), (a(3), a(0), 9)] + [(a(5), a(10 + k), k + 1) for k in range(14)]
+    try:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.executemany(
+                "INSERT INTO transactions(tx_hash, block_number, from_address, to_address, value_wei, success, timestamp) VALUES (%s, 1, %s, %s, %s, true, now() - %s::interval)",
+                [(f"{p}tx{i}", s, d, v, ago) for i, (s, d, v, ago) in enumerate(txs)],
+            )
+            cur.executemany(
+                "INSERT INTO edges(src_address, dst_address, tx_count, total_value_wei, window_start, window_end) VALUES (%s, %s, %s, 100, now(), now())",
+                edges,
+            )
+            cur.execute("INSERT INTO labels(address, label, confidence, evidence) VALUES (%s, 'router', 0.5, '{}')", (a(0),))
+            cur.execute("INSERT INTO address_label_state(address, tx_count, contracts_deployed, unique_counterparties, inbound_edges, outbound_edges) VALUES (%s, 3, 0, 1, 2, 1)", (a(0),))
+        score_all()
+
+        client = TestClient(app)
+        asked = [a(i) for i in range(7)] + [a(0).upper(), a(99)]
+        r = client.post("/entity/batch", json={"addresses": asked})
+        assert r.status_code == 200 and r.headers["content-type"].startswith("application/x-ndjson")
+        profiles = [json.loads(line) for line in r.text.splitlines()]
+        assert [x["address"] for x in profiles] == [a(i) for i in range(7)] + [a(99)]
+        with get_conn() as conn:
+            cur = conn.cursor()
+            for prof in profiles:
+                flows, top = _reference(cur, prof["address"])
+                assert {k: prof[k] for k in flows} == flows
+                assert prof["top_counterparties"] == top
+                assert prof == client.get(f"/entity/{prof['address']}").json()
+        assert profiles[0]["labels"][0]["label"] == "router" and profiles[0]["features"]["tx_count"] == 3
+        assert len(profiles[5]["top_counterparties"]) == 10
+
+        r = client.post("/risk/batch", json={"addresses": asked})
+        risks = [json.loads(line) for line in r.text.splitlines()]
+        assert risks == [entity_risk(x["address"]) for x in profiles]
+        assert risks[0]["factors"]["label_risk"] == 10.0
+
+        assert client.post("/risk/batch", json={"addresses": [a(i) for i in range(21)]}).status_code == 400
+    finally:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM transactions WHERE tx_hash LIKE %s", (f"{p}%",))
+            cur.execute("DELETE FROM edges WHERE src_address LIKE %s", (f"{p}%",))
+            cur.execute("DELETE FROM labels WHERE address LIKE %s", (f"{p}%",))
+            cur.execute("DELETE FROM address_label_state WHERE address LIKE %s", (f"{p}%",))
+            cur.execute("DELETE FROM address_risk WHERE address LIKE %s", (f"{p}%",))
+            cur.execute("DELETE FROM address_risk_history WHERE address LIKE %s", (f"{p}%",))
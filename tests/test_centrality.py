@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+
+from alerts.engine import apply_centrality
+from api.services.db import get_conn
+from graph.centrality import degree_centrality, pagerank, rank_percentiles
+from graph.csr import CSRGraph
+
+
+def _a(i):
+    return f"0x{i:040x}"
+
+
+def _dense_pagerank(g: CSRGraph, damping=0.85, iters=500):
+    n = g.n_nodes
+    m = np.zeros((n, n))
+    for s, d, c in zip(g.sources(), g.out_dst, g.tx_count):
+        m[d, s] += np.log1p(c)
+    out = m.sum(axis=0)
+    m[:, out > 0] /= out[out > 0]
+    r = np.full(n, 1.0 / n)
+    for _ in range(iters):
+        r = damping * (m @ r + r[out == 0].sum() / n) + (1 - damping) / n
+    return r
+
+
+def test_pagerank_matches_dense_reference_and_demotes_spam():
+    rows = [(_a(i), _a(0), 20, 1.0, 1, 1) for i in range(1, 6)]  # 0 is a real counterparty
+    rows += [(_a(0), _a(1), 5, 1.0, 1, 1), (_a(2), _a(3), 3, 1.0, 1, 1)]
+    rows += [(_a(99), _a(100 + i), 1, 1.0, 1, 1) for i in range(40)]  # spray to 40 fresh addresses
+    g = CSRGraph.from_edges(rows)
+    pr = pagerank(g, tol=1e-10, max_iter=200)
+    assert pr["converged"] and pr["iterations"] < 200
+    assert np.allclose(pr["scores"], _dense_pagerank(g), atol=1e-8)
+    assert abs(pr["scores"].sum() - 1.0) < 1e-9
+
+    rank, pct = rank_percentiles(pr["scores"])
+    spam, hub = g.index.lookup(_a(99)), g.index.lookup(_a(0))
+    assert rank[hub] == 1 and pct[hub] == 1.0
+    deg = degree_centrality(g)
+    assert deg["out_degree"][spam] == 40 and deg["in_tx"][hub] == 100
+    assert pct[spam] < pct[hub]
+
+    capped = pagerank(g, tol=0.0, max_iter=3)
+    assert capped["iterations"] == 3 and not capped["converged"]
+
+
+def test_apply_centrality_rescores_degree_candidates():
+    cand = {"type": "new_high_centrality_node", "address": _a(1), "severity": "medium", "confidence": 0.7, "evidence": {"degree_proxy": 900}}
+    assert apply_centrality(cand, None) is cand
+    assert apply_centrality(cand, {"pagerank": 1e-7, "pagerank_rank": 90000, "pagerank_pct": 0.4}) is None
+    top = apply_centrality(cand, {"pagerank": 0.01, "pagerank_rank": 3, "pagerank_pct": 0.99999})
+    assert top["severity"] == "high" and top["confidence"] > 0.9 and top["evidence"]["pagerank_rank"] == 3
+
+
+def test_centrality_job_stores_latest_and_history(pg):
+    from api.services.centrality_service import centrality_for, centrality_history
+    from graph.centrality_job import run_once
+
+    prefix = f"0xcen{os.getpid():x}"
+    a, b, c = (f"{prefix}{i:02x}" for i in range(3))
+    insert = "INSERT INTO edges(src_address, dst_address, tx_count, total_value_wei, window_start, window_end) VALUES(%s, %s, %s, 1, now(), now())"
+    try:
+        with get_conn() as conn:
+            conn.cursor().executemany(insert, [(a, b, 5), (c, b, 5), (b, a, 1)])
+        graph, run = run_once()
+        assert run["converged"] and run["nodes"] >= 3
+        assert run_once(graph, run["edge_watermark"])[1] is None  # nothing new
+        scores = centrality_for([a, b, c, "0xnothere"])
+        assert set(scores) == {a, b, c}
+        assert scores[b]["in_degree"] == 2 and scores[b]["pagerank"] > scores[c]["pagerank"]
+        with get_conn() as conn:
+            conn.cursor().execute(insert, (a, c, 3))
+        _, run2 = run_once(graph, run["edge_watermark"])
+        hist = centrality_history(b)
+        assert [h["run_id"] for h in hist[:2]] == [run2["id"], run["id"]]
+    finally:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM edges WHERE src_address LIKE %s", (f"{prefix}%",))
+            cur.execute("DELETE FROM address_centrality WHERE address LIKE %s", (f"{prefix}%",))
+            cur.execute("DELETE FROM address_centrality_history WHERE address LIKE %s", (f"{prefix}%",))
@@ -0,0 +1,99 @@
+import os
+
+import numpy as np
+
+from api.services.db import get_conn
+from graph.clustering import Clustering, connected_components
+from graph.csr import CSRGraph
+
+
+def _a(i):
+    return f"0x{i:040x}"
+
+
+def _clique(ids, tx):
+    return [(_a(i), _a(j), tx, 1.0, 1, 1) for i in ids for j in ids if i < j]
+
+
+def _rows():
+    # two 4-cliques joined by one weak pair, a separate pair, and a hub (0x..63)
+    # touching everyone, which must not merge the groups
+    rows = _clique(range(1, 5), 9) + _clique(range(5, 9), 9) + [(_a(4), _a(5), 2, 1.0, 1, 1), (_a(20), _a(21), 3, 1.0, 1, 1)]
+    rows += [(_a(99), _a(i), 5, 1.0, 1, 1) for i in (*range(1, 9), 20, 21)]
+    return rows
+
+
+def _by_key(g, c, key):
+    groups = {}
+    for i, k in enumerate(key.tolist()):
+        groups.setdefault(g.index.address(k), set()).add(g.index.address(i))
+    return groups
+
+
+def test_components_and_communities_exclude_hubs():
+    g = CSRGraph.from_edges(_rows())
+    c = Clustering(max_degree=5, min_tx=2, skip=())
+    assert len(c.update(g)) == g.n_nodes and c.mode == "full"
+    comps = _by_key(g, c, c.component_key)
+    assert comps[_a(1)] == {_a(i) for i in range(1, 9)} and comps[_a(20)] == {_a(20), _a(21)}
+    clusters = _by_key(g, c, c.cluster_key)
+    assert clusters[_a(1)] == {_a(i) for i in range(1, 5)} and clusters[_a(5)] == {_a(i) for i in range(5, 9)}
+    hub = g.index.lookup(_a(99))
+    assert c.hub[hub] and c.cluster_key[hub] == hub and c.sizes()[g.index.lookup(_a(2))] == 4
+
+    assert (connected_components(4, np.array([3, 1]), np.array([2, 0])) == [0, 0, 2, 2]).all()
+
+
+def test_incremental_update_matches_full_rebuild():
+    g = CSRGraph.from_edges(_rows())
+    c = Clustering(max_degree=5, min_tx=2, skip=())
+    c.full(g)
+    # 0x..15 joins the first clique; 0x..20-0x..21 gets glued to the second group
+    g2 = g.merge(_clique([1, 2, 3, 15], 9) + [(_a(21), _a(8), 2, 1.0, 1, 1)])
+    changed = {g2.index.address(int(i)) for i in c.update(g2)}
+    assert c.mode == "incremental" and _a(15) in changed and _a(20) in changed and _a(1) not in changed
+    fresh = Clustering(max_degree=5, min_tx=2, skip=())
+    fresh.full(g2)
+    assert (fresh.component_key == c.component_key).all() and (fresh.cluster_key == c.cluster_key).all()
+
+    # 0x..01 crosses max_degree: it becomes a singleton, the rest of its clique stays together
+    g3 = g2.merge([(_a(1), _a(30), 1, 1.0, 1, 1)])
+    c.update(g3)
+    one = g3.index.lookup(_a(1))
+    assert c.hub[one] and c.cluster_key[one] == one and c.sizes()[one] == 1
+    assert _by_key(g3, c, c.cluster_key)[_a(2)] == {_a(i) for i in (2, 3, 4, 15)}
+    fresh.full(g3)
+    assert (fresh.component_key == c.component_key).all() and (fresh.cluster_key == c.cluster_key).all()
+
+
+def test_cluster_job_serves_precomputed_lookup(pg):
+    from api.services.cluster_service import get_cluster
+    from graph.cluster_job import run_once
+
+    prefix = f"0xclu{os.getpid():x}"
+    a, b, c, d = (f"{prefix}{i:02x}" for i in range(4))
+    insert = "INSERT INTO edges(src_address, dst_address, tx_count, total_value_wei, window_start, window_end) VALUES(%s, %s, %s, 1, now(), now())"
+    try:
+        with get_conn() as conn:
+            conn.cursor().executemany(insert, [(a, b, 3), (b, c, 3), (c, d, 1)])
+        clustering = Clustering(skip=())
+        graph, run = run_once(clustering)
+        assert run["mode"] == "full"
+        res = get_cluster(b, limit=2)
+        assert res["source"] == "precomputed" and res["cluster_id"] == a and res["size"] == 3
+        assert [n["id"] for n in res["nodes"]] == [a, b] and res["truncated"]
+        assert get_cluster(d)["size"] == 1  # single transfer is below min_tx
+        fallback = get_cluster(f"{prefix}ff")  # never clustered: 2-hop neighborhood, same keys
+        assert fallback["source"] == "neighborhood" and list(fallback) == list(res) and fallback["hop1_count"] == 0
+
+        with get_conn() as conn:
+            conn.cursor().execute(insert, (c, d, 1))
+        graph, run = run_once(clustering, graph)
+        assert run["mode"] == "incremental" and run["changed"] >= 1
+        assert get_cluster(d)["cluster_id"] == a and get_cluster(a)["size"] == 4
+    finally:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM edges WHERE src_address LIKE %s", (f"{prefix}%",))
+            cur.execute("DELETE FROM address_clusters WHERE address LIKE %s", (f"{prefix}%",))
+            cur.execute("DELETE FROM clusters WHERE cluster_id LIKE %s", (f"{prefix}%",))
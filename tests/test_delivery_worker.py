@@ -0,0 +1,194 @@
+import asyncio
+import json
+import os
+
+import httpx
+
+from alerts import delivery_worker
+from alerts.digest import format_digest
+from api.services import alert_service, delivery_service
+from api.services.db import get_conn
+
+ALERT = {"type": "fan_out_spike", "address": "0xabc", "severity": "high", "confidence": 0.9, "evidence": {}}
+
+
+def _stub(responses):
+    """Local webhook stub: pops scripted responses, records requests."""
+    seen = []
+
+    async def handler(request: httpx.Request):
+        seen.append(request)
+        status, headers = responses.pop(0) if responses else (204, {})
+        return httpx.Response(status, headers=headers, json={} if status != 204 else None)
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler)), seen
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_rate_limited_send_pauses_channel_and_schedules_retry(monkeypatch):
+    monkeypatch.setenv("DISCORD_WEBHOOK_URL", "http://stub.local/webhook")
+
+    async def go():
+        client, seen = _stub([(429, {"Retry-After": "30"})])
+        limiters = {"discord": delivery_worker.ChannelLimiter(1)}
+        items = [{"id": i, "channel": "discord", "attempts": 1, "payload": ALERT} for i in range(3)]
+        updates = await delivery_worker.deliver_batch(client, items, limiters)
+        await client.aclose()
+        return updates, seen, limiters["discord"]
+
+    updates, seen, limiter = _run(go())
+    assert len(seen) == 1
+    assert limiter.remaining_pause() > 20
+    assert [u["status"] for u in updates] == ["retry"] * 3
+    assert updates[0]["retry_in"] == 30.0
+    assert all(u["retry_in"] > 20 for u in updates)
+
+
+def test_classify_permanent_and_exhausted_failures():
+    item = {"id": 1, "attempts": 1}
+    assert delivery_worker.classify(item, {"ok": False, "error": "missing_discord_webhook"}, 5)["status"] == "failed"
+    assert delivery_worker.classify(item, {"ok": False, "status_code": 400, "error": "bad"}, 5)["status"] == "failed"
+    assert delivery_worker.classify(item, {"ok": False, "status_code": 502, "error": "bad gateway"}, 5)["status"] == "retry"
+    assert delivery_worker.classify({"id": 1, "attempts": 5}, {"ok": False, "error": "timeout"}, 5)["status"] == "failed"
+
+
+def test_paused_channel_skips_do_not_use_up_attempts(monkeypatch):
+    monkeypatch.setenv("DISCORD_WEBHOOK_URL", "http://stub.local/webhook")
+
+    async def go(items):
+        client, seen = _stub([])
+        limiter = delivery_worker.ChannelLimiter(1)
+        limiter.pause(60)
+        updates = await delivery_worker.deliver_batch(client, items, {"discord": limiter}, max_attempts=5)
+        await client.aclose()
+        return updates, seen
+
+    updates, seen = _run(go([{"id": 1, "channel": "discord", "attempts": 5, "payload": ALERT}]))
+    assert seen == []
+    assert updates[0]["status"] == "retry" and updates[0]["refund"] == 1 and updates[0]["retry_in"] > 50
+
+
+def test_paused_channel_keeps_rows_queued_past_max_attempts(pg):
+    prefix = f"0xpause{os.getpid():x}"
+    try:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT INTO alert_deliveries(channel, status, attempts, payload) VALUES ('discord', 'pending', 0, %s::jsonb) RETURNING id",
+                (json.dumps({**ALERT, "address": prefix}),),
+            )
+            row_id = cur.fetchone()[0]
+        limiter = delivery_worker.ChannelLimiter(1)
+        limiter.pause(600)
+        for _ in range(8):
+            items = [i for i in delivery_service.claim_deliveries(50) if i["id"] == row_id]
+            assert len(items) == 1
+            delivery_service.record_delivery_results(_run(delivery_worker.deliver_batch(None, items, {"discord": limiter}, max_attempts=3)))
+            with get_conn() as conn:
+                conn.cursor().execute("UPDATE alert_deliveries SET next_attempt_at = now() WHERE id = %s", (row_id,))
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT status, attempts, error FROM alert_deliveries WHERE id = %s", (row_id,))
+            assert cur.fetchone() == ("retry", 0, "channel_paused")
+    finally:
+        with get_conn() as conn:
+            conn.cursor().execute("DELETE FROM alert_deliveries WHERE payload->>'address' = %s", (prefix,))
+
+
+def test_digest_ranks_by_severity_then_confidence_and_fits_limit():
+    alerts = [
+        {**ALERT, "address": "0xlow", "severity": "low", "confidence": 0.99},
+        {**ALERT, "address": "0xmed", "severity": "medium", "confidence": 0.6},
+        {**ALERT, "address": "0xhigh", "severity": "high", "confidence": 0.7},
+        {**ALERT, "address": "0xmed2", "severity": "medium", "confidence": 0.8},
+    ]
+    text, included = format_digest(alerts, "discord")
+    lines = text.splitlines()
+    assert included == [2, 3, 1, 0]
+    assert lines[0].startswith("BaseTrace digest: 4 alerts")
+    assert [line.split()[3] for line in lines[1:]] == ["0xhigh", "0xmed2", "0xmed", "0xlow"]
+
+    burst = [{**ALERT, "address": f"0x{i:040x}"} for i in range(500)]
+    text, included = format_digest(burst, "discord")
+    assert len(text) <= 2000
+    assert text.splitlines()[-1] == f"... +{500 - len(included)} more in the next digest"
+
+
+def test_digest_overflow_rows_go_back_to_pending_not_sent(monkeypatch):
+    monkeypatch.setenv("DISCORD_WEBHOOK_URL", "http://stub.local/webhook")
+    items = [{"id": i, "channel": "discord", "attempts": 1, "payload": {**ALERT, "address": f"0x{i:040x}"}} for i in range(60)]
+
+    async def go():
+        client, seen = _stub([])
+        updates = await delivery_worker.deliver_digest(client, delivery_worker.ChannelLimiter(1), items)
+        await client.aclose()
+        return updates, seen
+
+    updates, seen = _run(go())
+    text = seen[0].read().decode()
+    sent = {u["id"] for u in updates if u["status"] == "sent"}
+    pending = {u["id"] for u in updates if u["status"] == "pending"}
+    assert len(seen) == 1 and len(updates) == 60 and sent and pending and not sent & pending
+    assert all(f"0x{i:040x}" in text for i in sent) and not any(f"0x{i:040x}" in text for i in pending)
+    assert all(u["refund"] == 1 for u in updates if u["status"] == "pending")
+
+
+def test_persisted_alerts_are_queued_and_drained(pg, monkeypatch):
+    monkeypatch.setenv("ALERT_DELIVERY_CHANNELS", "discord")
+    monkeypatch.setenv("DISCORD_WEBHOOK_URL", "http://stub.local/webhook")
+    prefix = f"0xdeliv{os.getpid():x}"
+    candidates = [{**ALERT, "address": f"{prefix}{i:04x}", "evidence": {"window": "24h_vs_prev24h"}} for i in range(40)]
+    try:
+        inserted = alert_service._persist_alerts(candidates, alert_service.DEFAULT_THRESHOLDS)
+        client, seen = _stub([])
+        stats = _run(delivery_worker.run_worker(batch_size=50, client=client, once=True))
+        _run(client.aclose())
+        assert len(seen) >= len(inserted) == 40
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT status, attempts FROM alert_deliveries WHERE alert_id = ANY(%s)", ([a["id"] for a in inserted],))
+            rows = cur.fetchall()
+        assert rows and all(r == ("sent", 1) for r in rows)
+        assert stats["sent"] >= 40
+    finally:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM alert_deliveries WHERE payload->>'address' LIKE %s", (f"{prefix}%",))
+            cur.execute("DELETE FROM alerts WHERE address LIKE %s", (f"{prefix}%",))
+
+
+def test_digest_coalesces_burst_and_urgent_alerts_bypass(pg, monkeypatch):
+    monkeypatch.setenv("ALERT_DELIVERY_CHANNELS", "discord")
+    monkeypatch.setenv("DISCORD_WEBHOOK_URL", "http://stub.local/webhook")
+    prefix = f"0xdigst{os.getpid():x}"
+    candidates = [
+        {**ALERT, "address": f"{prefix}{i:04x}", "severity": "medium", "confidence": 0.7, "evidence": {"window": "24h_vs_prev24h"}}
+        for i in range(30)
+    ]
+    candidates.append({**ALERT, "address": f"{prefix}urgent", "confidence": 0.95, "evidence": {"window": "24h_vs_prev24h"}})
+    try:
+        alert_service._persist_alerts(candidates, alert_service.DEFAULT_THRESHOLDS)
+        client, seen = _stub([])
+        stats = _run(
+            delivery_worker.run_worker(
+                client=client, once=True, concurrency={"discord": 4}, digest_interval=3600, digest_max_items=25, urgent_min_confidence=0.9
+            )
+        )
+        _run(client.aclose())
+        # One urgent message plus one full digest; the 5 leftovers wait for the interval.
+        assert stats["messages"] == 2 and stats["sent"] == 26
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT status, COUNT(*) FROM alert_deliveries WHERE payload->>'address' LIKE %s GROUP BY status",
+                (f"{prefix}%",),
+            )
+            assert dict(cur.fetchall()) == {"sent": 26, "pending": 5}
+    finally:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM alert_deliveries WHERE payload->>'address' LIKE %s", (f"{prefix}%",))
+            cur.execute("DELETE FROM alerts WHERE address LIKE %s", (f"{prefix}%",))
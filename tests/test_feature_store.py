@@ -0,0 +1,162 @@
+import os
+import time
+
+from api.services import feature_service
+from api.services.feature_service import activity_rows, spike_rows
+from features.store import COLUMNS, FeatureStore, open_store, write_store
+from graph.csr import split_wei
+
+
+def _a(i):
+    return f"0x{i:040x}"
+
+
+def _store():
+    store, ids = FeatureStore.empty().extended([_a(3), _a(1), _a(2)])
+    c = store.columns
+    c["tx_count"][ids] = [30, 10, 20]
+    c["out_txs_1d"][ids] = [40, 5, 30]
+    c["out_txs_2d"][ids] = [45, 5, 90]
+    c["in_txs_1d"][ids] = [0, 300, 1]
+    c["out_wei_7d_hi"][ids], c["out_wei_7d_lo"][ids] = split_wei([15 * 10**21 + 1, 0, 2])
+    store.watermarks = {"edges": 4, "block": 9, "as_of": time.time(), "addresses_at": time.time()}
+    return store
+
+
+def test_round_trip_and_vectorized_reads(tmp_path):
+    path = str(tmp_path / "features.store")
+    write_store(_store(), path)
+    store, header = open_store(path, verify=True)
+    assert header["watermarks"]["block"] == 9 and len(store) == 3
+    assert all(not a.flags.writeable for a in store.columns.values())
+
+    got = store.features_many([_a(2), _a(9), _a(3).upper()], ["tx_count", "out_wei_7d"])
+    assert got["tx_count"].tolist() == [20, 0, 30] and got["out_wei_7d"].tolist() == [2, 0, 15 * 10**21 + 1]
+    assert set(store.features_many([_a(1)])) == set(COLUMNS)
+
+    # Extending a mapped store copies its columns; existing ids are kept.
+    grown, ids = store.extended([_a(7), _a(1)])
+    assert ids[1] == store.ids([_a(1)])[0] and grown.columns["tx_count"][ids].tolist() == [0, 10]
+    grown.columns["tx_count"][ids[0]] = 5
+    assert store.features_many([_a(7)])["tx_count"].tolist() == [0]
+
+    # fan-out: at least 25 now, largest increase over the previous 24h first.
+    assert spike_rows(store, "out", 25, 10) == [(_a(3), 40, 5), (_a(2), 30, 60)]
+    assert activity_rows(store, 40, 1) == [(_a(1), 5, 300)]
+    # Blocks ingested after the store was built: a known address grows past the others, a new one appears.
+    recent = {_a(1): (40, 0, 0, 0), _a(9): (26, 0, 0, 0), _a(2): (0, 7, 0, 0)}
+    assert spike_rows(store, "out", 25, 10, recent) == [(_a(1), 45, 0), (_a(3), 40, 5), (_a(9), 26, 0), (_a(2), 30, 60)]
+    assert spike_rows(store, "out", 25, 2, recent) == [(_a(1), 45, 0), (_a(3), 40, 5)]
+    assert activity_rows(store, 40, 2, recent) == [(_a(1), 45, 300), (_a(3), 40, 0)]
+
+
+def test_incremental_refresh_matches_a_full_rebuild_and_sql(pg, monkeypatch, tmp_path):
+    from api.services.db import get_conn
+    from api.services.entity_service import entity_profiles
+    from api.services.label_service import features_for
+    from api.services.risk_service import entity_risk, score_all
+
+    p = f"0xf5{os.getpid():x}"
+    a = lambda i: f"{p}{i:04x}"  # noqa: E731
+    mine = [a(i) for i in range(6)]
+
+    def seed(cur, block, txs, edges):
+        cur.executemany(
+            "INSERT INTO transactions(tx_hash, block_number, from_address, to_address, value_wei, success, timestamp) VALUES (%s, %s, %s, %s, %s, true, now() - %s::interval)",
+            [(f"{p}b{block}t{i}", block, s, d, v, ago) for i, (s, d, v, ago) in enumerate(txs)],
+        )
+        cur.executemany(
+            "INSERT INTO edges(src_address, dst_address, tx_count, total_value_wei, window_start, window_end) VALUES (%s, %s, 1, 1, now(), now())",
+            edges,
+        )
+
+    def build(full_store=None):
+        with get_conn() as conn:
+            return feature_service.refresh_store(full_store if full_store is not None else FeatureStore.empty(), conn, full=full_store is None)
+
+    def rows(store):
+        got = store.features_many(mine)
+        return {k: v.tolist() for k, v in got.items()}
+
+    try:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT COALESCE(MAX(block_number), 0) FROM transactions")
+            b = int(cur.fetchone()[0]) + 1000
+            seed(cur, b, [(a(0), a(1), 10**21 + 1, "1 hour"), (a(0), a(2), 5 * 10**18, "1 day -1.5 seconds"), (a(1), a(0), 7, "3 days"),
+                          (a(2), a(0), 1, "20 days"), (a(3), a(0), 1, "40 days")],
+                 [(a(0), a(1)), (a(0), a(2)), (a(1), a(0))])
+            cur.executemany(
+                "INSERT INTO addresses(address, tx_count, contracts_deployed) VALUES (%s, %s, %s)",
+                [(a(0), 4, 1), (a(1), 2, 0)],
+            )
+            cur.execute("INSERT INTO alerts(type, address, severity, confidence, status) VALUES ('fan_out_spike', %s, 'high', 0.5, 'new')", (a(0),))
+        store, run = build()
+        assert run["full"] and store.watermarks["block"] >= b
+        first = rows(store)
+        assert first["out_txs_1d"][0] == 2 and first["out_txs_7d"][0] == 2 and first["in_txs_7d"][0] == 1
+        assert first["out_wei_7d"][0] == 10**21 + 5 * 10**18 + 1 and first["in_txs_30d"][0] == 2
+        assert first["alerts_7d"][0] == 1 and first["high_alerts_7d"][0] == 1
+
+        time.sleep(2)  # a(0) -> a(2) leaves the 24h window
+        with get_conn() as conn:
+            cur = conn.cursor()
+            seed(cur, b + 1, [(a(0), a(4), 3 * 10**18, "1 minute"), (a(5), a(0), 2, "2 days")], [(a(0), a(1)), (a(0), a(4)), (a(5), a(0))])
+            cur.execute("UPDATE addresses SET tx_count = 6, updated_at = now() WHERE address = %s", (a(0),))
+            cur.execute("UPDATE alerts SET status = 'ack' WHERE address = %s", (a(0),))
+        store, run = build(store)
+        assert not run["full"] and run["expired"] >= 1
+        second = rows(store)
+        assert second["out_txs_1d"][0] == 2 and second["out_txs_2d"][0] == 3 and second["new_alerts_7d"][0] == 0
+        assert second["unique_counterparties"][0] == 3 and second["outbound_edges"][0] == 4 and second["tx_count"][0] == 6
+
+        rebuilt = rows(build()[0])
+        for k in COLUMNS:
+            assert second[k] == rebuilt[k], k
+
+        # Readers map the builder's file; label features, profiles and risk inputs come from it.
+        path = str(tmp_path / "features.store")
+        write_store(store, path)
+        monkeypatch.setenv("FEATURE_STORE_PATH", path)
+        monkeypatch.setattr(feature_service, "_state", {"store": None, "file": None, "checked_at": 0.0})
+        with get_conn() as conn:
+            cur = conn.cursor()
+            from_store = features_for(cur, mine)
+            monkeypatch.delenv("FEATURE_STORE_PATH")
+            assert from_store == features_for(cur, mine)
+            from_sql = entity_profiles(cur, mine)
+            monkeypatch.setenv("FEATURE_STORE_PATH", path)
+            assert entity_profiles(cur, mine) == from_sql
+
+        # Ingest after the store was written: a new address and an updated one are read from SQL.
+        with get_conn() as conn:
+            cur = conn.cursor()
+            seed(cur, b + 2, [(a(6), a(1), 9 * 10**18, "1 minute")], [(a(6), a(1)), (a(1), a(6))])
+            cur.execute("INSERT INTO addresses(address, tx_count, contracts_deployed) VALUES (%s, 1, 2)", (a(6),))
+            cur.execute("UPDATE addresses SET tx_count = 3, updated_at = now() WHERE address = %s", (a(1),))
+        late = mine + [a(6)]
+        with get_conn() as conn:
+            cur = conn.cursor()
+            from_store = features_for(cur, late)
+            profiles = entity_profiles(cur, late)
+            monkeypatch.delenv("FEATURE_STORE_PATH")
+            assert from_store == features_for(cur, late)
+            assert from_store[a(6)]["contracts_deployed"] == 2 and from_store[a(1)]["unique_counterparties"] == 2
+            assert profiles == entity_profiles(cur, late) and profiles[-1]["flow_7d"]["outbound_txs"] == 1
+            recent = feature_service.recent_activity(cur, store)
+            assert recent[a(6)] == (1, 0, 0, 0) and recent[a(1)] == (0, 1, 0, 0)
+            monkeypatch.setenv("FEATURE_STORE_PATH", path)
+        score_all()
+        risk = entity_risk(a(0))
+        assert risk["stats"]["outbound_txs_24h"] == 2 and risk["stats"]["high_alerts_7d"] == 1
+        assert risk["stats"]["outbound_wei_7d"] == str(10**21 + 8 * 10**18 + 1)
+        assert feature_service.feature_status()["ready"]
+    finally:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM transactions WHERE tx_hash LIKE %s", (f"{p}%",))
+            cur.execute("DELETE FROM edges WHERE src_address LIKE %s", (f"{p}%",))
+            cur.execute("DELETE FROM addresses WHERE address LIKE %s", (f"{p}%",))
+            cur.execute("DELETE FROM alerts WHERE address LIKE %s", (f"{p}%",))
+            cur.execute("DELETE FROM address_risk WHERE address LIKE %s", (f"{p}%",))
+            cur.execute("DELETE FROM address_risk_history WHERE address LIKE %s", (f"{p}%",))
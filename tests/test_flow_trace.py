@@ -0,0 +1,154 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.main import app
+from graph.flow import attribute, trace
+
+WETH = "0x4200000000000000000000000000000000000006"
+TOKEN = "0x00000000000000000000000000000000000000aa"
+WETH_ID = int(WETH, 16)
+
+
+def _a(i):
+    return f"0x{i:040x}"
+
+
+def _memory_fetch(transfers):
+    def fetch(bounds, limit, remaining_ms):
+        out = {}
+        for a, (lo, hi) in bounds.items():
+            rows = sorted(
+                (t for t in transfers if a in (t[2], t[3]) and (lo is None or t[0] >= lo) and (hi is None or t[0] <= hi)),
+                key=lambda t: t[0],
+            )
+            out[a] = (rows[:limit], len(rows) > limit)
+        return out
+
+    return fetch
+
+
+def _t(block, src, dst, amount, asset="native"):
+    return (block, asset, _a(src), _a(dst), amount, f"tx{block}-{src}-{dst}", None)
+
+
+def test_attribution_respects_time_order_and_modes():
+    # Node 1 holds 100 clean at block 5, receives 100 traced at block 10, then sends 50 and 150.
+    transfers = [_t(5, 9, 1, 100), _t(8, 1, 7, 100), _t(10, 0, 1, 100), _t(11, 1, 2, 50), _t(12, 1, 3, 150)]
+    arrivals = {("tx10-0-1", "native", _a(0)): (10, 100.0)}
+
+    prop, held = attribute(_a(1), transfers, arrivals, "proportional")
+    got = {t[3]: round(s, 6) for t, s in prop}
+    # The outflow at block 8 predates the traced arrival; the clean balance before block 10 is ignored.
+    assert _a(7) not in got
+    assert got == {_a(2): 50.0, _a(3): 50.0} and not held
+
+    fifo, held = attribute(_a(1), transfers, arrivals, "fifo")
+    assert {t[3]: s for t, s in fifo} == {_a(2): 50.0, _a(3): 50.0} and not held
+
+    # A clean inflow after the traced one dilutes proportionally but queues behind it under FIFO.
+    transfers = [_t(10, 0, 1, 100), _t(11, 9, 1, 100), _t(12, 1, 2, 100)]
+    prop, held = attribute(_a(1), transfers, arrivals, "proportional")
+    assert prop[0][1] == pytest.approx(50.0) and held["native"] == pytest.approx(50.0)
+    fifo, held = attribute(_a(1), transfers, arrivals, "fifo")
+    assert fifo[0][1] == pytest.approx(100.0) and not held
+
+
+def test_forward_trace_follows_tokens_separately_and_stops_at_infra():
+    transfers = [
+        _t(1, 0, 1, 1000),
+        _t(2, 0, 1, 40, TOKEN),
+        _t(3, 1, 2, 600),
+        _t(4, 1, WETH_ID, 400),
+        _t(5, 1, 4, 40, TOKEN),
+        _t(6, 2, 5, 600),
+        _t(0, 2, 6, 999),  # before the funds arrived: not part of the trace
+    ]
+    events = list(trace(_memory_fetch(transfers), _a(0), max_hops=5, stop_at={_a(WETH_ID): "router"}))
+    edges = [e for e in events if e["type"] == "edge"]
+    assert {(e["src"], e["dst"], e["asset"], e["traced"]) for e in edges} == {
+        (_a(0), _a(1), "native", "1000"),
+        (_a(0), _a(1), TOKEN, "40"),
+        (_a(1), _a(2), "native", "600"),
+        (_a(1), _a(WETH_ID), "native", "400"),
+        (_a(1), _a(4), TOKEN, "40"),
+        (_a(2), _a(5), "native", "600"),
+    }
+    done = events[-1]
+    assert done["type"] == "done" and not done["truncated"]
+    holders = {(h["address"], h["asset"]): h for h in done["holders"]}
+    assert holders[(_a(5), "native")]["held"] == "600"
+    assert holders[(_a(WETH_ID), "native")]["label"] == "router"
+    assert _a(WETH_ID) not in {e["address"] for e in events if e["type"] == "node"}
+
+
+def test_amounts_beyond_float_precision_stay_exact():
+    big = 10**24 + 7  # well past 2**53
+    transfers = [_t(1, 0, 1, big), _t(2, 9, 1, big), _t(3, 1, 2, 10**23 + 3), _t(4, 1, 3, 3 * 10**23 + 1)]
+    events = list(trace(_memory_fetch(transfers), _a(0), max_hops=2))
+    edges = [e for e in events if e["type"] == "edge"]
+    traced = {e["dst"]: (e["amount"], e["traced"]) for e in edges}
+    assert traced[_a(1)] == (str(big), str(big))
+    # Half of node 1's balance is traced: each outflow carries half of its amount, rounded down.
+    assert traced[_a(2)] == (str(10**23 + 3), str((10**23 + 3) // 2))
+    # Rounding remainders stay held: what node 1 received is fully accounted for.
+    held = {e["address"]: e["held"] for e in events if e["type"] == "node"}
+    assert int(held[_a(1)]["native"]) + sum(int(e["traced"]) for e in edges if e["src"] == _a(1)) == big
+
+
+def test_backward_trace_and_budgets():
+    # 3 and 4 fund 1, which pays the sink 2; 4's contribution arrived after the payment.
+    transfers = [_t(1, 3, 1, 70), _t(2, 1, 2, 70), _t(3, 4, 1, 30), _t(0, 5, 3, 70)]
+    events = list(trace(_memory_fetch(transfers), _a(2), direction="backward", max_hops=5))
+    funders = {e["src"] for e in events if e["type"] == "edge"}
+    assert funders == {_a(1), _a(3), _a(5)}
+
+    hub = [_t(i + 1, 0, 100 + i, 10) for i in range(50)]
+    done = list(trace(_memory_fetch(hub), _a(0), max_edges=10))[-1]
+    assert done["truncated"] and done["truncated_reason"] == "edge_budget" and done["edge_count"] == 10
+    done = list(trace(_memory_fetch(hub), _a(0), max_nodes=5))[-1]
+    assert done["truncated_reason"] == "node_budget" and done["node_count"] == 5
+    done = list(trace(_memory_fetch(hub), _a(0), max_fanout=7))[-1]
+    assert done["edge_count"] == 7 and not done["truncated"]
+
+
+def test_trace_endpoint_reads_both_tables(pg):
+    from api.services.db import get_conn
+
+    p = f"0xf1{os.getpid():x}"
+    a = lambda i: f"{p}{i:04x}"  # noqa: E731
+    token = f"{p}ffff"
+    try:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.executemany(
+                "INSERT INTO transactions(tx_hash, block_number, from_address, to_address, value_wei, success, timestamp) VALUES (%s, %s, %s, %s, %s, true, now())",
+                [(f"{p}tx1", 10, a(0), a(1), 500), (f"{p}tx2", 11, a(1), a(2), 500), (f"{p}tx0", 5, a(1), a(3), 7)],
+            )
+            cur.execute(
+                "INSERT INTO token_transfers(tx_hash, token_address, from_address, to_address, amount, block_number, timestamp) VALUES (%s, %s, %s, %s, %s, %s, now())",
+                (f"{p}tx3", token, a(2), a(4), 80, 12),
+            )
+            cur.execute(
+                "INSERT INTO token_transfers(tx_hash, token_address, from_address, to_address, amount, block_number, timestamp) VALUES (%s, %s, %s, %s, %s, %s, now())",
+                (f"{p}tx4", token, a(0), a(2), 80, 11),
+            )
+        client = TestClient(app)
+        r = client.get("/graph/trace", params={"address": a(0), "max_hops": 3})
+        assert r.status_code == 200
+        body = r.json()
+        assert {(e["src"], e["dst"], e["asset"]) for e in body["edges"]} == {
+            (a(0), a(1), "native"),
+            (a(1), a(2), "native"),
+            (a(0), a(2), token),
+            (a(2), a(4), token),
+        }
+        r = client.get("/graph/trace", params={"address": a(0), "asset": "native", "stream": "true"})
+        assert r.headers["content-type"].startswith("text/event-stream")
+        assert "event: edge" in r.text and token not in r.text and r.text.rstrip().split("\n")[-2] == "event: done"
+    finally:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM transactions WHERE tx_hash LIKE %s", (f"{p}%",))
+            cur.execute("DELETE FROM token_transfers WHERE tx_hash LIKE %s", (f"{p}%",))
@@ -0,0 +1,91 @@
+import os
+import random
+from collections import defaultdict
+
+import numpy as np
+
+from api.services.db import get_conn
+from graph.csr import CSRGraph
+
+ADDRS = [f"0x{i:040x}" for i in range(40)]
+
+
+def _rows(rng, n):
+    out = []
+    for _ in range(n):
+        ts = rng.randint(1_700_000_000, 1_700_100_000)
+        out.append((rng.choice(ADDRS), rng.choice(ADDRS), 1, rng.choice([rng.randint(1, 10**6), rng.randint(2**63, 2**64 - 1), rng.randint(1, 10**27)]), ts, ts))
+    return out
+
+
+def _wei(g, e):
+    return (int(g.value_hi[e]) << 64) | int(g.value_lo[e])
+
+
+def _pairs(g):
+    got = {}
+    for i in range(g.n_nodes):
+        for e in g.out_edges(i):
+            got[(g.index.address(i), g.index.address(int(g.out_dst[e])))] = (int(g.tx_count[e]), _wei(g, e), int(g.first_ts[e]), int(g.last_ts[e]))
+        assert (g.in_src[g.in_offsets[i]:g.in_offsets[i + 1]] == g.edge_src(g.in_edges(i))).all()
+        assert (g.out_dst[g.in_edges(i)] == i).all()
+    return got
+
+
+def test_incremental_merges_match_full_build():
+    rng = random.Random(5)
+    g, seen = CSRGraph.empty(), []
+    for step in range(8):
+        batch = _rows(rng, rng.randint(0, 200))
+        seen += batch
+        g = g.merge(batch, watermark=step + 1)
+
+    expected = defaultdict(lambda: [0, 0, 2**32, 0])
+    for s, d, c, v, f, last in seen:
+        x = expected[(s, d)]
+        x[0], x[1], x[2], x[3] = x[0] + c, x[1] + v, min(x[2], f), max(x[3], last)
+    expected = {k: tuple(v) for k, v in expected.items()}
+    assert _pairs(g) == expected
+    assert _pairs(CSRGraph.from_edges(seen)) == expected
+    assert g.watermark == 8
+
+
+def test_neighbors_and_cluster_rank_by_weight():
+    a, b, c, d = ADDRS[:4]
+    g = CSRGraph.from_edges([(a, b, 5, 10.0, 1, 1), (c, a, 2, 1.0, 1, 1), (a, d, 1, 1.0, 1, 1), (b, d, 9, 1.0, 1, 1)])
+    n = g.neighbors(a.upper().replace("0X", "0x"), limit=2)
+    assert [(e["src"], e["dst"], e["tx_count"]) for e in n["edges"]] == [(a, b, 5), (c, a, 2)]
+    assert g.neighbors("0xmissing", 5) == {"nodes": [{"id": "0xmissing"}], "edges": []}
+
+    big = g.merge([(a, b, 5, 1234567890123456789, 1, 1), (a, b, 5, 2**64 - 1, 1, 1)]).neighbors(b, limit=1)
+    assert big["edges"][0]["total_value_wei"] == str(10 + 1234567890123456789 + 2**64 - 1)
+
+    cl = g.cluster(a, limit=10)
+    assert (cl["hop1_count"], cl["hop2_count"]) == (3, 3)
+    assert [x["id"] for x in cl["nodes"]] == sorted([a, b, c, d])
+    assert g.top_nodes(1).tolist() == [g.index.lookup(b)]
+
+
+def test_snapshot_refresh_reads_past_watermark(pg):
+    from api.services.snapshot_service import load_edges
+
+    prefix = f"0xcsr{os.getpid():x}"
+    a, b, c = (f"{prefix}{i:02x}" for i in range(3))
+    insert = "INSERT INTO edges(src_address, dst_address, tx_count, total_value_wei, window_start, window_end) VALUES(%s, %s, 1, %s, now(), now())"
+    try:
+        with get_conn() as conn:
+            conn.cursor().executemany(insert, [(a, b, 10**21), (a, b, 5), (b, c, 1234567890123456789)])
+        with get_conn() as conn:
+            g = load_edges(CSRGraph.empty(), conn)
+        with get_conn() as conn:
+            conn.cursor().executemany(insert, [(a, b, 2**64 - 1), (c, a, 2)])
+        with get_conn() as conn:
+            g2 = load_edges(g, conn)
+        assert g2.watermark > g.watermark
+        e = g2.out_edges(g2.index.lookup(a))
+        assert [(g2.index.address(int(x)), int(g2.tx_count[y]), _wei(g2, y)) for x, y in zip(g2.out_dst[e], e)] == [(b, 3, 10**21 + 5 + 2**64 - 1)]
+        assert np.isin(g2.index.lookup_many([a, b, c]), -1).sum() == 0
+        assert g.neighbors(c)["edges"] == [{"src": b, "dst": c, "tx_count": 1, "total_value_wei": "1234567890123456789"}]
+    finally:
+        with get_conn() as conn:
+            conn.cursor().execute("DELETE FROM edges WHERE src_address LIKE %s", (f"{prefix}%",))
@@ -0,0 +1,54 @@
+from fastapi.testclient import TestClient
+
+from api.main import app
+from api.services import graph_service
+from graph.csr import CSRGraph
+from graph.paths import shortest_paths
+
+WETH = "0x4200000000000000000000000000000000000006"
+
+
+def _a(i):
+    return f"0x{i:040x}"
+
+
+def _graph():
+    # A -> 1 -> 2 -> B (weak, 1 tx each), A -> 3 -> 4 -> B (strong, 50 tx),
+    # A -> 5 -> 6 -> 7 -> B, A -> WETH -> B (shortcut through infrastructure).
+    rows = [(_a(0), _a(1), 1, 10.0, 100, 100), (_a(1), _a(2), 1, 10.0, 200, 200), (_a(2), _a(99), 1, 10.0, 300, 300)]
+    rows += [(_a(0), _a(3), 50, 5.0, 100, 900), (_a(3), _a(4), 50, 5.0, 100, 900), (_a(4), _a(99), 50, 5.0, 100, 900)]
+    rows += [(_a(0), _a(5), 1, 1.0, 1, 1), (_a(5), _a(6), 1, 1.0, 1, 1), (_a(6), _a(7), 1, 1.0, 1, 1), (_a(7), _a(99), 1, 1.0, 1, 1)]
+    rows += [(_a(0), WETH, 9, 1.0, 1, 1), (WETH, _a(99), 9, 1.0, 1, 1)]
+    return CSRGraph.from_edges(rows)
+
+
+def test_bfs_finds_fewest_hops_and_disjoint_alternatives():
+    g = _graph()
+    out = shortest_paths(g, _a(0), _a(99), k=3)
+    assert [p["hops"] for p in out["paths"]] == [3, 3, 4]
+    inner = [set(p["nodes"][1:-1]) for p in out["paths"]]
+    assert not (inner[0] & inner[1]) and WETH not in set().union(*inner)
+    e = out["paths"][0]["edges"][0]
+    assert set(e) == {"src", "dst", "tx_count", "total_value_wei", "first_seen", "last_seen"}
+
+    via_hub = shortest_paths(g, _a(0), _a(99), skip=())
+    assert via_hub["paths"][0]["nodes"] == [_a(0), WETH, _a(99)]
+
+
+def test_weighted_prefers_strong_ties_and_window_filters():
+    g = _graph()
+    assert shortest_paths(g, _a(0), _a(99), weighted=True)["paths"][0]["nodes"] == [_a(0), _a(3), _a(4), _a(99)]
+    late = shortest_paths(g, _a(0), _a(99), window=(250, 1000))
+    assert late["paths"][0]["nodes"] == [_a(0), _a(3), _a(4), _a(99)]
+    assert shortest_paths(g, _a(99), _a(0), direction="out")["paths"] == []
+    assert shortest_paths(g, _a(0), _a(99), max_hops=2)["paths"] == []
+
+
+def test_path_route_needs_snapshot(monkeypatch):
+    client = TestClient(app)
+    monkeypatch.setattr(graph_service, "graph_snapshot", lambda: None)
+    assert client.get("/graph/path", params={"src": _a(0), "dst": _a(99)}).status_code == 503
+    g = _graph()
+    monkeypatch.setattr(graph_service, "graph_snapshot", lambda: g)
+    r = client.get("/graph/path", params={"src": _a(0), "dst": _a(99), "k": 2})
+    assert r.status_code == 200 and len(r.json()["paths"]) == 2
@@ -0,0 +1,69 @@
+import os
+
+from graph.csr import CSRGraph
+from graph.traversal import bounded_bfs
+
+WETH = "0x4200000000000000000000000000000000000006"
+
+
+def _addr(i):
+    return f"0x{i:040x}"
+
+
+def _graph():
+    # seed -> 5 mids (weights 10..14), each mid -> 3 leaves; every mid also
+    # trades with WETH, which has 200 unrelated counterparties.
+    rows = []
+    for m in range(5):
+        rows.append((_addr(0), _addr(100 + m), 10 + m, 1.0, 1, 1))
+        rows.append((_addr(100 + m), WETH, 50, 1.0, 1, 1))
+        for leaf in range(3):
+            rows.append((_addr(100 + m), _addr(1000 + 10 * m + leaf), 1 + leaf, 1.0, 1, 1))
+    rows += [(WETH, _addr(5000 + j), 1, 1.0, 1, 1) for j in range(200)]
+    return CSRGraph.from_edges(rows)
+
+
+def test_bfs_caps_frontier_by_weight_and_does_not_expand_infra():
+    out = bounded_bfs(_graph(), _addr(0), depth=2, frontier_cap=3)
+    hops = {n["id"]: n["hop"] for n in out["nodes"]}
+    assert [a for a, h in hops.items() if h == 1] == [_addr(102), _addr(103), _addr(104)]
+    assert hops[WETH] == 2 and {"id": WETH, "hop": 2, "skipped": True} in out["nodes"]
+    assert not {_addr(5000 + j) for j in range(200)} & set(hops)  # WETH is never expanded
+    # Skipped leaves do not use up the frontier cap.
+    assert len([a for a, h in hops.items() if h == 2 and a != WETH]) == 3
+    assert out["truncated"] is False
+    assert all(e["src"] in hops and e["dst"] in hops for e in out["edges"])
+
+
+def test_bfs_without_skip_expands_hub_and_node_budget_truncates():
+    g = _graph()
+    out = bounded_bfs(g, _addr(0), depth=3, frontier_cap=50, skip=())
+    assert max(n["hop"] for n in out["nodes"]) == 3
+    capped = bounded_bfs(g, _addr(0), depth=3, frontier_cap=50, max_nodes=12, skip=())
+    assert capped["truncated"] and capped["truncated_reason"] == "node_budget"
+    assert len(capped["nodes"]) == 12
+
+
+def test_bfs_unknown_address_is_empty():
+    out = bounded_bfs(_graph(), "0xdead", depth=3)
+    assert out["nodes"] == [{"id": "0xdead", "hop": 0}] and out["edges"] == []
+
+
+def test_sql_fallback_walks_hops(pg, monkeypatch):
+    from api.services.db import get_conn
+    from api.services.graph_service import get_neighborhood
+
+    monkeypatch.setenv("GRAPH_ENGINE", "0")
+    p = f"0xbfs{os.getpid():x}"
+    chain = [(f"{p}a", f"{p}b"), (f"{p}b", f"{p}c"), (f"{p}c", f"{p}d"), (f"{p}b", WETH)]
+    try:
+        with get_conn() as conn:
+            conn.cursor().executemany(
+                "INSERT INTO edges(src_address, dst_address, tx_count, total_value_wei) VALUES(%s, %s, 1, 1)", chain
+            )
+        out = get_neighborhood(f"{p}a", depth=2, limit=10)
+        assert {n["id"]: n["hop"] for n in out["nodes"]} == {f"{p}a": 0, f"{p}b": 1, f"{p}c": 2, WETH: 2}
+        assert len(out["edges"]) == 3 and out["truncated"] is False
+    finally:
+        with get_conn() as conn:
+            conn.cursor().execute("DELETE FROM edges WHERE src_address LIKE %s", (f"{p}%",))
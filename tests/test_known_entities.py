@@ -0,0 +1,70 @@
+import gzip
+import json
+import os
+
+import numpy as np
+
+from labels import known_entities
+from labels.known_entities import BASE_KNOWN_LABELS, KnownEntities
+from labels.rules import FEATURES, label_address, label_columns
+
+IDLE = {k: 0 for k in FEATURES}
+
+
+def _address(i):
+    return f"0x{i:040x}"
+
+
+def test_lookups_match_a_dict_and_the_bloom_filter_has_no_false_negatives():
+    rng = np.random.default_rng(8)
+    ids = rng.choice(10**9, 20_000, replace=False)
+    labels = ("exchange", "sanctioned", "mev-bot", "bridge")
+    records = [(_address(int(i)), labels[j % 4], f"src{j % 3}", f"name {j}") for j, i in enumerate(ids.tolist())]
+    records += [(records[0][0], "sanctioned", "other", ""), (records[0][0], records[0][1], "dup", ""), ("0x" + "00" * 20, "sanctioned", "burn", "")]
+    reg = KnownEntities.build(records + [("not-an-address", "exchange", "x", ""), (_address(1), "unknown-class", "x", "")])
+    expected = {}
+    for a, lb, src, name in records:
+        if lb not in {e["label"] for e in expected.get(a, [])}:
+            expected.setdefault(a, []).append({"label": lb, "source": src, **({"name": name} if name else {})})
+    assert len(reg) == sum(len(v) for v in expected.values())
+
+    probes = list(expected) + [_address(int(i)) for i in rng.integers(10**9, 2 * 10**9, 20_000).tolist()] + ["", "0xzz", _address(1)]
+    rows, entries = reg.lookup_many(probes)
+    got = {}
+    for r, e in zip(rows.tolist(), entries.tolist()):
+        got.setdefault(probes[r], []).append(reg.entry(e))
+    assert got == expected
+    for a in probes[::97]:
+        assert reg.lookup(a.upper().replace("0X", "0x")) == expected.get(a, [])
+    assert reg._maybe(reg.keys).all()
+    misses = np.array([bytes.fromhex(p[2:]) for p in probes[len(expected):-3]], dtype="S20")
+    assert reg._maybe(misses).mean() < 0.03  # false-positive rate near the 1% design point
+    assert reg.changed(reg) == []
+
+
+def test_registry_loads_files_and_hot_reloads(tmp_path, monkeypatch):
+    monkeypatch.setenv("KNOWN_ENTITIES_PATH", str(tmp_path))
+    monkeypatch.setenv("KNOWN_ENTITIES_RELOAD_SECONDS", "0")
+    monkeypatch.setattr(known_entities, "_state", {**known_entities._state, "registry": None, "signature": None})
+    (tmp_path / "cex.csv").write_text(f"address,label,name\n{_address(5).upper().replace('0X', '0x')},exchange,Hot 5\n{_address(6)},exchange,\nbad,exchange,\n")
+    with gzip.open(tmp_path / "ofac.jsonl.gz", "wt") as f:
+        f.write(json.dumps({"address": _address(6), "label": "sanctioned", "source": "ofac-sdn"}) + "\n")
+        f.write(json.dumps({"address": _address(7), "label": "not-a-label"}) + "\n")
+
+    first = known_entities.registry()
+    status = known_entities.registry_status()
+    assert (status["entries"], status["rows"], status["rejected"]) == (len(BASE_KNOWN_LABELS) + 3, 5, 2)
+    assert [lb["label"] for lb in label_address(_address(6), IDLE)] == ["exchange", "sanctioned"]
+    assert label_address(_address(5), IDLE) == [{"label": "exchange", "confidence": 0.98, "evidence": {"source": "cex", "name": "Hot 5"}}]
+    wrapped = "0x4200000000000000000000000000000000000006"
+    assert label_address(wrapped, IDLE)[0]["evidence"] == {"source": "base_known_system_contracts"}
+    assert [i for i, _ in label_columns([_address(6), _address(9), wrapped], {k: np.zeros(3, np.int64) for k in FEATURES})] == [0, 0, 2]
+    assert known_entities.registry() is first  # unchanged files: no rebuild
+
+    (tmp_path / "cex.csv").write_text(f"address,label\n{_address(8)},exchange\n")
+    second = known_entities.registry()
+    assert second is not first and known_entities.registry_status()["version"] == status["version"] + 1
+    assert label_address(_address(5), IDLE) == [] and label_address(_address(8), IDLE)[0]["label"] == "exchange"
+    assert second.changed(first) == [_address(5), _address(6), _address(8)]
+    os.remove(tmp_path / "cex.csv")
+    assert [e["label"] for e in known_entities.registry().lookup(_address(6))] == ["sanctioned"]
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from labels.dsl import compile_expr
+from labels.known_entities import BASE_KNOWN_LABELS
+from labels.rules import FEATURES, compile_rules, label_address, label_columns, label_sql
+
+
+def _reference(address, f):
+    """The heuristics as they were hand-written before the taxonomy was compiled."""
+    labels = []
+    if address in BASE_KNOWN_LABELS:
+        labels.append({"label": BASE_KNOWN_LABELS[address], "confidence": 0.98, "evidence": {"source": "base_known_system_contracts"}})
+    if f["contracts_deployed"] >= 3:
+        labels.append({"label": "deployer", "confidence": min(0.95, 0.6 + f["contracts_deployed"] * 0.05), "evidence": {"contracts_deployed": f["contracts_deployed"]}})
+    if f["tx_count"] > 500 and f["unique_counterparties"] > 200:
+        labels.append({"label": "router", "confidence": 0.72, "evidence": {"tx_count": f["tx_count"], "unique_counterparties": f["unique_counterparties"]}})
+    if f["inbound_edges"] > 500 and f["outbound_edges"] < f["inbound_edges"] * 0.15:
+        labels.append({"label": "exchange-facing", "confidence": 0.67, "evidence": {"inbound_edges": f["inbound_edges"], "outbound_edges": f["outbound_edges"]}})
+    if f["tx_count"] > 1000 and f["outbound_edges"] > 500 and f["inbound_edges"] > 500:
+        labels.append({"label": "high-activity", "confidence": 0.6, "evidence": {"tx_count": f["tx_count"]}})
+    return labels
+
+
+def _columns(n, seed=9):
+    rng = np.random.default_rng(seed)
+    cols = {k: rng.integers(0, 2000, n) for k in FEATURES}
+    cols["contracts_deployed"] = rng.integers(0, 12, n)
+    # Boundaries: thresholds exactly, and outbound at inbound * 0.15 (a float product).
+    cols["inbound_edges"][:400] = rng.integers(495, 4000, 400) // 20 * 20
+    cols["outbound_edges"][:400] = cols["inbound_edges"][:400] * 3 // 20 + rng.integers(-1, 2, 400)
+    cols["tx_count"][400:450] = 500
+    cols["unique_counterparties"][400:450] = rng.integers(199, 202, 50)
+    addresses = [f"0x{i:040x}" for i in range(n)] + list(BASE_KNOWN_LABELS)
+    for k in FEATURES:
+        cols[k] = np.concatenate([cols[k], np.zeros(len(BASE_KNOWN_LABELS), dtype=np.int64)])
+    return addresses, cols
+
+
+def test_compiled_rules_match_the_handwritten_heuristics():
+    addresses, cols = _columns(4000)
+    got = {}
+    for i, lb in label_columns(addresses, cols):
+        got.setdefault(i, []).append(lb)
+    for i, a in enumerate(addresses):
+        f = {k: int(cols[k][i]) for k in FEATURES}
+        assert got.get(i, []) == _reference(a, f) == label_address(a.upper(), f)
+
+
+def test_expressions_compile_to_sql_and_reject_anything_else():
+    e = compile_expr("inbound_edges > 500 AND NOT (outbound_edges >= inbound_edges * 0.15)", FEATURES)
+    assert e.boolean and e.names == {"inbound_edges", "outbound_edges"}
+    assert e.sql == "((inbound_edges > 500) AND (NOT (outbound_edges >= (inbound_edges * 0.15::float8))))"
+    assert e({"inbound_edges": np.array([600, 600]), "outbound_edges": np.array([10, 90])}).tolist() == [True, False]
+    assert compile_expr("max(1, -tx_count + 2)", FEATURES).sql == "GREATEST(1, ((-tx_count) + 2))"
+    for bad in ("tx_count / 2 > 1", "balance > 1", "tx_count > 1 and tx_count < 5", "1 < tx_count < 5",
+                "__import__('os')", "tx_count > 1 AND 3", "tx_count[0] > 1", "", "tx_count >"):
+        with pytest.raises(ValueError):
+            compile_expr(bad, FEATURES)
+    with pytest.raises(ValueError, match="'x'"):
+        compile_rules({"x": {"rule": "tx_count", "confidence_model": "0.5"}})
+    with pytest.raises(ValueError, match="evidence"):
+        compile_rules({"x": {"rule": "tx_count > 1", "confidence_model": "0.5", "evidence": ["balance"]}})
+
+
+def test_sql_rules_match_numpy_rules(pg):
+    from api.services import label_service
+    from api.services.db import get_conn
+
+    addresses, cols = _columns(3000, seed=5)
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute(f"CREATE TEMP TABLE f (address TEXT, {', '.join(k + ' BIGINT' for k in FEATURES)})")
+        cur.executemany(
+            f"INSERT INTO f VALUES (%s{', %s' * len(FEATURES)})",
+            [(a, *(int(cols[k][i]) for k in FEATURES)) for i, a in enumerate(addresses)],
+        )
+        label_service.stage_known(cur, addresses)
+        cur.execute(f"SELECT address, label, confidence::text, evidence FROM ({label_sql('f', 'label_known')}) s")
+        from_sql = sorted(cur.fetchall())
+        conn.rollback()
+    from_numpy = sorted(
+        (addresses[i], lb["label"], repr(lb["confidence"]), lb["evidence"]) for i, lb in label_columns(addresses, cols)
+    )
+    assert len(from_numpy) > 500
+    assert from_sql == from_numpy
@@ -0,0 +1,122 @@
+import os
+
+import numpy as np
+
+from labels.rules import FEATURES, label_address, label_columns
+
+WETH = "0x4200000000000000000000000000000000000006"
+
+
+def test_columns_match_the_scalar_rules():
+    rng = np.random.default_rng(4)
+    n = 3000
+    cols = {k: rng.integers(0, 2000, n) for k in FEATURES}
+    cols["contracts_deployed"] = rng.integers(0, 12, n)
+    cols["outbound_edges"][:300] = rng.integers(0, 80, 300)  # exchange-facing candidates
+    addresses = [f"0x{i:040x}" for i in range(n)]
+    addresses[7] = WETH
+    got = {}
+    for i, lb in label_columns(addresses, cols):
+        got.setdefault(i, []).append(lb)
+    for i, a in enumerate(addresses):
+        assert got.get(i, []) == label_address(a, {k: int(cols[k][i]) for k in FEATURES})
+    assert {lb["label"] for labels in got.values() for lb in labels} >= {"router", "deployer", "exchange-facing", "high-activity"}
+
+
+def test_relabel_matches_per_address_labels(pg):
+    from api.services import label_service
+    from api.services.db import get_conn
+
+    p = f"0xlb{os.getpid():x}"
+    a = [f"{p}{i:04x}" for i in range(4)]
+    try:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.executemany(
+                "INSERT INTO addresses(address, tx_count, contracts_deployed) VALUES (%s, %s, %s)",
+                [(a[0], 900, 5), (a[1], 10, 0), (a[2], 3, 0), (a[3], 1, 1)],
+            )
+            # a[0] sends to 250 distinct counterparties; a[2] receives 600 transfers and sends few.
+            rows = [(a[0], f"{p}c{i:04x}") for i in range(250)] + [(f"{p}s{i % 50:04x}", a[2]) for i in range(600)] + [(a[2], a[1])] * 20
+            cur.executemany("INSERT INTO edges(src_address, dst_address, tx_count, total_value_wei) VALUES (%s, %s, 1, 1)", rows)
+            cur.execute("INSERT INTO labels(address, label, confidence, evidence) VALUES (%s, 'router', 0.5, '{}')", (a[3],))
+
+        out = label_service.relabel(addresses=a + [a[0].upper()], batch_size=3)
+        assert out["addresses"] == 4 and out["labels"] == 3 and out["deleted"] == 1
+
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT address, label, confidence::float8, evidence FROM labels WHERE address LIKE %s ORDER BY address, label", (f"{p}%",))
+            stored = cur.fetchall()
+        assert [(r[0], r[1]) for r in stored] == [(a[0], "deployer"), (a[0], "router"), (a[2], "exchange-facing")]
+        for address in (a[0], a[2]):
+            expected = label_service.get_labels(address)  # reads back exactly what relabel stored
+            assert sorted((lb["label"], lb["confidence"], lb["evidence"]) for lb in expected["labels"]) == sorted(
+                (r[1], r[2], r[3]) for r in stored if r[0] == address
+            )
+        again = label_service.relabel(addresses=a)
+        assert again["inserted"] == 0 and again["deleted"] == 0
+        in_db = label_service.relabel(addresses=a, in_database=True)  # the rules as SQL store the same rows
+        assert (in_db["addresses"], in_db["labels"], in_db["inserted"], in_db["deleted"]) == (4, 3, 0, 0)
+    finally:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM edges WHERE src_address LIKE %s OR dst_address LIKE %s", (f"{p}%", f"{p}%"))
+            cur.execute("DELETE FROM labels WHERE address LIKE %s", (f"{p}%",))
+            cur.execute("DELETE FROM address_label_state WHERE address LIKE %s", (f"{p}%",))
+            cur.execute("DELETE FROM addresses WHERE address LIKE %s", (f"{p}%",))
+
+
+def test_dirty_queue_relabels_and_reads_never_write(pg):
+    from api.services import label_service
+    from api.services.db import get_conn
+
+    p = f"0xlq{os.getpid():x}"
+    a = [f"{p}{i:04x}" for i in range(2)]
+    try:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.executemany("INSERT INTO addresses(address, tx_count, contracts_deployed) VALUES (%s, %s, %s)", [(a[0], 900, 5), (a[1], 1, 0)])
+            cur.executemany("INSERT INTO edges(src_address, dst_address, tx_count, total_value_wei) VALUES (%s, %s, 1, 1)", [(a[0], f"{p}c{i:04x}") for i in range(250)])
+            cur.execute("DELETE FROM label_dirty")  # leave only this test's addresses queued
+            label_service.mark_dirty(cur, [a[0].upper(), a[1], None])
+
+        unlabeled = label_service.get_labels(a[0])  # never labeled yet: computed in memory, not stored
+        assert unlabeled["labeled_at"] is None and not unlabeled["stale"]
+        assert {lb["label"] for lb in unlabeled["labels"]} == {"deployer", "router"}
+        assert label_service.queue_status()["label_dirty"] == 2
+
+        out = label_service.drain_dirty(batch_size=10)
+        assert out["addresses"] == 2 and out["labels"] == 2 and out["oldest_marked_at"]
+        assert label_service.drain_dirty(batch_size=10)["addresses"] == 0
+        assert label_service.queue_status() == {"label_dirty": 0, "label_stale_age_seconds": 0.0}
+
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT id, label FROM labels WHERE address = %s ORDER BY id", (a[0],))
+            before = cur.fetchall()
+        got = label_service.get_labels(a[0])
+        assert [lb["label"] for lb in got["labels"]] == [r[1] for r in before]
+        assert got["features"]["tx_count"] == 900 and got["labeled_at"] and not got["stale"]
+
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("UPDATE addresses SET tx_count = 1001 WHERE address = %s", (a[0],))
+            label_service.mark_dirty(cur, [a[0]])
+        got = label_service.get_labels(a[0])
+        assert got["stale"] and got["features"]["tx_count"] == 900  # served from the stored state until relabeled
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT id, label FROM labels WHERE address = %s ORDER BY id", (a[0],))
+            assert cur.fetchall() == before
+        label_service.drain_dirty(batch_size=10)
+        got = label_service.get_labels(a[0])
+        assert not got["stale"] and got["features"]["tx_count"] == 1001
+    finally:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM edges WHERE src_address LIKE %s", (f"{p}%",))
+            cur.execute("DELETE FROM labels WHERE address LIKE %s", (f"{p}%",))
+            cur.execute("DELETE FROM label_dirty WHERE address LIKE %s", (f"{p}%",))
+            cur.execute("DELETE FROM address_label_state WHERE address LIKE %s", (f"{p}%",))
+            cur.execute("DELETE FROM addresses WHERE address LIKE %s", (f"{p}%",))
@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+
+import pytest
+from fastapi import Request
+from fastapi.testclient import TestClient
+
+from api.main import app
+from api.routes import metrics as metrics_route
+from api.routes import runbook as runbook_route
+from api.services import cache_service
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    wm = {"block": "10", "alerts": (5, 0), "failures": 0}
+    monkeypatch.setattr(cache_service, "_read_watermarks", lambda: dict(wm))
+    monkeypatch.setenv("RESPONSE_CACHE_WATERMARK_MS", "0")
+    cache_service.clear_cache()
+    yield wm
+    cache_service.clear_cache()
+
+
+def test_responses_are_cached_per_watermark_and_revalidated(cache, monkeypatch):
+    calls = []
+    monkeypatch.setattr(runbook_route, "alerts_runbook", lambda: calls.append(1) or {"queue_counts": {"new": len(calls)}})
+
+    first = client.get("/runbook/alerts")
+    assert first.json() == {"queue_counts": {"new": 1}} and first.headers["x-cache"] == "miss"
+    etag = first.headers["etag"]
+    again = client.get("/runbook/alerts")
+    assert again.headers["x-cache"] == "hit" and again.json() == first.json() and len(calls) == 1
+
+    r = client.get("/runbook/alerts", headers={"If-None-Match": etag})
+    assert r.status_code == 304 and r.content == b"" and r.headers["etag"] == etag
+
+    cache["block"] = "11"  # /runbook/alerts does not depend on blocks
+    assert client.get("/runbook/alerts", headers={"If-None-Match": f'W/{etag}'}).status_code == 304
+    cache["alerts"] = (5, 1)  # a status change
+    r = client.get("/runbook/alerts", headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.json() == {"queue_counts": {"new": 2}} and r.headers["etag"] != etag
+
+    monkeypatch.setenv("RESPONSE_CACHE_TTL_SECONDS", "0")
+    client.get("/runbook/alerts")
+    assert len(calls) == 3
+    stats = client.get("/metrics/cache").json()
+    assert stats["misses"] == 3 and stats["hits"] == 3 and stats["not_modified"] == 2
+
+
+def test_metrics_expire_on_their_own_short_ttl(cache, monkeypatch):
+    monkeypatch.setenv("RESPONSE_CACHE_METRICS_TTL_SECONDS", "0.2")
+    queue = {"label_queue": 3}
+    monkeypatch.setattr(metrics_route, "get_metrics", lambda: dict(queue))  # no watermark covers the relabel queue
+
+    assert client.get("/metrics").json() == {"label_queue": 3}
+    queue["label_queue"] = 0
+    assert client.get("/metrics").headers["x-cache"] == "hit"
+    time.sleep(0.25)
+    assert client.get("/metrics").json() == {"label_queue": 0}
+
+
+def test_concurrent_misses_compute_once_and_lru_evicts(cache, monkeypatch):
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"n": len(calls)}
+
+    def request(path):
+        return Request({"type": "http", "method": "GET", "path": path, "query_string": b"limit=5", "headers": []})
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache_service.cached_response(request("/x"), ("block",), slow))) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1 and {r.body for r in results} == {b'{"n":1}'}
+    assert sorted(r.headers["x-cache"] for r in results).count("miss") == 1
+
+    monkeypatch.setenv("RESPONSE_CACHE_SIZE", "2")
+    for path in ("/y", "/z"):
+        cache_service.cached_response(request(path), ("block",), slow)
+    assert cache_service.cached_response(request("/x"), ("block",), slow).headers["x-cache"] == "miss"
+    assert cache_service.cache_stats()["evictions"] == 2
+
+    monkeypatch.setenv("RESPONSE_CACHE", "0")
+    assert cache_service.cached_response(request("/x"), ("block",), slow) == {"n": 5}
+
+
+def test_alert_writes_move_the_watermark_and_the_shared_backend_serves_other_processes(pg, monkeypatch):
+    monkeypatch.setenv("RESPONSE_CACHE_WATERMARK_MS", "0")
+    monkeypatch.setenv("RESPONSE_CACHE_BACKEND", "postgres")
+    from api.services.db import get_conn
+
+    p = f"0xc0{os.getpid():x}"
+    cache_service.clear_cache()
+    try:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("INSERT INTO alerts(type, address, severity, confidence) VALUES ('fan_out_spike', %s, 'high', 0.9) RETURNING id", (p,))
+            alert_id = cur.fetchone()[0]
+        before = cache_service.watermarks()
+        assert before["alerts"][0] >= alert_id
+        with get_conn() as conn:
+            conn.cursor().execute("UPDATE alerts SET status = 'ack' WHERE id = %s", (alert_id,))
+        after = cache_service.watermarks()
+        assert after["alerts"][0] == before["alerts"][0] and after["alerts"][1] > before["alerts"][1]
+        # Statements that change nothing, and inserts (covered by the max id), leave the epoch alone.
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("UPDATE alerts SET status = 'ack' WHERE id = %s", (alert_id,))
+            cur.execute("INSERT INTO alerts(type, address, severity, confidence) SELECT type, address, severity, confidence FROM alerts WHERE false")
+            cur.execute("INSERT INTO alerts(type, address, severity, confidence) VALUES ('fan_in_spike', %s, 'low', 0.1)", (p,))
+        later = cache_service.watermarks()
+        assert later["alerts"][1] == after["alerts"][1] and later["alerts"][0] > after["alerts"][0]
+
+        calls = []
+        monkeypatch.setattr(runbook_route, "alerts_runbook", lambda: calls.append(1) or {"p": p})
+        assert client.get("/runbook/alerts").headers["x-cache"] == "miss"
+        cache_service.clear_cache()  # another API process: empty local cache, same table
+        r = client.get("/runbook/alerts")
+        assert r.headers["x-cache"] == "shared_hit" and r.json() == {"p": p} and len(calls) == 1
+    finally:
+        cache_service.clear_cache()
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM alerts WHERE address = %s", (p,))
+            cur.execute("DELETE FROM response_cache")
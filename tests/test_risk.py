@@ -0,0 +1,110 @@
+import os
+
+import numpy as np
+import pytest
+
+from labels.taxonomy import KNOWN_CONFIDENCE, LABEL_TAXONOMY
+from risk.scoring import LABEL_WEIGHTS, band, risk_factors
+
+
+def _reference(labels, new_alerts, high_alerts, avg_conf, pagerank_pct, txs_24h, wei_7d):
+    """The per-address arithmetic /entity/{address}/risk used to run inline."""
+    label_risk = sum(c * LABEL_WEIGHTS.get(lb, 0.0) for lb, c in labels)
+    alert_risk = min(45.0, new_alerts * 4.0 + high_alerts * 8.0 + avg_conf * 10)
+    if pagerank_pct is not None:
+        centrality_risk = 25.0 * max(0.0, (pagerank_pct - 0.95) / 0.05)
+    else:
+        centrality_risk = min(25.0, txs_24h / 50.0)
+    flow_risk = min(20.0, wei_7d / 1e21)
+    return max(0.0, min(100.0, label_risk + alert_risk + centrality_risk + flow_risk))
+
+
+def test_risk_factor_columns_match_the_per_address_formula():
+    rng = np.random.default_rng(3)
+    n = 2000
+    names = list(LABEL_WEIGHTS) + ["contract"]
+    labels = [[(names[j], float(c)) for j, c in zip(rng.integers(0, len(names), k), rng.random(k))] for k in rng.integers(0, 4, n)]
+    pct = np.where(rng.random(n) < 0.5, rng.random(n), np.nan)
+    cols = {
+        "label_weight": np.array([sum(c * LABEL_WEIGHTS.get(lb, 0.0) for lb, c in ls) for ls in labels]),
+        "new_alerts": rng.integers(0, 8, n).astype(float),
+        "high_alerts": rng.integers(0, 4, n).astype(float),
+        "avg_alert_conf": rng.random(n),
+        "pagerank_pct": pct,
+        "txs_24h": rng.integers(0, 3000, n).astype(float),
+        "wei_7d": rng.random(n) * 3e22,
+    }
+    scores = risk_factors(cols)["risk_score"]
+    for i in range(n):
+        expected = _reference(
+            labels[i], cols["new_alerts"][i], cols["high_alerts"][i], cols["avg_alert_conf"][i],
+            None if np.isnan(pct[i]) else pct[i], cols["txs_24h"][i], cols["wei_7d"][i],
+        )
+        assert scores[i] == pytest.approx(expected, abs=1e-9)
+    assert band(70.0) == "high" and band(69.99) == "medium" and band(39.9) == "low"
+
+
+def test_known_entity_labels_carry_weight():
+    known = [lb for lb, spec in LABEL_TAXONOMY.items() if "known" in spec["source"]]
+    assert all(LABEL_WEIGHTS.get(lb, 0) > 0 for lb in known)
+    assert max(LABEL_WEIGHTS, key=LABEL_WEIGHTS.get) == "sanctioned"
+    zeros = {k: np.zeros(1) for k in ("new_alerts", "high_alerts", "avg_alert_conf", "txs_24h", "wei_7d")}
+    score = risk_factors({**zeros, "label_weight": np.array([KNOWN_CONFIDENCE * LABEL_WEIGHTS["sanctioned"]]), "pagerank_pct": np.array([np.nan])})
+    assert band(float(score["risk_score"][0])) == "high"
+
+
+def test_score_all_materializes_scores_and_leaderboard(pg):
+    from api.services.db import get_conn
+    from api.services.risk_service import entity_risk, risk_history, score_all, top_risk
+
+    p = f"0xr1{os.getpid():x}"
+    a = lambda i: f"{p}{i:04x}"  # noqa: E731
+    txs = [(a(0), a(1), 5 * 10**21, "1 hour")] * 3 + [(a(0), a(2), 10**20, "3 days"), (a(3), a(0), 1, "10 days")]
+    try:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.executemany(
+                "INSERT INTO transactions(tx_hash, block_number, from_address, to_address, value_wei, success, timestamp) VALUES (%s, 1, %s, %s, %s, true, now() - %s::interval)",
+                [(f"{p}tx{i}", src, dst, v, ago) for i, (src, dst, v, ago) in enumerate(txs)],
+            )
+            cur.executemany(
+                "INSERT INTO alerts(type, address, severity, confidence, status, created_at) VALUES ('fan_out_spike', %s, %s, %s, %s, now() - %s::interval)",
+                [(a(0), "high", 0.9, "new", "1 day"), (a(0), "medium", 0.5, "ack", "2 days"), (a(1), "high", 0.8, "new", "9 days")],
+            )
+            cur.executemany(
+                "INSERT INTO labels(address, label, confidence, evidence) VALUES (%s, %s, %s, '{}')",
+                [(a(0), "router", 0.5), (a(0), "contract", 0.9), (a(4), "treasury", 0.8)],
+            )
+        run = score_all()
+        assert run["addresses"] >= 4
+
+        top = entity_risk(a(0))
+        # 20 x 0.5 label + (4 + 8 + 7) alert + 3 txs / 50 degree + 15.1e21 wei / 1e21 flow
+        assert top["risk_score"] == pytest.approx(10 + 19 + 0.06 + 15.1, abs=0.01)
+        assert top["stats"]["outbound_txs_24h"] == 3 and top["stats"]["inbound_wei_7d"] == "0"
+        assert top["stats"]["outbound_wei_7d"] == str(15 * 10**21 + 10**20)
+        assert top["run_id"] == run["id"] and [lb["label"] for lb in top["labels"]] == ["router", "contract"]
+        assert entity_risk(a(4))["factors"]["label_risk"] == pytest.approx(8.0)
+        assert entity_risk(a(3))["risk_score"] == 0  # only a transfer outside the 7-day window
+        assert entity_risk(a(1))["factors"]["alert_risk"] == 0 and entity_risk(a(1))["stats"]["inbound_txs_24h"] == 3
+
+        board = top_risk(limit=500)["addresses"]
+        mine = [r["address"] for r in board if r["address"].startswith(p)]
+        assert mine[0] == a(0) and a(3) not in mine
+        scores = [r["risk_score"] for r in board]
+        assert scores == sorted(scores, reverse=True)
+        assert all(r["band"] != "low" for r in top_risk(min_band="medium")["addresses"])
+
+        with get_conn() as conn:
+            conn.cursor().execute("DELETE FROM labels WHERE address = %s", (a(4),))
+        run2 = score_all()
+        assert entity_risk(a(4))["risk_score"] == 0 and entity_risk(a(4))["run_id"] == run2["id"]
+        assert [h["run_id"] for h in risk_history(a(0))[:2]] == [run2["id"], run["id"]]
+    finally:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM transactions WHERE tx_hash LIKE %s", (f"{p}%",))
+            cur.execute("DELETE FROM alerts WHERE address LIKE %s", (f"{p}%",))
+            cur.execute("DELETE FROM labels WHERE address LIKE %s", (f"{p}%",))
+            cur.execute("DELETE FROM address_risk WHERE address LIKE %s", (f"{p}%",))
+            cur.execute("DELETE FROM address_risk_history WHERE address LIKE %s", (f"{p}%",))
@@ -0,0 +1,82 @@
+import os
+import random
+
+from search.trigram import TrigramIndex
+
+
+def test_trigram_index_matches_a_substring_scan():
+    rng = random.Random(3)
+    words = ["binance", "coinbase", "kraken", "hot", "wallet", "deposit", "bridge", "mev", "abcab", "bcabc"]
+    names = [" ".join(rng.choice(words) for _ in range(rng.randint(1, 3))) + f" {rng.randint(0, 99)}" for _ in range(3000)]
+    index = TrigramIndex(names + ["", "Binance HOT 1"])
+    distinct = sorted({n.lower() for n in names + ["Binance HOT 1"]})
+    assert index.names.tolist() == distinct
+    for q in ["binance hot", "ance", "t 1", "bcabc", "abcab 4", "b", "co", "zz", "wallet deposit 7", "hot 1"]:
+        assert [index.names[i] for i in index.search(q.upper())] == [n for n in distinct if (n.startswith(q) if len(q) < 3 else q in n)]
+
+
+def test_prefix_label_and_name_search(pg, monkeypatch, tmp_path):
+    from api.services import search_service
+    from api.services.db import get_conn
+    from labels import known_entities
+
+    rng = random.Random(os.getpid())
+    p = f"0x{os.getpid() % 0xfff:03x}"  # a 3-digit prefix of its own
+    addrs = [p + f"{rng.getrandbits(148):037x}" for _ in range(300)]
+    counts = {a: rng.randint(0, 10_000) for a in addrs}
+    (tmp_path / "cex.csv").write_text(f"address,label,name\n{addrs[5]},exchange,Zyxwv Hot Wallet\n{addrs[9]},exchange,Zyxwv Deposit\n")
+    monkeypatch.setenv("KNOWN_ENTITIES_PATH", str(tmp_path))
+    monkeypatch.setattr(known_entities, "_state", {**known_entities._state, "registry": None, "signature": None})
+
+    def brute(prefix, n):
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT address FROM addresses WHERE address LIKE %s ORDER BY tx_count DESC, address LIMIT %s", (prefix + "%", n))
+            return [r[0] for r in cur.fetchall()]
+
+    def search(q, **kw):
+        return [r["address"] for r in search_service.search_entities(q, **kw)]
+
+    try:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.executemany("INSERT INTO addresses(address, tx_count) VALUES (%s, %s)", list(counts.items()))
+            cur.execute("INSERT INTO labels(address, label, confidence, evidence) VALUES (%s, 'exchange-facing', 0.67, '{}')", (addrs[0],))
+            # Before the first indexer run a short prefix takes a bounded, unranked slice of its range.
+            cur.execute("UPDATE search_index_state SET refreshed_at = NULL")
+        got = search(p, limit=500)
+        assert len(got) == search_service.TOP_K and all(a.startswith(p) for a in got)
+        search_service.refresh_search_index(full=True)
+
+        for prefix in (p, p + addrs[0][5], addrs[0][:6], addrs[0][:9]):
+            assert search(prefix, limit=5) == brute(prefix, 5)
+        assert search(p, limit=50) == brute(p, search_service.TOP_K)  # short prefix: clamped to its precomputed list
+        assert search(addrs[0][:7], limit=50) == brute(addrs[0][:7], 50)  # 5+ digits: range scan
+        assert search(p, typeahead=True) == brute(p, 10)
+        assert search(addrs[3].upper()) == [addrs[3]]
+        assert search("0xnothex") == []
+
+        # An address climbs past the current leader: only an incremental run sees it.
+        leader = brute(p, 1)[0]
+        climber = brute(p, 30)[-1]
+        counts[climber] = counts[leader] + 1
+        with get_conn() as conn:
+            conn.cursor().execute("UPDATE addresses SET tx_count = %s, updated_at = now() WHERE address = %s", (counts[climber], climber))
+        assert search(p, limit=1) == [leader]
+        out = search_service.refresh_search_index()
+        assert not out["full"] and out["prefixes"] >= 1
+        for prefix in ("0x", p[:3], p[:4], p, climber[:6]):
+            assert search(prefix, limit=5) == brute(prefix, 5)
+        assert search(p, limit=1) == [climber]
+
+        hits = search_service.search_entities("zyxwv")
+        assert sorted(r["address"] for r in hits) == sorted([addrs[5], addrs[9]])
+        assert {r["match"] for r in hits} == {"name"} and {r["name"] for r in hits} == {"Zyxwv Hot Wallet", "Zyxwv Deposit"}
+        assert [r["address"] for r in hits] == sorted([addrs[5], addrs[9]], key=lambda a: (-counts[a], a))
+        assert addrs[0] in search("exchange-fac")
+    finally:
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM labels WHERE address LIKE %s", (f"{p}%",))
+            cur.execute("DELETE FROM addresses WHERE address = ANY(%s)", (addrs,))
+        search_service.refresh_search_index(full=True)
@@ -0,0 +1,87 @@
+import os
+import random
+from collections import Counter
+
+from graph.sketches import DegreeSketches
+
+T0 = 1_700_006_400
+
+
+def _stream(seed, blocks=200, per_block=50):
+    rnd = random.Random(seed)
+    hubs = [f"0xhub{i}" for i in range(5)]
+    for b in range(blocks):
+        txs = []
+        for _ in range(per_block):
+            src = rnd.choice(hubs) if rnd.random() < 0.3 else f"0x{rnd.randrange(5000):x}"
+            txs.append((src, f"0x{rnd.randrange(5000):x}"))
+        yield b, T0 + b * 60, txs
+
+
+def _exact(streams):
+    out, inn = Counter(), Counter()
+    for _, _, txs in streams:
+        for f, t in txs:
+            out[f] += 1
+            inn[t] += 1
+    return out, inn
+
+
+def test_estimates_never_undercount_and_find_heavy_hitters():
+    s = DegreeSketches(width=512, depth=4, k=64)
+    blocks = list(_stream(1))
+    for b, ts, txs in blocks:
+        s.add_block(b, ts, txs)
+    out, inn = _exact(blocks)
+
+    for addr in list(out)[:200]:
+        est = s.degree(addr)
+        assert est["outbound"] >= out[addr]
+        assert est["inbound"] >= inn[addr]
+
+    top = [r["address"] for r in s.top_degree(5)]
+    assert set(top) == {f"0xhub{i}" for i in range(5)}
+
+
+def test_replica_merge_and_snapshot_round_trip():
+    a, b, both = (DegreeSketches(width=256, depth=3, k=32) for _ in range(3))
+    for n, (blk, ts, txs) in enumerate(_stream(2, blocks=60)):
+        (a if n % 2 else b).add_block(blk, ts, txs)
+        both.add_block(blk, ts, txs)
+    a.merge(DegreeSketches.from_bytes(b.to_bytes()))
+
+    for addr in ("0xhub0", "0xhub3", "0x1f"):
+        assert a.degree(addr) == both.degree(addr)
+    assert a.error_bounds() == both.error_bounds()
+    assert a.top_degree(3)[0]["address"].startswith("0xhub")
+
+
+def test_catch_up_seeds_from_recent_transactions(pg):
+    import psycopg2
+
+    from ingest.base_ingest import catch_up_degree_sketches
+
+    p = f"0xd5{os.getpid():x}"
+    base = 900_000_000 + os.getpid() % 1000 * 100
+    rows = [(base + 1, f"{p}hub", f"{p}{i}", "1 hour") for i in range(6)]
+    rows += [(base + 2, f"{p}hub", f"{p}9", "30 minutes"), (base + 3, f"{p}old", f"{p}hub", "72 hours")]
+    conn = psycopg2.connect(pg)
+    try:
+        cur = conn.cursor()
+        cur.executemany(
+            "INSERT INTO transactions(tx_hash, block_number, from_address, to_address, value_wei, success, timestamp) VALUES (%s, %s, %s, %s, 1, true, now() - %s::interval)",
+            [(f"{p}t{n}", b, f, t, ago) for n, (b, f, t, ago) in enumerate(rows)],
+        )
+        conn.commit()
+        s = DegreeSketches(width=256, depth=3, k=32)
+        s.last_block = base
+        assert catch_up_degree_sketches(conn, s, base + 3) == 2
+        assert s.last_block == base + 3
+        assert s.degree(f"{p}hub", hours=48)["outbound"] >= 7
+        assert s.degree(f"{p}old", hours=48)["outbound"] == 0
+        assert s.top_degree(1, hours=48)[0]["address"] == f"{p}hub"
+    finally:
+        conn.rollback()
+        conn.cursor().execute("DELETE FROM transactions WHERE tx_hash LIKE %s", (f"{p}t%",))
+        conn.commit()
+        conn.close()
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from api.services import snapshot_service
+from graph.csr import CSRGraph
+from graph.snapshot_builder import resume
+from graph.snapshot_file import ARRAYS, FORMAT_VERSION, open_snapshot, write_snapshot
+
+
+def _a(i):
+    return f"0x{i:040x}"
+
+
+def _graph(watermark=7):
+    rows = [(_a(1), _a(2), 3, 1e18, 100, 200), (_a(2), _a(3), 1, 5.0, 150, 150), (_a(3), _a(1), 2, 2.0, 90, 300), (_a(4), _a(2), 9, 1.0, 1, 2)]
+    return CSRGraph.from_edges(rows, watermark=watermark)
+
+
+def test_round_trip_maps_identical_read_only_arrays(tmp_path):
+    g = _graph()
+    path = str(tmp_path / "graph.snapshot")
+    header = write_snapshot(g, path)
+    m, read = open_snapshot(path, verify=True)
+    assert read["watermark"] == header["watermark"] == 7 and read["nodes"] == g.n_nodes
+    for name in ARRAYS:
+        a = getattr(m.index, name) if name in ("addresses", "order") else getattr(m, name)
+        b = getattr(g.index, name) if name in ("addresses", "order") else getattr(g, name)
+        assert a.dtype == b.dtype and np.array_equal(a, b) and not a.flags.writeable
+    assert m.neighbors(_a(2)) == g.neighbors(_a(2))
+    # Mapped snapshots extend by copying, as the builder does.
+    merged = m.merge([(_a(1), _a(5), 1, 1.0, 400, 400)], watermark=8)
+    assert merged.index.lookup(_a(5)) >= 0 and m.index.lookup(_a(5)) == -1
+
+    empty_path = str(tmp_path / "empty.snapshot")
+    write_snapshot(CSRGraph.empty(), empty_path)
+    assert open_snapshot(empty_path)[0].n_nodes == 0
+
+
+def test_corruption_and_version_are_detected(tmp_path):
+    path = tmp_path / "graph.snapshot"
+    write_snapshot(_graph(), str(path))
+    raw = bytearray(path.read_bytes())
+
+    bad = bytearray(raw)
+    bad[4096] ^= 0xFF
+    path.write_bytes(bytes(bad))
+    open_snapshot(str(path))  # the payload is only read on verify
+    with pytest.raises(ValueError, match="payload checksum"):
+        open_snapshot(str(path), verify=True)
+
+    bad = bytearray(raw)
+    bad[40] ^= 0xFF
+    path.write_bytes(bytes(bad))
+    with pytest.raises(ValueError, match="header checksum"):
+        open_snapshot(str(path))
+
+    bad = bytearray(raw)
+    bad[8] = 99
+    path.write_bytes(bytes(bad))
+    with pytest.raises(ValueError, match="version 99"):
+        open_snapshot(str(path))
+
+    # Version 1 files carried float64 wei: never served nor resumed from.
+    bad = bytearray(raw)
+    bad[8] = 1
+    path.write_bytes(bytes(bad))
+    with pytest.raises(ValueError, match=f"version 1 \\(expected {FORMAT_VERSION}\\)"):
+        open_snapshot(str(path))
+    assert resume(str(path)).n_edges == 0
+
+    path.write_bytes(bytes(raw[:4200]))
+    with pytest.raises(ValueError, match="truncated"):
+        open_snapshot(str(path))
+
+
+def test_workers_reopen_the_file_after_an_atomic_replace(tmp_path, monkeypatch):
+    path = str(tmp_path / "graph.snapshot")
+    monkeypatch.setenv("GRAPH_SNAPSHOT_PATH", path)
+    monkeypatch.setitem(snapshot_service._state, "graph", None)
+    monkeypatch.setitem(snapshot_service._state, "file", None)
+    assert snapshot_service.refresh_snapshot() is None  # no file yet
+
+    write_snapshot(_graph(watermark=7), path)
+    first = snapshot_service.refresh_snapshot()
+    assert first.watermark == 7
+    assert snapshot_service.refresh_snapshot() is first  # unchanged file: no reload
+
+    write_snapshot(_graph().merge([(_a(8), _a(9), 1, 1.0, 5, 5)], watermark=9), path)
+    second = snapshot_service.refresh_snapshot()
+    assert second.watermark == 9 and second.index.lookup(_a(8)) >= 0
+    # The replaced file stays mapped for readers still holding the old snapshot.
+    assert first.neighbors(_a(2)) == _graph().neighbors(_a(2))
+    assert snapshot_service.snapshot_status()["source"] == "file"
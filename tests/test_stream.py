@@ -0,0 +1,55 @@
+import asyncio
+import json
+import os
+
+from api.services import stream_service
+from api.services.db import get_conn
+
+
+def test_apply_event_tracks_queue_and_high_open():
+    c = {k: 0 for k in stream_service.COUNTER_KEYS}
+    stream_service.apply_event(c, {"op": "insert", "status": "new", "severity": "high"})
+    stream_service.apply_event(c, {"op": "insert", "status": "new", "severity": "low"})
+    stream_service.apply_event(c, {"op": "update", "status": "ack", "old_status": "new", "severity": "high"})
+    assert c == {"alerts_24h": 2, "queue_new": 1, "queue_ack": 1, "queue_resolved": 0, "high_open": 1}
+    stream_service.apply_event(c, {"op": "update", "status": "resolved", "old_status": "ack", "severity": "high"})
+    assert (c["queue_ack"], c["queue_resolved"], c["high_open"]) == (0, 1, 0)
+
+
+def test_format_sse_frames_event():
+    frame = stream_service.format_sse("alert", {"id": 7, "type": "fan_in_spike"}, 7)
+    assert frame == 'id: 7\nevent: alert\ndata: {"id":7,"type":"fan_in_spike"}\n\n'
+
+
+def test_hub_fans_out_inserts_and_status_changes(pg):
+    prefix = f"0xstrm{os.getpid():x}"
+
+    async def go():
+        hub = stream_service.StreamHub()
+        subs = [hub.subscribe() for _ in range(3)]
+        await asyncio.sleep(0.5)  # listener connected and LISTENing
+        with get_conn() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT INTO alerts(type, address, severity, confidence, evidence) VALUES('fan_out_spike', %s, 'high', 0.9, '{}') RETURNING id",
+                (f"{prefix}01",),
+            )
+            alert_id = cur.fetchone()[0]
+        with get_conn() as conn:
+            conn.cursor().execute("UPDATE alerts SET status = 'ack' WHERE id = %s", (alert_id,))
+        chunks = []
+        for sub in subs:
+            text = ""
+            while text.count("event: alert") < 2:
+                text += await asyncio.wait_for(sub.queue.get(), 5)
+            chunks.append(text)
+        return alert_id, chunks
+
+    try:
+        alert_id, chunks = asyncio.run(go())
+        assert len(set(chunks)) == 1
+        events = [json.loads(line[6:]) for line in chunks[0].splitlines() if line.startswith("data: ") and '"op"' in line]
+        assert [(e["id"], e["op"], e["status"]) for e in events] == [(alert_id, "insert", "new"), (alert_id, "update", "ack")]
+    finally:
+        with get_conn() as conn:
+            conn.cursor().execute("DELETE FROM alerts WHERE address LIKE %s", (f"{prefix}%",))
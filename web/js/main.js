@@ -78,6 +78,39 @@ async function refreshAll() {
   }
 }
 
+// Live updates: the server pushes alert inserts/status changes and compact
+// counters over /stream, so the summary is only fetched on load and on demand.
+function applyCounters(c) {
+  const summary = store.state.summary;
+  if (!summary) return;
+  const queue = summary.summary?.queue || {};
+  store.set({
+    summary: {
+      ...summary,
+      compact: { ...summary.compact, ...c },
+      summary: { ...summary.summary, queue: { ...queue, queue_counts: { new: c.queue_new, ack: c.queue_ack, resolved: c.queue_resolved } } },
+    },
+  });
+}
+
+function applyAlert(a) {
+  const summary = store.state.summary;
+  if (!summary) return;
+  let hot = (summary.summary?.hot_alerts || []).filter((r) => r.id !== a.id);
+  if (a.status === 'new' || a.status === 'ack') hot = [a, ...hot].slice(0, 20);
+  store.set({ summary: { ...summary, summary: { ...summary.summary, hot_alerts: hot } } });
+  if (a.op === 'insert' && a.severity === 'high') toast(`High alert: ${a.type} ${shortAddr(a.address)}`);
+}
+
+function connectStream() {
+  if (!window.EventSource) return;
+  const es = new EventSource('/stream');
+  es.addEventListener('counters', (e) => applyCounters(JSON.parse(e.data)));
+  es.addEventListener('alert', (e) => applyAlert(JSON.parse(e.data)));
+  es.addEventListener('open', () => { document.getElementById('healthDot').style.background = 'var(--ok)'; });
+  es.addEventListener('error', () => { document.getElementById('healthDot').style.background = 'var(--warn)'; });
+}
+
 async function runSafe(fn) {
   setBusy(true);
   try { await fn(); }
@@ -130,4 +163,4 @@ function bind() {
 }
 
 bind();
-runSafe(refreshAll);
+runSafe(refreshAll).then(connectStream);